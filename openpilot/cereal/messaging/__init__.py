@@ -7,7 +7,7 @@ import os
 import capnp
 import time
 
-from typing import Union
+from typing import Any, Union
 
 from openpilot.cereal import log
 from openpilot.cereal.services import SERVICE_LIST
@@ -18,6 +18,7 @@ __all__ = (
   "Context",
   "FrequencyTracker",
   "IpcError",
+  "MessageBuilder",
   "MultiplePublishersError",
   "Poller",
   "PubMaster",
@@ -85,6 +86,48 @@ def new_message(service: str | None, size: int | None = None, **kwargs) -> capnp
   return dat
 
 
+class MessageBuilder:
+  """
+  One message of a service that a realtime loop fills in again every cycle, instead of
+  allocating and initializing a new one. All fields that can change need to be written
+  every cycle, since nothing is reset in between.
+
+  Scalar fields can be written in place as often as needed. Setting Text, Data, List or
+  struct fields allocates new space in the message without freeing the old one, so they
+  must only be set once, or go through set_list, for the message not to keep growing.
+  """
+  def __init__(self, service: str, size: int | None = None):
+    self.service = service
+    self.msg = new_message(service, size)
+    self.data = getattr(self.msg, service)
+    self._lists: dict[str, Any] = {}
+    self._last: dict[str, dict[str, Any]] = {}
+
+  def set_list(self, struct, field: str, values, key: str | None = None) -> None:
+    """Writes values to a list field of struct in place, only initing it again when the length changes"""
+    key = field if key is None else key
+    lst = self._lists.get(key)
+    if lst is None or len(lst) != len(values):
+      lst = self._lists[key] = struct.init(field, len(values))
+    for i, v in enumerate(values):
+      lst[i] = v
+
+  def update(self, key: str, struct, **fields) -> None:
+    """Writes the scalar fields of struct that changed since the last update with this key"""
+    last = self._last.setdefault(key, {})
+    for name, value in fields.items():
+      if name not in last or last[name] != value:
+        setattr(struct, name, value)
+        last[name] = value
+
+  def to_bytes(self, valid: bool) -> bytes:
+    self.msg.logMonoTime = int(time.monotonic() * 1e9)
+    self.msg.valid = valid
+    dat = self.msg.to_bytes()
+    self.msg.clear_write_flag()
+    return dat
+
+
 def drain_sock(sock: SubSocket, wait_for_one: bool = False) -> list[capnp.lib.capnp._DynamicStructReader]:
   """Receive all message currently available on the queue"""
   msgs = drain_sock_raw(sock, wait_for_one=wait_for_one)
@@ -4,6 +4,7 @@ import numbers
 import random
 import threading
 import time
+import warnings
 from openpilot.common.test import OpenpilotTestCase
 from openpilot.common.parameterized import parameterized
 
@@ -58,6 +59,35 @@ class TestMessaging(OpenpilotTestCase):
     assert not msg.valid
     assert evt == msg.which()
 
+  def test_message_builder(self):
+    builder = messaging.MessageBuilder('longitudinalPlan')
+    plan = builder.data
+    sizes, times = set(), []
+    for i in range(100):
+      builder.update('longitudinalPlan', plan, aTarget=i // 10, hasLead=True)
+      builder.set_list(plan, 'accels', [i, i + 1, i + 2])
+      with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        dat = builder.to_bytes(i % 2 == 0)
+
+      msg = messaging.log_from_bytes(dat)
+      assert msg.valid == (i % 2 == 0)
+      assert msg.longitudinalPlan.aTarget == i // 10 and msg.longitudinalPlan.hasLead
+      assert list(msg.longitudinalPlan.accels) == [i, i + 1, i + 2]
+      sizes.add(len(dat))
+      times.append(msg.logMonoTime)
+
+    # filled in place, the message doesn't grow
+    assert len(sizes) == 1
+    assert times == sorted(times) and (time.monotonic() - times[-1] / 1e9) < 0.1
+
+    # only what changed is written
+    plan.aTarget = 1.
+    builder.update('longitudinalPlan', plan, aTarget=9., hasLead=True)
+    assert plan.aTarget == 1.
+    builder.update('longitudinalPlan', plan, aTarget=2.)
+    assert plan.aTarget == 2.
+
   @parameterized.expand(events)
   def test_pub_sock(self, evt):
     messaging.pub_sock(evt)
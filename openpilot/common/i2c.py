@@ -5,6 +5,7 @@ import ctypes
 # I2C constants from /usr/include/linux/i2c-dev.h
 I2C_SLAVE = 0x0703
 I2C_SLAVE_FORCE = 0x0706
+I2C_RDWR = 0x0707
 I2C_SMBUS = 0x0720
 
 # SMBus transfer types
@@ -15,6 +16,10 @@ I2C_SMBUS_I2C_BLOCK_DATA = 8
 
 I2C_SMBUS_BLOCK_MAX = 32
 
+# i2c_msg flags
+I2C_M_RD = 0x0001
+I2C_MSG_LEN_MAX = 8192  # per message limit of the I2C_RDWR ioctl
+
 
 class _I2cSmbusData(ctypes.Union):
   _fields_ = [
@@ -33,6 +38,22 @@ class _I2cSmbusIoctlData(ctypes.Structure):
   ]
 
 
+class _I2cMsg(ctypes.Structure):
+  _fields_ = [
+    ("addr", ctypes.c_uint16),
+    ("flags", ctypes.c_uint16),
+    ("len", ctypes.c_uint16),
+    ("buf", ctypes.POINTER(ctypes.c_uint8)),
+  ]
+
+
+class _I2cRdwrIoctlData(ctypes.Structure):
+  _fields_ = [
+    ("msgs", ctypes.POINTER(_I2cMsg)),
+    ("nmsgs", ctypes.c_uint32),
+  ]
+
+
 class SMBus:
   def __init__(self, bus: int):
     self._fd = os.open(f'/dev/i2c-{bus}', os.O_RDWR)
@@ -79,3 +100,17 @@ class SMBus:
     read_len = int(data.block[0]) or length
     read_len = min(read_len, length)
     return [int(b) for b in data.block[1 : read_len + 1]]
+
+  def read_i2c_burst(self, addr: int, register: int, length: int) -> bytes:
+    # plain I2C write-then-read in one transfer, not limited to the 32 bytes of an SMBus block read
+    if not (0 <= length <= I2C_MSG_LEN_MAX):
+      raise ValueError(f"length must be 0..{I2C_MSG_LEN_MAX}")
+
+    reg = (ctypes.c_uint8 * 1)(register)
+    buf = (ctypes.c_uint8 * length)()
+    msgs = (_I2cMsg * 2)(
+      _I2cMsg(addr, 0, 1, reg),
+      _I2cMsg(addr, I2C_M_RD, length, buf),
+    )
+    fcntl.ioctl(self._fd, I2C_RDWR, _I2cRdwrIoctlData(msgs, 2))
+    return bytes(buf)
@@ -47,7 +47,9 @@ class SwagFormatter(logging.Formatter):
       except (ValueError, TypeError):
         record_dict['msg'] = [record.msg]+record.args
 
-    record_dict['ctx'] = self.swaglogger.get_ctx()
+    # handlers that format off the logging thread capture the thread-local ctx up front
+    ctx = getattr(record, 'swaglog_ctx', None)
+    record_dict['ctx'] = self.swaglogger.get_ctx() if ctx is None else ctx
 
     if record.exc_info:
       record_dict['exc_info'] = self.formatException(record.exc_info)
@@ -1,7 +1,11 @@
 import logging
 import os
+import struct
+import threading
 import time
+import traceback
 import warnings
+from collections import deque
 from pathlib import Path
 from logging.handlers import BaseRotatingHandler
 
@@ -53,6 +57,33 @@ class SwaglogRotatingFileHandler(BaseRotatingHandler):
     time_exceeded = self.interval > 0 and self.last_rollover + self.interval <= time.monotonic()
     return size_exceeded or time_exceeded
 
+  def emit_many(self, records):
+    """
+    Formats and writes records with one write and flush per file, rolling
+    over between records as emit() would.
+    """
+    lines = []
+    for record in records:
+      try:
+        lines.append(self.format(record) + self.terminator)
+      except Exception:
+        traceback.print_exc()
+
+    with self.lock:
+      if self.shouldRollover(None):
+        self.doRollover()
+      pending, size = [], self.stream.tell()
+      for line in lines:
+        pending.append(line)
+        size += len(line)
+        if self.max_bytes > 0 and size >= self.max_bytes:
+          self.stream.write(''.join(pending))
+          self.doRollover()
+          pending, size = [], 0
+      if pending:
+        self.stream.write(''.join(pending))
+      self.flush()
+
   def doRollover(self):
     if self.stream:
       self.stream.close()
@@ -105,6 +136,129 @@ class UnixDomainSocketHandler(logging.Handler):
       pass
 
 
+# batched frames start with a byte that is never a log level, followed by
+# (level: u8, length: u32 LE, json) for every record in the batch
+BATCH_MARKER = 0
+BATCH_RECORD_HEADER = struct.Struct('<BI')
+MAX_BATCH_RECORDS = 256
+
+
+def encode_batch(records: list[tuple[int, str]]) -> bytes:
+  parts = [bytes([BATCH_MARKER])]
+  for level, msg in records:
+    dat = msg.encode('utf8')
+    parts.append(BATCH_RECORD_HEADER.pack(min(level, 255), len(dat)))
+    parts.append(dat)
+  return b''.join(parts)
+
+
+def decode_log_frame(dat: bytes) -> list[tuple[int, str]]:
+  """Decode a frame from the swaglog socket, either a single record or a batch."""
+  if dat[0] != BATCH_MARKER:
+    return [(dat[0], dat[1:].decode('utf8'))]
+
+  records = []
+  pos = 1
+  while pos < len(dat):
+    level, length = BATCH_RECORD_HEADER.unpack_from(dat, pos)
+    pos += BATCH_RECORD_HEADER.size
+    records.append((level, dat[pos:pos + length].decode('utf8')))
+    pos += length
+  return records
+
+
+class BatchedSocketHandler(logging.Handler):
+  """
+  Opt-in replacement for UnixDomainSocketHandler, enabled with SWAGLOG_BATCHED=1.
+  The calling thread only resolves the message and the thread-local ctx and appends
+  the record to a deque, JSON formatting and sending happen on a background thread
+  that sends everything queued in batched frames every interval.
+  """
+  def __init__(self, formatter, interval=0.05, max_queued=4096):
+    logging.Handler.__init__(self)
+    self.setFormatter(formatter)
+    self.pid = None
+    self.interval = interval
+    self.max_queued = max_queued
+    self.queue: deque[logging.LogRecord] = deque(maxlen=max_queued)
+
+    self.zctx = None
+    self.sock = None
+    self.thread = None
+    self.stop_event = threading.Event()
+
+  def __del__(self):
+    self.close()
+
+  def close(self):
+    if self.thread is not None and self.pid == os.getpid():
+      self.stop_event.set()
+      self.thread.join()
+    self.thread = None
+    if self.sock is not None:
+      self.sock.close()
+      self.sock = None
+    if self.zctx is not None:
+      self.zctx.term()
+      self.zctx = None
+
+  def connect(self):
+    self.zctx = zmq.Context()
+    self.sock = self.zctx.socket(zmq.PUSH)
+    self.sock.setsockopt(zmq.LINGER, 10)
+    self.sock.connect(Paths.swaglog_ipc())
+    self.pid = os.getpid()
+
+    # records queued before a fork belong to the parent
+    self.queue = deque(maxlen=self.max_queued)
+    self.stop_event = threading.Event()
+    self.thread = threading.Thread(target=self._send_thread, name="swaglog", daemon=True)
+    self.thread.start()
+
+  def handle(self, record):
+    # emit only appends to the deque, no need for the handler lock
+    rv = self.filter(record)
+    if rv:
+      self.emit(record)
+    return rv
+
+  def emit(self, record):
+    if os.getpid() != self.pid:
+      # forked, like UnixDomainSocketHandler
+      warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*<zmq.*>")
+      self.connect()
+
+    # resolve what can change after the call returns, the rest is formatted later
+    if not isinstance(record.msg, dict):
+      try:
+        record.msg = record.getMessage()
+        record.args = None
+      except (ValueError, TypeError):
+        pass
+    record.swaglog_ctx = self.formatter.swaglogger.get_ctx()
+    self.queue.append(record)
+
+  def _send_pending(self):
+    while self.queue:
+      records = []
+      while self.queue and len(records) < MAX_BATCH_RECORDS:
+        record = self.queue.popleft()
+        try:
+          records.append((record.levelno, self.format(record).rstrip('\n')))
+        except Exception:
+          self.handleError(record)
+      try:
+        self.sock.send(encode_batch(records), zmq.NOBLOCK)
+      except zmq.error.Again:
+        # drop :/
+        pass
+
+  def _send_thread(self):
+    while not self.stop_event.wait(self.interval):
+      self._send_pending()
+    self._send_pending()
+
+
 class ForwardingHandler(logging.Handler):
   def __init__(self, target_logger):
     super().__init__()
@@ -138,7 +292,10 @@ elif print_level == 'info':
 elif print_level == 'warning':
   outhandler.setLevel(logging.WARNING)
 
-ipchandler = UnixDomainSocketHandler(SwagFormatter(log))
+if os.getenv('SWAGLOG_BATCHED') is not None:
+  ipchandler = BatchedSocketHandler(SwagFormatter(log))
+else:
+  ipchandler = UnixDomainSocketHandler(SwagFormatter(log))
 
 log.addHandler(outhandler)
 # logs are sent through IPC before writing to disk to prevent disk I/O blocking
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Latency of a log call on the calling thread, with the unbatched UnixDomainSocketHandler
+against the BatchedSocketHandler, which formats and sends from its own thread.
+
+  swaglog_benchmark.py [-n calls]
+"""
+import argparse
+import time
+
+import numpy as np
+import zmq
+
+from openpilot.common.hardware.hw import Paths
+from openpilot.common.logging_extra import SwagFormatter
+from openpilot.common.swaglog import BatchedSocketHandler, UnixDomainSocketHandler
+from openpilot.common.tests.test_swaglog import make_logger
+
+
+def benchmark(handler_cls, n):
+  log = make_logger()
+  handler = handler_cls(SwagFormatter(log))
+  log.addHandler(handler)
+  ts = np.empty(n)
+  for i in range(n):
+    st = time.perf_counter()
+    log.event("benchmark_event", i=i, value=i * 0.5, name="controlsd")
+    ts[i] = time.perf_counter() - st
+  handler.close()
+  return ts * 1e6
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Latency of a log call, unbatched against batched")
+  parser.add_argument("-n", "--calls", type=int, default=2000)
+  args = parser.parse_args()
+
+  # logmessaged's end of the socket
+  zctx = zmq.Context()
+  sock = zctx.socket(zmq.PULL)
+  sock.bind(Paths.swaglog_ipc())
+
+  for name, handler_cls in (("unbatched", UnixDomainSocketHandler), ("batched", BatchedSocketHandler)):
+    ts = benchmark(handler_cls, args.calls)
+    print(f"{name:>10}: mean {np.mean(ts):5.1f} us, p99 {np.percentile(ts, 99):5.1f} us per log call")
+
+  sock.close()
+  zctx.term()
@@ -0,0 +1,87 @@
+import logging
+import zmq
+
+from openpilot.common.test import OpenpilotTestCase
+from openpilot.common.hardware.hw import Paths
+from openpilot.common.logging_extra import SwagLogger, SwagFormatter
+from openpilot.common.swaglog import BatchedSocketHandler, decode_log_frame, encode_batch
+
+
+class CaptureHandler(logging.Handler):
+  # formats on the calling thread, like UnixDomainSocketHandler
+  def __init__(self, formatter):
+    super().__init__()
+    self.setFormatter(formatter)
+    self.records = []
+
+  def emit(self, record):
+    self.records.append((record.levelno, self.format(record)))
+
+
+def make_logger(*handlers):
+  log = SwagLogger()
+  log.setLevel(logging.DEBUG)
+  for handler in handlers:
+    log.addHandler(handler)
+  return log
+
+
+class TestBatchedSwaglog(OpenpilotTestCase):
+  def setup_method(self):
+    self.zctx = zmq.Context()
+    self.sock = self.zctx.socket(zmq.PULL)
+    self.sock.setsockopt(zmq.RCVTIMEO, 1000)
+    self.sock.bind(Paths.swaglog_ipc())
+
+  def teardown_method(self):
+    self.sock.close()
+    self.zctx.term()
+
+  def recv_records(self, n):
+    records = []
+    while len(records) < n:
+      records += decode_log_frame(b''.join(self.sock.recv_multipart()))
+    return records
+
+  def test_encode_decode(self):
+    records = [(20, '{"msg": "a"}'), (40, '{"msg": "\\u00e9"}'), (10, 'é' * 1000)]
+    assert decode_log_frame(encode_batch(records)) == records
+    # frames from the C++ and unbatched loggers still decode
+    assert decode_log_frame(chr(30).encode() + b'{"msg": "w"}') == [(30, '{"msg": "w"}')]
+
+  def test_matches_formatter(self):
+    log = make_logger()
+    capture = CaptureHandler(SwagFormatter(log))
+    handler = BatchedSocketHandler(SwagFormatter(log), interval=0.01)
+    log.addHandler(capture)
+    log.addHandler(handler)
+    log.bind_global(dongle_id="abc")
+
+    log.info("plain message")
+    log.warning("formatted %s %d", "message", 5)
+    log.event("some_event", x=1, y=[1, 2], error=True)
+    with log.ctx(daemon="test"):
+      log.debug({"dict": "message"})
+      try:
+        raise RuntimeError("boom")
+      except RuntimeError:
+        log.exception("caught")
+    args = [1, 2]
+    log.info("mutated %s", args)
+    args.append(3)
+
+    assert self.recv_records(len(capture.records)) == capture.records
+    handler.close()
+
+  def test_many_records(self):
+    # a burst of log calls goes out in a few frames, all of it and in order
+    log = make_logger()
+    capture = CaptureHandler(SwagFormatter(log))
+    handler = BatchedSocketHandler(SwagFormatter(log))
+    log.addHandler(capture)
+    log.addHandler(handler)
+
+    for i in range(2000):
+      log.event("many_event", i=i, value=i * 0.5, name="controlsd")
+    assert self.recv_records(2000) == capture.records
+    handler.close()
@@ -1,18 +1,97 @@
-from openpilot.common.transformations.orientation import numpy_wrap
-from openpilot.common.transformations.transformations import (ecef2geodetic_single,
-                                                    geodetic2ecef_single)
+import numpy as np
+
+from openpilot.common.transformations.transformations import a, b, esq, e1sq, ecef2geodetic_single, geodetic2ecef_single
 from openpilot.common.transformations.transformations import LocalCoord as LocalCoord_single
 
+# Like orientation.py, single points go to the _single versions and batches broadcast over any leading dimensions.
+
+
+def _points(inp, name: str) -> np.ndarray:
+  inp = np.asarray(inp)
+  if inp.ndim == 0:
+    raise IndexError(f"{name} must be a point or a batch of points")
+  if inp.ndim > 1 and inp.shape[-1] != 3:
+    raise ValueError(f"{name} must be size 3")
+  return inp
+
+
+def geodetic2ecef(geodetic) -> np.ndarray:
+  geodetic = _points(geodetic, "Geodetic")
+  if geodetic.ndim == 1:
+    return geodetic2ecef_single(geodetic)
+
+  lat, lon, alt = np.moveaxis(geodetic, -1, 0)
+  lat = np.radians(lat)
+  lon = np.radians(lon)
+  xi = np.sqrt(1.0 - esq * np.sin(lat)**2)
+  ecef = np.empty(geodetic.shape)
+  ecef[..., 0] = (a / xi + alt) * np.cos(lat) * np.cos(lon)
+  ecef[..., 1] = (a / xi + alt) * np.cos(lat) * np.sin(lon)
+  ecef[..., 2] = (a / xi * (1.0 - esq) + alt) * np.sin(lat)
+  return ecef
+
+
+def ecef2geodetic(ecef) -> np.ndarray:
+  """
+  Convert ECEF to geodetic coordinates using Ferrari's solution.
+  """
+  ecef = _points(ecef, "ECEF")
+  if ecef.ndim == 1:
+    return ecef2geodetic_single(ecef)
+
+  x, y, z = np.moveaxis(ecef, -1, 0)
+  r = np.sqrt(x**2 + y**2)
+  Esq = a**2 - b**2
+  F = 54 * b**2 * z**2
+  G = r**2 + (1 - esq) * z**2 - esq * Esq
+  C = (esq**2 * F * r**2) / (G**3)
+  S = np.cbrt(1 + C + np.sqrt(C**2 + 2 * C))
+  P = F / (3 * (S + 1 / S + 1)**2 * G**2)
+  Q = np.sqrt(1 + 2 * esq**2 * P)
+  r_0 = -(P * esq * r) / (1 + Q) + np.sqrt(0.5 * a**2 * (1 + 1.0 / Q) - P * (1 - esq) * z**2 / (Q * (1 + Q)) - 0.5 * P * r**2)
+  U = np.sqrt((r - esq * r_0)**2 + z**2)
+  V = np.sqrt((r - esq * r_0)**2 + (1 - esq) * z**2)
+  Z_0 = b**2 * z / (a * V)
+  geodetic = np.empty(ecef.shape)
+  geodetic[..., 0] = np.degrees(np.arctan((z + e1sq * Z_0) / r))
+  geodetic[..., 1] = np.degrees(np.arctan2(y, x))
+  geodetic[..., 2] = U * (1 - b**2 / (a * V))
+  return geodetic
+
+
+def ecef_from_ned_matrix(ecef_init) -> np.ndarray:
+  """
+  Rotation matrices from NED to ECEF at the given ECEF origins, the ned2ecef_matrix of LocalCoord.
+  """
+  lat, lon = np.moveaxis(np.radians(ecef2geodetic(ecef_init)[..., :2]), -1, 0)
+  s_lat, c_lat = np.sin(lat), np.cos(lat)
+  s_lon, c_lon = np.sin(lon), np.cos(lon)
+
+  mat = np.zeros(lat.shape + (3, 3))
+  mat[..., 0, 0] = -s_lat * c_lon
+  mat[..., 0, 1] = -s_lon
+  mat[..., 0, 2] = -c_lat * c_lon
+  mat[..., 1, 0] = -s_lat * s_lon
+  mat[..., 1, 1] = c_lon
+  mat[..., 1, 2] = -c_lat * s_lon
+  mat[..., 2, 0] = c_lat
+  mat[..., 2, 2] = -s_lat
+  return mat
+
 
 class LocalCoord(LocalCoord_single):
-  ecef2ned = numpy_wrap(LocalCoord_single.ecef2ned_single, (3,), (3,))
-  ned2ecef = numpy_wrap(LocalCoord_single.ned2ecef_single, (3,), (3,))
-  geodetic2ned = numpy_wrap(LocalCoord_single.geodetic2ned_single, (3,), (3,))
-  ned2geodetic = numpy_wrap(LocalCoord_single.ned2geodetic_single, (3,), (3,))
+  def ecef2ned(self, ecef) -> np.ndarray:
+    return (np.asarray(ecef) - self.init_ecef) @ self.ned2ecef_matrix
+
+  def ned2ecef(self, ned) -> np.ndarray:
+    return np.asarray(ned) @ self.ecef2ned_matrix + self.init_ecef
+
+  def geodetic2ned(self, geodetic) -> np.ndarray:
+    return self.ecef2ned(geodetic2ecef(geodetic))
 
+  def ned2geodetic(self, ned) -> np.ndarray:
+    return ecef2geodetic(self.ned2ecef(ned))
 
-geodetic2ecef = numpy_wrap(geodetic2ecef_single, (3,), (3,))
-ecef2geodetic = numpy_wrap(ecef2geodetic_single, (3,), (3,))
 
 geodetic_from_ecef = ecef2geodetic
 ecef_from_geodetic = geodetic2ecef
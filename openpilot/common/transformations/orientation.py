@@ -1,10 +1,10 @@
+import functools
 import numpy as np
 from collections.abc import Callable
 
-from openpilot.common.transformations.transformations import (ecef_euler_from_ned_single,
-                                                    euler2quat_single,
+from openpilot.common.transformations.coordinates import ecef_from_ned_matrix
+from openpilot.common.transformations.transformations import (euler2quat_single,
                                                     euler2rot_single,
-                                                    ned_euler_from_ecef_single,
                                                     quat2euler_single,
                                                     quat2rot_single,
                                                     rot2euler_single,
@@ -32,14 +32,157 @@ def numpy_wrap(function, input_shape, output_shape) -> Callable[..., np.ndarray]
   return f
 
 
-euler2quat = numpy_wrap(euler2quat_single, (3,), (4,))
-quat2euler = numpy_wrap(quat2euler_single, (4,), (3,))
-quat2rot = numpy_wrap(quat2rot_single, (4,), (3, 3))
-rot2quat = numpy_wrap(rot2quat_single, (3, 3), (4,))
-euler2rot = numpy_wrap(euler2rot_single, (3,), (3, 3))
-rot2euler = numpy_wrap(rot2euler_single, (3, 3), (3,))
-ecef_euler_from_ned = numpy_wrap(ecef_euler_from_ned_single, (3,), (3,))
-ned_euler_from_ecef = numpy_wrap(ned_euler_from_ecef_single, (3,), (3,))
+def numpy_broadcast(function, input_shape) -> Callable[[Callable[..., np.ndarray]], Callable[..., np.ndarray]]:
+  """Use function for a single input and the decorated broadcasting version for inputs with leading batch dimensions"""
+  def decorator(batched):
+    @functools.wraps(batched)
+    def f(inp):
+      inp = np.asarray(inp)
+      if inp.ndim == len(input_shape):
+        return function(inp)
+      if inp.ndim < len(input_shape):
+        raise IndexError(f"Input must have at least {len(input_shape)} dimensions, got shape {inp.shape}")
+      return batched(inp)
+    return f
+  return decorator
+
+
+def _vectors(inp: np.ndarray, size: int) -> np.ndarray:
+  if inp.shape[-1] != size:
+    raise ValueError(f"Input must have size {size} in its last dimension, got shape {inp.shape}")
+  return inp
+
+
+# The batched versions below broadcast over any leading dimensions, an (N, 3) euler batch gives (N, 4)
+# quaternions, (N, M, 3) gives (N, M, 4), and so on. They match the _single versions in transformations.py.
+
+@numpy_broadcast(euler2quat_single, (3,))
+def euler2quat(eulers) -> np.ndarray:
+  eulers = _vectors(eulers, 3)
+  half = eulers / 2
+  c_phi, c_theta, c_psi = np.moveaxis(np.cos(half), -1, 0)
+  s_phi, s_theta, s_psi = np.moveaxis(np.sin(half), -1, 0)
+
+  quats = np.empty(eulers.shape[:-1] + (4,))
+  quats[..., 0] = c_phi * c_theta * c_psi + s_phi * s_theta * s_psi
+  quats[..., 1] = s_phi * c_theta * c_psi - c_phi * s_theta * s_psi
+  quats[..., 2] = c_phi * s_theta * c_psi + s_phi * c_theta * s_psi
+  quats[..., 3] = c_phi * c_theta * s_psi - s_phi * s_theta * c_psi
+  return np.where(quats[..., :1] < 0, -quats, quats)
+
+
+@numpy_broadcast(quat2euler_single, (4,))
+def quat2euler(quats) -> np.ndarray:
+  w, x, y, z = np.moveaxis(_vectors(quats, 4), -1, 0)
+  eulers = np.empty(w.shape + (3,))
+  eulers[..., 0] = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x**2 + y**2))
+  eulers[..., 1] = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+  eulers[..., 2] = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y**2 + z**2))
+  return eulers
+
+
+@numpy_broadcast(quat2rot_single, (4,))
+def quat2rot(quats) -> np.ndarray:
+  w, x, y, z = np.moveaxis(_vectors(quats, 4), -1, 0)
+  xx, yy, zz = x * x, y * y, z * z
+  xy, xz, yz = x * y, x * z, y * z
+  wx, wy, wz = w * x, w * y, w * z
+
+  rots = np.empty(w.shape + (3, 3))
+  rots[..., 0, 0] = 1 - 2 * (yy + zz)
+  rots[..., 0, 1] = 2 * (xy - wz)
+  rots[..., 0, 2] = 2 * (xz + wy)
+  rots[..., 1, 0] = 2 * (xy + wz)
+  rots[..., 1, 1] = 1 - 2 * (xx + zz)
+  rots[..., 1, 2] = 2 * (yz - wx)
+  rots[..., 2, 0] = 2 * (xz - wy)
+  rots[..., 2, 1] = 2 * (yz + wx)
+  rots[..., 2, 2] = 1 - 2 * (xx + yy)
+  return rots
+
+
+@numpy_broadcast(rot2quat_single, (3, 3))
+def rot2quat(rots) -> np.ndarray:
+  batch_shape = rots.shape[:-2]
+  r = rots.reshape((-1,) + rots.shape[-2:])
+  r00, r01, r02 = r[:, 0, 0], r[:, 0, 1], r[:, 0, 2]
+  r10, r11, r12 = r[:, 1, 0], r[:, 1, 1], r[:, 1, 2]
+  r20, r21, r22 = r[:, 2, 0], r[:, 2, 1], r[:, 2, 2]
+
+  # same branches as rot2quat_single, each evaluated only on the rows that take it
+  trace = r00 + r11 + r22
+  branch = np.select([trace > 0, (r00 > r11) & (r00 > r22), r11 > r22], [0, 1, 2], 3)
+  quats = np.empty((len(r), 4))
+
+  m = branch == 0
+  s = 0.5 / np.sqrt(trace[m] + 1.0)
+  quats[m] = np.stack([0.25 / s, (r21[m] - r12[m]) * s, (r02[m] - r20[m]) * s, (r10[m] - r01[m]) * s], axis=-1)
+
+  m = branch == 1
+  s = 2.0 * np.sqrt(1.0 + r00[m] - r11[m] - r22[m])
+  quats[m] = np.stack([(r21[m] - r12[m]) / s, 0.25 * s, (r01[m] + r10[m]) / s, (r02[m] + r20[m]) / s], axis=-1)
+
+  m = branch == 2
+  s = 2.0 * np.sqrt(1.0 + r11[m] - r00[m] - r22[m])
+  quats[m] = np.stack([(r02[m] - r20[m]) / s, (r01[m] + r10[m]) / s, 0.25 * s, (r12[m] + r21[m]) / s], axis=-1)
+
+  m = branch == 3
+  s = 2.0 * np.sqrt(1.0 + r22[m] - r00[m] - r11[m])
+  quats[m] = np.stack([(r10[m] - r01[m]) / s, (r02[m] + r20[m]) / s, (r12[m] + r21[m]) / s, 0.25 * s], axis=-1)
+
+  quats = np.where(quats[:, :1] < 0, -quats, quats)
+  return quats.reshape(batch_shape + (4,))
+
+
+@numpy_broadcast(euler2rot_single, (3,))
+def euler2rot(eulers) -> np.ndarray:
+  eulers = _vectors(eulers, 3)
+  cx, cy, cz = np.moveaxis(np.cos(eulers), -1, 0)
+  sx, sy, sz = np.moveaxis(np.sin(eulers), -1, 0)
+
+  # Rz @ Ry @ Rx
+  rots = np.empty(eulers.shape[:-1] + (3, 3))
+  rots[..., 0, 0] = cz * cy
+  rots[..., 0, 1] = cz * sy * sx - sz * cx
+  rots[..., 0, 2] = cz * sy * cx + sz * sx
+  rots[..., 1, 0] = sz * cy
+  rots[..., 1, 1] = sz * sy * sx + cz * cx
+  rots[..., 1, 2] = sz * sy * cx - cz * sx
+  rots[..., 2, 0] = -sy
+  rots[..., 2, 1] = cy * sx
+  rots[..., 2, 2] = cy * cx
+  return rots
+
+
+@numpy_broadcast(rot2euler_single, (3, 3))
+def rot2euler(rots) -> np.ndarray:
+  return quat2euler(rot2quat(rots))
+
+
+def _frame_euler(rots: np.ndarray) -> np.ndarray:
+  # euler angles of the body axes in rots, with pitch kept within [-pi/2, pi/2]
+  eulers = np.empty(rots.shape[:-2] + (3,))
+  eulers[..., 0] = np.arctan2(rots[..., 2, 1], rots[..., 2, 2])
+  eulers[..., 1] = np.arctan2(-rots[..., 2, 0], np.hypot(rots[..., 0, 0], rots[..., 1, 0]))
+  eulers[..., 2] = np.arctan2(rots[..., 1, 0], rots[..., 0, 0])
+  return eulers
+
+
+def ecef_euler_from_ned(ecef_init, ned_pose) -> np.ndarray:
+  """
+  Convert NED Euler angles (roll, pitch, yaw) at the given ECEF origins
+  to equivalent ECEF Euler angles.
+  """
+  return _frame_euler(ecef_from_ned_matrix(ecef_init) @ euler2rot(ned_pose))
+
+
+def ned_euler_from_ecef(ecef_init, ecef_pose) -> np.ndarray:
+  """
+  Convert ECEF Euler angles (roll, pitch, yaw) at the given ECEF origins
+  to equivalent NED Euler angles.
+  """
+  return _frame_euler(np.swapaxes(ecef_from_ned_matrix(ecef_init), -1, -2) @ euler2rot(ecef_pose))
+
 
 quats_from_rotations = rot2quat
 quat_from_rot = rot2quat
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Time per row of euler2rot on batches of 1 to 1M angles, broadcast against numpy_wrap
+over the single row function.
+
+  orientation_benchmark.py [--sizes 1 100 10000 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from openpilot.common.transformations.orientation import euler2rot, numpy_wrap
+from openpilot.common.transformations.transformations import euler2rot_single
+
+
+def per_row(fn, n):
+  inputs = np.random.default_rng(1).uniform(-np.pi, np.pi, (n, 3))
+  iters = max(1, 10_000 // n)
+  st = time.perf_counter()
+  for _ in range(iters):
+    fn(inputs)
+  return (time.perf_counter() - st) / iters / n * 1e6
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time per row of euler2rot, numpy_wrap against broadcast")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000, 1_000_000])
+  args = parser.parse_args()
+
+  reference = numpy_wrap(euler2rot_single, (3,), (3, 3))
+  for n in args.sizes:
+    # the python loop costs the same per row at any size, running it over 1M rows takes too long
+    wrapped = per_row(reference, min(n, 10_000))
+    broadcast = per_row(euler2rot, n)
+    print(f"euler2rot n={n:>7}: numpy_wrap {wrapped:6.2f} us/row, broadcast {broadcast:6.3f} us/row")
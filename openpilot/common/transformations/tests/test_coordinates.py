@@ -2,6 +2,7 @@ import numpy as np
 
 from openpilot.common.test import OpenpilotTestCase
 import openpilot.common.transformations.coordinates as coord
+from openpilot.common.transformations.transformations import LocalCoord as LocalCoord_single, ecef2geodetic_single, geodetic2ecef_single
 
 geodetic_positions = np.array([[37.7610403, -122.4778699, 115],
                                  [27.4840915, -68.5867592, 2380],
@@ -136,3 +137,19 @@ class TestNED(OpenpilotTestCase):
       coord.ecef2geodetic([1, 2, 3, 4])
     with np.testing.assert_raises(IndexError):
       coord.ecef2geodetic(1.0)
+
+  def test_batch_matches_single(self):
+    rng = np.random.default_rng(0)
+    geodetic = np.column_stack([rng.uniform(-89, 89, 1000), rng.uniform(-180, 180, 1000), rng.uniform(-100, 3000, 1000)])
+    ecef = np.array([geodetic2ecef_single(g) for g in geodetic])
+    np.testing.assert_allclose(coord.geodetic2ecef(geodetic), ecef, rtol=1e-12)
+    np.testing.assert_allclose(coord.geodetic2ecef(geodetic.reshape(10, 100, 3)), ecef.reshape(10, 100, 3), rtol=1e-12)
+    np.testing.assert_allclose(coord.ecef2geodetic(ecef), [ecef2geodetic_single(e) for e in ecef], rtol=1e-9)
+
+    converter = coord.LocalCoord.from_geodetic(geodetic[0])
+    single = LocalCoord_single.from_geodetic(geodetic[0])
+    ned = rng.uniform(-1000, 1000, (1000, 3))
+    np.testing.assert_allclose(converter.ecef2ned(ecef), [single.ecef2ned_single(e) for e in ecef], rtol=1e-9, atol=1e-7)
+    np.testing.assert_allclose(converter.ned2ecef(ned), [single.ned2ecef_single(n) for n in ned], rtol=1e-9, atol=1e-7)
+    np.testing.assert_allclose(converter.geodetic2ned(geodetic), [single.geodetic2ned_single(g) for g in geodetic], rtol=1e-9, atol=1e-7)
+    np.testing.assert_allclose(converter.ned2geodetic(ned), [single.ned2geodetic_single(n) for n in ned], rtol=1e-9, atol=1e-7)
@@ -3,7 +3,10 @@ import numpy as np
 from openpilot.common.test import OpenpilotTestCase
 from openpilot.common.transformations.orientation import euler2quat, quat2euler, euler2rot, rot2euler, \
                                                rot2quat, quat2rot, \
-                                               ned_euler_from_ecef
+                                               ecef_euler_from_ned, ned_euler_from_ecef
+from openpilot.common.transformations.transformations import (ecef_euler_from_ned_single, euler2quat_single, euler2rot_single,
+                                                             ned_euler_from_ecef_single, quat2euler_single, quat2rot_single,
+                                                             rot2euler_single, rot2quat_single)
 
 eulers = np.array([[ 1.46520501,  2.78688383,  2.92780854],
        [ 4.86909526,  3.60618161,  4.30648981],
@@ -59,7 +62,7 @@ class TestOrientation(OpenpilotTestCase):
     for i in range(len(eulers)):
       np.testing.assert_allclose(ned_eulers[i], ned_euler_from_ecef(ecef_positions[i], eulers[i]), rtol=1e-7)
       #np.testing.assert_allclose(eulers[i], ecef_euler_from_ned(ecef_positions[i], ned_eulers[i]), rtol=1e-7)
-    # np.testing.assert_allclose(ned_eulers, ned_euler_from_ecef(ecef_positions, eulers), rtol=1e-7)
+    np.testing.assert_allclose(ned_eulers, ned_euler_from_ecef(ecef_positions, eulers), rtol=1e-7)
 
   def test_inputs(self):
     with self.assertRaises(ValueError):
@@ -89,3 +92,27 @@ class TestOrientation(OpenpilotTestCase):
     rpy_from_rot = rot2euler(R)
     R_new3 = euler2rot(rpy_from_rot)
     np.testing.assert_allclose(R, R_new3, atol=1e-15)
+
+  def test_batch_matches_single(self):
+    rng = np.random.default_rng(0)
+    eul = np.column_stack([rng.uniform(-np.pi, np.pi, 1000), rng.uniform(-1.5, 1.5, 1000), rng.uniform(-np.pi, np.pi, 1000)])
+    # rotations by pi about each axis take every branch of rot2quat
+    rots = np.concatenate([euler2rot_single(e)[None] for e in eul] + [np.diag(d)[None] for d in ([1, -1, -1], [-1, 1, -1], [-1, -1, 1])])
+    quat = np.array([euler2quat_single(e) for e in eul])
+
+    for batched, single, inputs in ((euler2quat, euler2quat_single, eul), (quat2euler, quat2euler_single, quat),
+                                    (quat2rot, quat2rot_single, quat), (rot2quat, rot2quat_single, rots),
+                                    (euler2rot, euler2rot_single, eul), (rot2euler, rot2euler_single, rots)):
+      expected = np.array([single(i) for i in inputs])
+      np.testing.assert_allclose(batched(inputs), expected, atol=1e-12)
+      np.testing.assert_allclose(batched(inputs[0]), expected[0], atol=1e-12)
+      # any number of leading dimensions broadcast
+      np.testing.assert_allclose(batched(inputs[:1000].reshape(10, 100, *inputs.shape[1:])),
+                                 expected[:1000].reshape(10, 100, *expected.shape[1:]), atol=1e-12)
+
+    for batched, single in ((ecef_euler_from_ned, ecef_euler_from_ned_single), (ned_euler_from_ecef, ned_euler_from_ecef_single)):
+      expected = np.array([single(ecef_positions[i % 5], e) for i, e in enumerate(eul[:100])])
+      np.testing.assert_allclose(batched(np.tile(ecef_positions, (20, 1)), eul[:100]), expected, atol=1e-7)
+      expected = np.array([single(ecef_positions[0], e) for e in eul[:100]])
+      np.testing.assert_allclose(batched(ecef_positions[0], eul[:100]), expected, atol=1e-7)
+
@@ -79,6 +79,24 @@ class MovingAverage:
     return self.sum / self.count
 
 
+class RateLimiter:
+  """Token bucket, allows rate events per second on average and up to burst at once."""
+  def __init__(self, rate: float, burst: int):
+    self.rate = rate
+    self.burst = burst
+    self.tokens = float(burst)
+    self.last: float | None = None
+
+  def take(self, n: int, now: float) -> int:
+    # returns how many of the n events are allowed
+    if self.last is not None:
+      self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+    self.last = now
+    n = min(n, int(self.tokens))
+    self.tokens -= n
+    return n
+
+
 class CallbackReader:
   """Wraps a file, but overrides the read method to also
   call a callback function with the number of bytes read so far."""
@@ -43,6 +43,10 @@ class Controls:
                                    'driverMonitoringState', 'onroadEvents', 'driverAssistance'], poll='selfdriveState')
     self.pm = messaging.PubMaster(['carControl', 'controlsState'])
 
+    # reused every cycle, see MessageBuilder
+    self.cc_msg = messaging.MessageBuilder('carControl')
+    self.cs_msg = messaging.MessageBuilder('controlsState')
+
     self.steer_limited_by_safety = False
     self.curvature = 0.0
     self.desired_curvature = 0.0
@@ -55,12 +59,17 @@ class Controls:
     self.LaC: LatControl
     if self.CP.steerControlType == car.CarParams.SteerControlType.angle:
       self.LaC = LatControlAngle(self.CP, self.CI, DT_CTRL)
+      lat_state = 'angleState'
     elif self.CP.steerControlType == car.CarParams.SteerControlType.curvature:
       self.LaC = LatControlCurvature(self.CP, self.CI, DT_CTRL)
+      lat_state = 'curvatureState'
     elif self.CP.lateralTuning.which() == 'pid':
       self.LaC = LatControlPID(self.CP, self.CI, DT_CTRL)
+      lat_state = 'pidState'
     elif self.CP.lateralTuning.which() == 'torque':
       self.LaC = LatControlTorque(self.CP, self.CI, DT_CTRL)
+      lat_state = 'torqueState'
+    self.lac_log = self.cs_msg.data.lateralControlState.init(lat_state)
 
   def update(self):
     self.sm.update(15)
@@ -92,7 +101,7 @@ class Controls:
     long_plan = self.sm['longitudinalPlan']
     model_v2 = self.sm['modelV2']
 
-    CC = car.CarControl.new_message()
+    CC = self.cc_msg.data
     CC.enabled = self.sm['selfdriveState'].enabled
 
     # Check which actuators can be enabled
@@ -105,9 +114,9 @@ class Controls:
     actuators.longControlState = self.LoC.long_control_state
 
     # Enable blinkers while lane changing
-    if model_v2.meta.laneChangeState != LaneChangeState.off:
-      CC.leftBlinker = model_v2.meta.laneChangeDirection == LaneChangeDirection.left
-      CC.rightBlinker = model_v2.meta.laneChangeDirection == LaneChangeDirection.right
+    lane_changing = model_v2.meta.laneChangeState != LaneChangeState.off
+    CC.leftBlinker = lane_changing and model_v2.meta.laneChangeDirection == LaneChangeDirection.left
+    CC.rightBlinker = lane_changing and model_v2.meta.laneChangeDirection == LaneChangeDirection.right
 
     if not CC.latActive:
       self.LaC.reset()
@@ -130,7 +139,7 @@ class Controls:
     actuators.curvature = self.desired_curvature
     steer, lateral_output, lac_log = self.LaC.update(CC.latActive, CS, self.VM, lp,
                                                      self.steer_limited_by_safety, self.desired_curvature,
-                                                     curvature_limited, lat_delay)
+                                                     curvature_limited, lat_delay, self.lac_log)
     actuators.torque = float(steer)
     if self.CP.steerControlType == car.CarParams.SteerControlType.curvature:
       actuators.curvature = float(lateral_output)
@@ -155,27 +164,29 @@ class Controls:
     # Only calibrated (car) frame is relevant for the carcontroller
     CC.currentCurvature = self.curvature
     if self.calibrated_pose is not None:
-      CC.orientationNED = self.calibrated_pose.orientation.xyz.tolist()
-      CC.angularVelocity = self.calibrated_pose.angular_velocity.xyz.tolist()
+      self.cc_msg.set_list(CC, 'orientationNED', self.calibrated_pose.orientation.xyz.tolist())
+      self.cc_msg.set_list(CC, 'angularVelocity', self.calibrated_pose.angular_velocity.xyz.tolist())
 
-    CC.cruiseControl.override = CC.enabled and not CC.longActive and self.CP.openpilotLongitudinalControl
-    CC.cruiseControl.cancel = CS.cruiseState.enabled and (not CC.enabled or not self.CP.pcmCruise)
-    CC.cruiseControl.resume = CC.enabled and CS.cruiseState.standstill and not self.sm['longitudinalPlan'].shouldStop
+    # mostly the same from one cycle to the next, only the changes are written
+    self.cc_msg.update('cruiseControl', CC.cruiseControl,
+                       override=CC.enabled and not CC.longActive and self.CP.openpilotLongitudinalControl,
+                       cancel=CS.cruiseState.enabled and (not CC.enabled or not self.CP.pcmCruise),
+                       resume=CC.enabled and CS.cruiseState.standstill and not self.sm['longitudinalPlan'].shouldStop)
 
     hudControl = CC.hudControl
-    hudControl.setSpeed = float(CS.vCruiseCluster * CV.KPH_TO_MS)
-    hudControl.speedVisible = CC.enabled
-    hudControl.lanesVisible = CC.enabled
-    hudControl.leadVisible = self.sm['longitudinalPlan'].hasLead
-    hudControl.leadDistanceBars = self.sm['selfdriveState'].personality.raw + 1
+    lane_departure = self.sm.valid['driverAssistance']
+    self.cc_msg.update('hudControl', hudControl,
+                       setSpeed=float(CS.vCruiseCluster * CV.KPH_TO_MS),
+                       speedVisible=CC.enabled,
+                       lanesVisible=CC.enabled,
+                       leadVisible=self.sm['longitudinalPlan'].hasLead,
+                       leadDistanceBars=self.sm['selfdriveState'].personality.raw + 1,
+                       rightLaneVisible=True,
+                       leftLaneVisible=True,
+                       leftLaneDepart=lane_departure and self.sm['driverAssistance'].leftLaneDeparture,
+                       rightLaneDepart=lane_departure and self.sm['driverAssistance'].rightLaneDeparture)
     hudControl.visualAlert = self.sm['selfdriveState'].alertHudVisual
 
-    hudControl.rightLaneVisible = True
-    hudControl.leftLaneVisible = True
-    if self.sm.valid['driverAssistance']:
-      hudControl.leftLaneDepart = self.sm['driverAssistance'].leftLaneDeparture
-      hudControl.rightLaneDepart = self.sm['driverAssistance'].rightLaneDeparture
-
     if self.sm['selfdriveState'].active:
       CO = self.sm['carOutput']
       if self.CP.steerControlType == car.CarParams.SteerControlType.angle:
@@ -188,9 +199,7 @@ class Controls:
     #       sm.all_checks(), but this creates a circular dependency
 
     # controlsState
-    dat = messaging.new_message('controlsState')
-    dat.valid = CS.canValid
-    cs = dat.controlsState
+    cs = self.cs_msg.data
 
     cs.curvature = self.curvature
     cs.longitudinalPlanMonoTime = self.sm.logMonoTime['longitudinalPlan']
@@ -206,23 +215,11 @@ class Controls:
     # trigger the car's stock driver monitoring escalation
     CC.driverMonitoringEscalation = cs.forceDecel
 
-    lat_tuning = self.CP.lateralTuning.which()
-    if self.CP.steerControlType == car.CarParams.SteerControlType.angle:
-      cs.lateralControlState.angleState = lac_log
-    elif self.CP.steerControlType == car.CarParams.SteerControlType.curvature:
-      cs.lateralControlState.curvatureState = lac_log
-    elif lat_tuning == 'pid':
-      cs.lateralControlState.pidState = lac_log
-    elif lat_tuning == 'torque':
-      cs.lateralControlState.torqueState = lac_log
-
-    self.pm.send('controlsState', dat)
+    # lac_log is filled in place by LaC
+    self.pm.send('controlsState', self.cs_msg.to_bytes(CS.canValid))
 
     # carControl
-    cc_send = messaging.new_message('carControl')
-    cc_send.valid = CS.canValid
-    cc_send.carControl = CC
-    self.pm.send('carControl', cc_send)
+    self.pm.send('carControl', self.cc_msg.to_bytes(CS.canValid))
 
   def run(self):
     rk = Ratekeeper(100, print_delay_threshold=None)
@@ -13,8 +13,12 @@ class LatControl(ABC):
     self.steer_max = 1.0
 
   @abstractmethod
-  def update(self, active: bool, CS, VM, params, steer_limited_by_safety: bool, desired_curvature: float, curvature_limited: bool, lat_delay: float):
-    pass
+  def update(self, active: bool, CS, VM, params, steer_limited_by_safety: bool, desired_curvature: float, curvature_limited: bool, lat_delay: float,
+             lac_log=None):
+    """
+    Returns the torque, the steering angle or curvature and the log. With lac_log, the log
+    is filled into it instead of a new one, writing all of its fields so it can be reused.
+    """
 
   def reset(self):
     self.sat_time = 0.
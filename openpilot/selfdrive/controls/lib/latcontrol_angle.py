@@ -13,8 +13,8 @@ class LatControlAngle(LatControl):
     self.sat_check_min_speed = 5.
     self.use_steer_limited_by_safety = CP.brand in ("tesla", "hyundai")
 
-  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay):
-    angle_log = log.ControlsState.LateralAngleState.new_message()
+  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay, lac_log=None):
+    angle_log = log.ControlsState.LateralAngleState.new_message() if lac_log is None else lac_log
 
     if not active:
       angle_log.active = False
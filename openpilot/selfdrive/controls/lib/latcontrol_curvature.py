@@ -26,14 +26,15 @@ class LatControlCurvature(LatControl):
     if self.pid is not None:
       self.pid.reset()
 
-  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay):
-    curvature_log = log.ControlsState.LateralCurvatureState.new_message()
+  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay, lac_log=None):
+    curvature_log = log.ControlsState.LateralCurvatureState.new_message() if lac_log is None else lac_log
     actual_curvature = -VM.calc_curvature(math.radians(CS.steeringAngleDeg - params.angleOffsetDeg), CS.vEgo, params.roll)
     error = desired_curvature - actual_curvature
 
     if not active:
       output_curvature = 0.0
       curvature_log.active = False
+      curvature_log.p = curvature_log.i = curvature_log.f = 0.0
       if self.pid is not None:
         self.pid.reset()
     elif self.pid is None or CS.steeringPressed:
@@ -42,6 +43,7 @@ class LatControlCurvature(LatControl):
         self.pid.reset()
       output_curvature = self.kf * desired_curvature
       curvature_log.active = True
+      curvature_log.p = curvature_log.i = curvature_log.f = 0.0
     else:
       output_curvature = self.pid.update(error, speed=CS.vEgo, feedforward=self.kf * desired_curvature)
       curvature_log.p = float(self.pid.p)
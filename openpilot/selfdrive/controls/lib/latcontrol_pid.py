@@ -14,8 +14,8 @@ class LatControlPID(LatControl):
     self.ff_factor = CP.lateralTuning.pid.kf
     self.get_steer_feedforward = CI.get_steer_feedforward_function()
 
-  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay):
-    pid_log = log.ControlsState.LateralPIDState.new_message()
+  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay, lac_log=None):
+    pid_log = log.ControlsState.LateralPIDState.new_message() if lac_log is None else lac_log
     pid_log.steeringAngleDeg = float(CS.steeringAngleDeg)
     pid_log.steeringRateDeg = float(CS.steeringRateDeg)
 
@@ -28,6 +28,8 @@ class LatControlPID(LatControl):
     if not active:
       output_torque = 0.0
       pid_log.active = False
+      pid_log.p = pid_log.i = pid_log.f = pid_log.output = 0.0
+      pid_log.saturated = False
 
     else:
       # offset does not contribute to resistive torque
@@ -56,8 +56,8 @@ class LatControlTorque(LatControl):
     self.pid.set_limits(self.lateral_accel_from_torque(self.steer_max, self.torque_params),
                         self.lateral_accel_from_torque(-self.steer_max, self.torque_params))
 
-  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay):
-    pid_log = log.ControlsState.LateralTorqueState.new_message()
+  def update(self, active, CS, VM, params, steer_limited_by_safety, desired_curvature, curvature_limited, lat_delay, lac_log=None):
+    pid_log = log.ControlsState.LateralTorqueState.new_message() if lac_log is None else lac_log
     pid_log.version = VERSION
     measured_curvature = -VM.calc_curvature(math.radians(CS.steeringAngleDeg - params.angleOffsetDeg), CS.vEgo, params.roll)
     measurement = measured_curvature * CS.vEgo ** 2
@@ -85,6 +85,9 @@ class LatControlTorque(LatControl):
     if not active:
       output_torque = 0.0
       pid_log.active = False
+      pid_log.error = pid_log.p = pid_log.i = pid_log.d = pid_log.f = pid_log.output = 0.0
+      pid_log.actualLateralAccel = pid_log.desiredLateralAccel = pid_log.desiredLateralJerk = 0.0
+      pid_log.saturated = False
     else:
       # do error correction in lateral acceleration space, convert at end to handle non-linear torque responses correctly
       pid_log.error = float(error)
@@ -0,0 +1,63 @@
+import openpilot.cereal.messaging as messaging
+from opendbc.car.car_helpers import interfaces
+from opendbc.car.honda.values import CAR as HONDA
+from opendbc.car.nissan.values import CAR as NISSAN
+from opendbc.car.toyota.values import CAR as TOYOTA
+from openpilot.common.parameterized import parameterized
+from openpilot.common.params import Params
+from openpilot.common.test import OpenpilotTestCase
+from openpilot.selfdrive.controls.controlsd import Controls
+
+CARS = [(HONDA.HONDA_CIVIC,), (TOYOTA.TOYOTA_RAV4,), (NISSAN.NISSAN_LEAF,)]
+
+
+def set_msg(sm, service, valid=True, **fields):
+  sm.data[service] = getattr(messaging.new_message(None, valid=valid, **{service: fields}).as_reader(), service)
+  sm.valid[service] = valid
+
+
+class TestControlsd(OpenpilotTestCase):
+  def controls(self, car_name):
+    CP = interfaces[car_name].get_non_essential_params(car_name)
+    Params().put("CarParams", CP.to_bytes())
+    controls = Controls()
+    sent = []
+    controls.pm.send = lambda s, dat: sent.append((s, dat))
+    return controls, sent
+
+  def step(self, controls, i):
+    engaged = 20 <= i < 60
+    set_msg(controls.sm, 'carState', vEgo=20., canValid=True, cruiseState={'enabled': engaged})
+    set_msg(controls.sm, 'selfdriveState', enabled=engaged, active=engaged)
+    lane_change = 'laneChangeStarting' if 30 <= i < 40 else 'off'
+    set_msg(controls.sm, 'modelV2', meta={'laneChangeState': lane_change, 'laneChangeDirection': 'left'})
+    set_msg(controls.sm, 'driverAssistance', valid=i < 50, leftLaneDeparture=True)
+    CC, lac_log = controls.state_control()
+    controls.publish(CC, lac_log)
+
+  @parameterized.expand(CARS)
+  def test_publish_in_place(self, car_name):
+    controls, sent = self.controls(car_name)
+    for i in range(100):
+      self.step(controls, i)
+
+    sent_by = {s: [dat for service, dat in sent if service == s] for s in ('carControl', 'controlsState')}
+    msgs = {s: [messaging.log_from_bytes(dat) for dat in sent_by[s]] for s in sent_by}
+    assert len(msgs['carControl']) == len(msgs['controlsState']) == 100
+
+    # nothing is left over from earlier cycles
+    for i, msg in enumerate(msgs['carControl']):
+      cc = msg.carControl
+      assert cc.enabled == (20 <= i < 60)
+      assert cc.leftBlinker == (30 <= i < 40) and not cc.rightBlinker
+      assert cc.hudControl.leftLaneDepart == (i < 50)
+    for msg, cc in zip(msgs['controlsState'], msgs['carControl'], strict=True):
+      lat = getattr(msg.controlsState.lateralControlState, msg.controlsState.lateralControlState.which())
+      assert lat.active == cc.carControl.latActive
+      if not lat.active:
+        assert lat.output == 0.
+
+    # and the messages don't grow
+    for s, dats in sent_by.items():
+      assert len({len(dat) for dat in dats}) == 1, s
+
@@ -45,3 +45,26 @@ class TestLatControl(OpenpilotTestCase):
     for _ in range(1000):
       _, _, lac_log = controller.update(True, CS, VM, params, False, 1, False, 0.2)
     assert lac_log.saturated
+
+  @parameterized.expand([(HONDA.HONDA_CIVIC, LatControlPID, 'pidState'), (TOYOTA.TOYOTA_RAV4, LatControlTorque, 'torqueState'),
+                         (NISSAN.NISSAN_LEAF, LatControlAngle, 'angleState')])
+  def test_reused_log(self, car_name, controller, lat_state):
+    CarInterface = interfaces[car_name]
+    CP = CarInterface.get_non_essential_params(car_name)
+    CI = CarInterface(CP)
+    VM = VehicleModel(CP)
+    controllers = [controller(CP.as_reader(), CI, DT_CTRL) for _ in range(2)]
+    reused = log.ControlsState.new_message().lateralControlState.init(lat_state)
+
+    CS = car.CarState.new_message()
+    CS.vEgo = 30
+    params = log.VehicleParameters.new_message()
+
+    # a log filled in place is the same as a new one, also after going inactive
+    for i in range(300):
+      CS.steeringAngleDeg = i % 7 - 3.
+      active = (i // 50) % 2 == 0
+      _, _, new_log = controllers[0].update(active, CS, VM, params, False, 0.01, i % 3 == 0, 0.2)
+      _, _, lac_log = controllers[1].update(active, CS, VM, params, False, 0.01, i % 3 == 0, 0.2, reused)
+      assert lac_log is reused
+      assert {f: getattr(lac_log, f) for f in lac_log.schema.fields} == {f: getattr(new_log, f) for f in new_log.schema.fields}
@@ -52,30 +52,56 @@ def rotate_std(rot_matrix, std_in):
   return np.sqrt(np.diag(rotate_cov(rot_matrix, np.diag(std_in**2))))
 
 
-class NPQueue:
-  def __init__(self, maxlen: int, rowsize: int) -> None:
+class RingBuffer:
+  """
+  Fixed-capacity FIFO with O(1) append. Every row is written twice into a
+  buffer of size 2 * maxlen, so the contents are always available as a
+  single contiguous view ordered oldest to newest.
+  """
+  def __init__(self, maxlen: int, rowsize: int | None = None, dtype: Any = np.float64, fill_value: Any = None) -> None:
     self.maxlen = maxlen
-    self.arr = np.empty((0, rowsize))
+    self._buf = np.empty((2 * maxlen,) if rowsize is None else (2 * maxlen, rowsize), dtype=dtype)
+    self._idx = 0
+    self._len = 0
+    self.count = 0  # total number of appends, lets readers detect changes cheaply
+    if fill_value is not None:
+      self._buf[:] = fill_value
+      self._len = maxlen
 
   def __len__(self) -> int:
-    return len(self.arr)
-
-  def append(self, pt: list[float]) -> None:
-    if len(self.arr) < self.maxlen:
-      self.arr = np.append(self.arr, [pt], axis=0)
-    else:
-      self.arr[:-1] = self.arr[1:]
-      self.arr[-1] = pt
+    return self._len
+
+  @property
+  def arr(self) -> np.ndarray:
+    start = self._idx - self._len
+    if start < 0:
+      start += self.maxlen
+    return self._buf[start:start + self._len]
+
+  def append(self, pt: Any) -> None:
+    self._buf[self._idx] = pt
+    self._buf[self._idx + self.maxlen] = pt
+    self._idx += 1
+    if self._idx == self.maxlen:
+      self._idx = 0
+    if self._len < self.maxlen:
+      self._len += 1
+    self.count += 1
 
 
 class PointBuckets:
   def __init__(self, x_bounds: list[tuple[float, float]], min_points: Sequence[float], min_points_total: int, points_per_bucket: int, rowsize: int) -> None:
     self._rng = np.random.default_rng()
     self.x_bounds = x_bounds
-    self.buckets = {bounds: NPQueue(maxlen=points_per_bucket, rowsize=rowsize) for bounds in x_bounds}
+    self.buckets = {bounds: RingBuffer(maxlen=points_per_bucket, rowsize=rowsize) for bounds in x_bounds}
     self.buckets_min_points = dict(zip(x_bounds, min_points, strict=True))
     self.min_points_total = min_points_total
 
+    # combined view of all buckets, only buckets that changed since the last read are copied in
+    self._points = np.empty((len(x_bounds) * points_per_bucket, rowsize))
+    self._offsets = [0] * len(x_bounds)
+    self._counts = [0] * len(x_bounds)
+
   def __len__(self) -> int:
     return sum([len(v) for v in self.buckets.values()])
 
@@ -96,10 +122,22 @@ class PointBuckets:
   def add_point(self, x: float, y: float) -> None:
     raise NotImplementedError
 
+  def _update_points(self) -> np.ndarray:
+    offset, shifted = 0, False
+    for i, bucket in enumerate(self.buckets.values()):
+      # once a bucket moves, every bucket after it has to be recopied as well
+      shifted = shifted or self._offsets[i] != offset
+      if shifted or self._counts[i] != bucket.count:
+        self._points[offset:offset + len(bucket)] = bucket.arr
+        self._offsets[i] = offset
+        self._counts[i] = bucket.count
+      offset += len(bucket)
+    return self._points[:offset]
+
   def get_points(self, num_points: int | None = None) -> Any:
-    points = np.vstack([x.arr for x in self.buckets.values()])
+    points = self._update_points()
     if num_points is None:
-      return points
+      return points.copy()
     return points[self._rng.choice(np.arange(len(points)), min(len(points), num_points), replace=False)]
 
   def load_points(self, points: Sequence[Sequence[float]]) -> None:
@@ -2,7 +2,6 @@
 import os
 import numpy as np
 import capnp
-from collections import deque
 from functools import partial
 
 import openpilot.cereal.messaging as messaging
@@ -13,7 +12,7 @@ from openpilot.common.constants import CV
 from openpilot.common.params import Params
 from openpilot.common.realtime import config_realtime_process
 from openpilot.common.swaglog import cloudlog
-from openpilot.selfdrive.locationd.helpers import PoseCalibrator, Pose, fft_next_good_size, parabolic_peak_interp
+from openpilot.selfdrive.locationd.helpers import PoseCalibrator, Pose, RingBuffer, fft_next_good_size, parabolic_peak_interp
 
 BLOCK_SIZE = 100
 BLOCK_NUM = 50
@@ -109,12 +108,141 @@ def masked_normalized_cross_correlation(expected_sig: np.ndarray, actual_sig: np
   return ncc
 
 
+def ncc_lag_range(dt: float, min_lag: float, max_lag: float) -> tuple[int, int]:
+  """ range of lags in samples [start, stop) that actuator delay estimation looks at """
+  min_lag_samples, max_lag_samples, one_sec_samples = int(round(min_lag / dt)), int(round(max_lag / dt)), int(round(1.0 / dt))
+  return min(min_lag_samples, -CORR_BORDER_OFFSET), max(max_lag_samples, one_sec_samples + CORR_BORDER_OFFSET)
+
+
+class IncrementalMaskedCrossCorrelation:
+  """
+  Masked normalized cross-correlation of a moving window of smoothed signals, equal to
+  masked_normalized_cross_correlation over masked_symmetric_moving_average of the window,
+  but only for a small range of lags.
+
+  Six running sums per lag (overlap count, masked sums and masked sums of squares/products)
+  are kept over the window interior, where the smoothed values no longer change. Each new
+  point adds the pairs of the sample entering the interior and drops the pairs of the one
+  leaving it. The few edge samples, whose smoothed values depend on the edge padding, are
+  added on top when the correlation is read. Sums are recomputed from scratch once per
+  window to bound floating point drift.
+  """
+  # smoothed rows are (expected, actual, mask, expected^2, actual^2), with masked out samples zeroed
+  # the running sums are products of an expected column and an actual column:
+  # overlap, expected, actual, expected * actual, expected^2, actual^2
+  E_COLS = np.array([2, 0, 2, 0, 3, 2])
+  A_COLS = np.array([2, 2, 1, 1, 2, 4])
+
+  def __init__(self, window_len: int, lag_start: int, lag_stop: int, k: int = SMOOTH_K, sigma: float = SMOOTH_SIGMA):
+    assert k >= 1 and k % 2 == 1, "k must be positive and odd"
+    self.pad = k // 2
+    self.lags = np.arange(lag_start, lag_stop)
+    max_abs_lag = int(np.abs(self.lags).max())
+    assert window_len > 2 * (2 * self.pad + max_abs_lag + 1), "window too short for lag range"
+    self.window_len = window_len
+
+    i = np.arange(k) - self.pad
+    self.w = np.exp(-0.5 * (i / sigma) ** 2)
+    self.w /= self.w.sum()
+
+    # raw rows are (expected * mask, actual * mask, mask)
+    self.raw = RingBuffer(window_len, rowsize=3, fill_value=0.0)
+    self.smoothed = RingBuffer(window_len - self.pad, rowsize=5, fill_value=0.0)
+    self.sums = np.zeros((len(self.lags), 6))
+    self.updates = 0
+
+    n, lags, abs_lags = window_len, self.lags, np.abs(self.lags)
+    # once the window has moved, the sample leaving the interior is at pad - 1 and the one entering it at n - pad - 1
+    rem, add = self.pad - 1, n - self.pad - 1
+    e_idx = np.concatenate([np.where(lags >= 0, rem, rem + abs_lags), np.where(lags >= 0, add - abs_lags, add)])
+    a_idx = np.concatenate([np.where(lags >= 0, rem + abs_lags, rem), np.where(lags >= 0, add, add - abs_lags)])
+    self.pair_e_idx = (e_idx[:, None], self.E_COLS[None, :])
+    self.pair_a_idx = (a_idx[:, None], self.A_COLS[None, :])
+
+    # pairs with at least one sample in the edge region, which only touch the first and last h samples
+    h = self.pad + max_abs_lag + 1
+    edges = np.r_[0:self.pad, n - self.pad:n]
+    def to_local(idx):
+      return np.where(idx < h, idx, idx - (n - 2 * h))
+    self.h = h
+    self.edge_local = to_local(edges)
+    self.edge_raw_idx = np.clip(edges[:, None] + i[None, :], 0, n - 1)
+
+    edge_e_idx = np.concatenate([np.broadcast_to(edges[:, None], (len(edges), len(lags))), edges[:, None] - lags[None, :]]).ravel()
+    edge_a_idx = np.concatenate([edges[:, None] + lags[None, :], np.broadcast_to(edges[:, None], (len(edges), len(lags)))]).ravel()
+    valid = (edge_e_idx >= 0) & (edge_e_idx < n) & (edge_a_idx >= 0) & (edge_a_idx < n)
+    valid[edge_e_idx.size // 2:] &= ~np.isin(edge_e_idx[edge_e_idx.size // 2:], edges)  # don't count edge-edge pairs twice
+    self.edge_e_idx = (to_local(edge_e_idx[valid])[:, None], self.E_COLS[None, :])
+    self.edge_a_idx = (to_local(edge_a_idx[valid])[:, None], self.A_COLS[None, :])
+    edge_lag_idx = np.tile(np.arange(len(lags)), 2 * len(edges))[valid]
+    self.edge_sum = (edge_lag_idx[None, :] == np.arange(len(lags))[:, None]).astype(np.float64)
+
+  def _smooth(self, rows: np.ndarray) -> np.ndarray:
+    # rows: (..., k, 3) raw rows centered around the samples to smooth
+    num = np.matmul(self.w, rows)
+    mask = rows[..., self.pad, 2:3]
+    val = np.divide(num[..., :2], num[..., 2:3], out=np.zeros_like(num[..., :2]), where=mask > 0)
+    return np.concatenate([val, mask, val ** 2], axis=-1)
+
+  def update(self, expected: float, actual: float, okay: bool) -> None:
+    self.raw.append((expected, actual, 1.0) if okay else (0.0, 0.0, 0.0))
+    # the newest sample of the interior has all its neighbors now
+    window = self.raw.arr[-2 * self.pad - 1:]
+    if window[self.pad, 2] > 0:
+      e, a, m = self.w @ window
+      e, a = e / m, a / m
+      self.smoothed.append((e, a, 1.0, e * e, a * a))
+    else:
+      self.smoothed.append(0.0)
+    self.updates += 1
+
+    if self.updates % self.window_len == 0:
+      self.recompute()
+    else:
+      rows = self.smoothed.arr
+      terms = rows[self.pair_e_idx] * rows[self.pair_a_idx]
+      num_lags = len(self.lags)
+      self.sums += terms[num_lags:]
+      self.sums -= terms[:num_lags]
+
+  def recompute(self) -> None:
+    interior = self.smoothed.arr[self.pad:]
+    n = len(interior)
+    for i, lag in enumerate(self.lags):
+      e_rows, a_rows = (interior[:n - lag], interior[lag:]) if lag >= 0 else (interior[-lag:], interior[:n + lag])
+      self.sums[i] = (e_rows[:, self.E_COLS] * a_rows[:, self.A_COLS]).sum(axis=0)
+
+  def get(self) -> np.ndarray:
+    h, smoothed = self.h, self.smoothed.arr
+    rows = np.concatenate([smoothed[:h], smoothed[-(h - self.pad):], np.empty((self.pad, 5))])
+    rows[self.edge_local] = self._smooth(self.raw.arr[self.edge_raw_idx])
+
+    sums = self.sums + self.edge_sum @ (rows[self.edge_e_idx] * rows[self.edge_a_idx])
+    overlap, corr_expected, corr_actual, corr, expected_sq, actual_sq = sums.T
+
+    eps = np.finfo(np.float64).eps
+    overlap = np.fmax(np.round(overlap), eps)
+    numerator = corr - corr_actual * corr_expected / overlap
+    actual_denom = np.fmax(actual_sq - corr_actual ** 2 / overlap, 0.0)
+    expected_denom = np.fmax(expected_sq - corr_expected ** 2 / overlap, 0.0)
+    denom = np.sqrt(actual_denom * expected_denom)
+
+    # zero-out samples with very small denominators
+    tol = 1e3 * eps * np.max(np.abs(denom), keepdims=True)
+    nonzero_indices = denom > tol
+
+    ncc = np.zeros_like(denom, dtype=np.float64)
+    ncc[nonzero_indices] = numerator[nonzero_indices] / denom[nonzero_indices]
+    np.clip(ncc, -1, 1, out=ncc)
+    return ncc
+
+
 class Points:
   def __init__(self, num_points: int):
-    self.times = deque[float]([0.0] * num_points, maxlen=num_points)
-    self.okay = deque[bool]([False] * num_points, maxlen=num_points)
-    self.desired = deque[float]([0.0] * num_points, maxlen=num_points)
-    self.actual = deque[float]([0.0] * num_points, maxlen=num_points)
+    self.times = RingBuffer(num_points, fill_value=0.0)
+    self.okay = RingBuffer(num_points, dtype=bool, fill_value=False)
+    self.desired = RingBuffer(num_points, fill_value=0.0)
+    self.actual = RingBuffer(num_points, fill_value=0.0)
 
   @property
   def num_points(self):
@@ -122,7 +250,7 @@ class Points:
 
   @property
   def num_okay(self):
-    return np.count_nonzero(self.okay)
+    return np.count_nonzero(self.okay.arr)
 
   def update(self, t: float, desired: float, actual: float, okay: bool):
     self.times.append(t)
@@ -131,7 +259,7 @@ class Points:
     self.actual.append(actual)
 
   def get(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    return np.array(self.times), np.array(self.desired), np.array(self.actual), np.array(self.okay)
+    return self.times.arr, self.desired.arr, self.actual.arr, self.okay.arr
 
 
 class BlockAverage:
@@ -216,6 +344,7 @@ class LateralLagEstimator:
   def reset(self, initial_lag: float, valid_blocks: int):
     window_len = int(self.window_sec / self.dt)
     self.points = Points(window_len)
+    self.correlation = IncrementalMaskedCrossCorrelation(window_len, *ncc_lag_range(self.dt, MIN_LAG, MAX_LAG))
     self.block_avg = BlockAverage(self.block_count, self.block_size, valid_blocks, initial_lag)
 
   def get_msg(self, valid: bool, debug: bool = False) -> capnp._DynamicStructBuilder:
@@ -307,6 +436,7 @@ class LateralLagEstimator:
            fast and turning and has_recovered and calib_valid and sensors_valid and la_valid
 
     self.points.update(self.t, la_desired, la_actual_pose, okay)
+    self.correlation.update(la_desired, la_actual_pose, okay)
 
   def update_estimate(self):
     if not self.points_enough():
@@ -319,10 +449,8 @@ class LateralLagEstimator:
       new_values_start_idx = next(-i for i, t in enumerate(reversed(times)) if t <= self.last_estimate_t)
       is_valid = is_valid and not (new_values_start_idx == 0 or not np.any(okay[new_values_start_idx:]))
 
-    desired = masked_symmetric_moving_average(desired, okay, SMOOTH_K, SMOOTH_SIGMA)
-    actual = masked_symmetric_moving_average(actual, okay, SMOOTH_K, SMOOTH_SIGMA)
-
-    delay, corr, confidence = self.actuator_delay(desired, actual, okay, self.dt, MIN_LAG, MAX_LAG)
+    ncc = self.correlation.get()
+    delay, corr, confidence = self.delay_from_ncc(ncc, -self.correlation.lags[0], self.dt, MIN_LAG, MAX_LAG)
     if corr < self.min_ncc or confidence < self.min_confidence or not is_valid:
       return
 
@@ -333,14 +461,19 @@ class LateralLagEstimator:
   def actuator_delay(expected_sig: np.ndarray, actual_sig: np.ndarray, mask: np.ndarray,
                      dt: float, min_lag: float, max_lag: float) -> tuple[float, float, float]:
     assert len(expected_sig) == len(actual_sig)
-    min_lag_samples, max_lag_samples, one_sec_samples = int(round(min_lag / dt)), int(round(max_lag / dt)), int(round(1.0 / dt))
+    max_lag_samples, one_sec_samples = int(round(max_lag / dt)), int(round(1.0 / dt))
     padded_size = fft_next_good_size(len(expected_sig) + max(max_lag_samples, one_sec_samples))
 
     ncc = masked_normalized_cross_correlation(expected_sig, actual_sig, mask, padded_size)
+    return LateralLagEstimator.delay_from_ncc(ncc, len(expected_sig) - 1, dt, min_lag, max_lag)
+
+  @staticmethod
+  def delay_from_ncc(ncc: np.ndarray, zero_lag_idx: int, dt: float, min_lag: float, max_lag: float) -> tuple[float, float, float]:
+    min_lag_samples, max_lag_samples, one_sec_samples = int(round(min_lag / dt)), int(round(max_lag / dt)), int(round(1.0 / dt))
 
     # only consider lags from ranges:
-    roi = np.s_[len(expected_sig) - 1 + min_lag_samples: len(expected_sig) - 1 + max_lag_samples] # min_lag - max_lag range
-    threshold_roi = np.s_[len(expected_sig) - 1: len(expected_sig) - 1 + one_sec_samples] # 0 - 1 second range
+    roi = np.s_[zero_lag_idx + min_lag_samples: zero_lag_idx + max_lag_samples] # min_lag - max_lag range
+    threshold_roi = np.s_[zero_lag_idx: zero_lag_idx + one_sec_samples] # 0 - 1 second range
     confidence_roi = np.s_[threshold_roi.start - CORR_BORDER_OFFSET: threshold_roi.stop + CORR_BORDER_OFFSET] # threshold range +/- border
     roi_ncc, confidence_roi_ncc, threshold_roi_ncc = ncc[roi], ncc[confidence_roi], ncc[threshold_roi]
 
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Time of appending a point to a full queue at the size torqued uses, RingBuffer against
+the np.append queue it replaced.
+
+  ring_buffer_benchmark.py [-n points]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from openpilot.selfdrive.locationd.helpers import RingBuffer
+from openpilot.selfdrive.locationd.test.test_helpers import ReferenceQueue
+
+
+def per_append(queue, pts):
+  st = time.perf_counter()
+  for pt in pts:
+    queue.append(pt)
+  return (time.perf_counter() - st) / len(pts) * 1e6
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time of a queue append, np.append against RingBuffer")
+  parser.add_argument("-n", "--points", type=int, default=20000)
+  args = parser.parse_args()
+
+  pts = np.random.default_rng(0).normal(size=(args.points, 3))
+  for name, queue in (("np.append", ReferenceQueue(1500, 3)), ("RingBuffer", RingBuffer(1500, rowsize=3))):
+    print(f"{name:>10}: {per_append(queue, pts):5.2f} us per append")
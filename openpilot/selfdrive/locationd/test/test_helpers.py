@@ -0,0 +1,68 @@
+import numpy as np
+
+from openpilot.selfdrive.locationd.helpers import RingBuffer
+from openpilot.selfdrive.locationd.torqued import TorqueBuckets, STEER_BUCKET_BOUNDS, MIN_BUCKET_POINTS
+
+
+class ReferenceQueue:
+  # the previous np.append based queue, kept here to check the ring buffer against
+  def __init__(self, maxlen: int, rowsize: int) -> None:
+    self.maxlen = maxlen
+    self.arr = np.empty((0, rowsize))
+
+  def __len__(self) -> int:
+    return len(self.arr)
+
+  def append(self, pt):
+    if len(self.arr) < self.maxlen:
+      self.arr = np.append(self.arr, [pt], axis=0)
+    else:
+      self.arr[:-1] = self.arr[1:]
+      self.arr[-1] = pt
+
+
+def make_buckets(points_per_bucket):
+  return TorqueBuckets(x_bounds=STEER_BUCKET_BOUNDS, min_points=MIN_BUCKET_POINTS.tolist(), min_points_total=4000,
+                       points_per_bucket=points_per_bucket, rowsize=3)
+
+
+class TestRingBuffer:
+  def test_matches_reference(self):
+    rng = np.random.default_rng(0)
+    rb, ref = RingBuffer(50, rowsize=3), ReferenceQueue(50, 3)
+    for _ in range(237):
+      pt = rng.normal(size=3)
+      rb.append(pt)
+      ref.append(pt)
+      assert len(rb) == len(ref)
+      assert rb.arr.flags.c_contiguous
+      np.testing.assert_array_equal(rb.arr, ref.arr)
+
+  def test_fill_value(self):
+    rb = RingBuffer(10, dtype=bool, fill_value=False)
+    assert len(rb) == 10 and not rb.arr.any()
+    rb.append(True)
+    assert len(rb) == 10
+    assert rb.arr[-1] and not rb.arr[:-1].any()
+
+  def test_point_buckets_match_vstack(self):
+    rng = np.random.default_rng(0)
+    buckets = make_buckets(100)
+    for i in range(3000):
+      buckets.add_point(rng.uniform(-0.5, 0.5), rng.normal())
+      if i % 7 == 0:
+        expected = np.vstack([b.arr for b in buckets.buckets.values()])
+        np.testing.assert_array_equal(buckets.get_points(), expected)
+    assert len(buckets.get_points(500)) == 500
+
+  def test_matches_reference_long(self):
+    # at the size torqued uses, wrapping around many times
+    rng = np.random.default_rng(0)
+    pts = rng.normal(size=(20000, 3))
+
+    ref = ReferenceQueue(1500, 3)
+    rb = RingBuffer(1500, rowsize=3)
+    for pt in pts:
+      ref.append(pt)
+      rb.append(pt)
+    np.testing.assert_array_equal(rb.arr, ref.arr)
@@ -8,8 +8,9 @@ from openpilot.common.test import OpenpilotTestCase
 from openpilot.cereal import messaging, log
 from opendbc.car.structs import car
 from openpilot.selfdrive.locationd.lagd import LateralLagEstimator, retrieve_initial_lag, masked_normalized_cross_correlation, \
-                                               BLOCK_NUM_NEEDED, BLOCK_SIZE, MIN_OKAY_WINDOW_SEC, VERSION, MIN_LAG, MAX_LAG
-from openpilot.selfdrive.test.process_replay.migration import migrate, migrate_carParams
+                                               masked_symmetric_moving_average, fft_next_good_size, \
+                                               BLOCK_NUM_NEEDED, BLOCK_SIZE, MIN_OKAY_WINDOW_SEC, VERSION, MIN_LAG, MAX_LAG, SMOOTH_K, SMOOTH_SIGMA
+from openpilot.selfdrive.test.process_replay.migration import migrate, migrate_all, migrate_carParams
 from openpilot.selfdrive.locationd.test.test_locationd_scenarios import TEST_ROUTE
 from openpilot.common.params import Params
 from openpilot.tools.lib.logreader import LogReader
@@ -53,6 +54,17 @@ def process_messages(estimator, lag_frames, n_frames, vego=25.0, rejection_thres
     estimator.update_estimate()
 
 
+def reference_ncc(estimator):
+  # full masked FFT cross-correlation over the smoothed points window, at the lags the incremental estimator computes
+  _, desired, actual, okay = estimator.points.get()
+  desired = masked_symmetric_moving_average(desired, okay, SMOOTH_K, SMOOTH_SIGMA)
+  actual = masked_symmetric_moving_average(actual, okay, SMOOTH_K, SMOOTH_SIGMA)
+  n = len(desired)
+  ncc = masked_normalized_cross_correlation(desired, actual, okay, fft_next_good_size(n + int(round(1.0 / estimator.dt))))
+  lags = estimator.correlation.lags
+  return ncc[n - 1 + lags[0]:n + lags[-1]]
+
+
 class TestLagd(OpenpilotTestCase):
   def test_read_saved_params(self):
     params = Params()
@@ -110,6 +122,41 @@ class TestLagd(OpenpilotTestCase):
     corr = masked_normalized_cross_correlation(desired_sig, actual_sig, mask, 200)[len(desired_sig) - 1:len(desired_sig) + 20]
     assert np.argmax(corr) in range(lag_frames - MAX_ERR_FRAMES, lag_frames + MAX_ERR_FRAMES + 1)
 
+  def test_incremental_ncc(self):
+    rng = np.random.default_rng(0)
+    mocked_CP = car.CarParams(steerActuatorDelay=0.5)
+    estimator = LateralLagEstimator(mocked_CP, DT, window_sec=30.0)
+    window_len = int(30.0 / DT)
+    for i in range(3 * window_len):
+      t = i * DT
+      # alternate between mostly valid and heavily masked stretches
+      okay = rng.uniform() < (0.6 if (i // 200) % 2 else 0.95)
+      desired, actual = np.cos(3 * t) * 0.3 + rng.normal(0, 0.02), np.cos(3 * (t - 0.3)) * 0.3 + rng.normal(0, 0.02)
+      estimator.points.update(t, desired, actual, okay)
+      estimator.correlation.update(desired, actual, okay)
+      # with only a handful of valid points the FFT reference is dominated by round-off
+      if i % 37 == 0 and estimator.points.num_okay >= 100:
+        np.testing.assert_allclose(estimator.correlation.get(), reference_ncc(estimator), atol=1e-9)
+
+  def test_incremental_ncc_route(self):
+    lr = migrate_all(LogReader(TEST_ROUTE))
+    CP = next(m for m in lr if m.which() == "carParams").carParams
+    estimator = LateralLagEstimator(CP, DT, min_recovery_buffer_sec=0.0, min_vego=0.0, min_yr=0.0)
+    checked = 0
+    for m in sorted(lr, key=lambda m: m.logMonoTime):
+      if m.which() in estimator.inputs:
+        estimator.handle_log(m.logMonoTime * 1e-9, m.which(), getattr(m, m.which()))
+      if m.which() == "deviceMotion":
+        estimator.update_points()
+        if estimator.points.num_okay >= 100:
+          ncc, ref = estimator.correlation.get(), reference_ncc(estimator)
+          np.testing.assert_allclose(ncc, ref, atol=1e-9)
+          zero_lag_idx = -estimator.correlation.lags[0]
+          np.testing.assert_allclose(estimator.delay_from_ncc(ncc, zero_lag_idx, DT, MIN_LAG, MAX_LAG),
+                                     estimator.delay_from_ncc(ref, zero_lag_idx, DT, MIN_LAG, MAX_LAG), atol=1e-6)
+          checked += 1
+    assert checked > 0
+
   def test_empty_estimator(self):
     mocked_CP = car.CarParams(steerActuatorDelay=0.5)
     estimator = LateralLagEstimator(mocked_CP, DT)
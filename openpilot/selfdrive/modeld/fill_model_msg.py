@@ -1,6 +1,7 @@
 import os
 import capnp
 import numpy as np
+from functools import cache
 from openpilot.cereal import log
 from openpilot.selfdrive.modeld.constants import ModelConstants, Plan, Meta
 
@@ -15,39 +16,32 @@ class PublishState:
     self.prev_brake_5ms2_probs = np.zeros(ModelConstants.FCW_5MS2_PROBS_WIDTH, dtype=np.float32)
     self.prev_brake_3ms2_probs = np.zeros(ModelConstants.FCW_3MS2_PROBS_WIDTH, dtype=np.float32)
 
-def fill_xyzt(builder, t, x, y, z, x_std=None, y_std=None, z_std=None):
+def fill_xyzt(builder, t, xyz, xyz_std=None):
+  # xyz and xyz_std are (3, N) arrays, converted to python lists in one go
   builder.t = t
-  builder.x = x.tolist()
-  builder.y = y.tolist()
-  builder.z = z.tolist()
-  if x_std is not None:
-    builder.xStd = x_std.tolist()
-  if y_std is not None:
-    builder.yStd = y_std.tolist()
-  if z_std is not None:
-    builder.zStd = z_std.tolist()
-
-def fill_xyvat(builder, t, x, y, v, a, x_std=None, y_std=None, v_std=None, a_std=None):
+  builder.x, builder.y, builder.z = xyz.tolist()
+  if xyz_std is not None:
+    builder.xStd, builder.yStd, builder.zStd = xyz_std.tolist()
+
+def fill_xyvat(builder, t, xyva, xyva_std=None):
+  # xyva and xyva_std are (4, N) arrays, converted to python lists in one go
   builder.t = t
-  builder.x = x.tolist()
-  builder.y = y.tolist()
-  builder.v = v.tolist()
-  builder.a = a.tolist()
-  if x_std is not None:
-    builder.xStd = x_std.tolist()
-  if y_std is not None:
-    builder.yStd = y_std.tolist()
-  if v_std is not None:
-    builder.vStd = v_std.tolist()
-  if a_std is not None:
-    builder.aStd = a_std.tolist()
+  builder.x, builder.y, builder.v, builder.a = xyva.tolist()
+  if xyva_std is not None:
+    builder.xStd, builder.yStd, builder.vStd, builder.aStd = xyva_std.tolist()
+
+@cache
+def poly_fit_matrix(degree):
+  # least squares fit on the fixed T_IDXS grid is a linear map, solved once like np.polynomial.polynomial.polyfit does
+  t = np.array(ModelConstants.T_IDXS)
+  lhs = np.polynomial.polynomial.polyvander(t, degree)
+  scl = np.sqrt(np.square(lhs).sum(axis=0))
+  return np.linalg.pinv(lhs / scl, rcond=len(t) * np.finfo(t.dtype).eps) / scl[:, None]
 
 def fill_xyz_poly(builder, degree, x, y, z):
   xyz = np.stack([x, y, z], axis=1)
-  coeffs = np.polynomial.polynomial.polyfit(ModelConstants.T_IDXS, xyz, deg=degree)
-  builder.xCoefficients = coeffs[:, 0].tolist()
-  builder.yCoefficients = coeffs[:, 1].tolist()
-  builder.zCoefficients = coeffs[:, 2].tolist()
+  coeffs = poly_fit_matrix(degree) @ xyz
+  builder.xCoefficients, builder.yCoefficients, builder.zCoefficients = coeffs.T.tolist()
 
 def fill_lane_line_meta(builder, lane_lines, lane_line_probs):
   builder.leftY = lane_lines[1].y[0]
@@ -86,11 +80,12 @@ def fill_model_msg(msg: capnp._DynamicStructBuilder, net_output_data: dict[str,
   modelV2.modelExecutionTime = model_execution_time
 
   # plan
-  fill_xyzt(modelV2.position, ModelConstants.T_IDXS, *net_output_data['plan'][0,:,Plan.POSITION].T, *net_output_data['plan_stds'][0,:,Plan.POSITION].T)
-  fill_xyzt(modelV2.velocity, ModelConstants.T_IDXS, *net_output_data['plan'][0,:,Plan.VELOCITY].T)
-  fill_xyzt(modelV2.acceleration, ModelConstants.T_IDXS, *net_output_data['plan'][0,:,Plan.ACCELERATION].T)
-  fill_xyzt(modelV2.orientation, ModelConstants.T_IDXS, *net_output_data['plan'][0,:,Plan.T_FROM_CURRENT_EULER].T)
-  fill_xyzt(modelV2.orientationRate, ModelConstants.T_IDXS, *net_output_data['plan'][0,:,Plan.ORIENTATION_RATE].T)
+  plan, plan_stds = net_output_data['plan'][0], net_output_data['plan_stds'][0]
+  fill_xyzt(modelV2.position, ModelConstants.T_IDXS, plan[:,Plan.POSITION].T, plan_stds[:,Plan.POSITION].T)
+  fill_xyzt(modelV2.velocity, ModelConstants.T_IDXS, plan[:,Plan.VELOCITY].T)
+  fill_xyzt(modelV2.acceleration, ModelConstants.T_IDXS, plan[:,Plan.ACCELERATION].T)
+  fill_xyzt(modelV2.orientation, ModelConstants.T_IDXS, plan[:,Plan.T_FROM_CURRENT_EULER].T)
+  fill_xyzt(modelV2.orientationRate, ModelConstants.T_IDXS, plan[:,Plan.ORIENTATION_RATE].T)
 
   # action
   modelV2.action = action
@@ -99,26 +94,34 @@ def fill_model_msg(msg: capnp._DynamicStructBuilder, net_output_data: dict[str,
   LINE_T_IDXS: list[float] = []
 
   # lane lines
+  lane_lines_yz = net_output_data['lane_lines'][0,:,:,:2].transpose(0, 2, 1).tolist()
   modelV2.init('laneLines', 4)
   for i in range(4):
     lane_line = modelV2.laneLines[i]
-    fill_xyzt(lane_line, LINE_T_IDXS, np.array(ModelConstants.X_IDXS), net_output_data['lane_lines'][0,i,:,0], net_output_data['lane_lines'][0,i,:,1])
+    lane_line.t = LINE_T_IDXS
+    lane_line.x = ModelConstants.X_IDXS
+    lane_line.y, lane_line.z = lane_lines_yz[i]
   modelV2.laneLineStds = net_output_data['lane_lines_stds'][0,:,0,0].tolist()
   modelV2.laneLineProbs = net_output_data['lane_lines_prob'][0,1::2].tolist()
 
   # road edges
+  road_edges_yz = net_output_data['road_edges'][0,:,:,:2].transpose(0, 2, 1).tolist()
   modelV2.init('roadEdges', 2)
   for i in range(2):
     road_edge = modelV2.roadEdges[i]
-    fill_xyzt(road_edge, LINE_T_IDXS, np.array(ModelConstants.X_IDXS), net_output_data['road_edges'][0,i,:,0], net_output_data['road_edges'][0,i,:,1])
+    road_edge.t = LINE_T_IDXS
+    road_edge.x = ModelConstants.X_IDXS
+    road_edge.y, road_edge.z = road_edges_yz[i]
   modelV2.roadEdgeStds = net_output_data['road_edges_stds'][0,:,0,0].tolist()
 
   # leads
+  leads, leads_stds = net_output_data['lead'][0].transpose(0, 2, 1), net_output_data['lead_stds'][0].transpose(0, 2, 1)
+  lead_probs = net_output_data['lead_prob'][0].tolist()
   modelV2.init('leadsV3', 3)
   for i in range(3):
     lead = modelV2.leadsV3[i]
-    fill_xyvat(lead, ModelConstants.LEAD_T_IDXS, *net_output_data['lead'][0,i].T, *net_output_data['lead_stds'][0,i].T)
-    lead.prob = net_output_data['lead_prob'][0,i].tolist()
+    fill_xyvat(lead, ModelConstants.LEAD_T_IDXS, leads[i], leads_stds[i])
+    lead.prob = lead_probs[i]
     lead.probTime = ModelConstants.LEAD_T_OFFSETS[i]
 
   # meta
@@ -52,28 +52,23 @@ class Parser:
     pred_std = safe_exp(raw[:,:,n_values: 2*n_values])
 
     if in_N > 1:
-      weights = np.zeros((raw.shape[0], in_N, out_N), dtype=raw.dtype)
-      for i in range(out_N):
-        weights[:,:,i - out_N] = softmax(raw[:,:,i - out_N], axis=-1)
+      # softmax over the hypotheses, for each selection at once
+      weights = softmax(raw[:,:,-out_N:], axis=1).copy() if out_N > 0 else np.zeros((raw.shape[0], in_N, 0), dtype=raw.dtype)
 
       if out_N == 1:
-        for fidx in range(weights.shape[0]):
-          idxs = np.argsort(weights[fidx][:,0])[::-1]
-          weights[fidx] = weights[fidx][idxs]
-          pred_mu[fidx] = pred_mu[fidx][idxs]
-          pred_std[fidx] = pred_std[fidx][idxs]
+        idxs = np.argsort(weights[:,:,0], axis=1)[:,::-1,None]
+        weights = np.take_along_axis(weights, idxs, axis=1)
+        pred_mu = np.take_along_axis(pred_mu, idxs, axis=1)
+        pred_std = np.take_along_axis(pred_std, idxs, axis=1)
       full_shape = tuple([raw.shape[0], in_N] + list(out_shape))
       outs[name + '_weights'] = weights
       outs[name + '_hypotheses'] = pred_mu.reshape(full_shape)
       outs[name + '_stds_hypotheses'] = pred_std.reshape(full_shape)
 
-      pred_mu_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
-      pred_std_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
-      for fidx in range(weights.shape[0]):
-        for hidx in range(out_N):
-          idxs = np.argsort(weights[fidx,:,hidx])[::-1]
-          pred_mu_final[fidx, hidx] = pred_mu[fidx, idxs[0]]
-          pred_std_final[fidx, hidx] = pred_std[fidx, idxs[0]]
+      # best hypothesis for each selection, the last of an ascending argsort to break ties the same way as sorting does
+      best_idxs = np.argsort(weights, axis=1)[:,-1,:,None]
+      pred_mu_final = np.take_along_axis(pred_mu, best_idxs, axis=1)
+      pred_std_final = np.take_along_axis(pred_std, best_idxs, axis=1)
     else:
       pred_mu_final = pred_mu
       pred_std_final = pred_std
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Time per frame of parsing random model outputs and filling the modelV2, drivingModelData
+and cameraOdometry messages from them, as modeld does each frame.
+
+  parse_model_outputs_benchmark.py [-n frames]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import openpilot.cereal.messaging as messaging
+from openpilot.selfdrive.modeld.constants import ModelConstants
+from openpilot.selfdrive.modeld.fill_model_msg import fill_model_msg, fill_driving_model_data, fill_pose_msg, PublishState
+from openpilot.selfdrive.modeld.parse_model_outputs import Parser
+from openpilot.selfdrive.modeld.tests.test_parse_model_outputs import random_outputs
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time per frame of parsing model outputs and filling the messages")
+  parser.add_argument("-n", "--frames", type=int, default=200)
+  args = parser.parse_args()
+
+  rng = np.random.default_rng(0)
+  model_parser, publish_state = Parser(), PublishState()
+  frames = [random_outputs(rng) for _ in range(args.frames)]
+
+  ts = np.empty(len(frames))
+  for i, outs in enumerate(frames):
+    st = time.perf_counter()
+    outs = model_parser.parse_outputs(outs)
+    modelv2_send = messaging.new_message('modelV2')
+    drivingdata_send = messaging.new_message('drivingModelData')
+    posenet_send = messaging.new_message('cameraOdometry')
+    fill_model_msg(modelv2_send, outs, modelv2_send.modelV2.action, publish_state, i, i, i, 0.0, 0, 0.01, True)
+    fill_driving_model_data(drivingdata_send, modelv2_send)
+    fill_pose_msg(posenet_send, outs, i, 0, 0, True)
+    ts[i] = time.perf_counter() - st
+
+  ts *= 1e3
+  print(f"parse + fill: mean {np.mean(ts):.3f} ms, max {np.max(ts):.3f} ms per frame, " +
+        f"of {1e3 / ModelConstants.MODEL_RUN_FREQ:.0f} ms per model frame")
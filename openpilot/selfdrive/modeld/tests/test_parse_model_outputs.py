@@ -0,0 +1,94 @@
+import numpy as np
+
+import openpilot.cereal.messaging as messaging
+from openpilot.selfdrive.modeld.constants import ModelConstants
+from openpilot.selfdrive.modeld.fill_model_msg import fill_model_msg, fill_driving_model_data, fill_pose_msg, fill_xyz_poly, PublishState
+from openpilot.selfdrive.modeld.parse_model_outputs import Parser, safe_exp, softmax
+
+
+def reference_parse_mdn(raw, in_N, out_N):
+  # per-frame loop implementation the vectorized parser replaced
+  raw = raw.reshape((raw.shape[0], in_N, -1)).copy()
+  n_values = (raw.shape[2] - out_N)//2
+  pred_mu = raw[:,:,:n_values]
+  pred_std = safe_exp(raw[:,:,n_values: 2*n_values])
+  weights = np.zeros((raw.shape[0], in_N, out_N), dtype=raw.dtype)
+  for i in range(out_N):
+    weights[:,:,i - out_N] = softmax(raw[:,:,i - out_N], axis=-1)
+  if out_N == 1:
+    for fidx in range(weights.shape[0]):
+      idxs = np.argsort(weights[fidx][:,0])[::-1]
+      weights[fidx] = weights[fidx][idxs]
+      pred_mu[fidx] = pred_mu[fidx][idxs]
+      pred_std[fidx] = pred_std[fidx][idxs]
+  pred_mu_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
+  pred_std_final = np.zeros((raw.shape[0], out_N, n_values), dtype=raw.dtype)
+  for fidx in range(weights.shape[0]):
+    for hidx in range(out_N):
+      idxs = np.argsort(weights[fidx,:,hidx])[::-1]
+      pred_mu_final[fidx, hidx] = pred_mu[fidx, idxs[0]]
+      pred_std_final[fidx, hidx] = pred_std[fidx, idxs[0]]
+  return weights, pred_mu, pred_std, pred_mu_final, pred_std_final
+
+
+def random_outputs(rng):
+  lead_size = ModelConstants.LEAD_MHP_N * (2 * ModelConstants.LEAD_TRAJ_LEN * ModelConstants.LEAD_WIDTH + ModelConstants.LEAD_MHP_SELECTION)
+  sizes = {
+    'plan': 2 * ModelConstants.IDX_N * ModelConstants.PLAN_WIDTH,
+    'lane_lines': 2 * ModelConstants.NUM_LANE_LINES * ModelConstants.IDX_N * ModelConstants.LANE_LINES_WIDTH,
+    'lane_lines_prob': 2 * ModelConstants.NUM_LANE_LINES,
+    'road_edges': 2 * ModelConstants.NUM_ROAD_EDGES * ModelConstants.IDX_N * ModelConstants.LANE_LINES_WIDTH,
+    'lead': lead_size,
+    'lead_prob': ModelConstants.LEAD_MHP_SELECTION,
+    'desire_state': ModelConstants.DESIRE_PRED_WIDTH,
+    'desire_pred': ModelConstants.DESIRE_PRED_LEN * ModelConstants.DESIRE_PRED_WIDTH,
+    'meta': 55,
+    'pose': 2 * ModelConstants.POSE_WIDTH,
+    'wide_from_device_euler': 2 * ModelConstants.WIDE_FROM_DEVICE_WIDTH,
+    'road_transform': 2 * ModelConstants.POSE_WIDTH,
+  }
+  return {k: rng.normal(size=(1, v)).astype(np.float32) for k, v in sizes.items()}
+
+
+class TestParseModelOutputs:
+  def test_mdn_matches_reference(self):
+    rng = np.random.default_rng(0)
+    for in_N, out_N in [(ModelConstants.LEAD_MHP_N, ModelConstants.LEAD_MHP_SELECTION), (ModelConstants.PLAN_MHP_N, ModelConstants.PLAN_MHP_SELECTION)]:
+      n_values = 12
+      raw = rng.normal(size=(4, in_N * (2 * n_values + out_N))).astype(np.float32)
+      weights, mu, std, mu_final, std_final = reference_parse_mdn(raw, in_N, out_N)
+
+      outs = {'x': raw.copy()}
+      Parser().parse_mdn('x', outs, in_N=in_N, out_N=out_N, out_shape=(n_values,))
+      np.testing.assert_array_equal(outs['x_weights'], weights)
+      np.testing.assert_array_equal(outs['x_hypotheses'], mu)
+      np.testing.assert_array_equal(outs['x_stds_hypotheses'], std)
+      final_shape = (raw.shape[0], out_N, n_values) if out_N > 1 else (raw.shape[0], n_values)
+      np.testing.assert_array_equal(outs['x'], mu_final.reshape(final_shape))
+      np.testing.assert_array_equal(outs['x_stds'], std_final.reshape(final_shape))
+
+  def test_poly_matches_polyfit(self):
+    rng = np.random.default_rng(0)
+    x, y, z = rng.normal(size=(3, ModelConstants.IDX_N))
+    msg = messaging.new_message('drivingModelData')
+    fill_xyz_poly(msg.drivingModelData.path, ModelConstants.POLY_PATH_DEGREE, x, y, z)
+    expected = np.polynomial.polynomial.polyfit(ModelConstants.T_IDXS, np.stack([x, y, z], axis=1), deg=ModelConstants.POLY_PATH_DEGREE)
+    path = msg.drivingModelData.path
+    np.testing.assert_allclose(np.array([path.xCoefficients, path.yCoefficients, path.zCoefficients]).T, expected, rtol=1e-5, atol=1e-6)
+
+  def test_fill_many_frames(self):
+    rng = np.random.default_rng(0)
+    parser, publish_state = Parser(), PublishState()
+
+    for i in range(200):
+      outs = parser.parse_outputs(random_outputs(rng))
+      modelv2_send = messaging.new_message('modelV2')
+      drivingdata_send = messaging.new_message('drivingModelData')
+      posenet_send = messaging.new_message('cameraOdometry')
+      fill_model_msg(modelv2_send, outs, modelv2_send.modelV2.action, publish_state, i, i, i, 0.0, 0, 0.01, True)
+      fill_driving_model_data(drivingdata_send, modelv2_send)
+      fill_pose_msg(posenet_send, outs, i, 0, 0, True)
+
+      for msg in (modelv2_send, drivingdata_send, posenet_send):
+        messaging.log_from_bytes(msg.to_bytes())
+      assert len(modelv2_send.modelV2.position.x) == ModelConstants.IDX_N
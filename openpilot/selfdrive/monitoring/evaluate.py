@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the driver monitoring policy over whole routes.
+
+evaluate() takes columnar inputs, one row per dmonitoringd step, and reproduces DriverMonitoring.run_step
+exactly. Everything that doesn't depend on policy state (face pose, blink, phone, strictness) is computed
+for the whole route at once, leaving a tight scalar loop for the awareness and lockout state machine.
+Routes are loaded once and can be evaluated against many settings, e.g. to tune timeouts:
+  ./evaluate.py <route> --set _VISION_POLICY_ALERT_1_TIMEOUT=4,5,6 --set _POSE_YAW_THRESHOLD=0.35,0.40
+"""
+import argparse
+import itertools
+import math
+import multiprocessing
+from dataclasses import dataclass, fields
+
+import numpy as np
+from opendbc.car.structs import car
+
+from openpilot.common.realtime import DT_DMON
+from openpilot.common.stat_live import RunningStatFilter
+from openpilot.selfdrive.monitoring.policy import (DRIVER_MONITOR_SETTINGS, AlertLevel, MonitoringPolicy, cabin_undistorted_FL,
+                                                   cabin_undistorted_H, cabin_undistorted_W)
+
+DM_SERVICES = ('driverStateV2', 'extrinsicsCalibration', 'carState', 'selfdriveState', 'modelV2')
+
+
+@dataclass
+class DriverDataColumns:
+  # one side of driverStateV2, valid is False where the model gave no face outputs
+  face_orientation: np.ndarray  # (N, 3)
+  face_position: np.ndarray  # (N, 2)
+  face_orientation_std: np.ndarray  # (N, 3)
+  face_prob: np.ndarray
+  left_eye_prob: np.ndarray
+  right_eye_prob: np.ndarray
+  left_blink_prob: np.ndarray
+  right_blink_prob: np.ndarray
+  sunglasses_prob: np.ndarray
+  phone_prob: np.ndarray
+  valid: np.ndarray
+
+  @classmethod
+  def from_messages(cls, driver_data) -> 'DriverDataColumns':
+    n = len(driver_data)
+    cols = {f.name: np.zeros(n) for f in fields(cls)}
+    cols['face_orientation'] = np.zeros((n, 3))
+    cols['face_position'] = np.zeros((n, 2))
+    cols['face_orientation_std'] = np.zeros((n, 3))
+    cols['valid'] = np.zeros(n, dtype=bool)
+    for i, d in enumerate(driver_data):
+      cols['valid'][i] = all(len(x) > 0 for x in (d.faceOrientation, d.facePosition, d.faceOrientationStd, d.facePositionStd))
+      if cols['valid'][i]:
+        cols['face_orientation'][i] = list(d.faceOrientation)
+        cols['face_position'][i] = list(d.facePosition)
+        cols['face_orientation_std'][i] = list(d.faceOrientationStd)
+      cols['face_prob'][i] = d.faceProb
+      cols['left_eye_prob'][i] = d.leftEyeProb
+      cols['right_eye_prob'][i] = d.rightEyeProb
+      cols['left_blink_prob'][i] = d.leftBlinkProb
+      cols['right_blink_prob'][i] = d.rightBlinkProb
+      cols['sunglasses_prob'][i] = d.sunglassesProb
+      cols['phone_prob'][i] = d.phoneProb
+    return cls(**cols)
+
+
+@dataclass
+class DMInputs:
+  left: DriverDataColumns
+  right: DriverDataColumns
+  wheel_on_right_prob: np.ndarray
+  rpy_calib: np.ndarray  # (N, 3)
+  car_speed: np.ndarray
+  enabled: np.ndarray
+  wrong_gear: np.ndarray
+  driver_engaged: np.ndarray
+  brake_disengage_prob: np.ndarray
+  steering_angle_deg: np.ndarray
+
+  def __len__(self):
+    return len(self.car_speed)
+
+  @classmethod
+  def from_events(cls, events) -> 'DMInputs':
+    """
+    Like dmonitoringd, steps on every driverStateV2 with the latest of the other services, once all have been seen.
+    """
+    latest: dict = {}
+    rows = []
+    for msg in events:
+      which = msg.which()
+      if which not in DM_SERVICES:
+        continue
+      latest[which] = getattr(msg, which)
+      if which == 'driverStateV2' and len(latest) == len(DM_SERVICES):
+        rows.append(tuple(latest[s] for s in DM_SERVICES))
+
+    ds = [r[0] for r in rows]
+    cs = [r[2] for r in rows]
+    return cls(
+      left=DriverDataColumns.from_messages([d.leftDriverData for d in ds]),
+      right=DriverDataColumns.from_messages([d.rightDriverData for d in ds]),
+      wheel_on_right_prob=np.array([d.wheelOnRightProb for d in ds], dtype=float),
+      rpy_calib=np.array([list(r[1].rpyCalib) for r in rows], dtype=float).reshape(-1, 3),
+      car_speed=np.array([c.vEgo for c in cs], dtype=float),
+      enabled=np.array([r[3].enabled for r in rows], dtype=bool),
+      wrong_gear=np.array([c.gearShifter not in (car.CarState.GearShifter.drive, car.CarState.GearShifter.low) for c in cs], dtype=bool),
+      driver_engaged=np.array([c.steeringPressed or c.gasPressed for c in cs], dtype=bool),
+      brake_disengage_prob=np.array([r[4].meta.disengagePredictions.brakeDisengageProbs[0] for r in rows], dtype=float),
+      steering_angle_deg=np.array([c.steeringAngleDeg for c in cs], dtype=float),
+    )
+
+
+@dataclass
+class DMTimeline:
+  # the policy state after each step, as published in driverMonitoringState
+  awareness: np.ndarray
+  alert_level: np.ndarray
+  active_policy: np.ndarray
+  wheel_on_right: np.ndarray
+  face_detected: np.ndarray
+  distracted: np.ndarray
+  distracted_pose: np.ndarray
+  distracted_eye: np.ndarray
+  distracted_phone: np.ndarray
+  pose_pitch: np.ndarray
+  pose_yaw: np.ndarray
+  pose_calibrated: np.ndarray
+  pose_uncertainty: np.ndarray
+  model_uncertain: np.ndarray
+  lockout: np.ndarray
+  lockout_count: np.ndarray
+  alert_3_count: np.ndarray
+  no_response_count: np.ndarray
+  no_response_force_decel: np.ndarray
+  always_on_lockout: np.ndarray
+
+  def __len__(self):
+    return len(self.awareness)
+
+  def events(self) -> list[list[str]]:
+    """
+    Names of the driver monitoring events selfdrived raises for each step.
+    """
+    out = []
+    for lockout, always_on_lockout, level, policy in zip(self.lockout, self.always_on_lockout, self.alert_level, self.active_policy, strict=True):
+      names = ['tooDistracted'] if lockout or always_on_lockout else []
+      if level != AlertLevel.none:
+        names.append(('driverDistracted' if policy == MonitoringPolicy.vision else 'driverUnresponsive') + str(int(level)))
+      out.append(names)
+    return out
+
+  def summary(self, enabled: np.ndarray | None = None) -> dict:
+    level = self.alert_level.astype(int)
+    prev_level = np.concatenate([[AlertLevel.none], level[:-1]])
+    onsets = {lvl: int(np.sum((level == lvl) & (prev_level != lvl))) for lvl in (1, 2, 3)}
+    lockouts = np.diff(self.lockout.astype(int), prepend=0) > 0
+    return {
+      "duration": len(self) * DT_DMON,
+      "engaged_time": float(np.sum(enabled)) * DT_DMON if enabled is not None else None,
+      "alerts_1": onsets[1],
+      "alerts_2": onsets[2],
+      "alerts_3": onsets[3],
+      "alert_time": float(np.sum(level > 0)) * DT_DMON,
+      "lockouts": int(np.sum(lockouts)),
+      "distracted_time": float(np.sum(self.distracted)) * DT_DMON,
+      "wheeltouch_time": float(np.sum(self.active_policy == MonitoringPolicy.wheeltouch)) * DT_DMON,
+      "min_awareness": float(np.min(self.awareness)) if len(self) else 1.,
+    }
+
+
+def _atan2(y: np.ndarray, x: float) -> np.ndarray:
+  # np.arctan2 can differ from math.atan2 in the last bit, which is enough to flip a threshold
+  return np.fromiter(map(math.atan2, y.tolist(), itertools.repeat(x)), dtype=float, count=len(y))
+
+
+def _side_features(d: DriverDataColumns, rpy_calib: np.ndarray, s: DRIVER_MONITOR_SETTINGS) -> dict:
+  # face_orientation_from_model and the per-frame parts of _update_states, for every row at once
+  pixel_x = (d.face_position[:, 0] + 0.5) * cabin_undistorted_W
+  pixel_y = (d.face_position[:, 1] + 0.5) * cabin_undistorted_H
+  yaw_focal_angle = _atan2(pixel_x - cabin_undistorted_W // 2, cabin_undistorted_FL)
+  pitch_focal_angle = _atan2(pixel_y - cabin_undistorted_H // 2, cabin_undistorted_FL)
+  pitch = (d.face_orientation[:, 0] + pitch_focal_angle) - rpy_calib[:, 1]
+  yaw = (-d.face_orientation[:, 1] + yaw_focal_angle) - rpy_calib[:, 2]
+
+  std_max = np.maximum(d.face_orientation_std[:, 0], d.face_orientation_std[:, 1])
+  no_sunglasses = d.sunglasses_prob < s._SG_THRESHOLD
+  blink_left = d.left_blink_prob * (d.left_eye_prob > s._EYE_THRESHOLD) * no_sunglasses
+  blink_right = d.right_blink_prob * (d.right_eye_prob > s._EYE_THRESHOLD) * no_sunglasses
+  return {
+    'valid': d.valid.tolist(),
+    'face': (d.face_prob > s._FACE_THRESHOLD).tolist(),
+    'pitch': pitch.tolist(),
+    'yaw': yaw.tolist(),
+    'std_max': std_max.tolist(),
+    'low_std': (std_max < s._HI_STD_THRESHOLD).tolist(),
+    'eye': ((blink_left + blink_right) * 0.5 > s._BLINK_THRESHOLD).tolist(),
+    'phone': (d.phone_prob > s._PHONE_THRESH).tolist(),
+  }
+
+
+def evaluate(inputs: DMInputs, settings: DRIVER_MONITOR_SETTINGS | None = None, rhd_saved: bool = False, always_on: bool = False,
+             lockout_count: int = 0, lockout_active: bool = False) -> DMTimeline:
+  """
+  Runs the policy over a route, giving the same states as calling DriverMonitoring.run_step on each row.
+  rhd_saved, lockout_count and lockout_active are the params DriverMonitoring starts from.
+  """
+  s = settings if settings is not None else DRIVER_MONITOR_SETTINGS()
+  n = len(inputs)
+
+  # _set_pose_strictness
+  car_speed = inputs.car_speed
+  k1 = np.maximum(-0.00156 * ((car_speed - 16) * (car_speed - 16)) + 0.6, 0.2)
+  bp_normal = np.maximum(np.minimum(inputs.brake_disengage_prob / k1, 0.5), 0)
+  cfactor_pitch = np.interp(bp_normal, [0, 0.5], [s._POSE_PITCH_THRESHOLD_SLACK, s._POSE_PITCH_THRESHOLD_STRICT]) / s._POSE_PITCH_THRESHOLD
+  cfactor_yaw = np.interp(bp_normal, [0, 0.5], [s._POSE_YAW_THRESHOLD_SLACK, s._POSE_YAW_THRESHOLD_STRICT]) / s._POSE_YAW_THRESHOLD
+  pitch_thresholds = (s._POSE_PITCH_THRESHOLD * cfactor_pitch).tolist()
+  yaw_thresholds = (s._POSE_YAW_THRESHOLD * cfactor_yaw).tolist()
+
+  steer = inputs.steering_angle_deg
+  steer_d = np.maximum(np.abs(steer) - s._POSE_YAW_MIN_STEER_DEG, 0.)
+  steer_yaw_offsets = (np.radians(steer_d) * -np.sign(steer) * s._POSE_YAW_STEER_FACTOR).tolist()
+
+  sides = (_side_features(inputs.left, inputs.rpy_calib, s), _side_features(inputs.right, inputs.rpy_calib, s))
+  face_either = (np.array(sides[0]['face']) | np.array(sides[1]['face'])).tolist() if n else []
+  wheelpos_calib = ((car_speed > s._WHEELPOS_CALIB_MIN_SPEED) & face_either).tolist() if n else []
+  wheel_on_right_prob = inputs.wheel_on_right_prob.tolist()
+  car_speed_col = car_speed.tolist()
+  lowspeed_col = (car_speed < s._ALERT_MIN_SPEED).tolist()
+  enabled_col = inputs.enabled.tolist()
+  engaged_col = inputs.driver_engaged.tolist()
+  wrong_gear_col = inputs.wrong_gear.tolist()
+
+  # policy constants
+  vision_thresholds = (1. - s._VISION_POLICY_ALERT_1_TIMEOUT / s._VISION_POLICY_ALERT_3_TIMEOUT,
+                       1. - s._VISION_POLICY_ALERT_2_TIMEOUT / s._VISION_POLICY_ALERT_3_TIMEOUT,
+                       DT_DMON / s._VISION_POLICY_ALERT_3_TIMEOUT)
+  wheeltouch_thresholds = (1. - s._WHEELTOUCH_POLICY_ALERT_1_TIMEOUT / s._WHEELTOUCH_POLICY_ALERT_3_TIMEOUT,
+                           1. - s._WHEELTOUCH_POLICY_ALERT_2_TIMEOUT / s._WHEELTOUCH_POLICY_ALERT_3_TIMEOUT,
+                           DT_DMON / s._WHEELTOUCH_POLICY_ALERT_3_TIMEOUT)
+  recovery_gain = s._TIMEOUT_RECOVERY_FACTOR_MAX - s._TIMEOUT_RECOVERY_FACTOR_MIN
+  filter_alpha = DT_DMON / (s._DISTRACTED_FILTER_TS + DT_DMON)
+  no_response_timeout = int(s._NO_RESPONSE_TIMEOUT / DT_DMON)
+  lockout_times = s._LOCKOUT_TIMES
+
+  # state, initialized like DriverMonitoring.__init__
+  wheelpos = RunningStatFilter(raw_priors=(s._WHEELPOS_DATA_AVG, s._WHEELPOS_DATA_VAR, 2), max_trackable=s._WHEELPOS_MAX_COUNT)
+  pitch_offsetter = RunningStatFilter(raw_priors=(s._PITCH_NATURAL_OFFSET, s._PITCH_NATURAL_VAR, 2), max_trackable=s._POSE_OFFSET_MAX_COUNT)
+  yaw_offsetter = RunningStatFilter(raw_priors=(s._YAW_NATURAL_OFFSET, s._YAW_NATURAL_VAR, 2), max_trackable=s._POSE_OFFSET_MAX_COUNT)
+  pitch = yaw = 0.
+  calibrated = False
+  model_std_max = 0.
+  low_std = True
+  d_pose = d_eye = d_phone = False
+  driver_distracted = False
+  distraction_x = 0.
+  wheel_on_right = False
+  wheel_on_right_last = None
+  face_detected = False
+  alert_3_cnt = cnt_since_alert_3 = no_response_cnt = 0
+  lockout_duration = lockout_times[min(max(lockout_count - 1, 0), len(lockout_times) - 1)]
+  lockout_time_elapsed = 0
+  is_model_uncertain = False
+  hi_stds = 0
+  awareness = last_vision_awareness = last_wheeltouch_awareness = 1.
+  active_policy = MonitoringPolicy.vision
+  threshold_alert_1, threshold_alert_2, step_change = vision_thresholds
+
+  out = {f.name: [None] * n for f in fields(DMTimeline)}
+  for i in range(n):
+    op_engaged = enabled_col[i]
+    lowspeed = lowspeed_col[i]
+
+    # _update_states
+    if wheelpos_calib[i]:
+      wheelpos.push_and_update(wheel_on_right_prob[i])
+    if wheelpos.filtered_stat.n >= s._WHEELPOS_FILTER_MIN_COUNT:
+      wheel_on_right = wheelpos.filtered_stat.M > s._WHEELPOS_THRESHOLD
+    else:
+      wheel_on_right = rhd_saved
+    if op_engaged and wheel_on_right_last is not None and wheel_on_right_last != wheel_on_right:
+      wheel_on_right = wheel_on_right_last
+
+    side = sides[wheel_on_right]
+    if side['valid'][i]:
+      face_detected = side['face'][i]
+      pitch = side['pitch'][i]
+      yaw = side['yaw'][i]
+      steer_yaw_offset = steer_yaw_offsets[i]
+      if wheel_on_right:
+        yaw *= -1
+        steer_yaw_offset *= -1
+      wheel_on_right_last = wheel_on_right
+      model_std_max = side['std_max'][i]
+      low_std = side['low_std'][i]
+
+      # _get_distracted_types
+      if not calibrated:
+        pitch_error = pitch - s._PITCH_NATURAL_OFFSET
+        yaw_error = yaw - s._YAW_NATURAL_OFFSET
+      else:
+        pitch_error = pitch - min(max(pitch_offsetter.filtered_stat.mean(), s._PITCH_MIN_OFFSET), s._PITCH_MAX_OFFSET)
+        yaw_error = yaw - min(max(yaw_offsetter.filtered_stat.mean(), s._YAW_MIN_OFFSET), s._YAW_MAX_OFFSET)
+      pitch_error = 0 if pitch_error > 0 else abs(pitch_error)
+      if yaw_error * steer_yaw_offset > 0:
+        yaw_error = max(abs(yaw_error) - min(abs(steer_yaw_offset), s._POSE_YAW_STEER_MAX_OFFSET), 0.)
+      else:
+        yaw_error = abs(yaw_error)
+      pitch_threshold = pitch_thresholds[i] if calibrated else s._PITCH_NATURAL_THRESHOLD
+      d_pose = pitch_error > pitch_threshold or yaw_error > yaw_thresholds[i]
+      d_eye = side['eye'][i]
+      d_phone = side['phone'][i]
+
+      driver_distracted = (d_pose or d_eye or d_phone) and face_detected and low_std
+      distraction_x = (1. - filter_alpha) * distraction_x + filter_alpha * driver_distracted
+
+      if face_detected and car_speed_col[i] > s._POSE_CALIB_MIN_SPEED and low_std and (not op_engaged or not driver_distracted):
+        pitch_offsetter.push_and_update(pitch)
+        yaw_offsetter.push_and_update(yaw)
+      calibrated = pitch_offsetter.filtered_stat.n >= s._POSE_OFFSET_MIN_COUNT and yaw_offsetter.filtered_stat.n >= s._POSE_OFFSET_MIN_COUNT
+
+      # _set_policy
+      is_model_uncertain = hi_stds >= s._HI_STD_FALLBACK_TIME
+      target_policy = MonitoringPolicy.vision if face_detected and not is_model_uncertain else MonitoringPolicy.wheeltouch
+      if active_policy == MonitoringPolicy.vision and awareness <= threshold_alert_2:
+        step_change = vision_thresholds[2] if target_policy == MonitoringPolicy.vision else 0.
+      elif awareness > 0.:
+        if target_policy == MonitoringPolicy.vision:
+          if active_policy != MonitoringPolicy.vision:
+            last_wheeltouch_awareness = awareness
+            awareness = last_vision_awareness
+          threshold_alert_1, threshold_alert_2, step_change = vision_thresholds
+        else:
+          if active_policy == MonitoringPolicy.vision:
+            last_vision_awareness = awareness
+            awareness = last_wheeltouch_awareness
+          threshold_alert_1, threshold_alert_2, step_change = wheeltouch_thresholds
+        active_policy = target_policy
+
+      if face_detected and not low_std and not driver_distracted:
+        hi_stds += 1
+      elif face_detected and low_std:
+        hi_stds = 0
+
+    # _update_events
+    alert_level = AlertLevel.none
+    driver_interacting = engaged_col[i]
+    if alert_3_cnt >= s._MAX_ALERT_3 or no_response_cnt >= s._MAX_NO_RESPONSE:
+      if not lockout_active:
+        lockout_count += 1
+        lockout_duration = lockout_times[min(lockout_count - 1, len(lockout_times) - 1)]
+      lockout_active = True
+    if lockout_active:
+      lockout_time_elapsed += 1
+      if lockout_time_elapsed > lockout_duration:
+        lockout_active = False
+        alert_3_cnt = cnt_since_alert_3 = no_response_cnt = lockout_time_elapsed = 0
+
+    always_on_valid = always_on and not wrong_gear_col[i]
+    if (driver_interacting and awareness > 0 and active_policy == MonitoringPolicy.wheeltouch) or \
+       (not always_on_valid and not op_engaged) or \
+       (always_on_valid and not op_engaged and awareness <= 0):
+      awareness = last_vision_awareness = last_wheeltouch_awareness = 1.
+    else:
+      awareness_prev = awareness
+      reaching_alert_1 = awareness - step_change <= threshold_alert_1
+      reaching_alert_3 = awareness - step_change <= 0
+      lowspeed_exemption = lowspeed and reaching_alert_1
+      always_on_exemption = always_on_valid and not op_engaged and reaching_alert_3
+
+      attentive = awareness > 0 and ((distraction_x < 0.37 and face_detected and low_std) or lowspeed_exemption)
+      recovered = False
+      if attentive:
+        if driver_interacting:
+          awareness = last_vision_awareness = last_wheeltouch_awareness = 1.
+          recovered = True
+        else:
+          awareness = min(awareness + (recovery_gain * (1. - awareness) + s._TIMEOUT_RECOVERY_FACTOR_MIN) * step_change, 1.)
+          if awareness == 1.:
+            last_wheeltouch_awareness = min(last_wheeltouch_awareness + step_change, 1.)
+          recovered = awareness > threshold_alert_2
+
+      if not recovered:
+        certainly_distracted = distraction_x > 0.63 and driver_distracted and face_detected
+        maybe_distracted = is_model_uncertain or not face_detected
+        if (certainly_distracted or maybe_distracted) and not (lowspeed_exemption or always_on_exemption):
+          awareness = max(awareness - step_change, -0.1)
+
+        if awareness <= 0.:
+          alert_level = AlertLevel.three
+          if awareness_prev > 0.:
+            alert_3_cnt += 1
+            cnt_since_alert_3 = 0
+          else:
+            cnt_since_alert_3 += 1
+          if cnt_since_alert_3 == no_response_timeout:
+            no_response_cnt += 1
+        elif awareness <= threshold_alert_2:
+          alert_level = AlertLevel.two
+        elif awareness <= threshold_alert_1:
+          alert_level = AlertLevel.one
+
+    out['awareness'][i] = awareness
+    out['alert_level'][i] = alert_level
+    out['active_policy'][i] = active_policy
+    out['wheel_on_right'][i] = wheel_on_right
+    out['face_detected'][i] = face_detected
+    out['distracted'][i] = driver_distracted
+    out['distracted_pose'][i] = d_pose
+    out['distracted_eye'][i] = d_eye
+    out['distracted_phone'][i] = d_phone
+    out['pose_pitch'][i] = pitch
+    out['pose_yaw'][i] = yaw
+    out['pose_calibrated'][i] = calibrated
+    out['pose_uncertainty'][i] = model_std_max
+    out['model_uncertain'][i] = is_model_uncertain
+    out['lockout'][i] = lockout_active
+    out['lockout_count'][i] = lockout_count
+    out['alert_3_count'][i] = alert_3_cnt
+    out['no_response_count'][i] = no_response_cnt
+    out['no_response_force_decel'][i] = alert_level == AlertLevel.three and cnt_since_alert_3 >= no_response_timeout
+    out['always_on_lockout'][i] = always_on and awareness <= threshold_alert_2
+
+  dtypes = {'awareness': float, 'pose_pitch': float, 'pose_yaw': float, 'pose_uncertainty': float, 'alert_level': np.int8, 'active_policy': np.int8,
+            'lockout_count': int, 'alert_3_count': int, 'no_response_count': int}
+  return DMTimeline(**{k: np.array(v, dtype=dtypes.get(k, bool)) for k, v in out.items()})
+
+
+def make_settings(overrides: dict) -> DRIVER_MONITOR_SETTINGS:
+  settings = DRIVER_MONITOR_SETTINGS()
+  for k, v in overrides.items():
+    if not hasattr(settings, k):
+      raise AttributeError(f"unknown driver monitoring setting {k}")
+    setattr(settings, k, v)
+  return settings
+
+
+def evaluate_route(route: str, overrides: list[dict], **kwargs) -> list[dict]:
+  from openpilot.tools.lib.logreader import LogReader
+  inputs = DMInputs.from_events(LogReader(route))
+  results = []
+  for o in overrides:
+    timeline = evaluate(inputs, make_settings(o), **kwargs)
+    results.append({"route": route, "settings": o, **timeline.summary(inputs.enabled)})
+  return results
+
+
+def _evaluate_route(args):
+  route, overrides, kwargs = args
+  return evaluate_route(route, overrides, **kwargs)
+
+
+def evaluate_routes(routes: list[str], overrides: list[dict] | None = None, workers: int = 1, **kwargs) -> list[dict]:
+  """
+  Evaluates every route against every set of setting overrides. Each route is loaded once, by one worker.
+  """
+  overrides = overrides if overrides is not None else [{}]
+  jobs = [(r, overrides, kwargs) for r in routes]
+  if workers <= 1:
+    return [res for job in jobs for res in _evaluate_route(job)]
+  with multiprocessing.Pool(workers) as pool:
+    return [res for results in pool.imap(_evaluate_route, jobs) for res in results]
+
+
+def settings_grid(sweeps: list[str]) -> list[dict]:
+  # ["_A=1,2", "_B=3"] -> [{"_A": 1., "_B": 3.}, {"_A": 2., "_B": 3.}]
+  names, values = [], []
+  for sweep in sweeps:
+    name, vals = sweep.split("=", 1)
+    names.append(name)
+    values.append([float(v) for v in vals.split(",")])
+  return [dict(zip(names, combo, strict=True)) for combo in itertools.product(*values)]
+
+
+def format_report(results: list[dict]) -> str:
+  lines = [f"{'route':<40} {'settings':<40} {'alert 1':>8} {'alert 2':>8} {'alert 3':>8} {'lockouts':>9} {'distracted s':>13}"]
+  for r in results:
+    settings = " ".join(f"{k}={v:g}" for k, v in r["settings"].items()) or "default"
+    lines.append(f"{r['route']:<40} {settings:<40} {r['alerts_1']:8d} {r['alerts_2']:8d} {r['alerts_3']:8d} {r['lockouts']:9d} " +
+                 f"{r['distracted_time']:13.1f}")
+  return "\n".join(lines)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Evaluate the driver monitoring policy offline on routes.",
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument("routes", nargs="+", help="routes or segment ranges, anything LogReader takes")
+  parser.add_argument("--set", action="append", default=[], dest="sweeps", metavar="SETTING=V1,V2",
+                      help="sweep a DRIVER_MONITOR_SETTINGS value, repeat for a grid")
+  parser.add_argument("-j", "--workers", type=int, default=1, help="routes to evaluate in parallel")
+  parser.add_argument("--rhd", action="store_true", help="start with a saved right hand drive calibration")
+  parser.add_argument("--always-on", action="store_true", help="evaluate with always on driver monitoring")
+  args = parser.parse_args()
+
+  results = evaluate_routes(args.routes, settings_grid(args.sweeps), args.workers, rhd_saved=args.rhd, always_on=args.always_on)
+  print(format_report(results))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,141 @@
+import numpy as np
+from opendbc.car.structs import car
+
+import openpilot.cereal.messaging as messaging
+from openpilot.common.params import Params
+from openpilot.common.realtime import DT_DMON
+from openpilot.common.test import OpenpilotTestCase
+from openpilot.selfdrive.monitoring.evaluate import DMInputs, evaluate, make_settings, settings_grid
+from openpilot.selfdrive.monitoring.policy import DriverMonitoring
+
+GearShifter = car.CarState.GearShifter
+
+# DriverMonitoring attribute for each timeline column
+TIMELINE_ATTRS = {
+  'awareness': lambda dm: dm.awareness,
+  'alert_level': lambda dm: dm.alert_level,
+  'active_policy': lambda dm: dm.active_policy,
+  'wheel_on_right': lambda dm: dm.wheel_on_right,
+  'face_detected': lambda dm: dm.face_detected,
+  'distracted': lambda dm: dm.driver_distracted,
+  'distracted_pose': lambda dm: dm.distracted_types['pose'],
+  'distracted_eye': lambda dm: dm.distracted_types['eye'],
+  'distracted_phone': lambda dm: dm.distracted_types['phone'],
+  'pose_pitch': lambda dm: dm.pose.pitch,
+  'pose_yaw': lambda dm: dm.pose.yaw,
+  'pose_calibrated': lambda dm: dm.pose.calibrated,
+  'pose_uncertainty': lambda dm: dm.model_std_max,
+  'model_uncertain': lambda dm: dm.is_model_uncertain,
+  'lockout': lambda dm: dm.lockout_active,
+  'lockout_count': lambda dm: dm.lockout_count,
+  'alert_3_count': lambda dm: dm.alert_3_cnt,
+  'no_response_count': lambda dm: dm.no_response_cnt,
+  'no_response_force_decel': lambda dm: dm.alert_level == 3 and dm.cnt_since_alert_3 >= dm.no_response_timeout,
+  'always_on_lockout': lambda dm: dm.always_on and dm.awareness <= dm.threshold_alert_2,
+}
+
+
+def fill_driver_data(dd, rng, visible):
+  if rng.random() < 0.05:
+    return  # no model outputs for this side
+  dd.faceOrientation = (rng.normal(0, 0.3, 3) + [0., rng.choice([-0.1, 0.4]), 0.]).tolist()
+  dd.facePosition = rng.normal(0, 0.1, 2).tolist()
+  dd.faceOrientationStd = rng.choice([0.02, 0.2, 0.5], 3).tolist()
+  dd.facePositionStd = [0.01, 0.01]
+  dd.faceProb = float(visible * rng.uniform(0.6, 1.))
+  dd.leftEyeProb = float(rng.uniform(0.5, 1.))
+  dd.rightEyeProb = float(rng.uniform(0.5, 1.))
+  dd.leftBlinkProb = float(rng.choice([0., 0.95]))
+  dd.rightBlinkProb = float(rng.choice([0., 0.95]))
+  dd.sunglassesProb = float(rng.choice([0., 0.95], p=[0.9, 0.1]))
+  dd.phoneProb = float(rng.choice([0., 0.8], p=[0.9, 0.1]))
+
+
+def make_drive(seed, n_segments=60):
+  # piecewise constant drives, with segments long enough to walk through alerts, lockouts and calibration
+  rng = np.random.default_rng(seed)
+  events = []
+  for _ in range(n_segments):
+    wheel_on_right_prob = float(rng.choice([0.01, 0.99], p=[0.8, 0.2]))
+    speed = float(rng.choice([0., 5., 12., 25.]))
+    enabled = bool(rng.random() < 0.8)
+    pressed = bool(rng.random() < 0.15)
+    steer = float(rng.choice([0., 45., -60.]))
+    gear = GearShifter.drive if rng.random() < 0.9 else GearShifter.reverse
+    brake_prob = float(rng.uniform(0., 0.6))
+    rpy = rng.normal(0, 0.03, 3).tolist()
+    driver_states = []
+    for _ in range(rng.integers(2, 4)):
+      ds = messaging.new_message('driverStateV2')
+      ds.driverStateV2.wheelOnRightProb = wheel_on_right_prob
+      visible = rng.random() < 0.8
+      fill_driver_data(ds.driverStateV2.leftDriverData, rng, visible)
+      fill_driver_data(ds.driverStateV2.rightDriverData, rng, visible)
+      driver_states.append(ds)
+
+    cs = messaging.new_message('carState')
+    cs.carState.vEgo = speed
+    cs.carState.steeringPressed = pressed
+    cs.carState.gasPressed = False
+    cs.carState.steeringAngleDeg = steer
+    cs.carState.gearShifter = gear
+    ss = messaging.new_message('selfdriveState')
+    ss.selfdriveState.enabled = enabled
+    mdl = messaging.new_message('modelV2')
+    mdl.modelV2.meta.disengagePredictions.brakeDisengageProbs = [brake_prob]
+    cal = messaging.new_message('extrinsicsCalibration')
+    cal.extrinsicsCalibration.rpyCalib = rpy
+    events += [cs, ss, mdl, cal]
+
+    duration = int(rng.choice([2., 10., 40.]) / DT_DMON)
+    events += [driver_states[i * len(driver_states) // duration] for i in range(duration)]
+  return events
+
+
+def run_policy(events, **kwargs):
+  # what dmonitoringd does with the same messages, starting without a lockout history
+  Params().remove("DriverLockoutCount")
+  dm = DriverMonitoring(**kwargs)
+  sm = {}
+  states = {k: [] for k in TIMELINE_ATTRS}
+  for msg in events:
+    sm[msg.which()] = getattr(msg, msg.which())
+    if msg.which() == 'driverStateV2' and len(sm) == 5:
+      dm.run_step(sm)
+      for k, attr in TIMELINE_ATTRS.items():
+        states[k].append(attr(dm))
+  return states
+
+
+class TestEvaluate(OpenpilotTestCase):
+  def test_matches_policy(self):
+    for seed, kwargs in ((0, {}), (1, {'rhd_saved': True}), (2, {'always_on': True}), (3, {})):
+      events = make_drive(seed)
+      expected = run_policy(events, **kwargs)
+      timeline = evaluate(DMInputs.from_events(events), **kwargs)
+      assert len(timeline) == len(expected['awareness']) > 0
+      for k, v in expected.items():
+        np.testing.assert_array_equal(getattr(timeline, k), np.array(v), err_msg=f"seed {seed}: {k}")
+
+      # the drives should cover the whole state machine
+      assert set(timeline.alert_level) == {0, 1, 2, 3}
+      assert len(set(timeline.active_policy)) == 2
+
+  def test_events(self):
+    timeline = evaluate(DMInputs.from_events(make_drive(0)))
+    events = timeline.events()
+    summary = timeline.summary()
+    assert summary["alerts_3"] > 0
+    assert sum('driverDistracted3' in e or 'driverUnresponsive3' in e for e in events) * DT_DMON <= summary["alert_time"]
+    assert any('tooDistracted' in e for e in events) == (summary["lockouts"] > 0)
+
+  def test_settings(self):
+    grid = settings_grid(["_VISION_POLICY_ALERT_1_TIMEOUT=3,5", "_FACE_THRESHOLD=0.7"])
+    assert grid == [{"_VISION_POLICY_ALERT_1_TIMEOUT": 3., "_FACE_THRESHOLD": 0.7}, {"_VISION_POLICY_ALERT_1_TIMEOUT": 5., "_FACE_THRESHOLD": 0.7}]
+
+    events = make_drive(0)
+    inputs = DMInputs.from_events(events)
+    strict = evaluate(inputs, make_settings({"_VISION_POLICY_ALERT_1_TIMEOUT": 3.}))
+    default = evaluate(inputs, make_settings({}))
+    assert strict.summary()["alert_time"] > default.summary()["alert_time"]
+
@@ -1,3 +1,5 @@
-from openpilot.selfdrive.pandad.pandad_api_impl import can_list_to_can_capnp, can_capnp_to_list
+from openpilot.selfdrive.pandad.pandad_api_impl import can_list_to_can_capnp, can_capnp_to_list, can_arrays_to_can_capnp, can_capnp_to_arrays
 assert can_list_to_can_capnp
 assert can_capnp_to_list
+assert can_arrays_to_can_capnp
+assert can_capnp_to_arrays
@@ -1,8 +1,18 @@
 import time
+from typing import NamedTuple
+
+import numpy as np
+
 from openpilot.cereal import log
 
 NO_TRAVERSAL_LIMIT = 2**64 - 1
 
+# Below this many frames the fixed cost of the numpy conversions is more than pycapnp's per frame cost,
+# which covers card's sendcan and a can event of a single bus. The size of serialized can events stands
+# in for their frame count, which is only known once they are parsed.
+SMALL_BATCH_FRAMES = 100
+SMALL_BATCH_BYTES = SMALL_BATCH_FRAMES * 24  # a CanData with a classic frame's dat is 3 words
+
 # Cache schema fields for faster access (avoids string lookup on each field access)
 _cached_reader_fields = None  # (address_field, dat_field, src_field) for reading
 _cached_writer_fields = None  # (address_field, dat_field, src_field) for writing
@@ -26,6 +36,238 @@ def _get_writer_fields(schema):
   return _cached_writer_fields
 
 
+class CanFrames(NamedTuple):
+  """CAN frames of a batch of can or sendcan events, one row per frame."""
+  nanos: np.ndarray  # (E,) logMonoTime of each event
+  counts: np.ndarray  # (E,) frames in each event, the frames of event i follow those of event i - 1
+  address: np.ndarray  # (F,) uint32
+  src: np.ndarray  # (F,) uint8, the bus
+  length: np.ndarray  # (F,) uint16
+  data: np.ndarray  # (F, W) uint8, zero padded to the longest frame
+
+  def to_list(self):
+    dat = [row[:n].tobytes() for row, n in zip(self.data, self.length.tolist(), strict=True)]
+    return _frames_to_list(self.nanos, self.counts, self.address, dat, self.src)
+
+
+class _Layout:
+  """
+  Wire layout of Event and CanData, read from the schema so the bulk conversions follow schema changes.
+  See https://capnproto.org/encoding.html
+  """
+  def __init__(self):
+    event = log.Event.schema
+    self.event_data_words = event.node.struct.dataWordCount
+    self.event_ptr_words = event.node.struct.pointerCount
+    self.discriminant_byte = event.node.struct.discriminantOffset * 2
+    self.mono_time_word = event.fields['logMonoTime'].proto.slot.offset
+    valid = event.fields['valid'].proto.slot
+    self.valid_byte, self.valid_bit = divmod(valid.offset, 8)
+    self.valid_default = valid.defaultValue.bool
+    self.lists = {t: (event.fields[t].proto.discriminantValue, event.fields[t].proto.slot.offset) for t in ('can', 'sendcan')}
+
+    can = log.CanData.schema
+    self.can_data_words = can.node.struct.dataWordCount
+    self.can_ptr_words = can.node.struct.pointerCount
+    self.address_byte = can.fields['address'].proto.slot.offset * 4
+    self.src_byte = can.fields['src'].proto.slot.offset
+    self.dat_ptr = can.fields['dat'].proto.slot.offset
+
+
+_cached_layout = None
+
+
+def _get_layout():
+  global _cached_layout
+  if _cached_layout is None:
+    _cached_layout = _Layout()
+  return _cached_layout
+
+
+class _Unsupported(Exception):
+  pass
+
+
+def _pointer_offset(ptr):
+  # signed 30 bit word offset of a struct or list pointer
+  return (((ptr & 0xffffffff) ^ 0x80000000) - 0x80000000) >> 2
+
+
+def _resolve(words, pos, seg_starts):
+  # returns (position, pointer), following a far pointer to its landing pad
+  ptr = int(words[pos])
+  if ptr & 3 == 2:
+    if ptr & 4:
+      raise _Unsupported("double far pointer")
+    pos = seg_starts[ptr >> 32] + ((ptr >> 3) & 0x1fffffff)
+    ptr = int(words[pos])
+  return pos, ptr
+
+
+def _decode(strings, msgtype):
+  """
+  Decodes the frames of all events straight from the serialized messages. Per event only the few words leading
+  to the CanData list are read in Python, then the frames of all events are decoded together with numpy.
+  Returns nanos, counts, address, src and length like CanFrames, the word each frame's dat starts at, and the joined messages.
+  """
+  lay = _get_layout()
+  discriminant, list_ptr = lay.lists[msgtype]
+  buf = b"".join(strings)
+  if len(buf) % 8:
+    raise _Unsupported("messages are not word aligned")
+  words = np.frombuffer(buf, dtype='<u8')
+  u8 = np.frombuffer(buf, dtype=np.uint8)
+
+  nanos, counts, starts, strides, elem_data_words, seg_bases = [], [], [], [], [], []
+  all_seg_starts: list[int] = []
+  base = 0
+  for s in strings:
+    n_segs = int.from_bytes(buf[base * 8:base * 8 + 4], 'little') + 1
+    seg_starts = [base + (n_segs + 2) // 2]
+    for size in np.frombuffer(buf, dtype='<u4', count=n_segs - 1, offset=base * 8 + 4).tolist():
+      seg_starts.append(seg_starts[-1] + size)
+    seg_bases.append(len(all_seg_starts))
+    all_seg_starts += seg_starts
+    base += len(s) // 8
+
+    pos, root = _resolve(words, seg_starts[0], seg_starts)
+    data_words, ptr_words = (root >> 32) & 0xffff, root >> 48
+    if root & 3 != 0 or data_words < lay.event_data_words or ptr_words < lay.event_ptr_words:
+      raise _Unsupported("unexpected Event struct")
+    event = pos + 1 + _pointer_offset(root)
+    if int.from_bytes(buf[event * 8 + lay.discriminant_byte:event * 8 + lay.discriminant_byte + 2], 'little') != discriminant:
+      raise _Unsupported(f"not a {msgtype} event")
+    nanos.append(int(words[event + lay.mono_time_word]))
+
+    pos, ptr = _resolve(words, event + data_words + list_ptr, seg_starts)
+    if ptr == 0:
+      counts.append(0)
+      starts.append(0)
+      strides.append(0)
+      elem_data_words.append(0)
+      continue
+    if ptr & 3 != 1 or (ptr >> 32) & 7 != 7:
+      raise _Unsupported("CanData is not a struct list")
+    tag = pos + 1 + _pointer_offset(ptr)
+    tag_ptr = int(words[tag])
+    data_words, ptr_words = (tag_ptr >> 32) & 0xffff, tag_ptr >> 48
+    if data_words < lay.can_data_words or ptr_words < lay.can_ptr_words:
+      raise _Unsupported("unexpected CanData struct")
+    counts.append((tag_ptr & 0xffffffff) >> 2)
+    starts.append(tag + 1)
+    strides.append(data_words + ptr_words)
+    elem_data_words.append(data_words)
+
+  counts_arr = np.array(counts, dtype=np.int64)
+  n_frames = int(counts_arr.sum())
+  event_idx = np.repeat(np.arange(len(counts)), counts_arr)
+  first = np.repeat(np.cumsum(counts_arr) - counts_arr, counts_arr)
+  elems = np.array(starts, dtype=np.int64)[event_idx] + (np.arange(n_frames) - first) * np.array(strides, dtype=np.int64)[event_idx]
+
+  address = np.frombuffer(buf, dtype='<u4')[(elems * 8 + lay.address_byte) // 4]
+  src = u8[elems * 8 + lay.src_byte]
+
+  ptr_pos = elems + np.array(elem_data_words, dtype=np.int64)[event_idx] + lay.dat_ptr
+  ptrs = words[ptr_pos]
+  far = (ptrs & 3) == 2
+  if far.any():
+    if (ptrs[far] & 4).any():
+      raise _Unsupported("double far pointer")
+    seg = np.array(seg_bases, dtype=np.int64)[event_idx[far]] + (ptrs[far] >> 32).astype(np.int64)
+    ptr_pos[far] = np.array(all_seg_starts, dtype=np.int64)[seg] + ((ptrs[far] >> 3) & 0x1fffffff).astype(np.int64)
+    ptrs[far] = words[ptr_pos[far]]
+  # a byte list pointer, or null for an unset dat which has length 0 all the same
+  if not (((ptrs & 0x700000003) == 0x200000001) | (ptrs == 0)).all():
+    raise _Unsupported("dat is not a byte list")
+  length = (ptrs >> 35).astype(np.int64)
+  dat_words = ptr_pos + 1 + ((ptrs & 0xffffffff).astype(np.uint32).view(np.int32) >> 2)
+  return np.array(nanos, dtype=np.uint64), counts_arr, address, src, length, dat_words, buf
+
+
+def _gather_data(buf, dat_words, length):
+  # whole words from the start of each frame's dat, with the bytes past its length zeroed
+  width = int(length.max()) if len(length) else 0
+  words = np.frombuffer(buf, dtype='<u8')
+  idx = np.minimum(dat_words[:, None] + np.arange((width + 7) // 8), len(words) - 1)
+  data = words[idx].view(np.uint8)[:, :width]
+  return data * (np.arange(width) < length[:, None])
+
+
+def _frames_to_list(nanos, counts, address, dat, src):
+  frames = list(zip(address.tolist(), dat, src.tolist(), strict=True))
+  result = []
+  start = 0
+  for t, n in zip(nanos.tolist(), counts.tolist(), strict=True):
+    result.append((t, frames[start:start + n]))
+    start += n
+  return result
+
+
+def _encode(address, src, length, payload, msgtype, valid):
+  # single segment message: root pointer, Event, CanData list, then the dat of each frame
+  lay = _get_layout()
+  discriminant, list_ptr = lay.lists[msgtype]
+  n_frames = len(address)
+  stride = lay.can_data_words + lay.can_ptr_words
+  dat_words = (length + 7) // 8
+  tag = 1 + lay.event_data_words + lay.event_ptr_words
+  elems = tag + 1 + np.arange(n_frames, dtype=np.int64) * stride
+  dat_starts = tag + 1 + n_frames * stride + np.cumsum(dat_words) - dat_words
+  size = tag + 1 + n_frames * stride + int(dat_words.sum())
+
+  msg = np.zeros(1 + size, dtype='<u8')
+  msg[0] = size << 32
+  seg = msg[1:]
+  seg8 = seg.view(np.uint8)
+  seg[0] = (lay.event_data_words << 32) | (lay.event_ptr_words << 48)
+  seg[1 + lay.mono_time_word] = int(time.monotonic() * 1e9)
+  seg8[8 + lay.discriminant_byte:8 + lay.discriminant_byte + 2] = np.array([discriminant], dtype='<u2').view(np.uint8)
+  if valid != lay.valid_default:
+    seg8[8 + lay.valid_byte] |= 1 << lay.valid_bit
+  ptr = 1 + lay.event_data_words + list_ptr
+  seg[ptr] = ((tag - ptr - 1) << 2) | 1 | (7 << 32) | ((n_frames * stride) << 35)
+  seg[tag] = (n_frames << 2) | (lay.can_data_words << 32) | (lay.can_ptr_words << 48)
+
+  seg.view('<u4')[(elems * 8 + lay.address_byte) // 4] = address
+  seg8[elems * 8 + lay.src_byte] = src
+  ptrs = elems + lay.can_data_words + lay.dat_ptr
+  seg[ptrs] = (((dat_starts - ptrs - 1) << 2) | 1 | (2 << 32) | (length << 35)).astype(np.uint64)
+  seg8[np.repeat(dat_starts * 8 - (np.cumsum(length) - length), length) + np.arange(len(payload))] = payload
+  return msg.tobytes()
+
+
+def _check_frames(address, src):
+  address = np.asarray(address, dtype=np.int64)
+  src = np.asarray(src, dtype=np.int64)
+  if len(address) and (address.min() < 0 or address.max() > 0xffffffff or src.min() < 0 or src.max() > 0xff):
+    raise ValueError("CAN address or src out of range")
+  return address.astype(np.uint32), src.astype(np.uint8)
+
+
+def can_arrays_to_can_capnp(address, data, length, src, msgtype='can', valid=True):
+  """Convert arrays of CAN frames, as in CanFrames, to Cap'n Proto serialized bytes.
+
+  Args:
+    address: (F,) addresses
+    data: (F, W) frame data, only the first length bytes of each row are used
+    length: (F,) data lengths
+    src: (F,) buses
+    msgtype: 'can' or 'sendcan'
+    valid: Whether the event is valid
+
+  Returns:
+    Cap'n Proto serialized bytes
+  """
+  if len(address) < SMALL_BATCH_FRAMES:
+    dat = [row[:n].tobytes() for row, n in zip(np.asarray(data, dtype=np.uint8), np.asarray(length).tolist(), strict=True)]
+    return _can_list_to_can_capnp(list(zip(np.asarray(address).tolist(), dat, np.asarray(src).tolist(), strict=True)), msgtype, valid)
+  address, src = _check_frames(address, src)
+  length = np.asarray(length, dtype=np.int64)
+  data = np.asarray(data, dtype=np.uint8)
+  payload = data[np.arange(data.shape[1]) < length[:, None]]
+  return _encode(address, src, length, payload, msgtype, valid)
+
+
 def can_list_to_can_capnp(can_msgs, msgtype='can', valid=True):
   """Convert list of CAN messages to Cap'n Proto serialized bytes.
 
@@ -37,8 +279,75 @@ def can_list_to_can_capnp(can_msgs, msgtype='can', valid=True):
   Returns:
     Cap'n Proto serialized bytes
   """
+  if len(can_msgs) < SMALL_BATCH_FRAMES:
+    return _can_list_to_can_capnp(can_msgs, msgtype, valid)
+  address, dat, src = zip(*can_msgs, strict=True) if len(can_msgs) else ((), (), ())
+  address, src = _check_frames(address, src)
+  length = np.fromiter(map(len, dat), dtype=np.int64, count=len(dat))
+  payload = np.frombuffer(b"".join(dat), dtype=np.uint8)
+  return _encode(address, src, length, payload, msgtype, valid)
+
+
+def can_capnp_to_arrays(strings, msgtype='can'):
+  """Convert Cap'n Proto serialized bytes to arrays of CAN frames.
+
+  Args:
+    strings: Tuple/list of serialized Cap'n Proto bytes
+    msgtype: 'can' or 'sendcan'
+
+  Returns:
+    CanFrames with the frames of all events
+  """
+  if _is_small(strings):
+    return _frames_from_list(_can_capnp_to_list(strings, msgtype))
+  try:
+    nanos, counts, address, src, length, dat_words, buf = _decode(strings, msgtype)
+    return CanFrames(nanos, counts, address, src, length.astype(np.uint16), _gather_data(buf, dat_words, length))
+  except _Unsupported:
+    return _frames_from_list(_can_capnp_to_list(strings, msgtype))
+
+
+def can_capnp_to_list(strings, msgtype='can'):
+  """Convert Cap'n Proto serialized bytes to list of CAN messages.
+
+  Args:
+    strings: Tuple/list of serialized Cap'n Proto bytes
+    msgtype: 'can' or 'sendcan'
+
+  Returns:
+    List of tuples [(nanos, [(address, data, src), ...]), ...]
+  """
+  if _is_small(strings):
+    return _can_capnp_to_list(strings, msgtype)
+  try:
+    nanos, counts, address, src, length, dat_words, buf = _decode(strings, msgtype)
+  except _Unsupported:
+    return _can_capnp_to_list(strings, msgtype)
+  dat = [buf[o:o + n] for o, n in zip((dat_words * 8).tolist(), length.tolist(), strict=True)]
+  return _frames_to_list(nanos, counts, address, dat, src)
+
+
+def _frames_from_list(can_list):
+  frames = [f for _, fs in can_list for f in fs]
+  length = np.array([len(f[1]) for f in frames], dtype=np.uint16)
+  data = np.zeros((len(frames), int(length.max()) if len(frames) else 0), dtype=np.uint8)
+  for i, f in enumerate(frames):
+    data[i, :len(f[1])] = np.frombuffer(f[1], dtype=np.uint8)
+  return CanFrames(np.array([t for t, _ in can_list], dtype=np.uint64), np.array([len(fs) for _, fs in can_list], dtype=np.int64),
+                   np.array([f[0] for f in frames], dtype=np.uint32), np.array([f[2] for f in frames], dtype=np.uint8), length, data)
+
+
+def _is_small(strings):
+  return sum(map(len, strings)) < SMALL_BATCH_BYTES
+
+
+def _can_list_to_can_capnp(can_msgs, msgtype='can', valid=True):
+  # path through pycapnp, for small batches
   global _cached_writer_fields
 
+  if not all(0 <= m[0] <= 0xffffffff and 0 <= m[2] <= 0xff for m in can_msgs):
+    raise ValueError("CAN address or src out of range")
+
   dat = log.Event.new_message(valid=valid, logMonoTime=int(time.monotonic() * 1e9))
   can_data = dat.init(msgtype, len(can_msgs))
 
@@ -57,16 +366,8 @@ def can_list_to_can_capnp(can_msgs, msgtype='can', valid=True):
   return dat.to_bytes()
 
 
-def can_capnp_to_list(strings, msgtype='can'):
-  """Convert Cap'n Proto serialized bytes to list of CAN messages.
-
-  Args:
-    strings: Tuple/list of serialized Cap'n Proto bytes
-    msgtype: 'can' or 'sendcan'
-
-  Returns:
-    List of tuples [(nanos, [(address, data, src), ...]), ...]
-  """
+def _can_capnp_to_list(strings, msgtype='can'):
+  # path through pycapnp, for small batches and messages the bulk decoder doesn't handle
   global _cached_reader_fields
   result = []
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Time of converting CAN frames to and from Cap'n Proto at the sizes card sees, through pycapnp,
+the numpy bulk conversions, and the default which picks one of the two by batch size.
+
+  can_conversion_benchmark.py [-n iterations]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import openpilot.selfdrive.pandad.pandad_api_impl as impl
+from openpilot.selfdrive.pandad.tests.test_can_conversion import capnp_event
+
+
+def classic_frames(n):
+  return [(random.randrange(1 << 11), random.randbytes(8), random.randrange(3)) for _ in range(n)]
+
+
+def bulk(f):
+  def run(*args):
+    small = impl.SMALL_BATCH_FRAMES, impl.SMALL_BATCH_BYTES
+    impl.SMALL_BATCH_FRAMES = impl.SMALL_BATCH_BYTES = 0
+    try:
+      return f(*args)
+    finally:
+      impl.SMALL_BATCH_FRAMES, impl.SMALL_BATCH_BYTES = small
+  return run
+
+
+def benchmark(f, arg, n):
+  ts = np.empty(n)
+  for i in range(n):
+    st = time.perf_counter()
+    f(arg)
+    ts[i] = time.perf_counter() - st
+  return ts * 1e6
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time of CAN frame conversions, pycapnp against numpy")
+  parser.add_argument("-n", "--iterations", type=int, default=2000)
+  args = parser.parse_args()
+
+  random.seed(0)
+  cases = []
+  # card's sendcan, and larger batches to show where the bulk conversion takes over
+  for n in (5, 10, 50, 100, 500):
+    frames = classic_frames(n)
+    cases.append((f"encode {n} frames", frames, {
+      "pycapnp": lambda fs: impl._can_list_to_can_capnp(fs, 'sendcan'),
+      "numpy": bulk(lambda fs: impl.can_list_to_can_capnp(fs, 'sendcan')),
+      "default": lambda fs: impl.can_list_to_can_capnp(fs, 'sendcan'),
+    }))
+  # card reads the can events since its last cycle, a few frames of a single bus up to a batch of every bus
+  for events, n in ((1, 10), (1, 50), (1, 100), (3, 150)):
+    strings = [capnp_event(classic_frames(n)) for _ in range(events)]
+    cases.append((f"decode {events}x{n} frames", strings, {
+      "pycapnp": impl._can_capnp_to_list,
+      "numpy": bulk(impl.can_capnp_to_list),
+      "default": impl.can_capnp_to_list,
+    }))
+
+  for name, arg, fs in cases:
+    results = []
+    for f_name, f in fs.items():
+      benchmark(f, arg, 100)  # warm up
+      ts = benchmark(f, arg, args.iterations)
+      results.append(f"{f_name} {np.mean(ts):6.1f} us")
+    print(f"{name:>20}: " + ", ".join(results))
@@ -0,0 +1,89 @@
+import random
+import time
+
+import numpy as np
+import pytest
+
+from openpilot.cereal import log
+import openpilot.selfdrive.pandad.pandad_api_impl as pandad_api_impl
+from openpilot.selfdrive.pandad.pandad_api_impl import (NO_TRAVERSAL_LIMIT, _can_capnp_to_list, can_arrays_to_can_capnp, can_capnp_to_arrays,
+                                                        can_capnp_to_list, can_list_to_can_capnp)
+
+
+def random_frames(n):
+  # classic and CAN FD lengths, including empty frames
+  return [(random.randrange(1 << 29), random.randbytes(random.choice([0, 1, 5, 8, 12, 32, 64])), random.randrange(3)) for _ in range(n)]
+
+
+def capnp_event(frames, msgtype='can', valid=True):
+  # serialized by pycapnp, large lists end up over multiple segments with far pointers
+  dat = log.Event.new_message(valid=valid, logMonoTime=random.randrange(1 << 63))
+  can = dat.init(msgtype, len(frames))
+  for i, (address, d, src) in enumerate(frames):
+    can[i].address = address
+    can[i].dat = d
+    can[i].src = src
+  return dat.to_bytes()
+
+
+def read_event(dat, msgtype):
+  with log.Event.from_bytes(dat, traversal_limit_in_words=NO_TRAVERSAL_LIMIT) as event:
+    return event.valid, event.logMonoTime, [(f.address, f.dat, f.src) for f in getattr(event, msgtype)]
+
+
+@pytest.fixture(params=["default", "bulk"])
+def batch_path(request, monkeypatch):
+  # the bulk conversions also handle the small batches that go through pycapnp by default
+  if request.param == "bulk":
+    monkeypatch.setattr(pandad_api_impl, "SMALL_BATCH_FRAMES", 0)
+    monkeypatch.setattr(pandad_api_impl, "SMALL_BATCH_BYTES", 0)
+  return request.param
+
+
+@pytest.mark.usefixtures("batch_path")
+class TestCanConversion:
+  def setup_method(self):
+    random.seed(0)
+
+  @pytest.mark.parametrize("msgtype", ["can", "sendcan"])
+  def test_decode(self, msgtype):
+    strings = [capnp_event(random_frames(n), msgtype) for n in (0, 1, 50, 3, 2000, 0, 120)]
+    assert int.from_bytes(strings[4][:4], 'little') > 0  # segment count - 1
+
+    expected = _can_capnp_to_list(strings, msgtype)
+    assert can_capnp_to_list(strings, msgtype) == expected
+
+    frames = can_capnp_to_arrays(strings, msgtype)
+    assert frames.to_list() == expected
+    assert frames.nanos.tolist() == [t for t, _ in expected]
+    assert frames.counts.tolist() == [len(fs) for _, fs in expected]
+    assert frames.data.shape == (sum(frames.counts), 64)
+    assert frames.address.dtype == np.uint32 and frames.src.dtype == np.uint8 and frames.data.dtype == np.uint8
+
+    assert can_capnp_to_list([], msgtype) == []
+    assert len(can_capnp_to_arrays([], msgtype).address) == 0
+
+  def test_wrong_msgtype(self):
+    strings = [capnp_event(random_frames(5), 'can')]
+    with pytest.raises(Exception, match="sendcan"):
+      can_capnp_to_list(strings, 'sendcan')
+
+  @pytest.mark.parametrize("valid", [True, False])
+  def test_encode(self, valid):
+    for n in (0, 1, 17, 2000):
+      frames = random_frames(n)
+      start = int(time.monotonic() * 1e9)
+      event_valid, nanos, decoded = read_event(can_list_to_can_capnp(frames, msgtype='sendcan', valid=valid), 'sendcan')
+      assert event_valid == valid and nanos >= start
+      assert decoded == frames
+
+      arrays = can_capnp_to_arrays([capnp_event(frames)])
+      dat = can_arrays_to_can_capnp(arrays.address, arrays.data, arrays.length, arrays.src, msgtype='sendcan', valid=valid)
+      assert read_event(dat, 'sendcan')[2] == frames
+      assert can_capnp_to_list([dat], 'sendcan')[0][1] == frames
+
+    with pytest.raises(ValueError):
+      can_list_to_can_capnp([(1 << 32, b"", 0)])
+    with pytest.raises(ValueError):
+      can_list_to_can_capnp([(0x100, b"", 256)])
+
@@ -47,16 +47,50 @@ class ET:
 
 # get event name from enum
 EVENT_NAME = {v: k for k, v in EventName.schema.enumerants.items()}
+NUM_EVENTS = max(EVENT_NAME) + 1
+
+ET_BITS = {et: 1 << i for i, et in enumerate(v for k, v in vars(ET).items() if not k.startswith('_'))}
+
+
+class EventTable:
+  """ Per-event lookup built once from its EVENTS entry: a bitmask of its event types and the alert for each type """
+  def __init__(self, event_name: int, alerts: dict):
+    self.alerts = alerts
+    self.mask = 0
+    self.types: dict[str, tuple[Alert | Callable, str]] = {}
+    for et, alert in alerts.items():
+      self.mask |= ET_BITS[et]
+      self.types[et] = (alert, f"{EVENT_NAME.get(event_name, event_name)}/{et}")
+
+
+EVENT_TABLES: list[EventTable | None] = [None] * NUM_EVENTS
+EMPTY_ALERTS: dict = {}
+
+
+def get_event_table(event_name: int) -> EventTable:
+  alerts = EVENTS.get(event_name, EMPTY_ALERTS)
+  table = EVENT_TABLES[event_name]
+  # rebuilt if the EVENTS entry was replaced since the table was made
+  if table is None or table.alerts is not alerts:
+    table = EVENT_TABLES[event_name] = EventTable(event_name, alerts)
+  return table
 
 
 class Events:
   def __init__(self):
     self.events: list[int] = []
     self.static_events: list[int] = []
-    self.event_counters = dict.fromkeys(EVENTS.keys(), 0)
+    # number of consecutive cycles each event has been active for, indexed by event enum
+    self.event_counters = [0] * NUM_EVENTS
+    self._counted: set[int] = set()
+    self._sorted = True
+    self._mask: int | None = None
 
   @property
   def names(self) -> list[int]:
+    if not self._sorted:
+      self.events.sort()
+      self._sorted = True
     return self.events
 
   def __len__(self) -> int:
@@ -65,44 +99,61 @@ class Events:
   def add(self, event_name: int, static: bool=False) -> None:
     if static:
       bisect.insort(self.static_events, event_name)
-    bisect.insort(self.events, event_name)
+    self.events.append(event_name)
+    self._sorted = False
+    self._mask = None
 
   def clear(self) -> None:
-    self.event_counters = {k: (v + 1 if k in self.events else 0) for k, v in self.event_counters.items()}
+    # only touch the counters of events that started, stayed or stopped being active
+    active = set(self.events)
+    for e in self._counted - active:
+      self.event_counters[e] = 0
+    for e in active:
+      self.event_counters[e] += 1
+    self._counted = active
+
     self.events = self.static_events.copy()
+    self._sorted = True
+    self._mask = None
 
   def contains(self, event_type: str) -> bool:
-    return any(event_type in EVENTS.get(e, {}) for e in self.events)
+    if self._mask is None:
+      self._mask = 0
+      for e in self.events:
+        self._mask |= get_event_table(e).mask
+    return bool(self._mask & ET_BITS[event_type])
 
   def create_alerts(self, event_types: list[str], callback_args=None):
     if callback_args is None:
       callback_args = []
 
     ret = []
-    for e in self.events:
-      types = EVENTS[e].keys()
+    for e in self.names:
+      types = get_event_table(e).types
       for et in event_types:
         if et in types:
-          alert = EVENTS[e][et]
+          alert, alert_type = types[et]
           if not isinstance(alert, Alert):
             alert = alert(*callback_args)
 
           if DT_CTRL * (self.event_counters[e] + 1) >= alert.creation_delay:
-            alert.alert_type = f"{EVENT_NAME[e]}/{et}"
+            alert.alert_type = alert_type
             alert.event_type = et
             ret.append(alert)
     return ret
 
   def add_from_msg(self, events):
     for e in events:
-      bisect.insort(self.events, e.name.raw)
+      self.events.append(e.name.raw)
+    self._sorted = False
+    self._mask = None
 
   def to_msg(self):
     ret = []
-    for event_name in self.events:
+    for event_name in self.names:
       event = log.OnroadEvent.new_message()
       event.name = event_name
-      for event_type in EVENTS.get(event_name, {}):
+      for event_type in get_event_table(event_name).types:
         setattr(event, event_type, True)
       ret.append(event)
     return ret
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Time of one selfdrived cycle of events: clearing, adding a few events, checking every event
+type and creating the alerts, with Events against the reference implementation it replaced.
+
+  events_benchmark.py [-n cycles]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from openpilot.selfdrive.selfdrived.events import Events, ET
+from openpilot.selfdrive.selfdrived.tests.test_events import STATIC_EVENTS, ReferenceEvents, run_cycle
+
+
+def benchmark(events, cycles, event_types):
+  ts = np.empty(len(cycles))
+  for i, cycle_events in enumerate(cycles):
+    st = time.perf_counter()
+    run_cycle(events, cycle_events, event_types)
+    ts[i] = time.perf_counter() - st
+  return ts * 1e6
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time of a cycle of events, Events against the reference")
+  parser.add_argument("-n", "--cycles", type=int, default=5000)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  cycles = [rng.sample(STATIC_EVENTS, 6) for _ in range(args.cycles)]
+  event_types = [ET.PERMANENT, ET.WARNING]
+
+  for name, events in (("reference", ReferenceEvents()), ("Events", Events())):
+    ts = benchmark(events, cycles, event_types)
+    print(f"{name:>10}: mean {np.mean(ts):5.1f} us, p99 {np.percentile(ts, 99):5.1f} us per cycle")
@@ -0,0 +1,75 @@
+import bisect
+import random
+
+from openpilot.common.realtime import DT_CTRL
+from openpilot.selfdrive.selfdrived.events import Alert, Events, EVENTS, EVENT_NAME, ET
+
+ALL_ETS = [v for k, v in vars(ET).items() if not k.startswith('_')]
+# events with only static alerts, callback alerts need a full set of callback args
+STATIC_EVENTS = [e for e, alerts in EVENTS.items() if all(isinstance(a, Alert) for a in alerts.values())]
+
+
+class ReferenceEvents:
+  # the dict and insort based implementation Events replaced
+  def __init__(self):
+    self.events: list[int] = []
+    self.static_events: list[int] = []
+    self.event_counters = dict.fromkeys(EVENTS.keys(), 0)
+
+  def add(self, event_name, static=False):
+    if static:
+      bisect.insort(self.static_events, event_name)
+    bisect.insort(self.events, event_name)
+
+  def clear(self):
+    self.event_counters = {k: (v + 1 if k in self.events else 0) for k, v in self.event_counters.items()}
+    self.events = self.static_events.copy()
+
+  def contains(self, event_type):
+    return any(event_type in EVENTS.get(e, {}) for e in self.events)
+
+  def create_alerts(self, event_types):
+    ret = []
+    for e in self.events:
+      types = EVENTS[e].keys()
+      for et in event_types:
+        if et in types:
+          alert = EVENTS[e][et]
+          if DT_CTRL * (self.event_counters[e] + 1) >= alert.creation_delay:
+            ret.append((alert, f"{EVENT_NAME[e]}/{et}", et))
+    return ret
+
+
+def run_cycle(events, cycle_events, event_types):
+  events.clear()
+  for e in cycle_events:
+    events.add(e)
+  contains = [events.contains(et) for et in ALL_ETS]
+  return contains, events.create_alerts(event_types)
+
+
+class TestEvents:
+  def test_matches_reference(self):
+    rng = random.Random(0)
+    events, ref = Events(), ReferenceEvents()
+    static = rng.choice(STATIC_EVENTS)
+    events.add(static, static=True)
+    ref.add(static, static=True)
+
+    active = set(rng.sample(STATIC_EVENTS, 3))
+    for _ in range(2000):
+      # events stay active for a while, with a few starting and stopping each cycle
+      if rng.random() < 0.2:
+        active ^= {rng.choice(STATIC_EVENTS)}
+      cycle_events = list(active) + ([rng.choice(STATIC_EVENTS)] if rng.random() < 0.1 else [])
+      rng.shuffle(cycle_events)
+      event_types = rng.sample(ALL_ETS, 3)
+
+      contains, alerts = run_cycle(events, cycle_events, event_types)
+      ref_contains, ref_alerts = run_cycle(ref, cycle_events, event_types)
+      assert contains == ref_contains
+      assert events.names == ref.events
+      assert [(a, a.alert_type, a.event_type) for a in alerts] == ref_alerts
+      for e in EVENTS:
+        assert events.event_counters[e] == ref.event_counters[e]
+
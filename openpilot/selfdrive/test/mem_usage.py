@@ -1,12 +1,11 @@
 import os
-from collections import defaultdict
 
 import numpy as np
 
 from openpilot.common.utils import tabulate
+from openpilot.tools.lib.proc_stats import ProcStats
 
 DEMO_ROUTE = "5beb9b58bd12b691/0000010a--a51155e496"
-MB = 1024 * 1024
 TABULATE_OPTS = {"tablefmt": "simple_grid", "stralign": "center", "numalign": "center"}
 
 
@@ -22,34 +21,22 @@ def is_openpilot_proc(name):
   return 'openpilot' in name or name.startswith(('selfdrive.', 'system.'))
 
 
-def get_proc_name(proc):
-  if len(proc.cmdline) > 0:
-    return list(proc.cmdline)[0]
-  return proc.name
-
-
 def pct(val_mb, total_mb):
   return val_mb / total_mb * 100 if total_mb else 0
 
 
-def has_pss(proc_logs):
+def has_pss(stats: ProcStats):
   """Check if logs contain PSS data (new field, not in old logs)."""
-  try:
-    for proc in proc_logs[-1].procLog.procs:
-      if proc.memPss > 0:
-        return True
-  except AttributeError:
-    pass
-  return False
-
-
-def print_summary(proc_logs, device_states):
-  mem = proc_logs[-1].procLog.mem
-  total = mem.total / MB
-  used = (mem.total - mem.available) / MB
-  cached = mem.cached / MB
-  shared = mem.shared / MB
-  buffers = mem.buffers / MB
+  return len(stats) > 0 and bool(stats.pss[-1].any())
+
+
+def print_summary(stats: ProcStats):
+  mem = {k: v[-1] for k, v in stats.mem.items()}
+  total = mem['total']
+  used = mem['total'] - mem['available']
+  cached = mem['cached']
+  shared = mem['shared']
+  buffers = mem['buffers']
 
   lines = [
     f"  Total: {total:.0f} MB",
@@ -58,8 +45,8 @@ def print_summary(proc_logs, device_states):
     f"  Shared/MSGQ: {shared:.0f} MB ({pct(shared, total):.0f}%)",
   ]
 
-  if device_states:
-    mem_pcts = [m.deviceState.memoryUsagePercent for m in device_states]
+  mem_pcts = stats.memory_usage_percent
+  if len(mem_pcts):
     lines.append(f"  deviceState memory: {np.min(mem_pcts)}-{np.max(mem_pcts)}% (avg {np.mean(mem_pcts):.0f}%)")
 
   print("\n-- Memory Summary --")
@@ -67,77 +54,50 @@ def print_summary(proc_logs, device_states):
   return total
 
 
-def collect_per_process_mem(proc_logs, use_pss):
-  """Collect per-process memory samples. Returns {name: {metric: [values_per_sample_in_MB]}}."""
-  by_proc = defaultdict(lambda: defaultdict(list))
-
-  for msg in proc_logs:
-    sample = defaultdict(lambda: defaultdict(float))
-    for proc in msg.procLog.procs:
-      name = get_proc_name(proc)
-      sample[name]['rss'] += proc.memRss / MB
-      if use_pss:
-        sample[name]['pss'] += proc.memPss / MB
-        sample[name]['pss_anon'] += proc.memPssAnon / MB
-        sample[name]['pss_shmem'] += proc.memPssShmem / MB
-
-    for name, metrics in sample.items():
-      for metric, val in metrics.items():
-        by_proc[name][metric].append(val)
-
-  return by_proc
-
-
-def _has_pss_detail(by_proc) -> bool:
+def _has_pss_detail(stats: ProcStats) -> bool:
   """Check if any process has non-zero pss_anon/pss_shmem (unavailable on some kernels)."""
-  return any(sum(v.get('pss_anon', [])) > 0 or sum(v.get('pss_shmem', [])) > 0 for v in by_proc.values())
+  return bool(stats.pss_anon.any() or stats.pss_shmem.any())
 
 
-def process_table_rows(by_proc, total_mb, use_pss, show_detail):
-  """Build table rows. Returns (rows, total_row)."""
+def process_table_rows(stats: ProcStats, cols, total_mb, use_pss, show_detail):
+  """Build table rows for the processes in cols. Returns (rows, total_row)."""
   mem_key = 'pss' if use_pss else 'rss'
+  means, maxes = stats.mean(mem_key), stats.max(mem_key)
   rows = []
-  for name in sorted(by_proc, key=lambda n: np.mean(by_proc[n][mem_key]), reverse=True):
-    m = by_proc[name]
-    vals = m[mem_key]
-    avg = round(np.mean(vals))
-    row = [name, f"{avg} MB", f"{round(np.max(vals))} MB", f"{round(pct(avg, total_mb), 1)}%"]
+  for i in sorted(cols, key=lambda i: means[i], reverse=True):
+    avg = round(means[i])
+    row = [stats.names[i], f"{avg} MB", f"{round(maxes[i])} MB", f"{round(pct(avg, total_mb), 1)}%"]
     if show_detail:
-      row.append(f"{round(np.mean(m['pss_anon']))} MB")
-      row.append(f"{round(np.mean(m['pss_shmem']))} MB")
+      row.append(f"{round(stats.mean('pss_anon')[i])} MB")
+      row.append(f"{round(stats.mean('pss_shmem')[i])} MB")
     rows.append(row)
 
   # Total row
   total_row = None
-  if by_proc:
-    max_samples = max(len(v[mem_key]) for v in by_proc.values())
-    totals = []
-    for i in range(max_samples):
-      s = sum(v[mem_key][i] for v in by_proc.values() if i < len(v[mem_key]))
-      totals.append(s)
+  if len(cols):
+    totals = getattr(stats, mem_key)[:, cols].sum(axis=1)
     avg_total = round(np.mean(totals))
     total_row = ["TOTAL", f"{avg_total} MB", f"{round(np.max(totals))} MB", f"{round(pct(avg_total, total_mb), 1)}%"]
     if show_detail:
-      total_row.append(f"{round(sum(np.mean(v['pss_anon']) for v in by_proc.values()))} MB")
-      total_row.append(f"{round(sum(np.mean(v['pss_shmem']) for v in by_proc.values()))} MB")
+      total_row.append(f"{round(stats.mean('pss_anon')[cols].sum())} MB")
+      total_row.append(f"{round(stats.mean('pss_shmem')[cols].sum())} MB")
 
   return rows, total_row
 
 
-def print_process_tables(op_procs, other_procs, total_mb, use_pss):
-  all_procs = {**op_procs, **other_procs}
-  show_detail = use_pss and _has_pss_detail(all_procs)
+def print_process_tables(stats: ProcStats, op_cols, other_cols, total_mb, use_pss):
+  show_detail = use_pss and _has_pss_detail(stats)
 
   header = ["process", "avg", "max", "%"]
   if show_detail:
     header += ["anon", "shmem"]
 
-  op_rows, op_total = process_table_rows(op_procs, total_mb, use_pss, show_detail)
+  op_rows, op_total = process_table_rows(stats, op_cols, total_mb, use_pss, show_detail)
   # filter other: >5MB avg and not bare interpreter paths (test infra noise)
-  other_filtered = {n: v for n, v in other_procs.items()
-                    if np.mean(v['pss' if use_pss else 'rss']) > 5.0
-                    and os.path.basename(n.split()[0]) not in ('python', 'python3')}
-  other_rows, other_total = process_table_rows(other_filtered, total_mb, use_pss, show_detail)
+  means = stats.mean('pss' if use_pss else 'rss')
+  other_filtered = [i for i in other_cols
+                    if means[i] > 5.0 and os.path.basename(stats.names[i].split()[0]) not in ('python', 'python3')]
+  other_rows, other_total = process_table_rows(stats, other_filtered, total_mb, use_pss, show_detail)
 
   rows = op_rows
   if op_total:
@@ -155,16 +115,16 @@ def print_process_tables(op_procs, other_procs, total_mb, use_pss):
   print(tabulate(rows, header, **TABULATE_OPTS))
 
 
-def print_memory_accounting(proc_logs, op_procs, other_procs, total_mb, use_pss):
-  last = proc_logs[-1].procLog.mem
-  used = (last.total - last.available) / MB
-  shared = last.shared / MB
-  cached_buf = (last.buffers + last.cached) / MB - shared  # shared (MSGQ) is in Cached; separate it
+def print_memory_accounting(stats: ProcStats, op_cols, other_cols, total_mb, use_pss):
+  last = {k: v[-1] for k, v in stats.mem.items()}
+  used = last['total'] - last['available']
+  shared = last['shared']
+  cached_buf = last['buffers'] + last['cached'] - shared  # shared (MSGQ) is in Cached; separate it
   msgq = shared
 
   mem_key = 'pss' if use_pss else 'rss'
-  op_total = sum(v[mem_key][-1] for v in op_procs.values()) if op_procs else 0
-  other_total = sum(v[mem_key][-1] for v in other_procs.values()) if other_procs else 0
+  op_total = getattr(stats, mem_key)[-1, op_cols].sum()
+  other_total = getattr(stats, mem_key)[-1, other_cols].sum()
   proc_sum = op_total + other_total
   remainder = used - (cached_buf + msgq) - proc_sum
 
@@ -187,23 +147,54 @@ def print_memory_accounting(proc_logs, op_procs, other_procs, total_mb, use_pss)
   print(tabulate(rows, header, tablefmt="simple_grid", stralign="right"))
 
 
-def print_report(proc_logs, device_states=None):
+def split_procs(stats: ProcStats):
+  """Column indices of the openpilot and the other processes."""
+  is_op = np.array([is_openpilot_proc(n) for n in stats.names], dtype=bool)
+  return np.flatnonzero(is_op), np.flatnonzero(~is_op)
+
+
+def print_report(stats: ProcStats):
   """Print full memory analysis report. Can be called from tests or CLI."""
-  if not proc_logs:
+  if not len(stats):
     print("No procLog messages found")
     return
 
-  print(f"{len(proc_logs)} procLog samples, {len(device_states or [])} deviceState samples")
+  print(f"{len(stats)} procLog samples, {len(stats.device_t)} deviceState samples")
 
-  use_pss = has_pss(proc_logs)
+  use_pss = has_pss(stats)
   if not use_pss:
     print("  (no PSS data — re-record with updated proclogd for accurate numbers)")
 
-  total_mb = print_summary(proc_logs, device_states or [])
+  total_mb = print_summary(stats)
+
+  op_cols, other_cols = split_procs(stats)
+  print_process_tables(stats, op_cols, other_cols, total_mb, use_pss)
+  print_memory_accounting(stats, op_cols, other_cols, total_mb, use_pss)
+
+
+def print_comparison(stats_by_route: dict[str, ProcStats]):
+  """Print average memory and CPU usage of the openpilot processes side by side for several routes."""
+  use_pss = all(has_pss(s) for s in stats_by_route.values())
+  mem_key = 'pss' if use_pss else 'rss'
+
+  per_route = []
+  for stats in stats_by_route.values():
+    op_cols, _ = split_procs(stats)
+    means, usage = stats.mean(mem_key), stats.cpu_usage()
+    per_route.append({stats.names[i]: (means[i], usage[i]) for i in op_cols})
 
-  by_proc = collect_per_process_mem(proc_logs, use_pss)
-  op_procs = {n: v for n, v in by_proc.items() if is_openpilot_proc(n)}
-  other_procs = {n: v for n, v in by_proc.items() if not is_openpilot_proc(n)}
+  names = sorted({n for r in per_route for n in r}, key=lambda n: -max(r.get(n, (0, 0))[0] for r in per_route))
+  rows = []
+  for name in names:
+    row = [name]
+    for r in per_route:
+      mem, cpu = r.get(name, (np.nan, np.nan))
+      row += ["-" if np.isnan(mem) else f"{round(mem)} MB", "-" if np.isnan(cpu) else f"{cpu:.1f}%"]
+    rows.append(row)
+  rows.append(["TOTAL"] + [v for r in per_route for v in (f"{round(sum(m for m, _ in r.values()))} MB",
+                                                          f"{np.nansum([c for _, c in r.values()]):.1f}%")])
+
+  header = ["process"] + [f"{h} ({route})" for route in stats_by_route for h in (mem_key.upper(), "CPU")]
+  print(f"\n-- openpilot processes: average {mem_key.upper()} and CPU --")
+  print(tabulate(rows, header, **TABULATE_OPTS))
 
-  print_process_tables(op_procs, other_procs, total_mb, use_pss)
-  print_memory_accounting(proc_logs, op_procs, other_procs, total_mb, use_pss)
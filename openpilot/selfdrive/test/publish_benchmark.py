@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Time of building and serializing the carControl and controlsState messages of one
+controlsd cycle, with a new message every cycle against a reused MessageBuilder.
+
+  publish_benchmark.py [-n cycles]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import openpilot.cereal.messaging as messaging
+from openpilot.cereal import log
+from opendbc.car.structs import car
+
+
+def fill_cc(CC, i, builder=None):
+  CC.enabled = CC.latActive = CC.longActive = True
+  CC.leftBlinker = CC.rightBlinker = False
+  CC.currentCurvature = 0.001 * (i % 10)
+  actuators = CC.actuators
+  actuators.accel = 0.1 * (i % 10)
+  actuators.torque = 0.01 * (i % 100)
+  actuators.curvature = actuators.steeringAngleDeg = 0.
+  orientation, angular_velocity = [0.01, 0.02, 1.5], [0., 0., 0.01 * (i % 10)]
+  cruise = {'override': False, 'cancel': False, 'resume': False}
+  hud = {'setSpeed': 25., 'speedVisible': True, 'lanesVisible': True, 'leadVisible': i % 50 == 0, 'leadDistanceBars': 3,
+         'rightLaneVisible': True, 'leftLaneVisible': True, 'leftLaneDepart': False, 'rightLaneDepart': False}
+  if builder is None:
+    CC.orientationNED, CC.angularVelocity = orientation, angular_velocity
+    for k, v in cruise.items():
+      setattr(CC.cruiseControl, k, v)
+    for k, v in hud.items():
+      setattr(CC.hudControl, k, v)
+  else:
+    builder.set_list(CC, 'orientationNED', orientation)
+    builder.set_list(CC, 'angularVelocity', angular_velocity)
+    builder.update('cruiseControl', CC.cruiseControl, **cruise)
+    builder.update('hudControl', CC.hudControl, **hud)
+
+
+def fill_cs(cs, i):
+  cs.curvature = cs.desiredCurvature = 0.001 * (i % 10)
+  cs.longitudinalPlanMonoTime = cs.lateralPlanMonoTime = i * 10**7
+  cs.upAccelCmd = cs.uiAccelCmd = cs.ufAccelCmd = 0.1
+  cs.forceDecel = False
+
+
+def fill_lac(lac_log, i):
+  lac_log.active = True
+  lac_log.error = lac_log.errorRate = lac_log.p = lac_log.i = lac_log.d = lac_log.f = 0.01 * (i % 10)
+  lac_log.output = lac_log.actualLateralAccel = lac_log.desiredLateralAccel = lac_log.desiredLateralJerk = 0.1
+  lac_log.saturated = False
+
+
+def new_messages(i):
+  # as controlsd did: CarControl and the lateral log are built apart and copied into new events
+  CC = car.CarControl.new_message()
+  fill_cc(CC, i)
+  lac_log = log.ControlsState.LateralTorqueState.new_message()
+  fill_lac(lac_log, i)
+
+  dat = messaging.new_message('controlsState', valid=True)
+  fill_cs(dat.controlsState, i)
+  dat.controlsState.lateralControlState.torqueState = lac_log
+
+  cc_send = messaging.new_message('carControl', valid=True)
+  cc_send.carControl = CC
+  return dat.to_bytes(), cc_send.to_bytes()
+
+
+class Builders:
+  def __init__(self):
+    self.cc_msg = messaging.MessageBuilder('carControl')
+    self.cs_msg = messaging.MessageBuilder('controlsState')
+    self.lac_log = self.cs_msg.data.lateralControlState.init('torqueState')
+
+  def __call__(self, i):
+    fill_cc(self.cc_msg.data, i, self.cc_msg)
+    fill_cs(self.cs_msg.data, i)
+    fill_lac(self.lac_log, i)
+    return self.cs_msg.to_bytes(True), self.cc_msg.to_bytes(True)
+
+
+def benchmark(publish, n):
+  ts = np.empty(n)
+  for i in range(n):
+    st = time.perf_counter()
+    dats = publish(i)
+    ts[i] = time.perf_counter() - st
+  return ts * 1e6, [len(d) for d in dats]
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time of building controlsd's messages, new against reused")
+  parser.add_argument("-n", "--cycles", type=int, default=10000)
+  args = parser.parse_args()
+
+  for name, publish in (("new_message", new_messages), ("MessageBuilder", Builders())):
+    benchmark(publish, 100)  # warm up
+    ts, sizes = benchmark(publish, args.cycles)
+    print(f"{name:>14}: mean {np.mean(ts):5.1f} us, p99 {np.percentile(ts, 99):5.1f} us per cycle, " +
+          f"controlsState {sizes[0]} B, carControl {sizes[1]} B")
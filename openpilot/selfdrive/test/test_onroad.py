@@ -24,6 +24,7 @@ from openpilot.selfdrive.test.helpers import set_params_enabled, release_only
 from openpilot.common.hardware.hw import Paths
 from openpilot.tools.lib.logreader import LogReader
 from openpilot.tools.lib.log_time_series import msgs_to_time_series
+from openpilot.tools.lib.proc_stats import ProcStats
 
 """
 CPU usage budget
@@ -100,10 +101,6 @@ LOGS_SIZE = {  # MB per segment
 LOGS_SIZE.update(dict.fromkeys(['ecamera.hevc', 'fcamera.hevc', 'dcamera.hevc'], 76.5))
 
 
-def cputime_total(ct):
-  return ct.cpuUser + ct.cpuSystem + ct.cpuChildrenUser + ct.cpuChildrenSystem
-
-
 class TestOnroad(OpenpilotTestCase):
   COMMA_HARDWARE_TEST = True
 
@@ -170,6 +167,7 @@ class TestOnroad(OpenpilotTestCase):
     cls.msgs = defaultdict(list)
     for m in cls.lr:
       cls.msgs[m.which()].append(m)
+    cls.proc_stats = ProcStats.from_msgs(cls.msgs['procLog'] + cls.msgs['deviceState'])
 
   def test_service_frequencies(self, subtests):
     for s, msgs in self.msgs.items():
@@ -236,32 +234,23 @@ class TestOnroad(OpenpilotTestCase):
     print("------------------ CPU Usage -------------------")
     print("------------------------------------------------")
 
-    plogs_by_proc = defaultdict(list)
-    for pl in self.msgs['procLog']:
-      for x in pl.procLog.procs:
-        if len(x.cmdline) > 0:
-          n = list(x.cmdline)[0]
-          plogs_by_proc[n].append(x)
+    cpu_usage = dict(zip(self.proc_stats.names, self.proc_stats.cpu_usage(), strict=True))
 
     cpu_ok = True
-    dt = (self.msgs['procLog'][-1].logMonoTime - self.msgs['procLog'][0].logMonoTime) / 1e9
     header = ['process', 'usage', 'expected', 'max allowed', 'test result']
     rows = []
     for proc_name, expected in PROCS.items():
 
       error = ""
-      usage = 0.
-      x = plogs_by_proc[proc_name]
-      if len(x) > 2:
-        cpu_time = cputime_total(x[-1]) - cputime_total(x[0])
-        usage = cpu_time / dt * 100.
-
-        max_allowed = max(expected * 1.8, expected + 5.0)
+      usage = cpu_usage.get(proc_name, math.nan)
+      max_allowed = max(expected * 1.8, expected + 5.0)
+      if not math.isnan(usage):
         if usage > max_allowed:
           error = "❌ USING MORE CPU THAN EXPECTED ❌"
           cpu_ok = False
 
       else:
+        usage = 0.
         error = "❌ NO METRICS FOUND ❌"
         cpu_ok = False
 
@@ -290,10 +279,10 @@ class TestOnroad(OpenpilotTestCase):
     print("------------------------------------------------")
 
     from openpilot.selfdrive.test.mem_usage import print_report
-    print_report(self.msgs['procLog'], self.msgs['deviceState'])
+    print_report(self.proc_stats)
 
     offset = int(SERVICE_LIST['deviceState'].frequency * LOG_OFFSET)
-    mems = [m.deviceState.memoryUsagePercent for m in self.msgs['deviceState'][offset:]]
+    mems = self.proc_stats.memory_usage_percent[offset:]
     print("MSGQ (/dev/shm/) usage: ", subprocess.check_output(["du", "-hs", "/dev/shm"]).split()[0].decode())
 
     # check for big leaks. note that memory usage is
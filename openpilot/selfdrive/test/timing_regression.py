@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Offline timing regression check of the onroad processes: store the loop timings of
+some routes as a baseline, then compare the timings of new routes against it.
+
+  timing_regression.py baseline <routes or logs> -o baseline.npz
+  timing_regression.py compare baseline.npz <routes or logs>
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from openpilot.common.utils import tabulate
+from openpilot.selfdrive.test.mem_usage import TABULATE_OPTS, is_openpilot_proc
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.lib.timing_stats import Comparison, TimingStats, compare
+
+SKIP = 8.  # s at the start of each route, while the processes start up
+STATUS_ORDER = ('regressed', 'improved', 'added', 'removed', 'ok')
+
+
+def _get_timings():
+  from openpilot.selfdrive.test.test_onroad import TIMINGS
+  return TIMINGS
+
+
+def route_stats(routes: list[str], skip: float = SKIP, num_processes: int = 8) -> TimingStats:
+  services = tuple(_get_timings())
+  return TimingStats.merge([TimingStats.from_logreader(LogReader(r), services, is_openpilot_proc, skip, r, num_processes)
+                            for r in routes])
+
+
+def format_report(results: list[Comparison], show_all: bool = False) -> str:
+  def fmt(v, unit):
+    return "-" if np.isnan(v) else f"{v:.2f} {unit}"
+
+  results = sorted(results, key=lambda r: (STATUS_ORDER.index(r.status), r.metric))
+  rows = []
+  for r in results:
+    if r.status == 'ok' and not show_all:
+      continue
+    rows.append([r.metric, fmt(r.baseline[0], r.unit), fmt(r.new[0], r.unit), fmt(r.baseline[1], r.unit),
+                 fmt(r.new[1], r.unit), f"{r.baseline_rate:.1f}", f"{r.new_rate:.1f}",
+                 "-" if np.isnan(r.p_value) else f"{r.p_value:.1e}", r.status.upper()])
+
+  counts = {s: sum(r.status == s for r in results) for s in STATUS_ORDER}
+  summary = ", ".join(f"{n} {s}" for s, n in counts.items() if n)
+  if not rows:
+    return f"\n-- Timing regression report: {summary or 'no metrics'} --"
+  header = ["metric", "median (base)", "median (new)", "p95 (base)", "p95 (new)", "n/min (base)", "n/min (new)", "p-value", "status"]
+  return f"\n-- Timing regression report: {summary} --\n" + tabulate(rows, header, **TABULATE_OPTS)
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description="Loop timing regressions of the onroad processes, from saved logs")
+  parser.add_argument("-j", "--num-processes", type=int, default=8)
+  parser.add_argument("--skip", type=float, default=SKIP, help="seconds to skip at the start of each route")
+  sub = parser.add_subparsers(dest="command", required=True)
+
+  p = sub.add_parser("baseline", help="store the timings of routes as a baseline")
+  p.add_argument("routes", nargs="+")
+  p.add_argument("-o", "--output", required=True, help="baseline file (.npz)")
+
+  p = sub.add_parser("compare", help="compare the timings of routes against a baseline")
+  p.add_argument("baseline", help="baseline file (.npz)")
+  p.add_argument("routes", nargs="+")
+  p.add_argument("--alpha", type=float, default=0.01, help="significance level")
+  p.add_argument("--rel-tol", type=float, default=0.1, help="smallest relative change of the median or p95 to report")
+  p.add_argument("--all", action="store_true", help="show the metrics that didn't change too")
+  args = parser.parse_args()
+
+  stats = route_stats(args.routes, args.skip, args.num_processes)
+  if args.command == "baseline":
+    stats.save(args.output)
+    print(f"{len(stats.samples)} metrics over {stats.duration / 60:.1f} min of logs saved to {args.output}")
+    return 0
+
+  results = compare(TimingStats.load(args.baseline), stats, args.alpha, args.rel_tol)
+  print(format_report(results, args.all))
+  return int(any(r.status == 'regressed' for r in results))
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -1,42 +1,363 @@
 #!/usr/bin/env python3
-import json
+import os
+import time
+import ctypes
+import ctypes.util
+import select
 import subprocess
+from dataclasses import dataclass
+from typing import NamedTuple
 
 import openpilot.cereal.messaging as messaging
 from openpilot.common.swaglog import cloudlog
+from openpilot.common.utils import RateLimiter
 
+# only these fields are read from each entry and forwarded
+FIELDS = (b'MESSAGE', b'PRIORITY', b'_PID', b'SYSLOG_IDENTIFIER', b'_SYSTEMD_UNIT')
 
-def main():
-  pm = messaging.PubMaster(['operatingSystemLog'])
-  cmd = ['journalctl', '-f', '-o', 'json']
-  proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
-  assert proc.stdout is not None
+BATCH_INTERVAL = 0.1  # s, bursts within this are coalesced
+MAX_READ_ENTRIES = 2000  # per batch interval, the rest waits for the next one
+MAX_MESSAGE_BYTES = 8192
+MAX_MESSAGES_PER_SEC = 50.
+MAX_MESSAGES_BURST = 200
+
+LOG_WARNING = 4
+LOG_DEBUG = 7
+
+libc = ctypes.CDLL(None)
+libc.free.argtypes = [ctypes.c_void_p]
+
+
+class JournalEntry(NamedTuple):
+  ts: int  # wall time in microseconds
+  priority: int
+  pid: int
+  tag: str
+  unit: str
+  message: str
+
+
+def _int(value: bytes | None, default: int) -> int:
   try:
-    for line in proc.stdout:
-      line = line.strip()
+    return int(value) if value is not None else default
+  except ValueError:
+    return default
+
+
+def entry_from_fields(fields: dict[bytes, bytes], ts: int) -> JournalEntry:
+  return JournalEntry(
+    ts=ts,
+    priority=_int(fields.get(b'PRIORITY'), 6),
+    pid=_int(fields.get(b'_PID'), 0),
+    tag=fields.get(b'SYSLOG_IDENTIFIER', b'').decode('utf-8', 'replace'),
+    unit=fields.get(b'_SYSTEMD_UNIT', b'').decode('utf-8', 'replace'),
+    message=fields.get(b'MESSAGE', b'').decode('utf-8', 'replace'),
+  )
+
+
+@dataclass(frozen=True)
+class JournalFilter:
+  max_priority: int = LOG_DEBUG
+  units: frozenset[str] = frozenset()  # if set, only entries from these units
+  exclude_units: frozenset[str] = frozenset()
+
+  @classmethod
+  def from_env(cls) -> 'JournalFilter':
+    def units(name: str) -> frozenset[str]:
+      return frozenset(u for u in os.getenv(name, '').split(',') if u)
+    return cls(int(os.getenv('JOURNALD_PRIORITY', str(LOG_DEBUG))), units('JOURNALD_UNITS'), units('JOURNALD_EXCLUDE_UNITS'))
+
+  def matches(self) -> list[bytes]:
+    # as sd_journal matches, ORed within a field and ANDed between fields
+    matches = [f'_SYSTEMD_UNIT={u}'.encode() for u in sorted(self.units)]
+    if self.max_priority < LOG_DEBUG:
+      matches += [f'PRIORITY={p}'.encode() for p in range(self.max_priority + 1)]
+    return matches
+
+  def journalctl_args(self) -> list[str]:
+    args = [f'--unit={u}' for u in sorted(self.units)]
+    if self.max_priority < LOG_DEBUG:
+      args.append(f'--priority={self.max_priority}')
+    return args
+
+  def accepts(self, entry: JournalEntry) -> bool:
+    if entry.priority > self.max_priority:
+      return False
+    if self.units and entry.unit not in self.units:
+      return False
+    return entry.unit not in self.exclude_units
+
+
+class ExportParser:
+  """Incremental parser for the journal export format, as written by journalctl -o export."""
+  def __init__(self, fields: tuple[bytes, ...] | None = FIELDS) -> None:
+    # None keeps all fields
+    self.fields = None if fields is None else frozenset(fields) | {b'__CURSOR', b'__REALTIME_TIMESTAMP'}
+    self.buf = b''
+    self.entry: dict[bytes, bytes] = {}
+
+  def feed(self, data: bytes) -> list[dict[bytes, bytes]]:
+    buf = self.buf + data
+    entries = []
+    # text fields are one line each, so most of the parsing is a single split
+    lines = buf.split(b'\n')
+    n = len(lines) - 1  # the last one isn't complete
+    i = pos = 0
+    while i < n:
+      line = lines[i]
       if not line:
+        # an empty line ends the entry
+        if self.entry:
+          entries.append(self.entry)
+          self.entry = {}
+        i += 1
+        pos += 1
         continue
+
+      name, sep, value = line.partition(b'=')
+      if sep:
+        if self.fields is None or name in self.fields:
+          self.entry[name] = value
+        i += 1
+        pos += len(line) + 1
+        continue
+
+      # binary safe field: the name, then a 64 bit little endian size and the raw value
+      nl = pos + len(line)
+      if len(buf) < nl + 9:
+        break
+      end = nl + 9 + int.from_bytes(buf[nl + 1:nl + 9], 'little')
+      if len(buf) <= end:
+        break
+      if self.fields is None or name in self.fields:
+        self.entry[name] = buf[nl + 9:end]
+      # skip the lines the size and value were split into, up to the newline after the value
+      i += 1
+      pos = nl + 1
+      while pos <= end:
+        pos += len(lines[i]) + 1
+        i += 1
+
+    self.buf = buf[pos:]
+    return entries
+
+
+class JournalctlReader:
+  """Follows the journal through journalctl's export output, where libsystemd isn't available."""
+  def __init__(self, filt: JournalFilter, cursor: str | None = None) -> None:
+    self.filt = filt
+    self.cursor = cursor
+    cmd = ['journalctl', '--follow', '--output=export', f'--output-fields={",".join(f.decode() for f in FIELDS)}', '--lines=0',
+           *filt.journalctl_args()]
+    if cursor is not None:
+      cmd.append(f'--after-cursor={cursor}')
+    self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    assert self.proc.stdout is not None
+    self.fd = self.proc.stdout.fileno()
+    self.parser = ExportParser()
+    self.pending: list[dict[bytes, bytes]] = []
+    self.eof = False
+
+  def read(self, timeout: float) -> list[JournalEntry]:
+    while not self.eof and len(self.pending) < MAX_READ_ENTRIES and select.select([self.fd], [], [], timeout if not self.pending else 0)[0]:
+      dat = os.read(self.fd, 1 << 16)
+      self.eof = not dat
+      self.pending += self.parser.feed(dat)
+      timeout = 0
+
+    if self.eof and not self.pending:
+      raise EOFError(f'journalctl exited with {self.proc.wait()}')
+
+    fields, self.pending = self.pending[:MAX_READ_ENTRIES], self.pending[MAX_READ_ENTRIES:]
+    if fields:
+      self.cursor = fields[-1][b'__CURSOR'].decode()
+    entries = (entry_from_fields(f, _int(f.get(b'__REALTIME_TIMESTAMP'), 0)) for f in fields)
+    return [e for e in entries if self.filt.accepts(e)]
+
+  def close(self) -> None:
+    self.proc.terminate()
+    self.proc.wait()
+
+
+class SdJournalReader:
+  """Follows the journal through libsystemd's sd_journal API, filtered by journal matches."""
+  SD_JOURNAL_LOCAL_ONLY = 1
+
+  def __init__(self, filt: JournalFilter, cursor: str | None = None) -> None:
+    self.filt = filt
+    self.cursor = cursor
+    self.lib = self.load()
+    self.j = ctypes.c_void_p()
+    self._check(self.lib.sd_journal_open(ctypes.byref(self.j), self.SD_JOURNAL_LOCAL_ONLY))
+
+    for m in filt.matches():
+      self._check(self.lib.sd_journal_add_match(self.j, m, len(m)))
+
+    if cursor is not None and self.lib.sd_journal_seek_cursor(self.j, cursor.encode()) >= 0:
+      # lands on the cursor's entry, which was already read
+      if self._check(self.lib.sd_journal_next(self.j)) and self.lib.sd_journal_test_cursor(self.j, cursor.encode()) <= 0:
+        self._check(self.lib.sd_journal_previous(self.j))
+    else:
+      self._check(self.lib.sd_journal_seek_tail(self.j))
+      self._check(self.lib.sd_journal_previous(self.j))
+
+    self._data = ctypes.c_void_p()
+    self._length = ctypes.c_size_t()
+    self._usec = ctypes.c_uint64()
+
+  @staticmethod
+  def load() -> ctypes.CDLL:
+    lib = ctypes.CDLL(ctypes.util.find_library('systemd') or 'libsystemd.so.0')
+    p, u64 = ctypes.c_void_p, ctypes.c_uint64
+    for name, argtypes in (
+      ('sd_journal_open', [ctypes.POINTER(p), ctypes.c_int]),
+      ('sd_journal_add_match', [p, ctypes.c_char_p, ctypes.c_size_t]),
+      ('sd_journal_seek_tail', [p]),
+      ('sd_journal_seek_cursor', [p, ctypes.c_char_p]),
+      ('sd_journal_test_cursor', [p, ctypes.c_char_p]),
+      ('sd_journal_next', [p]),
+      ('sd_journal_previous', [p]),
+      ('sd_journal_get_data', [p, ctypes.c_char_p, ctypes.POINTER(p), ctypes.POINTER(ctypes.c_size_t)]),
+      ('sd_journal_get_realtime_usec', [p, ctypes.POINTER(u64)]),
+      ('sd_journal_get_cursor', [p, ctypes.POINTER(p)]),
+      ('sd_journal_wait', [p, u64]),
+      ('sd_journal_close', [p]),
+    ):
+      f = getattr(lib, name)
+      f.argtypes = argtypes
+      f.restype = None if name == 'sd_journal_close' else ctypes.c_int
+    return lib
+
+  @staticmethod
+  def _check(r: int) -> int:
+    if r < 0:
+      raise OSError(-r, os.strerror(-r))
+    return r
+
+  def _get_fields(self) -> dict[bytes, bytes]:
+    fields = {}
+    for name in FIELDS:
+      if self.lib.sd_journal_get_data(self.j, name, ctypes.byref(self._data), ctypes.byref(self._length)) >= 0:
+        # data is FIELD=value
+        fields[name] = ctypes.string_at(self._data.value, self._length.value)[len(name) + 1:]
+    return fields
+
+  def read(self, timeout: float) -> list[JournalEntry]:
+    entries = []
+    n = self._check(self.lib.sd_journal_next(self.j))
+    if n == 0:
+      self._check(self.lib.sd_journal_wait(self.j, int(timeout * 1e6)))
+      n = self._check(self.lib.sd_journal_next(self.j))
+
+    read = 0
+    while n > 0:
+      read += 1
+      self._check(self.lib.sd_journal_get_realtime_usec(self.j, ctypes.byref(self._usec)))
+      entry = entry_from_fields(self._get_fields(), self._usec.value)
+      if self.filt.accepts(entry):
+        entries.append(entry)
+      if read == MAX_READ_ENTRIES:
+        break
+      n = self._check(self.lib.sd_journal_next(self.j))
+
+    if read:
+      # at the end, sd_journal_next stays on the last entry
+      cursor = ctypes.c_void_p()
+      self._check(self.lib.sd_journal_get_cursor(self.j, ctypes.byref(cursor)))
+      self.cursor = ctypes.string_at(cursor.value).decode()
+      libc.free(cursor)
+    return entries
+
+  def close(self) -> None:
+    self.lib.sd_journal_close(self.j)
+
+
+class JournalBatcher:
+  """
+  Coalesces consecutive entries from the same process into one entry, with
+  the messages on separate lines, and rate limits the coalesced entries.
+  What's dropped is reported in the next entry that goes through.
+  """
+  def __init__(self, rate: float = MAX_MESSAGES_PER_SEC, burst: int = MAX_MESSAGES_BURST, max_bytes: int = MAX_MESSAGE_BYTES) -> None:
+    self.limiter = RateLimiter(rate, burst)
+    self.max_bytes = max_bytes
+    self.dropped = 0
+    self.dropped_ts = 0  # of the last dropped entry
+
+  def coalesce(self, entries: list[JournalEntry]) -> list[tuple[JournalEntry, int]]:
+    # coalesced entries, with the number of journal entries in each
+    batches: list[tuple[JournalEntry, list[str], int]] = []
+    for e in entries:
+      if batches:
+        first, lines, size = batches[-1]
+        if (first.priority, first.pid, first.tag) == (e.priority, e.pid, e.tag) and size + 1 + len(e.message) <= self.max_bytes:
+          lines.append(e.message)
+          batches[-1] = (first, lines, size + 1 + len(e.message))
+          continue
+      batches.append((e, [e.message], len(e.message)))
+    return [(first if len(lines) == 1 else first._replace(message='\n'.join(lines)), len(lines)) for first, lines, _ in batches]
+
+  def batch(self, entries: list[JournalEntry], now: float) -> list[JournalEntry]:
+    batches = self.coalesce(entries)
+    n = self.limiter.take(len(batches) + bool(self.dropped), now)
+
+    out = []
+    if self.dropped and n:
+      out.append(JournalEntry(self.dropped_ts, LOG_WARNING, os.getpid(), 'journald', '',
+                              f'rate limited, dropped {self.dropped} journal entries'))
+      self.dropped = 0
+      n -= 1
+    out += [e for e, _ in batches[:n]]
+    if n < len(batches):
+      self.dropped += sum(count for _, count in batches[n:])
+      self.dropped_ts = batches[-1][0].ts
+    return out
+
+
+def build_message(entry: JournalEntry) -> bytes:
+  msg = messaging.new_message('operatingSystemLog')
+  log = msg.operatingSystemLog
+  log.ts = entry.ts
+  log.priority = entry.priority
+  log.pid = entry.pid
+  log.tag = entry.tag
+  log.message = entry.message
+  return msg.to_bytes()
+
+
+def open_reader(filt: JournalFilter, cursor: str | None = None) -> SdJournalReader | JournalctlReader:
+  try:
+    return SdJournalReader(filt, cursor)
+  except OSError:
+    cloudlog.exception("failed to open the journal with libsystemd, falling back to journalctl")
+    return JournalctlReader(filt, cursor)
+
+
+def main():
+  pm = messaging.PubMaster(['operatingSystemLog'])
+  filt = JournalFilter.from_env()
+  batcher = JournalBatcher()
+  reader = open_reader(filt)
+  try:
+    while True:
+      t = time.monotonic()
       try:
-        kv = json.loads(line)
-      except json.JSONDecodeError:
-        cloudlog.exception("failed to parse journalctl output")
+        entries = reader.read(1.)
+      except (OSError, EOFError):
+        cloudlog.exception("failed to read the journal")
+        reader.close()
+        time.sleep(1)
+        reader = open_reader(filt, reader.cursor)
         continue
 
-      msg = messaging.new_message('operatingSystemLog')
-      entry = msg.operatingSystemLog
-      entry.ts = int(kv.get('__REALTIME_TIMESTAMP', 0))
-      entry.message = json.dumps(kv)
-      if '_PID' in kv:
-        entry.pid = int(kv['_PID'])
-      if 'PRIORITY' in kv:
-        entry.priority = int(kv['PRIORITY'])
-      if 'SYSLOG_IDENTIFIER' in kv:
-        entry.tag = kv['SYSLOG_IDENTIFIER']
-
-      pm.send('operatingSystemLog', msg)
+      for entry in batcher.batch(entries, time.monotonic()):
+        pm.send('operatingSystemLog', build_message(entry))
+
+      # let bursts accumulate, so they go out together
+      if entries:
+        time.sleep(max(BATCH_INTERVAL - (time.monotonic() - t), 0.))
   finally:
-    proc.terminate()
-    proc.wait()
+    reader.close()
 
 
 if __name__ == '__main__':
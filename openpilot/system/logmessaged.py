@@ -1,11 +1,131 @@
 #!/usr/bin/env python3
+import os
+import re
+import time
 import zmq
+from collections import Counter
 from typing import NoReturn
 
 import openpilot.cereal.messaging as messaging
 from openpilot.common.logging_extra import SwagLogFileFormatter
 from openpilot.common.hardware.hw import Paths
-from openpilot.common.swaglog import get_file_handler
+from openpilot.common.swaglog import cloudlog, decode_log_frame, get_file_handler
+from openpilot.common.utils import RateLimiter
+
+MAX_DRAIN_FRAMES = 1000  # frames received before handling them as one batch
+MAX_PUBLISH_SIZE = 2*1024*1024
+MAX_AGGREGATE_SIZE = 256*1024
+
+# per source, records beyond these are still written to disk but not published.
+# Error records are always published, and don't count against the budget.
+SOURCE_RATE = 200.  # records/s
+SOURCE_BURST = 1000
+DROP_REPORT_INTERVAL = 10.  # s
+
+# the daemon the record was logged from, or the pid if it wasn't started by manager
+_SOURCE_RE = re.compile(r'"daemon":\s*"([^"]*)"|"process":\s*(\d+)')
+
+
+def record_source(record: str) -> str:
+  m = _SOURCE_RE.search(record)
+  if m is None:
+    return ""
+  return m.group(1) if m.group(1) is not None else m.group(2)
+
+
+def build_message(which: str, record: str) -> bytes:
+  # set after construction, long text passed to new_message as a keyword is much slower
+  msg = messaging.new_message(None, valid=True)
+  setattr(msg, which, record)
+  return msg.to_bytes()
+
+
+class LogMessageBatcher:
+  """
+  Writes batches of swaglog records to disk and turns them into logMessage and
+  errorLogMessage events, rate limited per source. With aggregate_threshold,
+  batches of more records than that are published as few logMessage events
+  with one record per line.
+  """
+  def __init__(self, log_handler, log_level: int = 20, aggregate_threshold: int | None = None,
+               rate: float = SOURCE_RATE, burst: int = SOURCE_BURST) -> None:
+    self.log_handler = log_handler
+    self.log_level = log_level
+    self.aggregate_threshold = aggregate_threshold
+    self.rate = rate
+    self.burst = burst
+    self.limiters: dict[str, RateLimiter] = {}
+    self.dropped: Counter[str] = Counter()  # since the last report
+    self.dropped_total: Counter[str] = Counter()
+    self.last_report = 0.
+
+  def _rate_limit(self, records: list[tuple[int, str]], now: float) -> list[tuple[int, str]]:
+    sources = [record_source(record) if level < 40 else None for level, record in records]  # logging.ERROR
+    allowed = {}
+    for source, n in Counter(s for s in sources if s is not None).items():
+      limiter = self.limiters.get(source)
+      if limiter is None:
+        limiter = self.limiters[source] = RateLimiter(self.rate, self.burst)
+      allowed[source] = limiter.take(n, now)
+      if allowed[source] < n:
+        self.dropped[source] += n - allowed[source]
+        self.dropped_total[source] += n - allowed[source]
+
+    published = []
+    for r, source in zip(records, sources, strict=True):
+      if source is None:
+        published.append(r)
+      elif allowed[source] > 0:
+        allowed[source] -= 1
+        published.append(r)
+    return published
+
+  def process(self, records: list[tuple[int, str]], now: float) -> tuple[list[bytes], list[bytes]]:
+    """Returns the serialized logMessage and errorLogMessage events for the records."""
+    self.log_handler.emit_many([record for level, record in records if level >= self.log_level])
+
+    published = []
+    for level, record in records:
+      if len(record) > MAX_PUBLISH_SIZE:
+        print("WARNING: log too big to publish", len(record))
+        print(record[:100])
+        continue
+      published.append((level, record))
+    published = self._rate_limit(published, now)
+
+    if self.dropped and now - self.last_report >= DROP_REPORT_INTERVAL:
+      cloudlog.event("logmessaged rate limited", dropped=dict(self.dropped))
+      self.dropped.clear()
+      self.last_report = now
+
+    if self.aggregate_threshold is not None and len(published) > self.aggregate_threshold:
+      log_messages = []
+      chunk: list[str] = []
+      size = 0
+      for _, record in published:
+        if chunk and size + len(record) > MAX_AGGREGATE_SIZE:
+          log_messages.append('\n'.join(chunk))
+          chunk, size = [], 0
+        chunk.append(record)
+        size += len(record) + 1
+      if chunk:
+        log_messages.append('\n'.join(chunk))
+    else:
+      log_messages = [record for _, record in published]
+
+    return ([build_message('logMessage', m) for m in log_messages],
+            [build_message('errorLogMessage', record) for level, record in published if level >= 40])  # logging.ERROR
+
+
+def recv_batch(sock: zmq.Socket) -> list[tuple[int, str]]:
+  # blocks for the first frame, then takes what's queued up without waiting
+  frames = [b''.join(sock.recv_multipart())]
+  while len(frames) < MAX_DRAIN_FRAMES:
+    try:
+      frames.append(b''.join(sock.recv_multipart(zmq.NOBLOCK)))
+    except zmq.error.Again:
+      break
+  return [r for dat in frames for r in decode_log_frame(dat)]
 
 
 def main() -> NoReturn:
@@ -13,6 +133,9 @@ def main() -> NoReturn:
   log_handler.setFormatter(SwagLogFileFormatter(None))
   log_level = 20  # logging.INFO
 
+  aggregate = os.getenv("LOGMESSAGED_AGGREGATE")
+  batcher = LogMessageBatcher(log_handler, log_level, int(aggregate) if aggregate else None)
+
   ctx = zmq.Context.instance()
   sock = ctx.socket(zmq.PULL)
   sock.bind(Paths.swaglog_ipc())
@@ -23,24 +146,11 @@ def main() -> NoReturn:
 
   try:
     while True:
-      dat = b''.join(sock.recv_multipart())
-      level = dat[0]
-      record = dat[1:].decode("utf-8")
-      if level >= log_level:
-        log_handler.emit(record)
-
-      if len(record) > 2*1024*1024:
-        print("WARNING: log too big to publish", len(record))
-        print(record[:100])
-        continue
-
-      # then we publish them
-      msg = messaging.new_message(None, valid=True, logMessage=record)
-      log_message_sock.send(msg.to_bytes())
-
-      if level >= 40:  # logging.ERROR
-        msg = messaging.new_message(None, valid=True, errorLogMessage=record)
-        error_log_message_sock.send(msg.to_bytes())
+      log_messages, error_log_messages = batcher.process(recv_batch(sock), time.monotonic())
+      for dat in log_messages:
+        log_message_sock.send(dat)
+      for dat in error_log_messages:
+        error_log_message_sock.send(dat)
   finally:
     sock.close()
     ctx.term()
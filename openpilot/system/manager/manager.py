@@ -14,7 +14,8 @@ from openpilot.common.params import Params, ParamKeyFlag
 from openpilot.common.text_window import TextWindow
 from openpilot.common.hardware import HARDWARE
 from openpilot.system.manager.helpers import unblock_stdout, save_bootlog
-from openpilot.system.manager.process import ensure_running
+from openpilot.system.manager.process import ParamsWatcher, ProcessSupervisor, get_zygote, stop_zygote
+from openpilot.system.manager.zygote import zygote_enabled
 from openpilot.system.manager.process_config import managed_processes
 from openpilot.system.athena.registration import register, UNREGISTERED_DONGLE_ID
 from openpilot.common.swaglog import cloudlog, add_file_handler
@@ -95,6 +96,7 @@ def manager_cleanup() -> None:
   # ensure all are killed
   for p in managed_processes.values():
     p.stop(block=True)
+  stop_zygote()
 
   cloudlog.info("everything is dead")
 
@@ -117,7 +119,10 @@ def manager_thread() -> None:
   pm = messaging.PubMaster(['managerState'])
 
   params.put_bool("IsOffroad", True, block=True)
-  ensure_running(managed_processes.values(), False, params=params, CP=sm['carParams'], not_run=ignore)
+  supervisor = ProcessSupervisor(managed_processes.values(), params, not_run=ignore)
+  supervisor.update(False, sm['carParams'])
+  exit_params = ParamsWatcher(params, ("DoUninstall", "DoShutdown", "DoReboot"))
+  msg = None
 
   started_prev = False
   ignition_prev = False
@@ -143,16 +148,19 @@ def manager_thread() -> None:
     started_prev = started
     ignition_prev = ignition
 
-    ensure_running(managed_processes.values(), started, params=params, CP=sm['carParams'], not_run=ignore)
-
-    running = ' '.join("{}{}\u001b[0m".format("\u001b[32m" if p.proc.is_alive() else "\u001b[31m", p.name)
-                       for p in managed_processes.values() if p.proc)
-    print(running)
-    cloudlog.debug(running)
-
-    # send managerState
-    msg = messaging.new_message('managerState', valid=True)
-    msg.managerState.processes = [p.get_process_state_msg() for p in managed_processes.values()]
+    # managerState is only rebuilt when a process changed state
+    if supervisor.update(started, sm['carParams']) or msg is None:
+      running = ' '.join("{}{}\u001b[0m".format("\u001b[32m" if p.proc.is_alive() else "\u001b[31m", p.name)
+                         for p in managed_processes.values() if p.proc)
+      print(running)
+      cloudlog.debug(running)
+
+      msg = messaging.new_message('managerState', valid=True)
+      msg.managerState.processes = [p.get_process_state_msg() for p in managed_processes.values()]
+    else:
+      # already serialized, only the time changes
+      msg.clear_write_flag()
+      msg.logMonoTime = int(time.monotonic() * 1e9)
     pm.send('managerState', msg)
 
     # kick AGNOS power monitoring watchdog
@@ -165,8 +173,9 @@ def manager_thread() -> None:
 
     # Exit main loop when uninstall/shutdown/reboot is needed
     shutdown = False
+    exit_params.update()
     for param in ("DoUninstall", "DoShutdown", "DoReboot"):
-      if params.get_bool(param):
+      if exit_params.values[param]:
         shutdown = True
         params.put("LastManagerExitReason", f"{param} {datetime.datetime.now()}", block=True)
         cloudlog.warning(f"Shutting down manager - {param} set")
@@ -183,6 +192,10 @@ def main() -> None:
   # SystemExit on sigterm
   signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
 
+  # fork the zygote after manager_init, daemons forked from it get the environment it set up
+  if zygote_enabled():
+    get_zygote().start()
+
   try:
     manager_thread()
   except Exception:
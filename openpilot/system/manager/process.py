@@ -1,9 +1,10 @@
 import importlib
 import os
+import select
 import signal
 import time
 import subprocess
-from collections.abc import Callable, ValuesView
+from collections.abc import Callable, Iterable, ValuesView
 from abc import ABC, abstractmethod
 from multiprocessing import Process
 
@@ -16,12 +17,15 @@ import openpilot.system.sentry as sentry
 from openpilot.common.basedir import BASEDIR
 from openpilot.common.params import Params
 from openpilot.common.swaglog import cloudlog
+from openpilot.system.manager.zygote import Zygote, ZygoteChild, zygote_enabled
 
 
-def launcher(proc: str, name: str) -> None:
+def launcher(proc: str, name: str, start_time: float | None = None) -> None:
   try:
     # import the process
+    import_start = time.monotonic()
     mod = importlib.import_module(proc)
+    import_time = time.monotonic() - import_start
 
     # rename the process
     setproctitle(proc)
@@ -33,6 +37,10 @@ def launcher(proc: str, name: str) -> None:
     cloudlog.bind(daemon=name)
     sentry.set_tag("daemon", name)
 
+    # startup time is from the manager deciding to start the process until main()
+    cloudlog.event("daemon startup", name=name, import_time=import_time,
+                   startup_time=None if start_time is None else time.monotonic() - start_time)
+
     # exec the process
     mod.main()
   except KeyboardInterrupt:
@@ -52,7 +60,22 @@ def nativelauncher(pargs: list[str], cwd: str, name: str) -> None:
   os.execvp(pargs[0], pargs)
 
 
-def join_process(process: Process, timeout: float) -> None:
+_zygote: Zygote | None = None
+
+def get_zygote() -> Zygote:
+  global _zygote
+  if _zygote is None:
+    _zygote = Zygote(launcher)
+  return _zygote
+
+def stop_zygote() -> None:
+  global _zygote
+  if _zygote is not None:
+    _zygote.stop()
+    _zygote = None
+
+
+def join_process(process: Process | ZygoteChild, timeout: float) -> None:
   # Process().join(timeout) will hang due to a python 3 bug: https://bugs.python.org/issue28382
   # We have to poll the exitcode instead
   t = time.monotonic()
@@ -60,11 +83,31 @@ def join_process(process: Process, timeout: float) -> None:
     time.sleep(0.001)
 
 
+def depends_on(params: Iterable[str] = (), car_params: Iterable[str] = ()):
+  """
+  Declare what a should_run predicate reads besides started, so ProcessSupervisor
+  only re-evaluates it when one of them changes. Undeclared predicates run every update.
+  """
+  def decorator(fn):
+    fn.param_deps = frozenset(params)
+    fn.car_params_deps = frozenset(car_params)
+    return fn
+  return decorator
+
+
+def combine_deps(fn, fns):
+  """Give a predicate built from fns the union of their dependencies, if they're all declared."""
+  if all(hasattr(f, 'param_deps') for f in fns):
+    fn.param_deps = frozenset().union(*(f.param_deps for f in fns))
+    fn.car_params_deps = frozenset().union(*(f.car_params_deps for f in fns))
+  return fn
+
+
 class ManagerProcess(ABC):
   daemon = False
   sigkill = False
   should_run: Callable[[bool, Params, car.CarParams], bool]
-  proc: Process | None = None
+  proc: Process | ZygoteChild | None = None
   enabled = True
   name = ""
   shutting_down = False
@@ -174,8 +217,11 @@ class PythonProcess(ManagerProcess):
       return
 
     cloudlog.info(f"starting python {self.module}")
-    self.proc = Process(name=self.name, target=self.launcher, args=(self.module, self.name))
-    self.proc.start()
+    if zygote_enabled():
+      self.proc = get_zygote().spawn(self.module, self.name)
+    else:
+      self.proc = Process(name=self.name, target=self.launcher, args=(self.module, self.name, time.monotonic()))
+      self.proc.start()
     self.shutting_down = False
 
 
@@ -190,6 +236,7 @@ class DaemonProcess(ManagerProcess):
     self.params = None
 
   @staticmethod
+  @depends_on()
   def should_run(started, params, CP):
     return True
 
@@ -238,3 +285,187 @@ def ensure_running(procs: ValuesView[ManagerProcess], started: bool, params: Par
     p.start()
 
   return running
+
+
+class ParamsWatcher:
+  """
+  Tracks the values of a set of params. Params are written by renaming into the params
+  directory, so an unchanged directory mtime means none of them changed and nothing is read.
+  """
+  # mtimes have coarse granularity, keep reading while the last change is this recent
+  SETTLE_NS = 100_000_000
+
+  def __init__(self, params: Params, keys: Iterable[str] = ()):
+    self.params = params
+    self.path = params.get_param_path()
+    self.keys: set[str] = set(keys)
+    self.values: dict[str, object] = {}
+    self.mtime_ns: int | None = None
+
+  def add(self, keys: Iterable[str]) -> None:
+    self.keys.update(keys)
+
+  def update(self) -> set[str]:
+    """Return the keys whose values changed since the last update."""
+    try:
+      mtime_ns = os.stat(self.path).st_mtime_ns
+    except OSError:
+      mtime_ns = None
+
+    if mtime_ns is not None and mtime_ns == self.mtime_ns and time.time_ns() - mtime_ns > self.SETTLE_NS \
+       and self.keys.issubset(self.values):
+      return set()
+    self.mtime_ns = mtime_ns
+
+    changed = set()
+    for k in self.keys:
+      value = self.params.get(k)
+      if k not in self.values or self.values[k] != value:
+        self.values[k] = value
+        changed.add(k)
+    return changed
+
+
+class ProcessSupervisor:
+  """
+  Event-driven replacement for calling ensure_running every loop. Predicates are only
+  re-evaluated when started, or a param or CarParams field they depend on changes, and
+  child exits are picked up through pidfds instead of polling every process.
+  """
+  STOP_TIMEOUT = 5.  # s, then processes that ignored SIGINT get SIGKILL, like a blocking stop()
+
+  def __init__(self, procs: Iterable[ManagerProcess], params: Params, not_run: Iterable[str] | None = None):
+    self.procs = list(procs)
+    self.params = params
+    self.not_run = set(not_run or [])
+
+    self.should_run: dict[str, bool] = {}
+    self.started: bool | None = None
+    self.car_params: dict[str, object] = {}
+    self.car_params_fields: set[str] = set()
+    self.watcher = ParamsWatcher(params)
+    for p in self.procs:
+      if hasattr(p.should_run, 'param_deps'):
+        self.watcher.add(p.should_run.param_deps)
+        self.car_params_fields.update(p.should_run.car_params_deps)
+
+    # pidfd -> process, without pidfd support exitcodes of the started processes are polled
+    self.poller = select.poll() if hasattr(os, 'pidfd_open') else None
+    self.pidfds: dict[int, ManagerProcess] = {}
+    self.watched: dict[str, tuple[int | None, Process | ZygoteChild]] = {}
+    self.pending: set[str] = set()
+    self.kill_at: dict[str, float] = {}
+    self.changed = True
+
+  def close(self) -> None:
+    for name in list(self.watched):
+      self._unwatch(name)
+
+  def _watch(self, p: ManagerProcess) -> None:
+    if p.proc is None or p.proc.pid is None:
+      return
+    fd = None
+    if self.poller is not None:
+      try:
+        fd = os.pidfd_open(p.proc.pid)
+      except OSError:
+        # already reaped
+        return
+      self.poller.register(fd, select.POLLIN)
+      self.pidfds[fd] = p
+    self.watched[p.name] = (fd, p.proc)
+
+  def _unwatch(self, name: str) -> None:
+    fd, _ = self.watched.pop(name)
+    if fd is not None:
+      del self.pidfds[fd]
+      self.poller.unregister(fd)
+      os.close(fd)
+
+  def _sync_watch(self, p: ManagerProcess) -> None:
+    watched = self.watched.get(p.name)
+    if watched is not None and watched[1] is not p.proc:
+      self._unwatch(p.name)
+      watched = None
+    if watched is None and p.proc is not None and p.proc.exitcode is None:
+      self._watch(p)
+
+  def _exited(self) -> list[ManagerProcess]:
+    if self.poller is None:
+      exited = [p for p in self.procs if p.name in self.watched and self.watched[p.name][1].exitcode is not None]
+    else:
+      exited = [self.pidfds[fd] for fd, _ in self.poller.poll(0)]
+    for p in exited:
+      self._unwatch(p.name)
+    return exited
+
+  def _kill(self, p: ManagerProcess) -> None:
+    cloudlog.info(f"killing {p.name} with SIGKILL")
+    fd = self.watched.get(p.name, (None, None))[0]
+    if fd is not None:
+      # can't hit a reused pid
+      signal.pidfd_send_signal(fd, signal.SIGKILL)
+    else:
+      p.signal(signal.SIGKILL)
+
+  def update(self, started: bool, CP: car.CarParams) -> bool:
+    """Start and stop processes as needed. Returns True if any process changed state."""
+    changed_params = self.watcher.update()
+    started_changed = started != self.started
+    self.started = started
+    changed_car_params = set()
+    for field in self.car_params_fields:
+      value = getattr(CP, field)
+      if field not in self.car_params or self.car_params[field] != value:
+        self.car_params[field] = value
+        changed_car_params.add(field)
+
+    exited = self._exited()
+    for p in exited:
+      # wait() on the exited child so exitcode is set
+      if p.proc is not None:
+        p.proc.join(0)
+      self.changed = True
+
+    if started_changed or changed_params or changed_car_params:
+      procs = self.procs
+    else:
+      # nothing any predicate reads changed, only look at processes with work left
+      procs = [p for p in self.procs if p.name in self.pending or p in exited]
+
+    for p in procs:
+      if not p.enabled or p.name in self.not_run:
+        run = False
+      elif (p.name not in self.should_run or started_changed or not hasattr(p.should_run, 'param_deps') or
+            p.should_run.param_deps & changed_params or p.should_run.car_params_deps & changed_car_params):
+        run = p.should_run(started, self.params, CP)
+      else:
+        run = self.should_run[p.name]
+      self.should_run[p.name] = run
+
+      prev = (p.proc, p.shutting_down)
+      if run:
+        if p.proc is None or p.shutting_down:
+          p.start()
+      elif p.proc is not None and (not p.shutting_down or p.proc.exitcode is not None):
+        # only reap processes that are shutting down once they've exited
+        p.stop(block=False)
+        if p.shutting_down:
+          self.kill_at[p.name] = time.monotonic() + self.STOP_TIMEOUT
+      elif p.shutting_down and p.proc.exitcode is None and time.monotonic() >= self.kill_at.get(p.name, float('inf')):
+        self._kill(p)
+        del self.kill_at[p.name]
+      if not p.shutting_down:
+        self.kill_at.pop(p.name, None)
+      if (p.proc, p.shutting_down) != prev:
+        self.changed = True
+      self._sync_watch(p)
+
+      # undeclared predicates, daemons that are started every loop and processes still shutting down
+      if not hasattr(p.should_run, 'param_deps') or (run and p.proc is None) or p.shutting_down:
+        self.pending.add(p.name)
+      else:
+        self.pending.discard(p.name)
+
+    changed, self.changed = self.changed, False
+    return changed
@@ -5,19 +5,23 @@ import platform
 from opendbc.car.structs import car
 from openpilot.common.params import Params
 from openpilot.common.hardware import PC, COMMA_HARDWARE
-from openpilot.system.manager.process import PythonProcess, NativeProcess, DaemonProcess
+from openpilot.system.manager.process import PythonProcess, NativeProcess, DaemonProcess, combine_deps, depends_on
 
 WEBCAM = os.getenv("USE_WEBCAM") is not None
 
+@depends_on(params=['IsDriverViewEnabled'])
 def driverview(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started or params.get_bool("IsDriverViewEnabled")
 
+@depends_on(car_params=['notCar'])
 def notcar(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and CP.notCar
 
+@depends_on(car_params=['notCar'])
 def iscar(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and not CP.notCar
 
+@depends_on(params=['DisableLogging'], car_params=['notCar'])
 def logging(started: bool, params: Params, CP: car.CarParams) -> bool:
   run = (not CP.notCar) or not params.get_bool("DisableLogging")
   return started and run
@@ -25,47 +29,62 @@ def logging(started: bool, params: Params, CP: car.CarParams) -> bool:
 def ublox_available() -> bool:
   return os.path.exists('/dev/ttyHS0') and not os.path.exists('/persist/comma/use-quectel-gps')
 
+@depends_on()
 def ublox(started: bool, params: Params, CP: car.CarParams) -> bool:
   use_ublox = ublox_available()
   if use_ublox != params.get_bool("UbloxAvailable"):
     params.put_bool("UbloxAvailable", use_ublox, block=True)
   return started and use_ublox
 
+@depends_on(params=['JoystickDebugMode'])
 def joystick(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and params.get_bool("JoystickDebugMode")
 
+@depends_on(params=['JoystickDebugMode'])
 def not_joystick(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and not params.get_bool("JoystickDebugMode")
 
+@depends_on(params=['LongitudinalManeuverMode'])
 def long_maneuver(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and params.get_bool("LongitudinalManeuverMode")
 
+@depends_on(params=['LateralManeuverMode'])
 def lat_maneuver(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and params.get_bool("LateralManeuverMode")
 
+@depends_on(params=['LongitudinalManeuverMode'])
 def not_long_maneuver(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and not params.get_bool("LongitudinalManeuverMode")
 
+@depends_on()
 def qcomgps(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started and not ublox_available()
 
+@depends_on()
 def always_run(started: bool, params: Params, CP: car.CarParams) -> bool:
   return True
 
+@depends_on()
 def only_onroad(started: bool, params: Params, CP: car.CarParams) -> bool:
   return started
 
+@depends_on()
 def only_offroad(started: bool, params: Params, CP: car.CarParams) -> bool:
   return not started
 
+@depends_on(params=['IsLiveStreaming'])
 def livestream(started: bool, params: Params, CP: car.CarParams) -> bool:
   return params.get_bool("IsLiveStreaming")
 
 def or_(*fns):
-  return lambda *args: operator.or_(*(fn(*args) for fn in fns))
+  def pred(*args):
+    return operator.or_(*(fn(*args) for fn in fns))
+  return combine_deps(pred, fns)
 
 def and_(*fns):
-  return lambda *args: operator.and_(*(fn(*args) for fn in fns))
+  def pred(*args):
+    return operator.and_(*(fn(*args) for fn in fns))
+  return combine_deps(pred, fns)
 
 procs = [
   DaemonProcess("manage_athenad", "openpilot.system.athena.manage_athenad", "AthenadPid"),
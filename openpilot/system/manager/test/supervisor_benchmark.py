@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Time of one manager loop over the real process list, ensure_running against
+ProcessSupervisor.update, with processes that never spawn anything.
+
+  supervisor_benchmark.py [-n loops]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from opendbc.car.structs import car
+from openpilot.common.params import Params
+from openpilot.system.manager.process import ProcessSupervisor, ensure_running
+from openpilot.system.manager.process_config import procs
+from openpilot.system.manager.test.test_process import NoopProcess
+
+
+def benchmark(loop, n):
+  ts = np.empty(n)
+  for i in range(n):
+    st = time.perf_counter()
+    loop()
+    ts[i] = time.perf_counter() - st
+  return ts * 1e6
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time of a manager loop, ensure_running against ProcessSupervisor")
+  parser.add_argument("-n", "--loops", type=int, default=200)
+  args = parser.parse_args()
+
+  params = Params()
+  CP = car.CarParams.new_message()
+
+  ref_procs = [NoopProcess(p.name, p.should_run) for p in procs]
+  fake_procs = [NoopProcess(p.name, p.should_run) for p in procs]
+  supervisor = ProcessSupervisor(fake_procs, params)
+  loops = {
+    "ensure_running": lambda: ensure_running(ref_procs, True, params, CP),
+    "supervisor": lambda: supervisor.update(True, CP),
+  }
+  # start everything that should run and let the params directory settle
+  for loop in loops.values():
+    loop()
+  time.sleep(0.2)
+
+  for name, loop in loops.items():
+    ts = benchmark(loop, args.loops)
+    print(f"{name:>14}: mean {np.mean(ts):6.1f} us, p99 {np.percentile(ts, 99):6.1f} us per loop")
+  supervisor.close()
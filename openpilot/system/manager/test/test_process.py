@@ -0,0 +1,139 @@
+import os
+import signal
+import time
+from multiprocessing import Process
+
+from opendbc.car.structs import car
+from openpilot.common.test import OpenpilotTestCase
+from openpilot.common.params import Params
+from openpilot.system.manager.process import ManagerProcess, ProcessSupervisor, depends_on, ensure_running
+from openpilot.system.manager.process_config import procs
+
+
+def sleeper(duration: float, ignore_sigint: bool) -> None:
+  if ignore_sigint:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+  time.sleep(duration)
+
+
+class FakeProcess(ManagerProcess):
+  def __init__(self, name, should_run, duration=60., ignore_sigint=False):
+    self.name = name
+    self.should_run = should_run
+    self.duration = duration
+    self.ignore_sigint = ignore_sigint
+
+  def start(self) -> None:
+    if self.shutting_down:
+      self.stop()
+    if self.proc is not None:
+      return
+    self.proc = Process(name=self.name, target=sleeper, args=(self.duration, self.ignore_sigint))
+    self.proc.start()
+    self.shutting_down = False
+
+
+class DummyProc:
+  pid = None
+  exitcode = None
+
+  def is_alive(self):
+    return True
+
+
+class NoopProcess(ManagerProcess):
+  # never spawns anything, for checking what the supervision loop starts and timing it
+  def __init__(self, name, should_run):
+    self.name = name
+    self.should_run = should_run
+
+  def start(self) -> None:
+    if self.proc is None:
+      self.proc = DummyProc()
+
+
+class TestProcessSupervisor(OpenpilotTestCase):
+  def setup_method(self):
+    self.params = Params()
+    self.params.clear_all()
+    self.CP = car.CarParams.new_message()
+    self.procs = []
+
+  def teardown_method(self):
+    for p in self.procs:
+      if p.proc is not None and p.proc.exitcode is None:
+        os.kill(p.proc.pid, signal.SIGKILL)
+        p.proc.join()
+
+  def test_reevaluate_on_change(self):
+    calls = []
+
+    @depends_on(params=['IsLiveStreaming'])
+    def pred(started, params, CP):
+      calls.append(started)
+      return False
+
+    supervisor = ProcessSupervisor([FakeProcess("fake", pred)], self.params)
+    for _ in range(5):
+      supervisor.update(False, self.CP)
+    assert len(calls) == 1
+
+    self.params.put_bool("IsLiveStreaming", True)
+    supervisor.update(False, self.CP)
+    assert len(calls) == 2
+
+    self.params.put_bool("JoystickDebugMode", True)
+    supervisor.update(False, self.CP)
+    supervisor.update(True, self.CP)
+    assert calls == [False, False, True]
+
+  def test_child_exit(self):
+    p = FakeProcess("fake", depends_on()(lambda started, params, CP: True), duration=0.2)
+    self.procs.append(p)
+    supervisor = ProcessSupervisor([p], self.params)
+    assert supervisor.update(True, self.CP)
+    assert p.proc.is_alive()
+    assert not supervisor.update(True, self.CP)
+
+    time.sleep(0.5)
+    assert supervisor.update(True, self.CP)
+    assert p.proc.exitcode == 0
+    assert not p.proc.is_alive()
+    assert not supervisor.update(True, self.CP)
+    supervisor.close()
+
+  def test_stop_doesnt_block(self):
+    p = FakeProcess("fake", depends_on()(lambda started, params, CP: started), ignore_sigint=True)
+    self.procs.append(p)
+    supervisor = ProcessSupervisor([p], self.params)
+    supervisor.STOP_TIMEOUT = 1.
+    supervisor.update(True, self.CP)
+    time.sleep(0.2)
+
+    # the process ignores SIGINT, waiting for it must not stall the loop
+    assert supervisor.update(False, self.CP)
+    assert p.shutting_down
+    st = time.monotonic()
+    assert not supervisor.update(False, self.CP)
+    assert time.monotonic() - st < 0.5
+
+    # once the timeout passes, the supervisor kills it and reaps it on the next update
+    proc = p.proc
+    time.sleep(supervisor.STOP_TIMEOUT)
+    supervisor.update(False, self.CP)
+    time.sleep(0.2)
+    assert supervisor.update(False, self.CP)
+    assert p.proc is None
+    assert proc.exitcode == -signal.SIGKILL
+    supervisor.close()
+
+  def test_matches_ensure_running(self):
+    for started in (False, True):
+      ref_procs = [NoopProcess(p.name, p.should_run) for p in procs]
+      ensure_running(ref_procs, started, self.params, self.CP)
+
+      fake_procs = [NoopProcess(p.name, p.should_run) for p in procs]
+      supervisor = ProcessSupervisor(fake_procs, self.params)
+      supervisor.update(started, self.CP)
+      supervisor.close()
+      assert {p.name for p in fake_procs if p.proc is not None} == {p.name for p in ref_procs if p.proc is not None}
@@ -0,0 +1,99 @@
+import importlib
+import os
+import signal
+import sys
+import uuid
+from multiprocessing import Process
+
+import pytest
+
+from openpilot.system.manager.zygote import Zygote
+
+
+def run_module(module: str, name: str, start_time: float | None = None) -> None:
+  # like process.launcher: import the daemon, then run it
+  mod = importlib.import_module(module)
+  with open(os.environ["ZYGOTE_TEST_OUT"], "a") as f:
+    f.write(f"{name} {os.getpid()}\n")
+  mod.main()
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+  suffix = uuid.uuid4().hex[:8]
+  heavy, daemon = f"zygote_heavy_{suffix}", f"zygote_daemon_{suffix}"
+  # stands in for the heavy imports shared by daemons, like numpy and the capnp schemas
+  (tmp_path / f"{heavy}.py").write_text(f"""import os
+with open({str(tmp_path / 'imports.txt')!r}, "a") as f:
+  f.write(f"{{os.getpid()}}\\n")
+""")
+  (tmp_path / f"{daemon}.py").write_text(f"""import os, signal, sys, time
+import {heavy}
+
+def main():
+  action = os.environ.get("ZYGOTE_TEST_ACTION", "exit0")
+  if action == "raise":
+    raise RuntimeError("daemon crashed")
+  elif action == "sleep":
+    time.sleep(60)
+  sys.exit(int(action[4:]))
+""")
+  monkeypatch.syspath_prepend(str(tmp_path))
+  monkeypatch.setenv("ZYGOTE_TEST_OUT", str(tmp_path / "started.txt"))
+  yield heavy, daemon, tmp_path
+  for m in (heavy, daemon):
+    sys.modules.pop(m, None)
+
+
+def started_pids(out):
+  return {name: int(pid) for name, pid in (line.split() for line in (out / "started.txt").read_text().splitlines())}
+
+
+def import_pids(out):
+  return {int(pid) for pid in (out / "imports.txt").read_text().split()}
+
+
+class TestZygote:
+  def test_exit_codes(self, modules, monkeypatch):
+    heavy, daemon, _ = modules
+    zygote = Zygote(run_module, preload=[heavy])
+    zygote.start()
+    try:
+      for action, expected in (("exit0", 0), ("exit3", 3), ("raise", 1)):
+        monkeypatch.setenv("ZYGOTE_TEST_ACTION", action)
+        child = zygote.spawn(daemon, action)
+        child.join(5)
+        assert child.exitcode == expected, action
+
+      monkeypatch.setenv("ZYGOTE_TEST_ACTION", "sleep")
+      child = zygote.spawn(daemon, "sleep")
+      assert child.is_alive()
+      os.kill(child.pid, signal.SIGKILL)
+      child.join(5)
+      assert child.exitcode == -signal.SIGKILL
+    finally:
+      zygote.stop()
+
+  def test_preloaded(self, modules):
+    heavy, daemon, out = modules
+    zygote = Zygote(run_module, preload=[heavy])
+    zygote.start()
+    try:
+      # let the zygote finish preloading, manager starts it well before the first onroad transition
+      zygote.spawn(daemon, "warmup").join(5)
+
+      for i in range(3):
+        proc = Process(target=run_module, args=(daemon, f"cold{i}"))
+        proc.start()
+        proc.join(5)
+        assert proc.exitcode == 0
+        child = zygote.spawn(daemon, f"zygote{i}")
+        child.join(5)
+        assert child.exitcode == 0
+    finally:
+      zygote.stop()
+
+    # the children of the zygote start with the shared imports already done
+    pids, imported = started_pids(out), import_pids(out)
+    assert all(pids[f"cold{i}"] in imported for i in range(3))
+    assert not any(pids[f"zygote{i}"] in imported for i in range(3))
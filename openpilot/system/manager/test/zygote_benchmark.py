@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Launch time of python daemons, from the manager deciding to start one until its module is
+imported, started cold as PythonProcess does against forked from a zygote with ZYGOTE_PRELOAD.
+The daemons are only imported, not run.
+
+  zygote_benchmark.py [-n launches] [modules ...]
+"""
+import argparse
+import importlib
+import os
+import tempfile
+import time
+from multiprocessing import Process
+
+import numpy as np
+
+from openpilot.system.manager.zygote import Zygote
+
+DEFAULT_MODULES = [
+  "openpilot.selfdrive.controls.plannerd",
+  "openpilot.selfdrive.controls.radard",
+  "openpilot.selfdrive.locationd.calibrationd",
+  "openpilot.selfdrive.locationd.paramsd",
+]
+
+
+def import_only(module: str, name: str, start_time: float | None = None) -> None:
+  # like process.launcher, without running the daemon
+  importlib.import_module(module)
+  with open(os.environ["ZYGOTE_BENCHMARK_OUT"], "a") as f:
+    f.write(f"{name} {time.monotonic() - start_time}\n")
+
+
+def launch_times(out: str) -> dict[str, list[float]]:
+  times: dict[str, list[float]] = {}
+  with open(out) as f:
+    for name, t in (line.rsplit(" ", 1) for line in f):
+      times.setdefault(name, []).append(float(t) * 1e3)
+  return times
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Launch time of python daemons, cold against the zygote")
+  parser.add_argument("-n", "--launches", type=int, default=5)
+  parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+  args = parser.parse_args()
+
+  with tempfile.NamedTemporaryFile() as out:
+    os.environ["ZYGOTE_BENCHMARK_OUT"] = out.name
+    zygote = Zygote(import_only)
+    zygote.start()
+    try:
+      # let the zygote finish preloading, manager starts it well before the first onroad transition
+      zygote.spawn("os", "warmup").join(60)
+      for module in args.modules:
+        for _ in range(args.launches):
+          proc = Process(target=import_only, args=(module, f"cold {module}", time.monotonic()))
+          proc.start()
+          proc.join(60)
+          zygote.spawn(module, f"zygote {module}").join(60)
+    finally:
+      zygote.stop()
+    times = launch_times(out.name)
+
+  for module in args.modules:
+    cold, warm = times.get(f"cold {module}", [np.nan]), times.get(f"zygote {module}", [np.nan])
+    print(f"{module:>45}: cold {np.median(cold):7.1f} ms, zygote {np.median(warm):7.1f} ms")
@@ -0,0 +1,226 @@
+"""
+Preforked zygote for PythonProcess, enabled with MANAGER_ZYGOTE=1.
+
+The zygote is forked from manager once, imports the modules most daemons need and then
+forks daemons on request, so starting a daemon only pays for the imports specific to it.
+Daemons are children of the zygote, which reaps them and reports their exit codes back.
+"""
+import fcntl
+import importlib
+import os
+import signal
+import sys
+import time
+import traceback
+from collections.abc import Callable, Iterable
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection, wait
+
+from setproctitle import setproctitle
+
+# heavy modules shared by most python daemons
+ZYGOTE_PRELOAD = [
+  "numpy",
+  "capnp",
+  "openpilot.cereal.log",
+  "openpilot.cereal.messaging",
+  "openpilot.common.params",
+  "openpilot.common.realtime",
+  "openpilot.common.swaglog",
+  "openpilot.system.sentry",
+  "opendbc.car.structs",
+  "opendbc.car.interfaces",
+]
+
+
+def zygote_enabled() -> bool:
+  return os.getenv("MANAGER_ZYGOTE") is not None
+
+
+class ZygoteChild:
+  """Stands in for multiprocessing.Process for daemons forked by the zygote."""
+  def __init__(self, zygote: 'Zygote', pid: int, name: str):
+    self.zygote = zygote
+    self.pid = pid
+    self.name = name
+    self._exitcode: int | None = None
+
+  @property
+  def exitcode(self) -> int | None:
+    if self._exitcode is None:
+      self.zygote.poll()
+    return self._exitcode
+
+  def is_alive(self) -> bool:
+    return self.exitcode is None
+
+  def join(self, timeout: float | None = None) -> None:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while self.exitcode is None:
+      remaining = None if deadline is None else deadline - time.monotonic()
+      if remaining is not None and remaining <= 0:
+        break
+      self.zygote.poll(remaining)
+
+
+class Zygote:
+  def __init__(self, target: Callable[[str, str, float], None], preload: Iterable[str] = ZYGOTE_PRELOAD):
+    self.target = target
+    self.preload = list(preload)
+    self.pid: int | None = None
+    self.conn: Connection | None = None
+    self.children: dict[int, ZygoteChild] = {}
+
+  def start(self) -> None:
+    parent_conn, child_conn = Pipe()
+    pid = os.fork()
+    if pid == 0:
+      parent_conn.close()
+      code = 0
+      try:
+        self._serve(child_conn)
+      except BaseException:
+        traceback.print_exc()
+        code = 1
+      finally:
+        os._exit(code)
+
+    child_conn.close()
+    self.conn = parent_conn
+    self.pid = pid
+
+  def stop(self) -> None:
+    if self.conn is not None:
+      # the zygote exits when its end of the pipe closes
+      self.conn.close()
+      self.conn = None
+    if self.pid is not None:
+      os.waitpid(self.pid, 0)
+      self.pid = None
+    self._orphan_children()
+
+  def spawn(self, module: str, name: str) -> ZygoteChild:
+    for _ in range(2):
+      if self.conn is None:
+        self.start()
+      try:
+        self.conn.send(("spawn", module, name, dict(os.environ), time.monotonic()))
+        while True:
+          msg = self.conn.recv()
+          if msg[0] == "started":
+            child = self.children[msg[1]] = ZygoteChild(self, msg[1], name)
+            return child
+          self._handle(msg)
+      except (EOFError, OSError):
+        self._lost()
+    raise RuntimeError(f"zygote failed to start {name}")
+
+  def poll(self, timeout: float | None = 0.) -> None:
+    if self.conn is None:
+      self._orphan_children()
+      time.sleep(0.01 if timeout is None else min(timeout, 0.01))
+      return
+    try:
+      while self.conn.poll(timeout):
+        self._handle(self.conn.recv())
+        timeout = 0.
+    except (EOFError, OSError):
+      self._lost()
+
+  def _handle(self, msg: tuple) -> None:
+    if msg[0] == "exited":
+      child = self.children.pop(msg[1], None)
+      if child is not None:
+        child._exitcode = msg[2]
+
+  def _lost(self) -> None:
+    print("WARNING: manager zygote died", file=sys.stderr)
+    if self.conn is not None:
+      self.conn.close()
+      self.conn = None
+    if self.pid is not None:
+      os.waitpid(self.pid, 0)
+      self.pid = None
+    self._orphan_children()
+
+  def _orphan_children(self) -> None:
+    # without the zygote exit codes are lost, children that are gone report 1
+    for pid, child in list(self.children.items()):
+      try:
+        os.kill(pid, 0)
+      except ProcessLookupError:
+        child._exitcode = 1
+        del self.children[pid]
+
+  # runs in the zygote
+
+  def _serve(self, conn: Connection) -> None:
+    setproctitle("manager zygote")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    for module in self.preload:
+      try:
+        importlib.import_module(module)
+      except Exception:
+        print(f"WARNING: zygote failed to preload {module}", file=sys.stderr)
+
+    # wake up on SIGCHLD to reap daemons as soon as they exit
+    wakeup_r, wakeup_w = os.pipe()
+    for fd in (wakeup_r, wakeup_w):
+      fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(wakeup_w, warn_on_full_buffer=False)
+
+    while True:
+      ready = wait([conn, wakeup_r])
+      if wakeup_r in ready:
+        try:
+          os.read(wakeup_r, 512)
+        except BlockingIOError:
+          pass
+      self._reap(conn)
+
+      if conn in ready:
+        try:
+          msg = conn.recv()
+        except EOFError:
+          return
+        if msg[0] == "spawn":
+          pid = os.fork()
+          if pid == 0:
+            os.close(wakeup_r)
+            os.close(wakeup_w)
+            self._run_child(conn, *msg[1:])
+          conn.send(("started", pid))
+
+  def _reap(self, conn: Connection) -> None:
+    while True:
+      try:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+      except ChildProcessError:
+        return
+      if pid == 0:
+        return
+      conn.send(("exited", pid, os.waitstatus_to_exitcode(status)))
+
+  def _run_child(self, conn: Connection, module: str, name: str, environ: dict[str, str], start_time: float) -> None:
+    # exit codes follow multiprocessing.Process
+    conn.close()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    os.environ.clear()
+    os.environ.update(environ)
+
+    code = 0
+    try:
+      self.target(module, name, start_time)
+    except SystemExit as e:
+      code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+      traceback.print_exc()
+      code = 1
+    finally:
+      sys.stdout.flush()
+      sys.stderr.flush()
+      os._exit(code)
@@ -10,11 +10,10 @@ JIFFY = os.sysconf(os.sysconf_names['SC_CLK_TCK'])
 PAGE_SIZE = os.sysconf(os.sysconf_names['SC_PAGE_SIZE'])
 
 
-def _cpu_times() -> list[dict[str, float]]:
+def _cpu_times(stat: str) -> list[dict[str, float]]:
   cpu_times: list[dict[str, float]] = []
   try:
-    with open('/proc/stat') as f:
-      lines = f.readlines()[1:]
+    lines = stat.splitlines()[1:]
     for line in lines:
       if not line.startswith('cpu') or len(line) < 4 or not line[3].isdigit():
         break
@@ -30,21 +29,20 @@ def _cpu_times() -> list[dict[str, float]]:
         'softirq': float(parts[7]) / JIFFY,
       })
   except Exception:
-    cloudlog.exception("failed to read /proc/stat")
+    cloudlog.exception("failed to parse /proc/stat")
   return cpu_times
 
 
-def _mem_info() -> dict[str, int]:
+def _mem_info(meminfo: str) -> dict[str, int]:
   keys = ["MemTotal:", "MemFree:", "MemAvailable:", "Buffers:", "Cached:", "Active:", "Inactive:", "Shmem:"]
   info: dict[str, int] = dict.fromkeys(keys, 0)
   try:
-    with open('/proc/meminfo') as f:
-      for line in f:
-        parts = line.split()
-        if parts and parts[0] in info:
-          info[parts[0]] = int(parts[1]) * 1024
+    for line in meminfo.splitlines():
+      parts = line.split()
+      if parts and parts[0] in info:
+        info[parts[0]] = int(parts[1]) * 1024
   except Exception:
-    cloudlog.exception("failed to read /proc/meminfo")
+    cloudlog.exception("failed to parse /proc/meminfo")
   return info
 
 
@@ -129,19 +127,21 @@ _smaps_path: str | None = None  # auto-detected on first call
 
 # per-VMA smaps is expensive (kernel walks page tables for every VMA).
 # cache results and only refresh every N cycles to keep CPU low.
-_smaps_cache: dict[int, SmapsData] = {}
-_smaps_cycle = 0
 _SMAPS_EVERY = 20  # refresh every 20th cycle (40s at 0.5Hz)
 
+# stat fds are kept open between samples, up to this many processes
+MAX_OPEN_FDS = 512
+STAT_READ_SIZE = 4096
+
 
-def _read_smaps(pid: int) -> SmapsData:
+def _read_smaps(proc_path: str, pid: int) -> SmapsData:
   global _smaps_path
   try:
     if _smaps_path is None:
-      _smaps_path = 'smaps_rollup' if os.path.exists(f'/proc/{pid}/smaps_rollup') else 'smaps'
+      _smaps_path = 'smaps_rollup' if os.path.exists(f'{proc_path}/{pid}/smaps_rollup') else 'smaps'
 
     result: SmapsData = {'pss': 0, 'pss_anon': 0, 'pss_shmem': 0}
-    with open(f'/proc/{pid}/{_smaps_path}', 'rb') as f:
+    with open(f'{proc_path}/{pid}/{_smaps_path}', 'rb') as f:
       for line in f:
         parts = line.split()
         if len(parts) >= 2 and parts[0] in _SMAPS_KEYS:
@@ -157,13 +157,6 @@ def _read_smaps(pid: int) -> SmapsData:
     return {'pss': 0, 'pss_anon': 0, 'pss_shmem': 0}
 
 
-def _get_smaps_cached(pid: int) -> SmapsData:
-  """Return cached smaps data, refreshing every _SMAPS_EVERY cycles."""
-  if _smaps_cycle == 0 or pid not in _smaps_cache:
-    _smaps_cache[pid] = _read_smaps(pid)
-  return _smaps_cache.get(pid, {'pss': 0, 'pss_anon': 0, 'pss_shmem': 0})
-
-
 class ProcExtra(TypedDict):
   pid: int
   name: str
@@ -171,50 +164,134 @@ class ProcExtra(TypedDict):
   cmdline: list[str]
 
 
-_proc_cache: dict[int, ProcExtra] = {}
-
-
-def _get_proc_extra(pid: int, name: str) -> ProcExtra:
-  cache: ProcExtra | None = _proc_cache.get(pid)
-  if cache is None or cache.get('name') != name:
-    exe = ''
-    cmdline: list[str] = []
-    try:
-      exe = os.readlink(f'/proc/{pid}/exe')
-    except OSError:
-      pass
-    try:
-      with open(f'/proc/{pid}/cmdline', 'rb') as f:
-        cmdline = [c.decode('utf-8', errors='replace') for c in f.read().split(b'\0') if c]
-    except OSError:
-      pass
-    cache = {'pid': pid, 'name': name, 'exe': exe, 'cmdline': cmdline}
-    _proc_cache[pid] = cache
-  return cache
-
-
-def _procs() -> list[ProcStat]:
-  stats: list[ProcStat] = []
-  for pid_str in os.listdir('/proc'):
-    if not pid_str.isdigit():
-      continue
+def _read_proc_extra(proc_path: str, pid: int, name: str) -> ProcExtra:
+  exe = ''
+  cmdline: list[str] = []
+  try:
+    exe = os.readlink(f'{proc_path}/{pid}/exe')
+  except OSError:
+    pass
+  try:
+    with open(f'{proc_path}/{pid}/cmdline', 'rb') as f:
+      cmdline = [c.decode('utf-8', errors='replace') for c in f.read().split(b'\0') if c]
+  except OSError:
+    pass
+  return {'pid': pid, 'name': name, 'exe': exe, 'cmdline': cmdline}
+
+
+class _PidState:
+  __slots__ = ('fd', 'extra', 'smaps')
+
+  def __init__(self, fd: int | None, extra: ProcExtra):
+    self.fd = fd
+    self.extra = extra
+    self.smaps: SmapsData | None = None
+
+
+class ProcSampler:
+  """
+  Keeps per-PID state between samples: the open stat fd, which is reread in place,
+  and the fields that don't change for the life of a process (exe, cmdline).
+  New and exited PIDs are found by diffing the /proc listing against the known set.
+  A reused PID is detected by its old stat fd failing with ESRCH.
+  """
+  def __init__(self, proc_path: str = '/proc', max_open_fds: int = MAX_OPEN_FDS):
+    self.proc_path = proc_path
+    self.max_open_fds = max_open_fds
+    self.pids: dict[int, _PidState] = {}
+    self.open_fds = 0
+    self.smaps_cycle = 0
+    self._file_fds: dict[str, int] = {}
+
+  def close(self) -> None:
+    for pid in list(self.pids):
+      self._drop(pid)
+    for fd in self._file_fds.values():
+      os.close(fd)
+    self._file_fds.clear()
+
+  def _drop(self, pid: int) -> None:
+    state = self.pids.pop(pid)
+    if state.fd is not None:
+      os.close(state.fd)
+      self.open_fds -= 1
+
+  def read_file(self, name: str) -> str:
+    # system-wide files like /proc/stat and /proc/meminfo, through a reused fd
+    fd = self._file_fds.get(name)
+    if fd is None:
+      fd = self._file_fds[name] = os.open(f'{self.proc_path}/{name}', os.O_RDONLY)
+    chunks = []
+    offset = 0
+    while chunk := os.pread(fd, 65536, offset):
+      chunks.append(chunk)
+      offset += len(chunk)
+    return b''.join(chunks).decode()
+
+  def _read_stat(self, pid: int, state: _PidState | None) -> tuple[str, int | None]:
+    if state is not None and state.fd is not None:
+      return os.pread(state.fd, STAT_READ_SIZE, 0).decode(errors='replace'), state.fd
+
+    path = f'{self.proc_path}/{pid}/stat'
+    if state is None and self.open_fds < self.max_open_fds:
+      fd = os.open(path, os.O_RDONLY)
+      try:
+        return os.pread(fd, STAT_READ_SIZE, 0).decode(errors='replace'), fd
+      except OSError:
+        os.close(fd)
+        raise
+    with open(path) as f:
+      return f.read(), None
+
+  def _sample_pid(self, pid: int) -> tuple[ProcStat, ProcExtra, _PidState] | None:
+    state = self.pids.get(pid)
     try:
-      with open(f'/proc/{pid_str}/stat') as f:
-        stat = f.read()
-      parsed = _parse_proc_stat(stat)
-      if parsed is not None:
-        stats.append(parsed)
+      stat, fd = self._read_stat(pid, state)
     except OSError:
-      continue
-  return stats
-
-
-def build_proc_log_message(msg) -> None:
+      if state is None:
+        return None
+      # exited, or the pid was reused by a new process: start over
+      self._drop(pid)
+      return self._sample_pid(pid)
+
+    parsed = _parse_proc_stat(stat)
+    if parsed is None:
+      return None
+    if state is None:
+      state = self.pids[pid] = _PidState(fd, _read_proc_extra(self.proc_path, pid, parsed['name']))
+      self.open_fds += fd is not None
+    elif state.extra['name'] != parsed['name']:
+      # comm changed (exec), cmdline and exe may have changed with it
+      state.extra = _read_proc_extra(self.proc_path, pid, parsed['name'])
+    return parsed, state.extra, state
+
+  def procs(self) -> list[tuple[ProcStat, ProcExtra, _PidState]]:
+    current = [int(p) for p in os.listdir(self.proc_path) if p.isdigit()]
+    for pid in self.pids.keys() - set(current):
+      self._drop(pid)
+
+    procs = []
+    for pid in current:
+      if (sample := self._sample_pid(pid)) is not None:
+        procs.append(sample)
+    return procs
+
+  def smaps(self, pid: int, state: _PidState) -> SmapsData:
+    """Return cached smaps data, refreshing every _SMAPS_EVERY cycles."""
+    if self.smaps_cycle == 0 or state.smaps is None:
+      state.smaps = _read_smaps(self.proc_path, pid)
+    return state.smaps
+
+  def next_cycle(self) -> None:
+    self.smaps_cycle = (self.smaps_cycle + 1) % _SMAPS_EVERY
+
+
+def build_proc_log_message(msg, sampler: ProcSampler) -> None:
   pl = msg.procLog
 
-  procs = _procs()
+  procs = sampler.procs()
   l = pl.init('procs', len(procs))
-  for i, r in enumerate(procs):
+  for i, (r, extra, state) in enumerate(procs):
     proc = l[i]
     proc.pid = r['pid']
     proc.state = ord(r['state'][0])
@@ -232,20 +309,21 @@ def build_proc_log_message(msg) -> None:
     proc.processor = r['processor']
     proc.name = r['name']
 
-    extra = _get_proc_extra(r['pid'], r['name'])
     proc.exe = extra['exe']
-    cmdline = proc.init('cmdline', len(extra['cmdline']))
-    for j, arg in enumerate(extra['cmdline']):
-      cmdline[j] = arg
+    proc.cmdline = extra['cmdline']
 
     # smaps is expensive (kernel walks page tables); skip small processes, use cache
     if r['rss'] * PAGE_SIZE > 5 * 1024 * 1024:
-      smaps = _get_smaps_cached(r['pid'])
+      smaps = sampler.smaps(r['pid'], state)
       proc.memPss = smaps['pss']
       proc.memPssAnon = smaps['pss_anon']
       proc.memPssShmem = smaps['pss_shmem']
 
-  cpu_times = _cpu_times()
+  try:
+    cpu_times = _cpu_times(sampler.read_file('stat'))
+  except OSError:
+    cloudlog.exception("failed to read /proc/stat")
+    cpu_times = []
   cpu_list = pl.init('cpuTimes', len(cpu_times))
   for i, ct in enumerate(cpu_times):
     cpu = cpu_list[i]
@@ -258,7 +336,11 @@ def build_proc_log_message(msg) -> None:
     cpu.irq = ct['irq']
     cpu.softirq = ct['softirq']
 
-  mem_info = _mem_info()
+  try:
+    mem_info = _mem_info(sampler.read_file('meminfo'))
+  except OSError:
+    cloudlog.exception("failed to read /proc/meminfo")
+    mem_info = _mem_info('')
   pl.mem.total = mem_info["MemTotal:"]
   pl.mem.free = mem_info["MemFree:"]
   pl.mem.available = mem_info["MemAvailable:"]
@@ -268,16 +350,16 @@ def build_proc_log_message(msg) -> None:
   pl.mem.inactive = mem_info["Inactive:"]
   pl.mem.shared = mem_info["Shmem:"]
 
-  global _smaps_cycle
-  _smaps_cycle = (_smaps_cycle + 1) % _SMAPS_EVERY
+  sampler.next_cycle()
 
 
 def main() -> NoReturn:
   pm = messaging.PubMaster(['procLog'])
   rk = Ratekeeper(0.5)
+  sampler = ProcSampler()
   while True:
     msg = messaging.new_message('procLog', valid=True)
-    build_proc_log_message(msg)
+    build_proc_log_message(msg, sampler)
     pm.send('procLog', msg)
     rk.keep_time()
 
@@ -4,6 +4,8 @@ import time
 import ctypes
 import select
 import threading
+import numpy as np
+from collections.abc import Iterator
 
 import openpilot.cereal.messaging as messaging
 from openpilot.cereal.services import SERVICE_LIST
@@ -14,14 +16,19 @@ from openpilot.common.gpio import gpiochip_get_ro_value_fd, gpioevent_data
 
 from openpilot.system.sensord.sensors.i2c_sensor import Sensor
 from openpilot.system.sensord.sensors.lsm6ds3_accel import LSM6DS3_Accel
+from openpilot.system.sensord.sensors.lsm6ds3_fifo import LSM6DS3_FIFO
 from openpilot.system.sensord.sensors.lsm6ds3_gyro import LSM6DS3_Gyro
 from openpilot.system.sensord.sensors.lsm6ds3_temp import LSM6DS3_Temp
 
 I2C_BUS_IMU = 1
 
-def interrupt_loop(sensors: list[tuple[Sensor, str, bool]], event) -> None:
-  pm = messaging.PubMaster([service for sensor, service, interrupt in sensors if interrupt])
+GPIOEVENT_EVENT_RISING_EDGE = 0x01
 
+def gpio_interrupts(event: threading.Event) -> Iterator[tuple[int, bool] | None]:
+  """
+  Yields the monotonic time and whether it's a rising edge for each IMU
+  interrupt, and None when there was no interrupt for 100ms.
+  """
   # NOTE: the gyro and accelerometer share an IRQ due to the comma three
   # routing only one GPIO from the LSM to the SOC, but comma 3X and four
   # have two. if we want better timestamps in the future, we can use both.
@@ -46,6 +53,7 @@ def interrupt_loop(sensors: list[tuple[Sensor, str, bool]], event) -> None:
     events = poller.poll(100)
     if not events:
       cloudlog.error("poll timed out")
+      yield None
       continue
     if not (events[0][1] & (select.POLLIN | select.POLLPRI)):
       cloudlog.error("no poll events set")
@@ -60,7 +68,17 @@ def interrupt_loop(sensors: list[tuple[Sensor, str, bool]], event) -> None:
       offset = cur_offset
       continue
 
-    ts = evd.timestamp - cur_offset
+    yield evd.timestamp - cur_offset, evd.id == GPIOEVENT_EVENT_RISING_EDGE
+
+
+def interrupt_loop(sensors: list[tuple[Sensor, str, bool]], event) -> None:
+  pm = messaging.PubMaster([service for sensor, service, interrupt in sensors if interrupt])
+
+  for irq in gpio_interrupts(event):
+    if irq is None:
+      continue
+
+    ts, _ = irq
     for sensor, service, interrupt in sensors:
       if interrupt:
         try:
@@ -76,6 +94,45 @@ def interrupt_loop(sensors: list[tuple[Sensor, str, bool]], event) -> None:
           cloudlog.exception(f"Error processing {service}")
 
 
+def imu_messages(source, timestamps: np.ndarray, accel: np.ndarray, gyro: np.ndarray) -> list[tuple[str, bytes]]:
+  # filled in place instead of building a SensorEventData per sample and copying it into the event
+  msgs = []
+  for t, a, g in zip(timestamps.tolist(), accel.tolist(), gyro.tolist(), strict=True):
+    for service, measurement, v in (("accelerometer", "acceleration", a), ("gyroscope", "gyroUncalibrated", g)):
+      msg = messaging.new_message(service, valid=True)
+      evt = getattr(msg, service)
+      evt.timestamp = t
+      evt.source = source
+      evt.init(measurement).v = v
+      msgs.append((service, msg.to_bytes()))
+  return msgs
+
+
+def fifo_loop(sensor: LSM6DS3_FIFO, event: threading.Event) -> None:
+  pm = messaging.PubMaster(["accelerometer", "gyroscope"])
+
+  for irq in gpio_interrupts(event):
+    # the threshold signal stays high until the FIFO is drained below it,
+    # its falling edge comes from our own read
+    if irq is not None and not irq[1]:
+      continue
+
+    try:
+      if irq is None:
+        # missed interrupt, drain so the threshold can trigger again
+        timestamps, accel, gyro = sensor.read_samples(time.monotonic_ns(), newest=True)
+      else:
+        timestamps, accel, gyro = sensor.read_samples(irq[0])
+      if not sensor.is_data_valid():
+        continue
+      for service, dat in imu_messages(sensor.source, timestamps, accel, gyro):
+        pm.send(service, dat)
+    except Sensor.DataNotReady:
+      pass
+    except Exception:
+      cloudlog.exception("Error processing IMU FIFO")
+
+
 def polling_loop(sensor: Sensor, service: str, event: threading.Event) -> None:
   pm = messaging.PubMaster([service])
   rk = Ratekeeper(SERVICE_LIST[service].frequency, print_delay_threshold=None)
@@ -94,11 +151,21 @@ def polling_loop(sensor: Sensor, service: str, event: threading.Event) -> None:
 def main() -> None:
   config_realtime_process([1, ], 1)
 
-  sensors_cfg = [
-    (LSM6DS3_Accel(I2C_BUS_IMU), "accelerometer", True),
-    (LSM6DS3_Gyro(I2C_BUS_IMU), "gyroscope", True),
-    (LSM6DS3_Temp(I2C_BUS_IMU), "temperatureSensor", False),
-  ]
+  # batch the accelerometer and gyroscope in the LSM FIFO, fewer wakeups
+  # and I2C transfers at the cost of up to a batch of publish latency
+  use_fifo = os.getenv("LSM_FIFO") == "1"
+  if use_fifo:
+    fifo = LSM6DS3_FIFO(I2C_BUS_IMU, int(os.getenv("LSM_FIFO_THRESHOLD", "4")))
+    sensors_cfg = [
+      (fifo, "accelerometer", True),  # and gyroscope
+      (LSM6DS3_Temp(I2C_BUS_IMU), "temperatureSensor", False),
+    ]
+  else:
+    sensors_cfg = [
+      (LSM6DS3_Accel(I2C_BUS_IMU), "accelerometer", True),
+      (LSM6DS3_Gyro(I2C_BUS_IMU), "gyroscope", True),
+      (LSM6DS3_Temp(I2C_BUS_IMU), "temperatureSensor", False),
+    ]
 
   # Reset sensors
   for sensor, _, _ in sensors_cfg:
@@ -109,9 +176,10 @@ def main() -> None:
 
   # Initialize sensors
   exit_event = threading.Event()
-  threads = [
-    threading.Thread(target=interrupt_loop, args=(sensors_cfg, exit_event), daemon=True)
-  ]
+  if use_fifo:
+    threads = [threading.Thread(target=fifo_loop, args=(fifo, exit_event), daemon=True)]
+  else:
+    threads = [threading.Thread(target=interrupt_loop, args=(sensors_cfg, exit_event), daemon=True)]
   for sensor, service, interrupt in sensors_cfg:
     try:
       sensor.init()
@@ -13,8 +13,9 @@ class Sensor:
   class DataNotReady(SensorException):
     pass
 
-  def __init__(self, bus: int) -> None:
-    self.bus = SMBus(bus)
+  def __init__(self, bus: int | SMBus) -> None:
+    # an already opened bus, e.g. a fake one in tests, is used as is
+    self.bus = SMBus(bus) if isinstance(bus, int) else bus
     self.source = log.SensorEventData.SensorSource.velodyne  # unknown
     self.start_ts = 0.
 
@@ -24,6 +25,9 @@ class Sensor:
   def read(self, addr: int, length: int) -> bytes:
     return bytes(self.bus.read_i2c_block_data(self.device_address, addr, length))
 
+  def read_burst(self, addr: int, length: int) -> bytes:
+    return self.bus.read_i2c_burst(self.device_address, addr, length)
+
   def write(self, addr: int, data: int) -> None:
     self.bus.write_byte_data(self.device_address, addr, data)
 
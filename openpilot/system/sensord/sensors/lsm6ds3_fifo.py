@@ -0,0 +1,139 @@
+import math
+import time
+
+import numpy as np
+
+from openpilot.cereal import log
+from openpilot.common.i2c import SMBus
+from openpilot.system.sensord.sensors.i2c_sensor import Sensor
+
+class LSM6DS3_FIFO(Sensor):
+  # Accelerometer and gyroscope batched in the FIFO, drained on the FIFO threshold interrupt
+  LSM6DS3_FIFO_I2C_REG_FIFO_CTRL1   = 0x06
+  LSM6DS3_FIFO_I2C_REG_FIFO_CTRL2   = 0x07
+  LSM6DS3_FIFO_I2C_REG_FIFO_CTRL3   = 0x08
+  LSM6DS3_FIFO_I2C_REG_FIFO_CTRL5   = 0x0A
+  LSM6DS3_FIFO_I2C_REG_INT1_CTRL    = 0x0D
+  LSM6DS3_FIFO_I2C_REG_CTRL1_XL     = 0x10
+  LSM6DS3_FIFO_I2C_REG_CTRL2_G      = 0x11
+  LSM6DS3_FIFO_I2C_REG_CTRL3_C      = 0x12
+  LSM6DS3_FIFO_I2C_REG_FIFO_STATUS1 = 0x3A
+  LSM6DS3_FIFO_I2C_REG_FIFO_DATA_OUT_L = 0x3E
+
+  LSM6DS3_FIFO_ODR_104HZ          = (0b0100 << 4)
+  LSM6DS3_FIFO_FIFO_ODR_104HZ     = (0b0100 << 3)
+  LSM6DS3_FIFO_MODE_BYPASS        = 0b000
+  LSM6DS3_FIFO_MODE_CONTINUOUS    = 0b110
+  LSM6DS3_FIFO_NO_DECIMATION      = (0b001 << 3) | 0b001  # gyro and accel
+  LSM6DS3_FIFO_INT1_DRDY          = 0b11
+  LSM6DS3_FIFO_INT1_FTH           = (1 << 3)
+  LSM6DS3_FIFO_IF_INC_BDU         = 0b01000100
+  LSM6DS3_FIFO_STATUS2_OVER_RUN   = (1 << 6)
+  LSM6DS3_FIFO_FTH_MAX            = 0x7FF
+
+  ODR = 104.  # Hz
+  SAMPLE_WORDS = 6  # gyro x, y, z, then accel x, y, z
+  ACCEL_SCALE = 9.81 * 2.0 / (1 << 15)  # ±2g
+  GYRO_SCALE = (8.75 / 1000.0) * (math.pi / 180.0)  # ±250 deg/s
+
+  def __init__(self, bus: int | SMBus, threshold: int = 4) -> None:
+    super().__init__(bus)
+    # samples per interrupt, trades publish latency for fewer wakeups and transfers
+    assert 0 < threshold * self.SAMPLE_WORDS <= self.LSM6DS3_FIFO_FTH_MAX
+    self.threshold = threshold
+    self.overruns = 0
+
+  @property
+  def device_address(self) -> int:
+    return 0x6A
+
+  def reset(self):
+    self.write(0x12, 0x1)
+    time.sleep(0.1)
+
+  def init(self):
+    chip_id = self.verify_chip_id(0x0F, [0x69, 0x6A])
+    if chip_id == 0x6A:
+      self.source = log.SensorEventData.SensorSource.lsm6ds3trc
+    else:
+      self.source = log.SensorEventData.SensorSource.lsm6ds3
+
+    fth = self.threshold * self.SAMPLE_WORDS
+    int1 = self.read(self.LSM6DS3_FIFO_I2C_REG_INT1_CTRL, 1)[0]
+    int1 = (int1 & ~self.LSM6DS3_FIFO_INT1_DRDY) | self.LSM6DS3_FIFO_INT1_FTH
+    self.writes((
+      # Block data update, so no sample is split between the low and high bytes, and automatic address increment
+      (self.LSM6DS3_FIFO_I2C_REG_CTRL3_C, self.LSM6DS3_FIFO_IF_INC_BDU),
+      # Set ODR to 104 Hz, FS to ±2g and ±250 deg/s (default)
+      (self.LSM6DS3_FIFO_I2C_REG_CTRL1_XL, self.LSM6DS3_FIFO_ODR_104HZ),
+      (self.LSM6DS3_FIFO_I2C_REG_CTRL2_G, self.LSM6DS3_FIFO_ODR_104HZ),
+      # Empty the FIFO, then batch every gyro and accel sample at the sensor ODR
+      (self.LSM6DS3_FIFO_I2C_REG_FIFO_CTRL5, self.LSM6DS3_FIFO_MODE_BYPASS),
+      (self.LSM6DS3_FIFO_I2C_REG_FIFO_CTRL1, fth & 0xFF),
+      (self.LSM6DS3_FIFO_I2C_REG_FIFO_CTRL2, fth >> 8),
+      (self.LSM6DS3_FIFO_I2C_REG_FIFO_CTRL3, self.LSM6DS3_FIFO_NO_DECIMATION),
+      (self.LSM6DS3_FIFO_I2C_REG_FIFO_CTRL5, self.LSM6DS3_FIFO_FIFO_ODR_104HZ | self.LSM6DS3_FIFO_MODE_CONTINUOUS),
+      # Route the FIFO threshold instead of data ready to INT1
+      (self.LSM6DS3_FIFO_I2C_REG_INT1_CTRL, int1),
+    ))
+
+  def read_samples(self, ts: int, newest: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Drains all complete samples from the FIFO, oldest first. Returns their timestamps
+    and the accelerations (m/s^2) and angular rates (rad/s) in the device frame.
+
+    ts is the time of the threshold interrupt, when the FIFO had just filled up to
+    the threshold. With newest, ts is the time of the newest sample instead, e.g.
+    when draining without an interrupt. After an overrun, the sample that raised the
+    interrupt was overwritten, so the newest sample is anchored at the time of the read.
+    """
+    status = self.read(self.LSM6DS3_FIFO_I2C_REG_FIFO_STATUS1, 4)
+    words = status[0] | ((status[1] & 0x0F) << 8)
+    pattern = status[2] | ((status[3] & 0x03) << 8)  # axis of the next word read
+    if status[1] & self.LSM6DS3_FIFO_STATUS2_OVER_RUN:
+      # the oldest samples were overwritten, so these don't follow the previous batch,
+      # and the full FIFO holds the samples up to the status read
+      self.overruns += 1
+      ts, newest = time.monotonic_ns(), True
+
+    skip = -pattern % self.SAMPLE_WORDS  # rest of a partially read sample
+    n = max(words - skip, 0) // self.SAMPLE_WORDS
+    if n == 0:
+      raise self.DataNotReady
+
+    # With automatic address increment, reads wrap from FIFO_DATA_OUT_H back
+    # to FIFO_DATA_OUT_L, so the whole batch is a single transfer
+    length = 2 * (skip + n * self.SAMPLE_WORDS)
+    b = self.read_burst(self.LSM6DS3_FIFO_I2C_REG_FIFO_DATA_OUT_L, length)
+    raw = np.frombuffer(b, dtype='<i2')[skip:].reshape(n, self.SAMPLE_WORDS)
+
+    # samples after the threshold one came in between the interrupt and the read
+    anchor = n - 1 if newest else self.threshold - 1
+    timestamps = ts + np.round((np.arange(n) - anchor) * (1e9 / self.ODR)).astype(np.int64)
+
+    gyro = raw[:, [1, 0, 2]] * np.array([self.GYRO_SCALE, -self.GYRO_SCALE, self.GYRO_SCALE])
+    accel = raw[:, [4, 3, 5]] * np.array([self.ACCEL_SCALE, -self.ACCEL_SCALE, self.ACCEL_SCALE])
+    return timestamps, accel, gyro
+
+  def shutdown(self) -> None:
+    # Disable FIFO threshold interrupt on INT1
+    value = self.read(self.LSM6DS3_FIFO_I2C_REG_INT1_CTRL, 1)[0]
+    value &= ~self.LSM6DS3_FIFO_INT1_FTH
+    self.write(self.LSM6DS3_FIFO_I2C_REG_INT1_CTRL, value)
+
+    # Stop batching
+    self.write(self.LSM6DS3_FIFO_I2C_REG_FIFO_CTRL5, self.LSM6DS3_FIFO_MODE_BYPASS)
+
+    # Power down by clearing ODR bits
+    for reg in (self.LSM6DS3_FIFO_I2C_REG_CTRL1_XL, self.LSM6DS3_FIFO_I2C_REG_CTRL2_G):
+      value = self.read(reg, 1)[0]
+      value &= 0x0F
+      self.write(reg, value)
+
+if __name__ == "__main__":
+  s = LSM6DS3_FIFO(1)
+  s.init()
+  time.sleep(0.2)
+  t, a, g = s.read_samples(time.monotonic_ns(), newest=True)
+  print(f"{len(t)} samples, {np.linalg.norm(a, axis=1).mean():.2f} m/s^2, {np.abs(g).max():.3f} rad/s")
+  s.shutdown()
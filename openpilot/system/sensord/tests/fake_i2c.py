@@ -0,0 +1,86 @@
+from collections import deque
+
+import numpy as np
+
+
+class FakeSMBus:
+  """In-memory stand-in for common.i2c.SMBus, with a register map per device address."""
+  def __init__(self) -> None:
+    self.registers: dict[int, bytearray] = {}
+    self.transfers = 0
+
+  def close(self) -> None:
+    pass
+
+  def _regs(self, addr: int) -> bytearray:
+    return self.registers.setdefault(addr, bytearray(256))
+
+  def read_register(self, addr: int, register: int) -> int:
+    return self._regs(addr)[register]
+
+  def read_byte_data(self, addr: int, register: int, force: bool = False) -> int:
+    self.transfers += 1
+    return self.read_register(addr, register)
+
+  def write_byte_data(self, addr: int, register: int, value: int, force: bool = False) -> None:
+    self.transfers += 1
+    self._regs(addr)[register] = value & 0xFF
+
+  def read_i2c_block_data(self, addr: int, register: int, length: int, force: bool = False) -> list[int]:
+    assert 0 <= length <= 32
+    self.transfers += 1
+    return [self.read_register(addr, register + i) for i in range(length)]
+
+  def read_i2c_burst(self, addr: int, register: int, length: int) -> bytes:
+    self.transfers += 1
+    return bytes(self.read_register(addr, register + i) for i in range(length))
+
+
+class FakeLSM6DS3(FakeSMBus):
+  """FakeSMBus with an LSM6DS3 at 0x6A, batching pushed gyro and accel samples in its FIFO."""
+  ADDRESS = 0x6A
+  FIFO_WORDS = 2046  # whole samples, 4 kB on the LSM6DS3TR-C
+
+  def __init__(self, chip_id: int = 0x6A) -> None:
+    super().__init__()
+    self._regs(self.ADDRESS)[0x0F] = chip_id
+    self.fifo: deque[int] = deque(maxlen=self.FIFO_WORDS)
+    self.words_read = 0
+    self.over_run = False
+    self._low: int | None = None
+
+  def push(self, gyro, accel) -> None:
+    # raw readings, one row of x, y, z per sample
+    for g, a in zip(np.asarray(gyro, dtype=np.int16), np.asarray(accel, dtype=np.int16), strict=True):
+      if len(self.fifo) + 6 > self.FIFO_WORDS:
+        self.over_run = True
+      for w in (*g, *a):
+        if len(self.fifo) == self.FIFO_WORDS:
+          self.words_read += 1  # the oldest word is dropped, the pattern moves on with it
+        self.fifo.append(int(w) & 0xFFFF)
+
+  def read_register(self, addr: int, register: int) -> int:
+    if addr != self.ADDRESS or not (0x3A <= register <= 0x3F):
+      return super().read_register(addr, register)
+
+    if register == 0x3A:
+      return len(self.fifo) & 0xFF
+    elif register == 0x3B:
+      return (self.over_run << 6) | (len(self.fifo) == 0) << 4 | (len(self.fifo) >> 8)
+    elif register in (0x3C, 0x3D):
+      pattern = self.words_read % 6
+      return pattern & 0xFF if register == 0x3C else pattern >> 8
+
+    # FIFO_DATA_OUT_L and H, a burst read wraps from H back to L
+    if (register - 0x3E) % 2 == 0:
+      self._low = self.fifo.popleft() if self.fifo else 0
+      self.words_read += 1
+      self.over_run = False
+      return self._low & 0xFF
+    return (self._low or 0) >> 8
+
+  def read_i2c_burst(self, addr: int, register: int, length: int) -> bytes:
+    self.transfers += 1
+    if addr == self.ADDRESS and register == 0x3E:
+      return bytes(self.read_register(addr, 0x3E + i % 2) for i in range(length))
+    return bytes(self.read_register(addr, register + i) for i in range(length))
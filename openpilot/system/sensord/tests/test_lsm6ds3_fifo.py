@@ -0,0 +1,106 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from openpilot.cereal import log
+from openpilot.system.sensord.sensord import imu_messages
+from openpilot.system.sensord.sensors.lsm6ds3_fifo import LSM6DS3_FIFO
+from openpilot.system.sensord.tests.fake_i2c import FakeLSM6DS3
+
+PERIOD_NS = 1e9 / 104.
+
+
+def random_samples(rng, n):
+  return rng.integers(-(1 << 15), 1 << 15, (n, 3)), rng.integers(-(1 << 15), 1 << 15, (n, 3))
+
+
+class TestLSM6DS3FIFO:
+  def setup_method(self):
+    self.rng = np.random.default_rng(0)
+    self.bus = FakeLSM6DS3()
+    self.sensor = LSM6DS3_FIFO(self.bus, threshold=4)
+    self.sensor.init()
+
+  def test_init(self):
+    regs = self.bus.registers[0x6A]
+    assert regs[0x06] | (regs[0x07] << 8) == 4 * 6  # threshold in words
+    assert regs[0x0A] == (0b0100 << 3) | 0b110  # continuous at 104 Hz
+    assert regs[0x0D] & (1 << 3) and not regs[0x0D] & 0b11  # threshold, not data ready, interrupt
+    assert self.sensor.source == log.SensorEventData.SensorSource.lsm6ds3trc
+
+    self.sensor.shutdown()
+    assert regs[0x0A] == 0 and regs[0x0D] == 0
+    assert regs[0x10] >> 4 == 0 and regs[0x11] >> 4 == 0
+
+  def test_read_samples(self):
+    gyro, accel = random_samples(self.rng, 6)
+    self.bus.push(gyro, accel)
+    ts = 10**12
+
+    transfers = self.bus.transfers
+    timestamps, a, g = self.sensor.read_samples(ts)
+    assert self.bus.transfers - transfers == 2  # status, then the whole batch
+    assert len(self.bus.fifo) == 0
+
+    # the 4th sample raised the interrupt, two more came in before the read
+    np.testing.assert_array_equal(timestamps, ts + np.round((np.arange(6) - 3) * PERIOD_NS).astype(np.int64))
+    accel_scale = 9.81 * 2.0 / (1 << 15)
+    gyro_scale = (8.75 / 1000.0) * (math.pi / 180.0)
+    np.testing.assert_allclose(a, np.stack([accel[:, 1], -accel[:, 0], accel[:, 2]], axis=1) * accel_scale)
+    np.testing.assert_allclose(g, np.stack([gyro[:, 1], -gyro[:, 0], gyro[:, 2]], axis=1) * gyro_scale)
+
+    # without an interrupt, the newest sample is at ts
+    self.bus.push(*random_samples(self.rng, 3))
+    timestamps, _, _ = self.sensor.read_samples(ts, newest=True)
+    assert timestamps[-1] == ts and len(timestamps) == 3
+
+  def test_not_ready(self):
+    with pytest.raises(LSM6DS3_FIFO.DataNotReady):
+      self.sensor.read_samples(0)
+
+    # a partial sample stays in the FIFO
+    self.bus.fifo.extend([1, 2, 3])
+    with pytest.raises(LSM6DS3_FIFO.DataNotReady):
+      self.sensor.read_samples(0)
+    assert len(self.bus.fifo) == 3
+
+  def test_realign(self):
+    # a partially read sample is skipped, reads start again with gyro x
+    gyro, accel = random_samples(self.rng, 5)
+    self.bus.push(gyro, accel)
+    self.bus.read_i2c_burst(0x6A, 0x3E, 4)
+
+    _, a, g = self.sensor.read_samples(0)
+    assert len(a) == 4
+    np.testing.assert_allclose(g[:, 1], -gyro[1:, 0] * self.sensor.GYRO_SCALE)
+    np.testing.assert_allclose(a[:, 2], accel[1:, 2] * self.sensor.ACCEL_SCALE)
+
+  def test_overrun(self):
+    gyro, accel = random_samples(self.rng, 700)
+    self.bus.push(gyro, accel)
+    before = time.monotonic_ns()
+    timestamps, a, _ = self.sensor.read_samples(0)
+    assert self.sensor.overruns == 1
+    assert len(a) == FakeLSM6DS3.FIFO_WORDS // 6
+    np.testing.assert_allclose(a[-1, 2], accel[-1, 2] * self.sensor.ACCEL_SCALE)
+
+    # the interrupt time is stale, the newest sample came in just before the read
+    assert before <= timestamps[-1] <= time.monotonic_ns()
+    np.testing.assert_allclose(np.diff(timestamps), PERIOD_NS, atol=1)
+
+  def test_messages(self):
+    self.bus.push(*random_samples(self.rng, 4))
+    timestamps, a, g = self.sensor.read_samples(10**12)
+    msgs = imu_messages(self.sensor.source, timestamps, a, g)
+    assert [s for s, _ in msgs] == ["accelerometer", "gyroscope"] * 4
+
+    for i, (service, dat) in enumerate(msgs):
+      with log.Event.from_bytes(dat) as evt:
+        assert evt.valid and evt.which() == service
+        sensor_event = getattr(evt, service)
+        assert sensor_event.timestamp == timestamps[i // 2]
+        assert sensor_event.source == log.SensorEventData.SensorSource.lsm6ds3trc
+        v = sensor_event.acceleration.v if service == "accelerometer" else sensor_event.gyroUncalibrated.v
+        np.testing.assert_allclose(list(v), (a if service == "accelerometer" else g)[i // 2], rtol=1e-6)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Records per second logmessaged handles from a log storm of one daemon: every record on its
+own as before, in batches, and in batches aggregated into a single logMessage.
+
+  logmessaged_benchmark.py [-n records] [-b batch size]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import openpilot.cereal.messaging as messaging
+from openpilot.system.logmessaged import LogMessageBatcher
+from openpilot.system.tests.test_logmessaged import file_handler, make_records
+
+
+def unbatched(path, records, batch_size):
+  handler = file_handler(path)
+  for _, record in records:
+    handler.emit(record)
+    messaging.new_message(None, valid=True, logMessage=record).to_bytes()
+
+
+def batched(path, records, batch_size, **kwargs):
+  batcher = LogMessageBatcher(file_handler(path), rate=1e9, burst=10**9, **kwargs)
+  for i in range(0, len(records), batch_size):
+    batcher.process(records[i:i + batch_size], 0.)
+
+
+def aggregated(path, records, batch_size):
+  batched(path, records, batch_size, aggregate_threshold=100)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Records per second of logmessaged, unbatched against batched")
+  parser.add_argument("-n", "--records", type=int, default=2000)
+  parser.add_argument("-b", "--batch-size", type=int, default=500)
+  args = parser.parse_args()
+
+  records = make_records("ubloxd", args.records)
+  for handle in (unbatched, batched, aggregated):
+    with tempfile.TemporaryDirectory() as d:
+      st = time.perf_counter()
+      handle(Path(d), records, args.batch_size)
+      t = time.perf_counter() - st
+    print(f"{handle.__name__:>10}: {len(records) / t:8.0f} records/s")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Time of one proclogd sample of the processes in a synthetic /proc, ProcSampler against
+listing, opening and parsing everything every time.
+
+  proclogd_benchmark.py [-p processes] [-n samples]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from openpilot.system.proclogd import ProcSampler
+from openpilot.system.tests.test_proclogd import SyntheticProc, naive_procs
+
+
+def benchmark(sample, n):
+  ts = np.empty(n)
+  for i in range(n):
+    st = time.perf_counter()
+    sample()
+    ts[i] = time.perf_counter() - st
+  return ts * 1e3
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time of a proclogd sample, ProcSampler against naive")
+  parser.add_argument("-p", "--processes", type=int, default=300)
+  parser.add_argument("-n", "--samples", type=int, default=20)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as root:
+    proc = SyntheticProc(root)
+    for pid in range(1000, 1000 + args.processes):
+      proc.add(pid, f'proc{pid}', [f'/usr/bin/proc{pid}', '--arg'])
+
+    sampler = ProcSampler(root)
+    sampler.procs()  # opens every process once
+    for name, sample in (("naive", lambda: naive_procs(root)), ("ProcSampler", sampler.procs)):
+      ts = benchmark(sample, args.samples)
+      print(f"{name:>11}: mean {np.mean(ts):6.2f} ms, max {np.max(ts):6.2f} ms per sample of {args.processes} processes")
+    sampler.close()
@@ -0,0 +1,127 @@
+import os
+import random
+
+import pytest
+
+from openpilot.cereal import log
+from openpilot.system.journald import (ExportParser, JournalBatcher, JournalctlReader, JournalEntry, JournalFilter, build_message,
+                                       entry_from_fields)
+
+# a device journal in journalctl -o export format, with a crash looping service and multi line and non UTF-8 messages
+EXPORT_FILE = os.path.join(os.path.dirname(__file__), 'journal.export')
+
+
+def recorded_fields():
+  with open(EXPORT_FILE, 'rb') as f:
+    return ExportParser().feed(f.read())
+
+
+def to_export(entries: list[dict[bytes, bytes]]) -> bytes:
+  def field(name, value):
+    if b'\n' in value:
+      return name + b'\n' + len(value).to_bytes(8, 'little') + value + b'\n'
+    return name + b'=' + value + b'\n'
+  return b''.join(b''.join(field(k, v) for k, v in e.items()) + b'\n' for e in entries)
+
+
+def recorded_entries():
+  return [entry_from_fields(f, int(f[b'__REALTIME_TIMESTAMP'])) for f in recorded_fields()]
+
+
+class TestJournald:
+  def test_export_parser(self):
+    fields = recorded_fields()
+    assert len(fields) == 57
+    assert all(set(f) <= {b'__CURSOR', b'__REALTIME_TIMESTAMP', b'MESSAGE', b'PRIORITY', b'_PID', b'SYSLOG_IDENTIFIER', b'_SYSTEMD_UNIT'}
+               for f in fields)
+
+    # fed in arbitrary pieces, as read from a pipe
+    with open(EXPORT_FILE, 'rb') as f:
+      dat = f.read()
+    random.seed(0)
+    parser = ExportParser()
+    chunked = []
+    pos = 0
+    while pos < len(dat):
+      n = random.randint(1, 300)
+      chunked += parser.feed(dat[pos:pos + n])
+      pos += n
+    assert chunked == fields
+    assert ExportParser().feed(to_export(fields)) == fields
+
+    entries = recorded_entries()
+    assert entries[0] == JournalEntry(1729343400003000, 6, 0, 'kernel', '', 'Booting Linux on physical CPU 0x0000000000 [0x517f803c]')
+    traceback = next(e for e in entries if e.tag == 'gpsd-helper')
+    assert traceback.message.splitlines()[-1] == 'RuntimeError: no fix' and traceback.pid == 1503
+    assert next(e for e in entries if e.tag == 'ModemManager').message == 'qmi: invalid utf-8 in payload �� end'
+
+  def test_filter(self):
+    entries = recorded_entries()
+    assert all(JournalFilter().accepts(e) for e in entries)
+
+    warnings = [e for e in entries if JournalFilter(max_priority=4).accepts(e)]
+    assert {e.priority for e in warnings} == {3, 4} and len(warnings) == 44
+
+    units = JournalFilter(units=frozenset({'ssh.service', 'NetworkManager.service'}))
+    assert {e.tag for e in entries if units.accepts(e)} == {'sshd', 'NetworkManager'}
+    exclude = JournalFilter(exclude_units=frozenset({'ModemManager.service'}))
+    assert not any(e.unit == 'ModemManager.service' for e in entries if exclude.accepts(e))
+
+    assert JournalFilter(max_priority=3, units=frozenset({'a.service'})).matches() == \
+           [b'_SYSTEMD_UNIT=a.service', b'PRIORITY=0', b'PRIORITY=1', b'PRIORITY=2', b'PRIORITY=3']
+    assert JournalFilter().matches() == []
+
+  def test_batching(self):
+    entries = recorded_entries()
+    batcher = JournalBatcher()
+    batches = batcher.batch(entries, 0.)
+    assert len(batches) < len(entries) // 2
+
+    # the crash looping service goes out in one message, one line per entry
+    burst = [b for b in batches if b.tag == 'qmi-proxy']
+    assert len(burst) == 1 and burst[0].message.splitlines() == [e.message for e in entries if e.tag == 'qmi-proxy']
+    assert burst[0].ts == next(e.ts for e in entries if e.tag == 'qmi-proxy')
+    assert sum(b.message.count('\n') + 1 for b in batches) == sum(e.message.count('\n') + 1 for e in entries)
+
+    small = JournalBatcher(max_bytes=100)
+    assert len(small.batch(entries, 0.)) > len(batches)
+
+  def test_rate_limit(self):
+    entries = recorded_entries()
+    batcher = JournalBatcher(rate=1., burst=5)
+    first = batcher.batch(entries, 0.)
+    assert len(first) == 5 and batcher.dropped > 0
+    dropped = batcher.dropped
+
+    assert batcher.batch(entries[:1], 0.5) == []
+    assert batcher.dropped == dropped + 1
+
+    notice, = batcher.batch([], 1.5)
+    assert notice.tag == 'journald' and f'dropped {dropped + 1} ' in notice.message
+    assert batcher.dropped == 0
+
+  def test_build_message(self):
+    for entry in JournalBatcher().batch(recorded_entries(), 0.):
+      with log.Event.from_bytes(build_message(entry)) as evt:
+        osl = evt.operatingSystemLog
+        assert (osl.ts, osl.priority, osl.pid, osl.tag, osl.message) == (entry.ts, entry.priority, entry.pid, entry.tag, entry.message)
+
+  def test_journalctl_reader(self, tmp_path, monkeypatch):
+    # replays the recording, then exits like journalctl does when the journal goes away
+    args_file = tmp_path / 'args'
+    journalctl = tmp_path / 'journalctl'
+    journalctl.write_text(f'#!/bin/sh\necho "$@" > {args_file}\ncat {EXPORT_FILE}\n')
+    journalctl.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{tmp_path}:{os.environ["PATH"]}')
+
+    reader = JournalctlReader(JournalFilter(max_priority=4), cursor='s=abc')
+    entries = []
+    with pytest.raises(EOFError):
+      while True:
+        entries += reader.read(1.)
+    reader.close()
+
+    assert '--after-cursor=s=abc' in args_file.read_text() and '--priority=4' in args_file.read_text()
+    assert len(entries) == 44
+    assert reader.cursor == recorded_fields()[-1][b'__CURSOR'].decode()
+
@@ -1,12 +1,17 @@
 import glob
+import json
+import logging
 import os
 import time
 
+from openpilot.cereal import log
 from openpilot.common.test import OpenpilotTestCase
 import openpilot.cereal.messaging as messaging
 from openpilot.system.manager.process_config import managed_processes
 from openpilot.common.hardware.hw import Paths
-from openpilot.common.swaglog import cloudlog, ipchandler
+from openpilot.common.logging_extra import SwagFormatter, SwagLogFileFormatter, SwagLogger
+from openpilot.common.swaglog import SwaglogRotatingFileHandler, cloudlog, ipchandler
+from openpilot.system.logmessaged import LogMessageBatcher, record_source
 
 
 class TestLogmessaged(OpenpilotTestCase):
@@ -53,3 +58,101 @@ class TestLogmessaged(OpenpilotTestCase):
 
     logsize = sum([os.path.getsize(f) for f in self._get_log_files()])
     assert (n*len(msg)) < logsize < (n*(len(msg)+1024))
+
+
+def make_records(daemon: str, n: int, level: int = logging.INFO) -> list[tuple[int, str]]:
+  # as swaglog sends them from a daemon started by manager
+  swaglog = SwagLogger()
+  formatter = SwagFormatter(swaglog)
+  swaglog.bind(daemon=daemon)
+  return [(level, formatter.format(swaglog.makeRecord("swaglog", level, __file__, 1, "record %d", (i,), None))) for i in range(n)]
+
+
+def file_handler(tmp_path, **kwargs):
+  handler = SwaglogRotatingFileHandler(str(tmp_path / "swaglog"), **kwargs)
+  handler.setFormatter(SwagLogFileFormatter(None))
+  return handler
+
+
+def read_logs(tmp_path) -> list[dict]:
+  lines = []
+  for fn in sorted(glob.glob(str(tmp_path / "swaglog.*"))):
+    with open(fn) as f:
+      lines += [json.loads(line) for line in f]
+  return lines
+
+
+class TestLogMessageBatcher:
+  def test_record_source(self):
+    assert record_source(make_records("controlsd", 1)[0][1]) == "controlsd"
+    assert record_source('{"ctx":{"daemon":"camerad"},"levelnum":20}') == "camerad"  # from C++
+    assert record_source('{"msg": "x", "ctx": {}, "process": 123}') == "123"
+
+  def test_write(self, tmp_path):
+    records = make_records("controlsd", 500) + make_records("plannerd", 10, logging.DEBUG)
+    batcher = LogMessageBatcher(file_handler(tmp_path, max_bytes=16*1024))
+    batcher.process(records, 0.)
+
+    # everything at or above INFO, in order, in files that roll over at max_bytes
+    logs = read_logs(tmp_path)
+    assert [line["msg$s"] for line in logs] == [f"record {i}" for i in range(500)]
+    sizes = [os.path.getsize(fn) for fn in glob.glob(str(tmp_path / "swaglog.*"))]
+    assert len(sizes) > 2 and max(sizes) < 17*1024
+
+  def test_rate_limit(self, tmp_path):
+    batcher = LogMessageBatcher(file_handler(tmp_path), rate=100., burst=200)
+    storm = make_records("ubloxd", 5000)
+    quiet = make_records("controlsd", 20, logging.ERROR)
+    records = storm[:2500] + quiet + storm[2500:]
+
+    log_msgs, error_msgs = batcher.process(records, 0.)
+    assert len(log_msgs) == 200 + 20 and len(error_msgs) == 20
+    assert batcher.dropped_total == {"ubloxd": 4800}
+    with log.Event.from_bytes(log_msgs[0]) as evt:
+      assert evt.logMessage == storm[0][1]
+
+    # the budget refills over time
+    log_msgs, _ = batcher.process(storm[:100], 0.5)
+    assert len(log_msgs) == 50
+    # nothing is dropped from disk
+    assert len(read_logs(tmp_path)) == 5000 + 20 + 100
+
+    # errors of a limited source are still published
+    errors = make_records("ubloxd", 10, logging.ERROR)
+    log_msgs, error_msgs = batcher.process(storm[:1000] + errors, 0.5)
+    assert len(error_msgs) == 10
+    assert len(log_msgs) == 10
+    for dat, (_, record) in zip(log_msgs, errors, strict=True):
+      with log.Event.from_bytes(dat) as evt:
+        assert evt.logMessage == record
+
+  def test_aggregate(self, tmp_path):
+    records = make_records("ubloxd", 300) + make_records("controlsd", 2, logging.ERROR)
+    batcher = LogMessageBatcher(file_handler(tmp_path), aggregate_threshold=100)
+
+    log_msgs, error_msgs = batcher.process(records, 0.)
+    assert len(log_msgs) == 1 and len(error_msgs) == 2
+    with log.Event.from_bytes(log_msgs[0]) as evt:
+      assert evt.logMessage.split("\n") == [r for _, r in records]
+
+    # small batches are still published one record per event
+    log_msgs, _ = batcher.process(records[:100], 1.)
+    assert len(log_msgs) == 100
+
+  def test_matches_unbatched(self, tmp_path):
+    records = make_records("ubloxd", 2000)
+
+    # what logmessaged did before, for every record
+    os.makedirs(tmp_path / "old")
+    handler = file_handler(tmp_path / "old")
+    for _, record in records:
+      handler.emit(record)
+
+    os.makedirs(tmp_path / "new")
+    batcher = LogMessageBatcher(file_handler(tmp_path / "new"), rate=1e9, burst=10**9)
+    for i in range(0, len(records), 500):
+      batcher.process(records[i:i + 500], 0.)
+    # the same lines, each with its own random id
+    def without_id(logs):
+      return [{k: v for k, v in line.items() if k != "id"} for line in logs]
+    assert without_id(read_logs(tmp_path / "new")) == without_id(read_logs(tmp_path / "old"))
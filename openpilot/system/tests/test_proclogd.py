@@ -0,0 +1,127 @@
+import os
+
+from openpilot.system.proclogd import ProcSampler, _parse_proc_stat, _read_proc_extra
+
+
+def stat_line(pid: int, name: str, utime: int = 0) -> str:
+  # 52 fields, only the ones proclogd reads carry meaningful values
+  fields = ['0'] * 52
+  fields[0] = str(pid)
+  fields[1] = f'({name})'
+  fields[2] = 'S'
+  fields[3] = '1'
+  fields[13] = str(utime)
+  fields[19] = '1'
+  return ' '.join(fields) + '\n'
+
+
+class SyntheticProc:
+  def __init__(self, root):
+    self.root = str(root)
+    with open(f'{self.root}/stat', 'w') as f:
+      f.write('cpu  1 2 3 4 5 6 7 0 0 0\ncpu0 1 2 3 4 5 6 7 0 0 0\nintr 0\n')
+    with open(f'{self.root}/meminfo', 'w') as f:
+      f.write('MemTotal:       1024 kB\nMemFree:         512 kB\n')
+    os.makedirs(f'{self.root}/self', exist_ok=True)
+
+  def add(self, pid: int, name: str, cmdline: list[str]):
+    d = f'{self.root}/{pid}'
+    os.makedirs(d)
+    self.set_stat(pid, name)
+    with open(f'{d}/cmdline', 'wb') as f:
+      f.write(b''.join(c.encode() + b'\0' for c in cmdline))
+    os.symlink(f'/usr/bin/{name}', f'{d}/exe')
+
+  def set_stat(self, pid: int, name: str, utime: int = 0):
+    # rewritten in place, like procfs the same inode shows the new contents
+    with open(f'{self.root}/{pid}/stat', 'w') as f:
+      f.write(stat_line(pid, name, utime))
+
+  def remove(self, pid: int):
+    d = f'{self.root}/{pid}'
+    for fn in os.listdir(d):
+      os.unlink(f'{d}/{fn}')
+    os.rmdir(d)
+
+
+def naive_procs(root):
+  # what proclogd did every cycle before: list, open, read and parse everything
+  procs = []
+  for p in os.listdir(root):
+    if not p.isdigit():
+      continue
+    with open(f'{root}/{p}/stat') as f:
+      r = _parse_proc_stat(f.read())
+    if r is not None:
+      procs.append((r, _read_proc_extra(root, r['pid'], r['name'])))
+  return procs
+
+
+def sampled(sampler):
+  return sorted(((r, extra) for r, extra, _ in sampler.procs()), key=lambda p: p[0]['pid'])
+
+
+class TestProcSampler:
+  def test_new_and_exited_pids(self, tmp_path):
+    proc = SyntheticProc(tmp_path)
+    proc.add(10, 'init', ['/sbin/init'])
+    proc.add(11, 'my proc', ['./my proc', '--flag'])
+    sampler = ProcSampler(str(tmp_path))
+
+    procs = sampled(sampler)
+    assert [r['pid'] for r, _ in procs] == [10, 11]
+    assert procs[1][0]['name'] == 'my proc'
+    assert procs[1][1] == {'pid': 11, 'name': 'my proc', 'exe': '/usr/bin/my proc', 'cmdline': ['./my proc', '--flag']}
+    assert sampler.open_fds == 2
+
+    proc.remove(10)
+    proc.add(12, 'new', ['new'])
+    assert [r['pid'] for r, _ in sampled(sampler)] == [11, 12]
+    assert sorted(sampler.pids) == [11, 12]
+    assert sampler.open_fds == 2
+
+    sampler.close()
+    assert sampler.open_fds == 0
+
+  def test_stat_reread(self, tmp_path):
+    proc = SyntheticProc(tmp_path)
+    proc.add(10, 'worker', ['worker'])
+    sampler = ProcSampler(str(tmp_path))
+    assert sampled(sampler)[0][0]['utime'] == 0
+
+    proc.set_stat(10, 'worker', utime=123)
+    assert sampled(sampler)[0][0]['utime'] == 123
+
+    # exec changes comm, cmdline is read again
+    with open(f'{tmp_path}/10/cmdline', 'wb') as f:
+      f.write(b'python\0script.py\0')
+    proc.set_stat(10, 'python', utime=124)
+    assert sampled(sampler)[0][1]['cmdline'] == ['python', 'script.py']
+    sampler.close()
+
+  def test_fd_limit(self, tmp_path):
+    proc = SyntheticProc(tmp_path)
+    for pid in range(100, 110):
+      proc.add(pid, f'p{pid}', [f'p{pid}'])
+    sampler = ProcSampler(str(tmp_path), max_open_fds=4)
+    for _ in range(2):
+      assert len(sampler.procs()) == 10
+      assert sampler.open_fds == 4
+    sampler.close()
+
+  def test_system_files(self, tmp_path):
+    SyntheticProc(tmp_path)
+    sampler = ProcSampler(str(tmp_path))
+    assert sampler.read_file('stat').startswith('cpu ')
+    assert 'MemTotal:' in sampler.read_file('meminfo')
+    sampler.close()
+
+  def test_matches_naive(self, tmp_path):
+    proc = SyntheticProc(tmp_path)
+    for pid in range(1000, 1300):
+      proc.add(pid, f'proc{pid}', [f'/usr/bin/proc{pid}', '--arg'])
+
+    sampler = ProcSampler(str(tmp_path))
+    for _ in range(3):
+      assert sampled(sampler) == sorted(naive_procs(str(tmp_path)), key=lambda p: p[0]['pid'])
+    sampler.close()
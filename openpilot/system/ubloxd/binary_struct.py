@@ -136,23 +136,16 @@ class BinaryReader:
     return result
 
   def read_bits_int_be(self, n: int) -> int:
-    result = 0
-    bits_remaining = n
-    while bits_remaining > 0:
-      if self.pos >= len(self.data):
-        raise EOFError("Unexpected end of data while reading bits")
-      bits_in_byte = 8 - self.bit_pos
-      bits_to_read = min(bits_remaining, bits_in_byte)
-      byte_val = self.data[self.pos]
-      shift = bits_in_byte - bits_to_read
-      mask = (1 << bits_to_read) - 1
-      extracted = (byte_val >> shift) & mask
-      result = (result << bits_to_read) | extracted
-      self.bit_pos += bits_to_read
-      bits_remaining -= bits_to_read
-      if self.bit_pos >= 8:
-        self.bit_pos = 0
-        self.pos += 1
+    if n <= 0:
+      return 0
+    end_bit = self.bit_pos + n
+    num_bytes = (end_bit + 7) // 8
+    if self.pos + num_bytes > len(self.data):
+      raise EOFError("Unexpected end of data while reading bits")
+    chunk = int.from_bytes(self.data[self.pos : self.pos + num_bytes], 'big')
+    result = (chunk >> (num_bytes * 8 - end_bit)) & ((1 << n) - 1)
+    self.pos += end_bit // 8
+    self.bit_pos = end_bit % 8
     return result
 
   def _align_to_byte(self) -> None:
@@ -175,13 +168,13 @@ class BinaryStruct:
       dataclass(init=False)(cls)
     fields = list(getattr(cls, '__annotations__', {}).items())
     cls.__binary_fields__ = fields
+    cls.__binary_plan__ = _compile_plan(fields)
 
     @classmethod
     def _read(inner_cls, reader: BinaryReader):
       obj = inner_cls.__new__(inner_cls)
-      for name, spec in inner_cls.__binary_fields__:
-        value = _parse_field(spec, reader, obj)
-        setattr(obj, name, value)
+      for step in inner_cls.__binary_plan__:
+        step.read(reader, obj)
       return obj
 
     cls._read = _read  # ty: ignore[invalid-assignment]  # installed dynamically for each subclass
@@ -278,3 +271,200 @@ def _parse_field(spec: Any, reader: BinaryReader, obj: Any) -> Any:
   if isinstance(spec, type) and issubclass(spec, BinaryStruct):
     return spec._read(reader)
   raise TypeError(f"Unsupported field spec: {spec!r}")
+
+
+# Compiled parser plans
+#
+# Each struct definition is compiled once into a list of steps. Consecutive byte-aligned
+# fixed-size fields become a single struct.Struct, consecutive bit fields a single bit read,
+# and arrays of fixed-size elements a single unpack over the whole block. Anything else
+# (switches, substreams, nested structs) goes through _parse_field as before.
+
+def _struct_code(field_type: Any) -> tuple[str, str | None] | None:
+  """Return (struct code, byte order or None if it doesn't matter) for fixed-size fields."""
+  if isinstance(field_type, (EnumType, ConstType)):
+    if isinstance(field_type.base_type, (EnumType, ConstType)):
+      return None
+    return _struct_code(field_type.base_type)
+  try:
+    if isinstance(field_type, IntType):
+      fmt = _int_format(field_type)
+    elif isinstance(field_type, FloatType):
+      fmt = _float_format(field_type)
+    elif isinstance(field_type, BytesType):
+      return f"{field_type.size}s", None
+    else:
+      return None
+  except ValueError:
+    # unsupported sizes raise when parsed, like they always have
+    return None
+  return (fmt, None) if len(fmt) == 1 else (fmt[1], fmt[0])
+
+
+class _FieldStep:
+  __slots__ = ('name', 'spec')
+
+  def __init__(self, name: str, spec: Any):
+    self.name = name
+    self.spec = spec
+
+  def read(self, reader: BinaryReader, obj: Any) -> None:
+    setattr(obj, self.name, _parse_field(self.spec, reader, obj))
+
+
+class _StructRun:
+  """Consecutive byte-aligned fixed-size fields, read with one unpack."""
+  __slots__ = ('names', 'struct', 'enums', 'const')
+
+  def __init__(self, fields: list[tuple[str, str, str | None, FieldType]]):
+    byte_order = next((order for _, _, order, _ in fields if order is not None), '<')
+    self.names = [name for name, _, _, _ in fields]
+    self.struct = struct.Struct(byte_order + ''.join(code for _, code, _, _ in fields))
+    self.enums = [(i, ft.enum_cls) for i, (_, _, _, ft) in enumerate(fields) if isinstance(ft, EnumType)]
+    # a const field always ends its run, so it's checked before anything after it is read
+    last = fields[-1][3]
+    self.const = last.expected if isinstance(last, ConstType) else None
+
+  def convert(self, values: tuple) -> tuple | list:
+    if not self.enums:
+      return values
+    values = list(values)
+    for i, enum_cls in self.enums:
+      try:
+        values[i] = enum_cls(values[i])
+      except ValueError:
+        pass
+    return values
+
+  def read(self, reader: BinaryReader, obj: Any) -> None:
+    reader._align_to_byte()
+    size = self.struct.size
+    reader._require(size)
+    values = self.convert(self.struct.unpack_from(reader.data, reader.pos))
+    reader.pos += size
+    obj.__dict__.update(zip(self.names, values, strict=True))
+    if self.const is not None and values[-1] != self.const:
+      raise ValueError(f"Invalid constant: expected {self.const!r}, got {values[-1]!r}")
+
+
+class _BitsRun:
+  """Consecutive bit fields, read as one big-endian integer and split with shifts."""
+  __slots__ = ('fields', 'total_bits')
+
+  def __init__(self, fields: list[tuple[str, int]]):
+    self.total_bits = sum(n for _, n in fields)
+    self.fields = []
+    shift = self.total_bits
+    for name, n in fields:
+      shift -= n
+      self.fields.append((name, shift, (1 << n) - 1, n == 1))
+
+  def read(self, reader: BinaryReader, obj: Any) -> None:
+    value = reader.read_bits_int_be(self.total_bits)
+    d = obj.__dict__
+    for name, shift, mask, is_bool in self.fields:
+      field = (value >> shift) & mask
+      d[name] = bool(field) if is_bool else field
+
+
+class _ScalarArray:
+  """Array of ints or floats, read with one unpack."""
+  __slots__ = ('name', 'count_field', 'byte_order', 'code', 'size')
+
+  def __init__(self, name: str, count_field: str, code: str, byte_order: str | None):
+    self.name = name
+    self.count_field = count_field
+    self.byte_order = byte_order or '<'
+    self.code = code
+    self.size = struct.calcsize(self.byte_order + code)
+
+  def read(self, reader: BinaryReader, obj: Any) -> None:
+    count = int(_resolve_path(obj, self.count_field))
+    values: list = []
+    if count > 0:
+      reader._align_to_byte()
+      reader._require(count * self.size)
+      values = list(struct.unpack_from(f"{self.byte_order}{count}{self.code}", reader.data, reader.pos))
+      reader.pos += count * self.size
+    setattr(obj, self.name, values)
+
+
+class _StructArray:
+  """Array of structs made of a single run, the whole block is read with one iter_unpack."""
+  __slots__ = ('name', 'count_field', 'element_cls', 'run')
+
+  def __init__(self, name: str, count_field: str, element_cls: type, run: _StructRun):
+    self.name = name
+    self.count_field = count_field
+    self.element_cls = element_cls
+    self.run = run
+
+  def read(self, reader: BinaryReader, obj: Any) -> None:
+    count = int(_resolve_path(obj, self.count_field))
+    items: list = []
+    if count > 0:
+      reader._align_to_byte()
+      size = count * self.run.struct.size
+      reader._require(size)
+      block = memoryview(reader.data)[reader.pos : reader.pos + size]
+      names, convert, cls = self.run.names, self.run.convert, self.element_cls
+      new = cls.__new__
+      for values in self.run.struct.iter_unpack(block):
+        item = new(cls)
+        item.__dict__.update(zip(names, convert(values), strict=True))
+        items.append(item)
+      reader.pos += size
+    setattr(obj, self.name, items)
+
+
+def _array_step(name: str, field_type: ArrayType) -> Any:
+  element = _field_type_from_spec(field_type.element_type) or field_type.element_type
+  if isinstance(element, type) and issubclass(element, BinaryStruct):
+    plan = element.__binary_plan__
+    if len(plan) == 1 and isinstance(plan[0], _StructRun) and plan[0].const is None:
+      return _StructArray(name, field_type.count_field, element, plan[0])
+  elif isinstance(element, (IntType, FloatType)) and (code := _struct_code(element)) is not None:
+    return _ScalarArray(name, field_type.count_field, *code)
+  return _FieldStep(name, field_type)
+
+
+def _compile_plan(fields: list[tuple[str, Any]]) -> list:
+  plan: list = []
+  run: list[tuple[str, str, str | None, FieldType]] = []
+  bit_run: list[tuple[str, int]] = []
+
+  def flush() -> None:
+    if run:
+      plan.append(_StructRun(run.copy()))
+      run.clear()
+    if bit_run:
+      plan.append(_BitsRun(bit_run.copy()))
+      bit_run.clear()
+
+  for name, spec in fields:
+    field_type = _field_type_from_spec(spec)
+    if isinstance(field_type, BitsType):
+      if run:
+        flush()
+      bit_run.append((name, field_type.bits))
+      continue
+
+    code = _struct_code(field_type)
+    if code is not None:
+      if bit_run:
+        flush()
+      run_order = next((order for _, _, order, _ in run if order is not None), None)
+      if code[1] is not None and run_order is not None and code[1] != run_order:
+        flush()
+      run.append((name, code[0], code[1], field_type))
+      if isinstance(field_type, ConstType):
+        flush()
+      continue
+
+    flush()
+    if isinstance(field_type, ArrayType):
+      plan.append(_array_step(name, field_type))
+    else:
+      plan.append(_FieldStep(name, spec))
+  flush()
+  return plan
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Time of parsing RXM-RAWX payloads with at least 20 measurements, with the compiled
+binary struct against the reference field by field reader.
+
+  binary_struct_benchmark.py [-n payloads]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from openpilot.system.ubloxd.ubx import Ubx
+from openpilot.system.ubloxd.tests.test_binary_struct import ReferenceReader, random_ubx_payloads, reference_read
+
+
+def benchmark(parse, payloads):
+  ts = np.empty(len(payloads))
+  for i, payload in enumerate(payloads):
+    st = time.perf_counter()
+    parse(payload)
+    ts[i] = time.perf_counter() - st
+  return ts * 1e6
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time of parsing RXM-RAWX, compiled against the reference reader")
+  parser.add_argument("-n", "--payloads", type=int, default=200)
+  args = parser.parse_args()
+
+  rng = random.Random(3)
+  payloads = []
+  while len(payloads) < args.payloads:
+    payload = random_ubx_payloads(rng)[0x0215]
+    if payload[11] >= 20:
+      payloads.append(payload)
+
+  for name, parse in (("reference", lambda d: reference_read(Ubx.RxmRawx, ReferenceReader(d))), ("compiled", Ubx.RxmRawx.from_bytes)):
+    benchmark(parse, payloads[:20])  # warm up
+    ts = benchmark(parse, payloads)
+    print(f"{name:>10}: mean {np.mean(ts):6.1f} us, p99 {np.percentile(ts, 99):6.1f} us per RXM-RAWX")
@@ -0,0 +1,141 @@
+import random
+import struct
+
+import pytest
+
+from openpilot.system.ubloxd import binary_struct as bs
+from openpilot.system.ubloxd.glonass import Glonass
+from openpilot.system.ubloxd.gps import Gps
+from openpilot.system.ubloxd.ubx import Ubx
+
+
+class ReferenceReader(bs.BinaryReader):
+  # the bit by bit reader the compiled plans replaced
+  def read_bits_int_be(self, n: int) -> int:
+    result = 0
+    bits_remaining = n
+    while bits_remaining > 0:
+      if self.pos >= len(self.data):
+        raise EOFError("Unexpected end of data while reading bits")
+      bits_in_byte = 8 - self.bit_pos
+      bits_to_read = min(bits_remaining, bits_in_byte)
+      extracted = (self.data[self.pos] >> (bits_in_byte - bits_to_read)) & ((1 << bits_to_read) - 1)
+      result = (result << bits_to_read) | extracted
+      self.bit_pos += bits_to_read
+      bits_remaining -= bits_to_read
+      if self.bit_pos >= 8:
+        self.bit_pos = 0
+        self.pos += 1
+    return result
+
+
+def reference_read(cls, reader):
+  # interprets the field descriptors one at a time, like before structs were compiled
+  obj = cls.__new__(cls)
+  for name, spec in cls.__binary_fields__:
+    setattr(obj, name, reference_field(spec, reader, obj))
+  return obj
+
+
+def reference_field(spec, reader, obj):
+  field_type = bs._field_type_from_spec(spec)
+  if field_type is not None:
+    spec = field_type
+  if isinstance(spec, bs.ConstType):
+    value = reference_field(spec.base_type, reader, obj)
+    if value != spec.expected:
+      raise ValueError(f"Invalid constant: expected {spec.expected!r}, got {value!r}")
+    return value
+  if isinstance(spec, bs.EnumType):
+    raw = reference_field(spec.base_type, reader, obj)
+    try:
+      return spec.enum_cls(raw)
+    except ValueError:
+      return raw
+  if isinstance(spec, bs.SwitchType):
+    target = spec.cases.get(bs._resolve_path(obj, spec.selector), spec.default)
+    return None if target is None else reference_field(target, reader, obj)
+  if isinstance(spec, bs.ArrayType):
+    count = bs._resolve_path(obj, spec.count_field)
+    return [reference_field(spec.element_type, reader, obj) for _ in range(int(count))]
+  if isinstance(spec, bs.SubstreamType):
+    data = reader.read_bytes(int(bs._resolve_path(obj, spec.length_field)))
+    return reference_field(spec.element_type, ReferenceReader(data), obj)
+  if isinstance(spec, bs.IntType):
+    return reader._read_struct(bs._int_format(spec))
+  if isinstance(spec, bs.FloatType):
+    return reader._read_struct(bs._float_format(spec))
+  if isinstance(spec, bs.BitsType):
+    value = reader.read_bits_int_be(spec.bits)
+    return bool(value) if spec.bits == 1 else value
+  if isinstance(spec, bs.BytesType):
+    return reader.read_bytes(spec.size)
+  if isinstance(spec, type) and issubclass(spec, bs.BinaryStruct):
+    return reference_read(spec, reader)
+  raise TypeError(f"Unsupported field spec: {spec!r}")
+
+
+def parse_both(cls, data: bytes):
+  results = []
+  for parse in (cls.from_bytes, lambda d: reference_read(cls, ReferenceReader(d))):
+    try:
+      results.append(parse(data))
+    except (EOFError, ValueError) as e:
+      results.append(type(e))
+  return results
+
+
+def ubx_frame(msg_type: int, payload: bytes) -> bytes:
+  return b"\xb5\x62" + struct.pack('>H', msg_type) + struct.pack('<H', len(payload)) + payload + b"\x00\x00"
+
+
+def random_ubx_payloads(rng: random.Random):
+  rawx_header = bytearray(rng.randbytes(16))
+  rawx_header[11] = rng.randint(0, 32)
+  rawx = bytes(rawx_header) + b''.join(
+    struct.pack('<ddfBBBBHBBBBBB', rng.uniform(2e7, 3e7), rng.uniform(-1e8, 1e8), rng.uniform(-5e3, 5e3),
+                rng.choice([0, 2, 6, 9]), rng.randint(1, 32), 0, rng.randint(0, 13), rng.randint(0, 65535),
+                rng.randint(0, 50), rng.randint(0, 15), rng.randint(0, 15), rng.randint(0, 15), rng.randint(0, 15), 0)
+    for _ in range(rawx_header[11]))
+  sfrbx = bytes([rng.choice([0, 6]), rng.randint(1, 32), 0, rng.randint(0, 13), 10, 0, 2, 0]) + rng.randbytes(40)
+  num_svs = rng.randint(0, 40)
+  navsat = rng.randbytes(5) + bytes([num_svs]) + rng.randbytes(2 + 12 * num_svs)
+  monhw = rng.randbytes(28) + bytes([rng.randint(0, 5), rng.randint(0, 3)]) + rng.randbytes(30)
+  return {0x0215: rawx, 0x0213: sfrbx, 0x0135: navsat, 0x0107: rng.randbytes(92), 0x0A09: monhw, 0x0A0B: rng.randbytes(28)}
+
+
+class TestBinaryStruct:
+  def test_ubx_matches_reference(self):
+    rng = random.Random(0)
+    classes = {0x0215: Ubx.RxmRawx, 0x0213: Ubx.RxmSfrbx, 0x0135: Ubx.NavSat, 0x0107: Ubx.NavPvt, 0x0A09: Ubx.MonHw, 0x0A0B: Ubx.MonHw2}
+    for _ in range(200):
+      for msg_type, payload in random_ubx_payloads(rng).items():
+        parsed, ref = parse_both(classes[msg_type], payload)
+        assert parsed == ref and repr(parsed) == repr(ref)
+        parsed, ref = parse_both(Ubx, ubx_frame(msg_type, payload))
+        assert parsed == ref and repr(parsed) == repr(ref)
+
+  @pytest.mark.parametrize("cls, size", [(Gps, 30), (Glonass, 16)])
+  def test_bits_match_reference(self, cls, size):
+    rng = random.Random(1)
+    for _ in range(2000):
+      data = bytearray(rng.randbytes(size))
+      if cls is Gps:
+        data[0] = 0x8b
+        data[5] = (data[5] & 0xe3) | (rng.randint(1, 5) << 2)
+      parsed, ref = parse_both(cls, bytes(data))
+      assert parsed == ref and repr(parsed) == repr(ref)
+
+  def test_truncated(self):
+    rng = random.Random(2)
+    payload = random_ubx_payloads(rng)[0x0215]
+    for n in range(len(payload)):
+      assert parse_both(Ubx.RxmRawx, payload[:n])[0] is EOFError
+    assert parse_both(Ubx, b"\xb5\x63" + ubx_frame(0x0107, rng.randbytes(92))[2:]) == [ValueError, ValueError]
+
+  def test_plans(self):
+    # RXM-RAWX is a header run and one block read for all measurements
+    assert [type(step) for step in Ubx.RxmRawx.__binary_plan__] == [bs._StructRun, bs._StructArray]
+    assert [type(step) for step in Ubx.RxmSfrbx.__binary_plan__] == [bs._StructRun, bs._ScalarArray]
+    assert [type(step) for step in Ubx.NavPvt.__binary_plan__] == [bs._StructRun]
+
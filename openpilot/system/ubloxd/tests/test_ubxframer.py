@@ -0,0 +1,101 @@
+import random
+
+from openpilot.system.ubloxd.ubloxd import UbxFramer
+
+
+class ReferenceFramer:
+  # the byte by byte framer UbxFramer replaced
+  def __init__(self):
+    self.buf = bytearray()
+
+  @staticmethod
+  def _checksum_ok(frame: bytes) -> bool:
+    ck_a = 0
+    ck_b = 0
+    for b in frame[2:-2]:
+      ck_a = (ck_a + b) & 0xFF
+      ck_b = (ck_b + ck_a) & 0xFF
+    return ck_a == frame[-2] and ck_b == frame[-1]
+
+  def add_data(self, log_time: float, incoming: bytes) -> list[bytes]:
+    out: list[bytes] = []
+    if not incoming:
+      return out
+    self.buf += incoming
+    while True:
+      if len(self.buf) < 2:
+        break
+      start = self.buf.find(b"\xb5\x62")
+      if start < 0:
+        self.buf.clear()
+        break
+      if start > 0:
+        self.buf = self.buf[start:]
+      if len(self.buf) < 6:
+        break
+      total_len = 6 + int.from_bytes(self.buf[4:6], 'little') + 2
+      if len(self.buf) < total_len:
+        break
+      candidate = bytes(self.buf[:total_len])
+      if self._checksum_ok(candidate):
+        out.append(candidate)
+        self.buf = self.buf[total_len:]
+      else:
+        self.buf = self.buf[1:]
+    return out
+
+
+def make_frame(msg_class: int, msg_id: int, payload: bytes) -> bytes:
+  body = bytes([msg_class, msg_id]) + len(payload).to_bytes(2, 'little') + payload
+  ck_a = ck_b = 0
+  for b in body:
+    ck_a = (ck_a + b) & 0xFF
+    ck_b = (ck_b + ck_a) & 0xFF
+  return b"\xb5\x62" + body + bytes([ck_a, ck_b])
+
+
+def make_stream(rng: random.Random, n_frames: int, corrupt: bool = True) -> bytes:
+  # roughly what the receiver sends: NAV-PVT, RXM-RAWX, RXM-SFRBX and MON-HW
+  sizes = {(0x01, 0x07): lambda: 92, (0x02, 0x15): lambda: 16 + 32 * rng.randint(0, 32),
+           (0x02, 0x13): lambda: 8 + 4 * 10, (0x0a, 0x09): lambda: 60}
+  stream = bytearray()
+  for _ in range(n_frames):
+    (msg_class, msg_id), size = rng.choice(list(sizes.items()))
+    frame = bytearray(make_frame(msg_class, msg_id, rng.randbytes(size())))
+    if corrupt and rng.random() < 0.05:
+      frame[rng.randrange(2, len(frame))] ^= 1 << rng.randrange(8)
+    if corrupt and rng.random() < 0.05:
+      stream += rng.choice([rng.randbytes(rng.randint(1, 20)), b"\xb5", b"\xb5\x62", b"\xb5\x62\x01\x07\xff"])
+    stream += frame
+  return bytes(stream)
+
+
+def split_chunks(rng: random.Random, data: bytes, max_chunk: int) -> list[bytes]:
+  chunks = []
+  pos = 0
+  while pos < len(data):
+    n = rng.randint(0, max_chunk)
+    chunks.append(data[pos:pos + n])
+    pos += n
+  return chunks
+
+
+class TestUbxFramer:
+  def test_matches_reference(self):
+    rng = random.Random(0)
+    for max_chunk in (1, 7, 300, 4096):
+      framer, ref = UbxFramer(), ReferenceFramer()
+      for i, chunk in enumerate(split_chunks(rng, make_stream(rng, 500), max_chunk)):
+        assert framer.add_data(i * 0.05, chunk) == ref.add_data(i * 0.05, chunk)
+        assert framer.buf == ref.buf
+        assert framer.last_log_time == i * 0.05
+
+  def test_clean_stream(self):
+    rng = random.Random(1)
+    stream = make_stream(rng, 200, corrupt=False)
+    framer = UbxFramer()
+    frames = framer.add_data(0., stream)
+    assert len(frames) == 200
+    assert b''.join(frames) == stream
+    assert len(framer.buf) == 0
+
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Throughput of framing a random UBX stream, read in chunks as from the serial port,
+with UbxFramer against the reference framer.
+
+  ubxframer_benchmark.py [-n frames] [-r repeats]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from openpilot.system.ubloxd.ubloxd import UbxFramer
+from openpilot.system.ubloxd.tests.test_ubxframer import ReferenceFramer, make_stream, split_chunks
+
+
+def benchmark(new_framer, chunks, n):
+  ts = np.empty(n)
+  for i in range(n):
+    framer = new_framer()
+    st = time.perf_counter()
+    for chunk in chunks:
+      framer.add_data(0., chunk)
+    ts[i] = time.perf_counter() - st
+  return ts
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Throughput of UbxFramer against the reference framer")
+  parser.add_argument("-n", "--frames", type=int, default=5000)
+  parser.add_argument("-r", "--repeats", type=int, default=5)
+  args = parser.parse_args()
+
+  rng = random.Random(2)
+  stream = make_stream(rng, args.frames)
+  chunks = split_chunks(rng, stream, 4096)
+
+  for name, new_framer in (("reference", ReferenceFramer), ("UbxFramer", UbxFramer)):
+    ts = benchmark(new_framer, chunks, args.repeats)
+    print(f"{name:>10}: {len(stream) / np.median(ts) / 1e6:6.2f} MB/s, {len(stream)} bytes in {len(chunks)} chunks")
@@ -33,13 +33,24 @@ class UbxFramer:
     self.buf.clear()
 
   @staticmethod
-  def _checksum_ok(frame: bytes) -> bool:
-    ck_a = 0
-    ck_b = 0
-    for b in frame[2:-2]:
-      ck_a = (ck_a + b) & 0xFF
-      ck_b = (ck_b + ck_a) & 0xFF
-    return ck_a == frame[-2] and ck_b == frame[-1]
+  def _prefix_sums(buf: bytearray) -> tuple[np.ndarray, np.ndarray]:
+    # 8-bit Fletcher: ck_a is the running sum of the bytes and ck_b the running sum of ck_a.
+    # With s1 the prefix sums of the buffer and s2 the prefix sums of s1, both checksums of
+    # any byte range come out of a few lookups. uint64 wraps around, which is fine mod 256.
+    s1 = np.zeros(len(buf) + 1, dtype=np.uint64)
+    np.cumsum(np.frombuffer(buf, dtype=np.uint8), dtype=np.uint64, out=s1[1:])
+    s2 = np.zeros_like(s1)
+    np.cumsum(s1[1:], out=s2[1:])
+    return s1, s2
+
+  @staticmethod
+  def _checksum_ok(buf: bytearray, s1: np.ndarray, s2: np.ndarray, start: int, end: int) -> bool:
+    # checksum covers class, id, length and payload
+    lo, hi = start + 2, end - 2
+    s1_lo = int(s1[lo])
+    ck_a = (int(s1[hi]) - s1_lo) & 0xFF
+    ck_b = (int(s2[hi]) - int(s2[lo]) - (hi - lo) * s1_lo) & 0xFF
+    return ck_a == buf[hi] and ck_b == buf[hi + 1]
 
   def add_data(self, log_time: float, incoming: bytes) -> list[bytes]:
     self.last_log_time = log_time
@@ -48,36 +59,41 @@ class UbxFramer:
       return out
     self.buf += incoming
 
-    while True:
+    # frames are consumed by advancing pos, the buffer is compacted once at the end
+    buf = self.buf
+    size = len(buf)
+    pos = 0
+    sums = None
+    while size - pos >= 2:
       # find preamble
-      if len(self.buf) < 2:
-        break
-      start = self.buf.find(b"\xb5\x62")
+      start = buf.find(b"\xb5\x62", pos)
       if start < 0:
         # no preamble in buffer
-        self.buf.clear()
+        pos = size
         break
-      if start > 0:
-        # drop garbage before preamble
-        self.buf = self.buf[start:]
+      # drop garbage before preamble
+      pos = start
 
-      if len(self.buf) < self.HEADER_SIZE:
+      if size - pos < self.HEADER_SIZE:
         break
 
-      length_le = int.from_bytes(self.buf[4:6], 'little', signed=False)
+      length_le = buf[pos + 4] | (buf[pos + 5] << 8)
       total_len = self.HEADER_SIZE + length_le + self.CHECKSUM_SIZE
-      if len(self.buf) < total_len:
+      if size - pos < total_len:
         break
 
-      candidate = bytes(self.buf[:total_len])
-      if self._checksum_ok(candidate):
-        out.append(candidate)
+      if sums is None:
+        sums = self._prefix_sums(buf)
+      if self._checksum_ok(buf, *sums, pos, pos + total_len):
+        out.append(bytes(buf[pos:pos + total_len]))
         # consume this frame
-        self.buf = self.buf[total_len:]
+        pos += total_len
       else:
         # drop first byte and retry
-        self.buf = self.buf[1:]
+        pos += 1
 
+    if pos:
+      del buf[:pos]
     return out
 
 
@@ -7,7 +7,8 @@ from openpilot.common.test import OpenpilotTestCase
 from openpilot.cereal import messaging, log
 from teleoprtc.tracks import VIDEO_CLOCK_RATE
 
-from openpilot.system.webrtc.webrtcd import CerealOutgoingMessageProxy, CerealIncomingMessageProxy, ServerState, handle_get_stream
+from openpilot.system.webrtc.webrtcd import CerealOutgoingMessageProxy, CerealIncomingMessageProxy, OutgoingChannel, ServerState, \
+                                           handle_get_stream
 from openpilot.system.webrtc.device.video import LiveStreamVideoStreamTrack
 
 
@@ -29,6 +30,7 @@ class TestStreamSession(OpenpilotTestCase):
 
     channel = mocker.Mock()
     channel.is_open.return_value = True
+    channel.bufferedAmount = 0
     proxy = CerealOutgoingMessageProxy(["customReservedRawData0"])
     def mocked_update(t):
       proxy.sm.update_msgs(0, [test_msg])
@@ -40,6 +42,67 @@ class TestStreamSession(OpenpilotTestCase):
 
     channel.send.assert_called_once_with(expected_json)
 
+  def device_state_proxy(self, mocker, msgs):
+    proxy = CerealOutgoingMessageProxy(["deviceState"])
+    mocker.patch.object(messaging.SubMaster, "update",
+                        side_effect=lambda t: proxy.sm.update_msgs(0, [messaging.log_from_bytes(msgs.pop(0))]))
+    return proxy
+
+  def device_state(self, free_space):
+    msg = messaging.new_message("deviceState", valid=True, logMonoTime=456)
+    msg.deviceState.freeSpacePercent = free_space
+    msg.deviceState.networkType = "wifi"
+    msg.deviceState.cpuTempC = [40.0, 41.5]
+    return msg.to_bytes()
+
+  def test_outgoing_encodings(self, mocker):
+    dat = self.device_state(50.)
+    proxy = self.device_state_proxy(mocker, [dat])
+    channels = [mocker.Mock(bufferedAmount=0) for _ in range(5)]
+    proxy.add_channel(channels[0])
+    proxy.add_channel(channels[1])
+    proxy.add_channel(channels[2], encoding="json", fields={"deviceState": ["networkType", "cpuTempC"]})
+    proxy.add_channel(channels[3], encoding="capnp")
+    proxy.add_channel(channels[4], encoding="capnp", fields={"deviceState": ["freeSpacePercent"]})
+    encode = mocker.spy(proxy, "encode")
+
+    proxy.update()
+
+    # once per format, not per channel
+    assert encode.call_count == 4
+    assert channels[0].send.call_args.args[0] is channels[1].send.call_args.args[0]
+    full = json.loads(channels[0].send.call_args.args[0])
+    assert full["data"] == proxy.to_json(messaging.log_from_bytes(dat).deviceState)
+    projected = json.loads(channels[2].send.call_args.args[0])
+    assert projected == {"type": "deviceState", "logMonoTime": 456, "valid": True, "data": {"networkType": "wifi", "cpuTempC": [40.0, 41.5]}}
+    assert channels[3].send.call_args.args[0] == dat
+    with log.Event.from_bytes(channels[4].send.call_args.args[0]) as event:
+      assert (event.logMonoTime, event.valid, event.deviceState.freeSpacePercent) == (456, True, 50.)
+      assert event.deviceState.networkType == "none"
+
+    with self.assertRaises(ValueError):
+      proxy.configure_channel(channels[0], "msgpack")
+    with self.assertRaises(ValueError):
+      proxy.configure_channel(channels[0], "json", {"deviceState": ["notAField"]})
+
+  def test_outgoing_backpressure(self, mocker):
+    proxy = self.device_state_proxy(mocker, [self.device_state(float(i)) for i in range(3)])
+    channel = mocker.Mock(bufferedAmount=OutgoingChannel.max_buffered)
+    outgoing = proxy.add_channel(channel, encoding="capnp")
+
+    # the channel is backed up, only the latest message is kept
+    proxy.update()
+    proxy.update()
+    channel.send.assert_not_called()
+    assert outgoing.dropped == 1
+
+    channel.bufferedAmount = 0
+    proxy.update()
+    channel.send.assert_called_once()
+    assert outgoing.dropped == 2
+    with log.Event.from_bytes(channel.send.call_args.args[0]) as event:
+      assert event.deviceState.freeSpacePercent == 2.
+
   def test_incoming_proxy(self, mocker):
     tested_msgs = [
       {"type": "customReservedRawData0", "data": "test"}, # primitive
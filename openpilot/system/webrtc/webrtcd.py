@@ -68,16 +68,92 @@ class AsyncTaskRunner:
     pass
 
 
+class EventSubMaster(messaging.SubMaster):
+  """SubMaster that also keeps the whole Event of the latest message of each service."""
+  def __init__(self, services: list[str]):
+    super().__init__(services)
+    self.events: dict[str, capnp._DynamicStructReader] = {}
+
+  def update_msgs(self, cur_time: float, msgs: list[capnp._DynamicStructReader]) -> None:
+    super().update_msgs(cur_time, msgs)
+    for msg in msgs:
+      if msg is not None:
+        self.events[msg.which()] = msg
+
+
+# encodings a channel can negotiate for outgoing messages
+# json: {"type", "logMonoTime", "valid", "data"} objects, the default
+# capnp: the serialized Event, as published by the service
+OUTGOING_ENCODINGS = ("json", "capnp")
+
+
+class OutgoingChannel:
+  """A messaging channel, the encoding it negotiated and its messages waiting to be sent."""
+  # stop sending while the channel has this much data buffered, newer messages replace the waiting ones
+  max_buffered = 256 * 1024
+
+  def __init__(self, channel, encoding: str = "json", fields: dict[str, list[str]] | None = None):
+    self.channel = channel
+    self.encoding = encoding
+    self.fields = {service: tuple(f) for service, f in (fields or {}).items()}
+    self.pending: dict[str, bytes] = {}
+    self.dropped = 0
+
+  def format(self, service: str) -> tuple[str, tuple[str, ...] | None]:
+    return self.encoding, self.fields.get(service)
+
+  def push(self, service: str, payload: bytes):
+    if service in self.pending:
+      # never sent, the channel couldn't keep up
+      del self.pending[service]
+      self.dropped += 1
+    self.pending[service] = payload
+
+  def flush(self):
+    if not self.channel.is_open():
+      self.pending.clear()
+      return
+    while self.pending and self.channel.bufferedAmount < self.max_buffered:
+      service = next(iter(self.pending))
+      self.channel.send(self.pending.pop(service))
+
+
 class CerealOutgoingMessageProxy(AsyncTaskRunner):
+  receive_timeout_ms = 50
+
   def __init__(self, services: list[str], enabled: bool = True):
     super().__init__()
     self.services = list(services)
-    self.sm = messaging.SubMaster(self.services)
-    self.channels = []
+    self.sm = EventSubMaster(self.services)
+    self.channels: list[OutgoingChannel] = []
     self._enabled = enabled
 
-  def add_channel(self, channel):
-    self.channels.append(channel)
+  def add_channel(self, channel, encoding: str = "json", fields: dict[str, list[str]] | None = None) -> OutgoingChannel:
+    self._check_format(encoding, fields)
+    outgoing = OutgoingChannel(channel, encoding, fields)
+    self.channels.append(outgoing)
+    return outgoing
+
+  def configure_channel(self, channel, encoding: str, fields: dict[str, list[str]] | None = None):
+    self._check_format(encoding, fields)
+    for outgoing in self.channels:
+      if outgoing.channel is channel:
+        outgoing.encoding = encoding
+        outgoing.fields = {service: tuple(f) for service, f in (fields or {}).items()}
+        outgoing.pending.clear()
+
+  def _check_format(self, encoding: str, fields: dict[str, list[str]] | None):
+    if encoding not in OUTGOING_ENCODINGS:
+      raise ValueError(f"Unknown encoding {encoding}")
+    for service, service_fields in (fields or {}).items():
+      if service not in self.services:
+        raise ValueError(f"{service} is not an outgoing service")
+      schema = log.Event.schema.fields[service].schema
+      if not hasattr(schema, "fields"):
+        raise ValueError(f"{service} is not a struct")
+      unknown = set(service_fields) - set(schema.fields)
+      if unknown:
+        raise ValueError(f"Unknown {service} fields {sorted(unknown)}")
 
   def enable(self, enable: bool):
     self._enabled = enable
@@ -89,25 +165,53 @@ class CerealOutgoingMessageProxy(AsyncTaskRunner):
       msg_dict = [self.to_json(msg) for msg in msg_content]
     elif isinstance(msg_content, bytes):
       msg_dict = msg_content.decode()
+    elif isinstance(msg_content, capnp.lib.capnp._DynamicEnum):
+      msg_dict = str(msg_content)
     else:
       msg_dict = msg_content
 
     return msg_dict
 
-  def update(self):
-    # this is blocking in async context...
-    self.sm.update(0)
+  def encode(self, service: str, encoding: str, fields: tuple[str, ...] | None) -> bytes:
+    event = self.sm.events[service]
+    if encoding == "capnp":
+      if fields is None:
+        return event.as_builder().to_bytes()
+      projected = log.Event.new_message(logMonoTime=event.logMonoTime, valid=event.valid)
+      data = projected.init(service)
+      for field in fields:
+        setattr(data, field, getattr(self.sm[service], field))
+      return projected.to_bytes()
+
+    if fields is None:
+      msg_dict = self.to_json(self.sm[service])
+    else:
+      msg_dict = {field: self.to_json(getattr(self.sm[service], field)) for field in fields}
+    mono_time, valid = self.sm.logMonoTime[service], self.sm.valid[service]
+    outgoing_msg = {"type": service, "logMonoTime": mono_time, "valid": valid, "data": msg_dict}
+    return json.dumps(outgoing_msg).encode()
+
+  def receive(self, timeout: int = 0) -> list[tuple[str, dict[tuple, bytes]]]:
+    # blocks for up to timeout ms, runs off the event loop. every message is encoded once per format in use
+    self.sm.update(timeout)
+    messages = []
     for service, updated in self.sm.updated.items():
       if not updated:
         continue
-      msg_dict = self.to_json(self.sm[service])
-      mono_time, valid = self.sm.logMonoTime[service], self.sm.valid[service]
-      outgoing_msg = {"type": service, "logMonoTime": mono_time, "valid": valid, "data": msg_dict}
-      encoded_msg = json.dumps(outgoing_msg).encode()
-      for channel in self.channels:
-        if not channel.is_open():
-          continue
-        channel.send(encoded_msg)
+      formats = {outgoing.format(service) for outgoing in self.channels}
+      messages.append((service, {fmt: self.encode(service, *fmt) for fmt in formats}))
+    return messages
+
+  def deliver(self, messages: list[tuple[str, dict[tuple, bytes]]]):
+    for outgoing in self.channels:
+      for service, payloads in messages:
+        payload = payloads.get(outgoing.format(service))
+        if payload is not None:
+          outgoing.push(service, payload)
+      outgoing.flush()
+
+  def update(self):
+    self.deliver(self.receive())
 
   async def run(self):
     while True:
@@ -115,10 +219,10 @@ class CerealOutgoingMessageProxy(AsyncTaskRunner):
         await asyncio.sleep(0.01)
         continue
       try:
-        self.update()
+        self.deliver(await asyncio.to_thread(self.receive, self.receive_timeout_ms))
       except Exception:
         self.logger.exception("Cereal outgoing proxy failure")
-      await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
 
 
 class CerealIncomingMessageProxy:
@@ -308,6 +412,10 @@ class StreamSession:
               "action": "pong", "browserSendTime": payload["data"]["browserSendTime"], "deviceTime": time.time() * 1000, # noqa: TID251
             }})
             self.stream.get_messaging_channel().send(pong)
+          case "bridgeSettings":
+            if self.outgoing_bridge is not None and self.stream.has_messaging_channel():
+              self.outgoing_bridge.configure_channel(self.stream.get_messaging_channel(), payload["data"]["encoding"],
+                                                     payload["data"].get("fields"))
           case "enableTimingSei":
             for track in self.video_tracks:
               track.timing_sei_enabled = bool(payload["data"]["enabled"])
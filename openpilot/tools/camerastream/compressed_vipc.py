@@ -2,10 +2,14 @@
 import os
 import argparse
 import multiprocessing
+import queue
+import threading
 import time
 import signal
 from collections import deque
+from typing import NamedTuple
 
+import numpy as np
 
 import openpilot.cereal.messaging as messaging
 from openpilot.cereal.visionipc import VisionStreamType
@@ -13,6 +17,7 @@ from msgq.visionipc import VisionIpcServer
 from openpilot.tools.camerastream.ffmpeg_decoder import Decoder, FFmpegError
 
 V4L2_BUF_FLAG_KEYFRAME = 8
+STATS_INTERVAL = 1.0  # s
 
 # start encoderd
 # also start cereal messaging bridge
@@ -24,88 +29,207 @@ ENCODE_SOCKETS = {
   VisionStreamType.VISION_STREAM_WIDE_ROAD: "wideRoadEncodeData",
 }
 
-def decoder(addr, vipc_server, vst, W, H, debug=False):
+class EncodedPacket(NamedTuple):
+  encode_id: int
+  keyframe: bool
+  header: bytes
+  data: bytes
+  log_mono_time: int
+  timestamp_sof: int
+  timestamp_eof: int
+  unix_timestamp_nanos: int
+  recv_time: float
+
+  @classmethod
+  def from_event(cls, evt, recv_time: float) -> 'EncodedPacket':
+    evta = getattr(evt, evt.which())
+    return cls(evta.idx.encodeId, bool(evta.idx.flags & V4L2_BUF_FLAG_KEYFRAME), evta.header, evta.data,
+               evt.logMonoTime, evta.idx.timestampSof, evta.idx.timestampEof, evta.unixTimestampNanos, recv_time)
+
+
+class PacketQueue:
+  """Hands packets from the network thread to the decoder."""
+  def __init__(self):
+    self.packets: deque[EncodedPacket] = deque()
+    self.cond = threading.Condition()
+
+  def put(self, packets: list[EncodedPacket]):
+    with self.cond:
+      self.packets.extend(packets)
+      self.cond.notify()
+
+  def get_all(self, timeout: float | None = None) -> list[EncodedPacket]:
+    with self.cond:
+      if not self.packets:
+        self.cond.wait(timeout)
+      packets = list(self.packets)
+      self.packets.clear()
+      return packets
+
+
+def receive_packets(sock, packets: PacketQueue):
+  while 1:
+    msgs = messaging.drain_sock(sock, wait_for_one=True)
+    recv_time = time.monotonic()
+    packets.put([EncodedPacket.from_event(evt, recv_time) for evt in msgs])
+
+
+class DecodeStats:
+  def __init__(self, window: int = 100):
+    self.start_time = time.monotonic()
+    self.received = 0
+    self.decoded = 0
+    self.skipped = 0  # dropped by the latency policy
+    self.resyncs = 0
+    self.max_queue = 0
+    self.latencies: deque[float] = deque(maxlen=window)  # receive to send, ms
+
+  def summary(self) -> dict[str, float]:
+    dt = max(time.monotonic() - self.start_time, 1e-9)
+    latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+    return {
+      "received": self.received,
+      "decoded": self.decoded,
+      "skipped": self.skipped,
+      "resyncs": self.resyncs,
+      "max_queue": self.max_queue,
+      "fps": self.decoded / dt,
+      "latency_mean_ms": float(latencies.mean()),
+      "latency_p95_ms": float(np.percentile(latencies, 95)),
+      "latency_max_ms": float(latencies.max()),
+    }
+
+
+class StreamDecoder:
+  """Decodes one camera stream and sends the frames over VisionIPC.
+
+  With max_queue set, when more than max_queue packets are waiting the decoder skips
+  ahead to the newest keyframe among them, bounding latency when it can't keep up.
+  """
+  def __init__(self, vipc_server, vst, W: int, H: int, max_queue: int | None = None, debug: bool = False):
+    self.vipc_server = vipc_server
+    self.vst = vst
+    self.W, self.H = W, H
+    self.max_queue = max_queue
+    self.debug = debug
+    self.codec = Decoder("hevc")
+    self.stats = DecodeStats()
+    self.pending: deque[EncodedPacket] = deque()
+    self.time_q: deque[float] = deque()
+    self.cnt = 0
+    self.last_idx = -1
+    self.seen_iframe = False
+
+  def log(self, msg: str):
+    if self.debug:
+      print(msg)
+
+  def resync(self):
+    self.codec.reset()
+    self.seen_iframe = False
+    self.time_q.clear()
+    self.stats.resyncs += 1
+
+  def skip_ahead(self):
+    keyframe = max((i for i, p in enumerate(self.pending) if p.keyframe), default=0)
+    if keyframe == 0:
+      return
+    self.log(f"SKIP {keyframe} PACKETS")
+    for _ in range(keyframe):
+      self.pending.popleft()
+    self.stats.skipped += keyframe
+    self.last_idx = self.pending[0].encode_id - 1
+    self.resync()
+
+  def add(self, packets: list[EncodedPacket]):
+    self.pending.extend(packets)
+    self.stats.received += len(packets)
+    self.stats.max_queue = max(self.stats.max_queue, len(self.pending))
+    if self.max_queue is not None and len(self.pending) > self.max_queue:
+      self.skip_ahead()
+
+  def process(self):
+    while self.pending:
+      self.decode(self.pending.popleft())
+
+  def decode(self, packet: EncodedPacket):
+    if self.last_idx != -1 and packet.encode_id != (self.last_idx + 1):
+      self.log("DROP PACKET!")
+      self.resync()
+    self.last_idx = packet.encode_id
+    if not self.seen_iframe and not packet.keyframe:
+      self.log("waiting for iframe")
+      return
+    self.time_q.append(packet.recv_time)
+
+    # put in header (first) — VPS/SPS/PPS only, no frame expected
+    if not self.seen_iframe:
+      try:
+        self.codec.decode(packet.header)
+      except FFmpegError as e:
+        self.log(f"HEADER ERROR: {e}")
+        self.resync()
+        return
+      self.seen_iframe = True
+
+    try:
+      img_yuv = self.codec.decode(packet.data)
+    except FFmpegError as e:
+      self.log(f"DECODE ERROR: {e}")
+      self.resync()
+      return
+
+    if img_yuv is None:
+      self.log("DROP SURFACE")
+      return
+
+    if self.codec.width != self.W or self.codec.height != self.H:
+      self.log(f"DECODE ERROR: decoded frame is {self.codec.width}x{self.codec.height}, expected {self.W}x{self.H}")
+      self.resync()
+      return
+
+    # the decoder reuses its output buffer, VisionIPC copies it into its own on send
+    frame_start_time = self.time_q.popleft()
+    self.vipc_server.send(self.vst, img_yuv.data, self.cnt, int(frame_start_time*1e9), int(time.monotonic()*1e9))
+    self.cnt += 1
+    self.stats.decoded += 1
+
+    pc_latency = (time.monotonic()-frame_start_time)*1000
+    self.stats.latencies.append(pc_latency)
+    if self.debug:
+      network_latency = (int(time.time()*1e9) - packet.unix_timestamp_nanos)/1e6  # noqa: TID251
+      frame_latency = ((packet.timestamp_eof/1e9) - (packet.timestamp_sof/1e9))*1000
+      process_latency = ((packet.log_mono_time/1e9) - (packet.timestamp_eof/1e9))*1000
+      print(f"{len(self.pending):2d} {packet.encode_id:4d} {packet.log_mono_time/1e9:.3f} {packet.timestamp_eof/1e6:.3f} \
+          roll {frame_latency:6.2f} ms latency {process_latency:6.2f} ms + {network_latency:6.2f} ms + {pc_latency:6.2f} ms \
+          = {process_latency+network_latency+pc_latency:6.2f} ms", len(packet.data), ENCODE_SOCKETS[self.vst])
+
+
+def decoder(addr, vipc_server, vst, W, H, debug=False, max_queue=None, stats_queue=None):
   sock_name = ENCODE_SOCKETS[vst]
   if debug:
     print(f"start decoder for {sock_name}, {W}x{H}")
 
-  codec = Decoder("hevc")
+  stream = StreamDecoder(vipc_server, vst, W, H, max_queue, debug)
 
   os.environ["ZMQ"] = "1"
   messaging.reset_context()
   sock = messaging.sub_sock(sock_name, None, addr=addr, conflate=False)
-  cnt = 0
-  last_idx = -1
-  seen_iframe = False
-
-  time_q = deque()
 
-  def resync():
-    nonlocal seen_iframe
-    codec.reset()
-    seen_iframe = False
-    time_q.clear()
+  # drain the network on its own thread, decoding releases the GIL
+  packets = PacketQueue()
+  threading.Thread(target=receive_packets, args=(sock, packets), daemon=True).start()
 
+  last_stats = time.monotonic()
   while 1:
-    msgs = messaging.drain_sock(sock, wait_for_one=True)
-    for evt in msgs:
-      evta = getattr(evt, evt.which())
-      if last_idx != -1 and evta.idx.encodeId != (last_idx + 1):
-        if debug:
-          print("DROP PACKET!")
-        resync()
-      last_idx = evta.idx.encodeId
-      if not seen_iframe and not (evta.idx.flags & V4L2_BUF_FLAG_KEYFRAME):
-        if debug:
-          print("waiting for iframe")
-        continue
-      time_q.append(time.monotonic())
-      network_latency = (int(time.time()*1e9) - evta.unixTimestampNanos)/1e6  # noqa: TID251
-      frame_latency = ((evta.idx.timestampEof/1e9) - (evta.idx.timestampSof/1e9))*1000
-      process_latency = ((evt.logMonoTime/1e9) - (evta.idx.timestampEof/1e9))*1000
-
-      # put in header (first) — VPS/SPS/PPS only, no frame expected
-      if not seen_iframe:
-        try:
-          codec.decode(evta.header)
-        except FFmpegError as e:
-          if debug:
-            print(f"HEADER ERROR: {e}")
-          resync()
-          continue
-        seen_iframe = True
-
-      try:
-        img_yuv = codec.decode(evta.data)
-      except FFmpegError as e:
-        if debug:
-          print(f"DECODE ERROR: {e}")
-        resync()
-        continue
-
-      if img_yuv is None:
-        if debug:
-          print("DROP SURFACE")
-        continue
-
-      if codec.width != W or codec.height != H:
-        if debug:
-          print(f"DECODE ERROR: decoded frame is {codec.width}x{codec.height}, expected {W}x{H}")
-        resync()
-        continue
-
-      frame_start_time = time_q.popleft()
-      vipc_server.send(vst, img_yuv.data, cnt, int(frame_start_time*1e9), int(time.monotonic()*1e9))
-      cnt += 1
-
-      pc_latency = (time.monotonic()-frame_start_time)*1000
-      if debug:
-        print(f"{len(msgs):2d} {evta.idx.encodeId:4d} {evt.logMonoTime/1e9:.3f} {evta.idx.timestampEof/1e6:.3f} \
-            roll {frame_latency:6.2f} ms latency {process_latency:6.2f} ms + {network_latency:6.2f} ms + {pc_latency:6.2f} ms \
-            = {process_latency+network_latency+pc_latency:6.2f} ms", len(evta.data), sock_name)
+    stream.add(packets.get_all(timeout=STATS_INTERVAL))
+    stream.process()
+    if stats_queue is not None and time.monotonic() - last_stats > STATS_INTERVAL:
+      last_stats = time.monotonic()
+      stats_queue.put((sock_name, stream.stats.summary()))
 
 class CompressedVipc:
-  def __init__(self, addr, vision_streams, server_name, debug=False):
+  def __init__(self, addr, vision_streams, server_name, debug=False, max_queue=None, stats=False):
     print("getting frame sizes")
     os.environ["ZMQ"] = "1"
     messaging.reset_context()
@@ -121,13 +245,26 @@ class CompressedVipc:
       self.vipc_server.create_buffers(vst, 4, ed.width, ed.height)
     self.vipc_server.start_listener()
 
+    # the decoders only report when somebody reads stats(), nothing drains the queue otherwise
+    self.stats_queue = multiprocessing.Queue() if stats else None
+    self.latest_stats: dict[str, dict[str, float]] = {}
     self.procs = []
     for vst in vision_streams:
       ed = sm[ENCODE_SOCKETS[vst]]
-      p = multiprocessing.Process(target=decoder, args=(addr, self.vipc_server, vst, ed.width, ed.height, debug))
+      p = multiprocessing.Process(target=decoder, args=(addr, self.vipc_server, vst, ed.width, ed.height, debug, max_queue, self.stats_queue))
       p.start()
       self.procs.append(p)
 
+  def stats(self) -> dict[str, dict[str, float]]:
+    """Latest decode statistics of each stream, updated every STATS_INTERVAL."""
+    while self.stats_queue is not None:
+      try:
+        sock_name, summary = self.stats_queue.get_nowait()
+      except queue.Empty:
+        return self.latest_stats
+      self.latest_stats[sock_name] = summary
+    return self.latest_stats
+
   def join(self):
     for p in self.procs:
       p.join()
@@ -143,6 +280,8 @@ if __name__ == "__main__":
   parser.add_argument("--cams", default="0,1,2", help="Cameras to decode")
   parser.add_argument("--server", default="camerad", help="choose vipc server name")
   parser.add_argument("--silent", action="store_true", help="Suppress debug output")
+  parser.add_argument("--max-queue", type=int, default=None, help="Skip ahead to the newest keyframe when more packets are waiting")
+  parser.add_argument("--stats", action="store_true", help="Print decode latency and throughput statistics")
   args = parser.parse_args()
 
   vision_streams = [
@@ -152,9 +291,14 @@ if __name__ == "__main__":
   ]
 
   vsts = [vision_streams[int(x)] for x in args.cams.split(",")]
-  cvipc = CompressedVipc(args.addr, vsts, args.server, debug=(not args.silent))
+  cvipc = CompressedVipc(args.addr, vsts, args.server, debug=(not args.silent), max_queue=args.max_queue,
+                         stats=args.stats)
 
   # register exit handler
   signal.signal(signal.SIGINT, lambda sig, frame: cvipc.kill())
 
+  while args.stats and any(p.is_alive() for p in cvipc.procs):
+    time.sleep(STATS_INTERVAL)
+    for sock_name, summary in cvipc.stats().items():
+      print(sock_name, " ".join(f"{k} {v:.1f}" if isinstance(v, float) else f"{k} {v}" for k, v in summary.items()))
   cvipc.join()
@@ -0,0 +1,126 @@
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from openpilot.cereal.visionipc import VisionStreamType
+from openpilot.tools.camerastream.compressed_vipc import EncodedPacket, PacketQueue, StreamDecoder
+from openpilot.tools.lib.framereader import HEVC_SLICE_I, decompress_video_data
+from openpilot.tools.lib.vidindex import hevc_index
+
+W, H = 320, 192
+FRAMES = 60
+GOP = 10
+VST = VisionStreamType.VISION_STREAM_NARROW_ROAD
+
+
+class FakeVipcServer:
+  def __init__(self):
+    self.frames = []
+
+  def send(self, vst, buf, frame_id, timestamp_sof, timestamp_eof):
+    self.frames.append((frame_id, bytes(buf)))
+
+
+@pytest.fixture(scope="module")
+def hevc_stream(tmp_path_factory):
+  # moving gradients, so P frames carry real motion
+  y, x = np.mgrid[:H, :W]
+  frames = []
+  for i in range(FRAMES):
+    luma = ((x + 4 * i) ^ (y + 2 * i)).astype(np.uint8)
+    chroma = np.full(W * H // 2, 128 + (i % 64), dtype=np.uint8)
+    frames.append(luma.tobytes() + chroma.tobytes())
+
+  fn = tmp_path_factory.mktemp("camerastream") / "stream.hevc"
+  subprocess.run(["ffmpeg", "-v", "quiet", "-f", "rawvideo", "-pix_fmt", "yuv420p", "-s", f"{W}x{H}", "-r", "20", "-i", "pipe:0",
+                  "-c:v", "libx265", "-x265-params", f"keyint={GOP}:min-keyint={GOP}:bframes=0:log-level=none",
+                  "-f", "hevc", str(fn)], input=b"".join(frames), check=True)
+
+  dat = fn.read_bytes()
+  frame_types, dat_len, prefix = hevc_index(str(fn))
+  offsets = [offset for _, offset in frame_types] + [dat_len]
+  packets = []
+  for i, (slice_type, _) in enumerate(frame_types):
+    keyframe = slice_type == HEVC_SLICE_I
+    packets.append(EncodedPacket(i, keyframe, prefix if keyframe else b"", dat[offsets[i]:offsets[i + 1]], 0, 0, 0, 0, time.monotonic()))
+  expected = decompress_video_data(dat, W, H, pix_fmt="nv12", hwaccel="none", loglevel="quiet")
+  return packets, [bytes(f) for f in expected]
+
+
+def decode_all(packets, **kwargs):
+  server = FakeVipcServer()
+  stream = StreamDecoder(server, VST, W, H, **kwargs)
+  stream.add(packets)
+  stream.process()
+  return stream, server.frames
+
+
+class TestCompressedVipc:
+  def test_decode(self, hevc_stream):
+    packets, expected = hevc_stream
+    assert len(packets) == FRAMES and sum(p.keyframe for p in packets) == FRAMES // GOP
+
+    stream, frames = decode_all(packets)
+    assert [frame_id for frame_id, _ in frames] == list(range(FRAMES))
+    assert [f for _, f in frames] == expected
+    assert stream.stats.decoded == FRAMES and stream.stats.skipped == 0
+
+  def test_dropped_packet(self, hevc_stream):
+    packets, expected = hevc_stream
+    # losing a packet resyncs on the next keyframe
+    stream, frames = decode_all(packets[:15] + packets[16:])
+    assert [f for _, f in frames] == expected[:15] + expected[20:]
+    assert stream.stats.resyncs == 1
+
+  def test_skip_ahead(self, hevc_stream):
+    packets, expected = hevc_stream
+    stream, frames = decode_all(packets[:25], max_queue=12)
+    # newest keyframe among the waiting packets is frame 20
+    assert [f for _, f in frames] == expected[20:25]
+    assert stream.stats.skipped == 20
+
+    # below the threshold nothing is skipped
+    stream, frames = decode_all(packets[:25], max_queue=25)
+    assert len(frames) == 25
+
+  def test_bounded_latency(self, hevc_stream):
+    packets, expected = hevc_stream
+    server = FakeVipcServer()
+    stream = StreamDecoder(server, VST, W, H, max_queue=2 * GOP)
+    # the decoder falls behind, three packets arrive for every one it decodes
+    for i in range(0, FRAMES, 3):
+      stream.add(packets[i:i + 3])
+      stream.decode(stream.pending.popleft())
+      assert len(stream.pending) <= 2 * GOP + 2
+    stream.process()
+
+    # frames come out in order and the stream caught up to the end
+    decoded = [expected.index(f) for _, f in server.frames]
+    assert decoded == sorted(set(decoded)) and decoded[-1] == FRAMES - 1
+    assert stream.stats.skipped > 0 and len(decoded) + stream.stats.skipped <= FRAMES
+    summary = stream.stats.summary()
+    assert summary["decoded"] == len(server.frames) and summary["fps"] > 0 and summary["latency_max_ms"] > 0
+
+  def test_pipeline(self, hevc_stream):
+    packets, expected = hevc_stream
+    queue = PacketQueue()
+
+    def network():
+      for p in packets:
+        queue.put([p._replace(recv_time=time.monotonic())])
+        time.sleep(0.002)
+    producer = threading.Thread(target=network)
+    producer.start()
+
+    server = FakeVipcServer()
+    stream = StreamDecoder(server, VST, W, H, max_queue=2 * GOP)
+    while stream.stats.received < FRAMES:
+      stream.add(queue.get_all(timeout=1.))
+      stream.process()
+    producer.join()
+
+    assert [f for _, f in server.frames] == expected
+    assert stream.stats.summary()["decoded"] == len(expected)
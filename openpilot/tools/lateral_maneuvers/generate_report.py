@@ -3,11 +3,13 @@ import argparse
 import base64
 import io
 import math
+import multiprocessing
 import numpy as np
 import os
 import webbrowser
 from collections import defaultdict
 from pathlib import Path
+from typing import NamedTuple
 import matplotlib.pyplot as plt
 from openpilot.common.utils import tabulate
 
@@ -21,7 +23,183 @@ from openpilot.tools.longitudinal_maneuvers.generate_report import format_car_pa
 
 
 def lat_accel(curvature, v):
-  return curvature * max(v, 1.0) ** 2
+  return curvature * np.maximum(v, 1.0) ** 2
+
+
+class RunColumns(NamedTuple):
+  complete: bool
+  t_carControl: np.ndarray
+  lat_active: np.ndarray
+  steer_desired: np.ndarray
+  roll: np.ndarray
+  t_carState: np.ndarray
+  v_ego: np.ndarray
+  steering_pressed: np.ndarray
+  t_controlsState: np.ndarray
+  curvature: np.ndarray
+  t_lateralPlan: np.ndarray
+  desired_curvature: np.ndarray
+  t_carOutput: np.ndarray
+  steer_output: np.ndarray
+
+
+SERVICES = ('carControl', 'carState', 'controlsState', 'lateralManeuverPlan', 'carOutput')
+N_VALUES = {'carControl': 3, 'carState': 2, 'controlsState': 1, 'lateralManeuverPlan': 1, 'carOutput': 1}
+
+
+def run_complete(msgs) -> bool:
+  return any(m.alertDebug.alertText1 == 'Complete' for m in msgs if m.which() == 'alertDebug')
+
+
+def run_columns(msgs, steer_field: str) -> RunColumns:
+  """Extracts the signals of a run in one pass, as arrays per service with times relative to each service's first message"""
+  rows = defaultdict(list)
+  complete = False
+  for m in msgs:
+    which = m.which()
+    if which == 'carControl':
+      rows[which].append((m.logMonoTime, m.carControl.latActive, getattr(m.carControl.actuators, steer_field), m.carControl.orientationNED[0]))
+    elif which == 'carState':
+      rows[which].append((m.logMonoTime, m.carState.vEgo, m.carState.steeringPressed))
+    elif which == 'controlsState':
+      rows[which].append((m.logMonoTime, m.controlsState.curvature))
+    elif which == 'lateralManeuverPlan':
+      if m.valid:
+        rows[which].append((m.logMonoTime, m.lateralManeuverPlan.desiredCurvature))
+    elif which == 'carOutput':
+      rows[which].append((m.logMonoTime, getattr(m.carOutput.actuatorsOutput, steer_field)))
+    elif which == 'alertDebug':
+      complete = complete or m.alertDebug.alertText1 == 'Complete'
+
+  # the run ends with the last valid plan, services without messages are empty
+  columns = []
+  last_active = max((t for t, _ in rows['lateralManeuverPlan']), default=None)
+  for which in SERVICES:
+    if rows[which]:
+      t, *values = (np.array(c) for c in zip(*rows[which], strict=True))
+    else:
+      t, *values = (np.empty(0) for _ in range(N_VALUES[which] + 1))
+    keep = t <= last_active if last_active is not None else np.ones(len(t), dtype=bool)
+    t = t[keep]
+    columns += [(t - t[0]) / 1e9 if len(t) else t, *(v[keep] for v in values)]
+  return RunColumns(complete, *columns)
+
+
+def plot_run(description: str, run: int, c: RunColumns, steer_field: str, steer_ylabel: str) -> tuple[str, list[float], bool]:
+  """Returns the report section of a completed run, its target cross times, and whether the maneuver was valid"""
+  builder = []
+  cross_times = []
+
+  # maneuver validity
+  maneuver_valid = bool(c.lat_active.all() and not c.steering_pressed.any())
+
+  _open = 'open' if maneuver_valid else ''
+  title = f'Run #{int(run)+1}' + (' <span style="color: red">(invalid maneuver!)</span>' if not maneuver_valid else '')
+
+  builder.append(f"<details {_open}><summary><h3 style='display: inline-block;'>{title}</h3></summary>\n")
+
+  # controlsState and lateralManeuverPlan are paired with carState by index
+  baseline_accel = lat_accel(c.curvature[0], c.v_ego[0])
+  n_desired = min(len(c.desired_curvature), len(c.v_ego))
+  n_actual = min(len(c.curvature), len(c.v_ego))
+  desired_lat_accel = lat_accel(c.desired_curvature[:n_desired], c.v_ego[:n_desired])
+  actual_lat_accel = lat_accel(c.curvature[:n_actual], c.v_ego[:n_actual])
+  t_accel = c.t_controlsState[:n_actual]
+  actual = actual_lat_accel - baseline_accel
+  cross_markers = []
+
+  if description.startswith(('sine', 'jitter')):
+    threshold = np.max(np.abs(desired_lat_accel - baseline_accel)) * 0.5
+    builder.append('<h3 style="font-weight: normal">50% peak')
+    crossed = np.flatnonzero(np.abs(actual) > threshold)
+    if len(crossed):
+      t = t_accel[crossed[0]]
+      builder.append(f', <strong>crossed in {t:.3f}s</strong>')
+      cross_markers.append((t, actual[crossed[0]] + baseline_accel))
+      cross_times.append(float(t))
+    else:
+      builder.append(', <strong>not crossed</strong>')
+    builder.append('</h3>')
+  else:
+    starts = np.concatenate(([0], np.flatnonzero(np.abs(np.diff(c.desired_curvature[:n_desired])) > 0.001) + 1))
+    action_targets = lat_accel(c.desired_curvature[starts], c.v_ego[starts]) - baseline_accel
+
+    for j, (start_i, act_target) in enumerate(zip(starts, action_targets, strict=True)):
+      start_time = c.t_lateralPlan[start_i]
+      end_time = c.t_lateralPlan[starts[j + 1]] if j + 1 < len(starts) else c.t_controlsState[-1]
+
+      builder.append(f'<h3 style="font-weight: normal">aTarget: {round(float(act_target), 1)} m/s^2')
+      window = (start_time <= t_accel) & (t_accel <= end_time)
+      crossed = ((0 < act_target) & (act_target < actual[window])) | ((0 > act_target) & (act_target > actual[window]))
+      # crossed on two samples in a row
+      held = np.flatnonzero(crossed[1:] & crossed[:-1])
+      if len(held):
+        t = t_accel[window][held[0] + 1]
+        cross_time = t - start_time
+        builder.append(f', <strong>crossed in {cross_time:.3f}s</strong>')
+        cross_markers.append((t, act_target + baseline_accel))
+        cross_times.append(float(cross_time))
+      else:
+        builder.append(', <strong>not crossed</strong>')
+      builder.append('</h3>')
+
+  plt.rcParams['font.size'] = 40
+  fig = plt.figure(figsize=(30, 40))
+  ax = fig.subplots(5, 1, sharex=True, gridspec_kw={'height_ratios': [5, 5, 3, 3, 3]})
+
+  ax[0].grid(linewidth=4)
+  desired_label = 'lateralManeuverPlan.desiredCurvature * vEgo^2'
+  if description.startswith(('sine', 'jitter')):
+    ax[0].plot(c.t_lateralPlan[:n_desired], desired_lat_accel, 'C1', label=desired_label, linewidth=6)
+  else:
+    t_desired = np.concatenate((c.t_lateralPlan[:1], c.t_lateralPlan[:n_desired]))
+    ax[0].step(t_desired, np.concatenate(([baseline_accel], desired_lat_accel)), 'C1', label=desired_label, linewidth=6, where='post')
+  ax[0].plot(t_accel, actual_lat_accel, 'g', label='controlsState.curvature * vEgo^2', linewidth=6)
+  ax[0].set_ylabel('Lateral Accel (m/s^2)')
+  for ct, cv in cross_markers:
+    ax[0].plot(ct, cv, marker='o', markersize=50, markeredgewidth=7, markeredgecolor='black', markerfacecolor='None')
+  ax[0].legend(prop={'size': 30})
+
+  ax[1].grid(linewidth=4)
+  ax[1].plot(c.t_carControl, c.steer_desired, 'C1', label=f'carControl.actuators.{steer_field}', linewidth=6)
+  ax[1].plot(c.t_carOutput, c.steer_output, 'g', label=f'carOutput.actuatorsOutput.{steer_field}', linewidth=6)
+  ax[1].set_ylabel(steer_ylabel)
+  ax[1].legend(prop={'size': 30})
+
+  ax[2].grid(linewidth=4)
+  ax[2].plot(c.t_carState, c.v_ego * CV.MS_TO_MPH, label='carState.vEgo', linewidth=6)
+  ax[2].set_ylabel('Velocity (mph)')
+  ax[2].yaxis.set_major_formatter(plt.FormatStrFormatter('%.1f'))
+  ax[2].legend()
+
+  raw_jerk = np.gradient(actual_lat_accel, t_accel)
+  dt_avg = np.mean(np.diff(t_accel))
+  jerk_filter = FirstOrderFilter(0.0, 1 / (2 * np.pi * LP_FILTER_CUTOFF_HZ), dt_avg)
+  filtered_jerk = [jerk_filter.update(j) for j in raw_jerk]
+  ax[3].grid(linewidth=4)
+  ax[3].plot(t_accel, filtered_jerk, label='d/dt(controlsState.curvature * vEgo^2)', linewidth=6)
+  ax[3].set_ylabel('Jerk (m/s^3)')
+  ax[3].legend()
+
+  ax[4].grid(linewidth=4)
+  ax[4].plot(c.t_carControl, [math.degrees(r) for r in c.roll], label='carControl.orientationNED[0]', linewidth=6)
+  ax[4].set_ylabel('Roll (deg)')
+  ax[4].legend()
+
+  ax[-1].set_xlabel("Time (s)")
+  fig.tight_layout()
+
+  buffer = io.BytesIO()
+  fig.savefig(buffer, format='webp')
+  plt.close(fig)
+  buffer.seek(0)
+  builder.append(f"<img src='data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode()}' style='width:100%; max-width:800px;'>\n")
+  builder.append("</details>\n")
+  return ''.join(builder), cross_times, maneuver_valid
+
+
+def _plot_run(args):
+  return plot_run(*args)
 
 
 def report(platform, route, _description, CP, ID, maneuvers):
@@ -30,6 +208,13 @@ def report(platform, route, _description, CP, ID, maneuvers):
   output_path.mkdir(exist_ok=True)
   target_cross_times = defaultdict(list)
 
+  if CP.steerControlType == car.CarParams.SteerControlType.angle:
+    steer_field, steer_ylabel = 'steeringAngleDeg', 'Steer angle (deg)'
+  elif CP.steerControlType == car.CarParams.SteerControlType.curvature:
+    steer_field, steer_ylabel = 'curvature', 'Curvature (1/m)'
+  else:
+    steer_field, steer_ylabel = 'torque', 'Steer torque'
+
   builder = [
     "<style>summary { cursor: pointer; }\n td, th { padding: 8px; } </style>\n",
     "<h1>Lateral maneuver report</h1>\n",
@@ -41,156 +226,30 @@ def report(platform, route, _description, CP, ID, maneuvers):
     builder.append(f"<h3>Description: {_description}</h3>\n")
   builder.append(f"<details><summary><h3 style='display: inline-block;'>CarParams</h3></summary><pre>{format_car_params(CP)}</pre></details>\n")
   builder.append('{ summary }')  # to be replaced below
+
+  # runs are plotted in parallel, then their sections are added in order
+  sections: list[tuple[str, int]] = []
+  jobs = []
   for description, runs in maneuvers:
-    # filter incomplete runs
-    completed_runs = [msgs for msgs in runs
-                      if any(m.alertDebug.alertText1 == 'Complete' for m in msgs if m.which() == 'alertDebug')]
+    # filter incomplete runs before extracting, aborted runs can be missing services
+    completed_runs = [run_columns(msgs, steer_field) for msgs in runs if run_complete(msgs)]
+    completed_runs = [c for c in completed_runs if len(c.t_lateralPlan) and len(c.t_controlsState) and len(c.t_carState)]
     print(f'plotting maneuver: {description}')
-    if not completed_runs:
-      continue
-    builder.append("<div style='border-top: 1px solid #000; margin: 20px 0;'></div>\n")
-    builder.append(f"<h2>{description}</h2>\n")
-    for run, msgs in enumerate(completed_runs):
-      last_active = max(m.logMonoTime for m in msgs if m.which() == 'lateralManeuverPlan' and m.valid)
-      msgs = [m for m in msgs if m.logMonoTime <= last_active]
-      t_carControl, carControl = zip(*[(m.logMonoTime, m.carControl) for m in msgs if m.which() == 'carControl'], strict=True)
-      t_carState, carState = zip(*[(m.logMonoTime, m.carState) for m in msgs if m.which() == 'carState'], strict=True)
-      t_controlsState, controlsState = zip(*[(m.logMonoTime, m.controlsState) for m in msgs if m.which() == 'controlsState'], strict=True)
-      t_lateralPlan, lateralPlan = zip(*[(m.logMonoTime, m.lateralManeuverPlan) for m in msgs if m.which() == 'lateralManeuverPlan' and m.valid], strict=True)
-      t_carOutput, carOutput = zip(*[(m.logMonoTime, m.carOutput) for m in msgs if m.which() == 'carOutput'], strict=True)
-
-      # make time relative seconds
-      t_carControl = [(t - t_carControl[0]) / 1e9 for t in t_carControl]
-      t_carState = [(t - t_carState[0]) / 1e9 for t in t_carState]
-      t_controlsState = [(t - t_controlsState[0]) / 1e9 for t in t_controlsState]
-      t_lateralPlan = [(t - t_lateralPlan[0]) / 1e9 for t in t_lateralPlan]
-      t_carOutput = [(t - t_carOutput[0]) / 1e9 for t in t_carOutput]
-
-      # maneuver validity
-      latActive = [m.latActive for m in carControl]
-      maneuver_valid = all(latActive) and not any(cs.steeringPressed for cs in carState)
-
-      _open = 'open' if maneuver_valid else ''
-      title = f'Run #{int(run)+1}' + (' <span style="color: red">(invalid maneuver!)</span>' if not maneuver_valid else '')
-
-      builder.append(f"<details {_open}><summary><h3 style='display: inline-block;'>{title}</h3></summary>\n")
-
-      baseline_accel = lat_accel(controlsState[0].curvature, carState[0].vEgo)
-      v_ego = [m.vEgo for m in carState]
-      cross_markers = []
-
-      if description.startswith(('sine', 'jitter')):
-        amplitude = max(abs(lat_accel(lp.desiredCurvature, v) - baseline_accel)
-                        for lp, v in zip(lateralPlan, v_ego, strict=False))
-        threshold = amplitude * 0.5
-        builder.append('<h3 style="font-weight: normal">50% peak')
-        for t, cs, v in zip(t_controlsState, controlsState, v_ego, strict=False):
-          actual = lat_accel(cs.curvature, v) - baseline_accel
-          if abs(actual) > threshold:
-            builder.append(f', <strong>crossed in {t:.3f}s</strong>')
-            cross_markers.append((t, actual + baseline_accel))
-            if maneuver_valid:
-              target_cross_times[description].append(t)
-            break
-        else:
-          builder.append(', <strong>not crossed</strong>')
-        builder.append('</h3>')
+    sections.append((description, len(completed_runs)))
+    jobs += [(description, run, c, steer_field, steer_ylabel) for run, c in enumerate(completed_runs)]
+
+  with multiprocessing.Pool() as pool:
+    results = iter(pool.imap(_plot_run, jobs))
+    for description, n_runs in sections:
+      if not n_runs:
+        continue
+      builder.append("<div style='border-top: 1px solid #000; margin: 20px 0;'></div>\n")
+      builder.append(f"<h2>{description}</h2>\n")
+      for _ in range(n_runs):
+        section, cross_times, maneuver_valid = next(results)
+        builder.append(section)
         if maneuver_valid:
-          target_cross_times.setdefault(description, [])
-      else:
-        action_targets = [(0, lat_accel(lateralPlan[0].desiredCurvature, v_ego[0]) - baseline_accel)]
-        for i in range(1, min(len(lateralPlan), len(v_ego))):
-          if abs(lateralPlan[i].desiredCurvature - lateralPlan[i - 1].desiredCurvature) > 0.001:
-            desired = lat_accel(lateralPlan[i].desiredCurvature, v_ego[i]) - baseline_accel
-            action_targets.append((i, desired))
-
-        for j, (start_i, act_target) in enumerate(action_targets):
-          start_time = t_lateralPlan[start_i]
-          end_time = t_lateralPlan[action_targets[j + 1][0]] if j + 1 < len(action_targets) else t_controlsState[-1]
-
-          builder.append(f'<h3 style="font-weight: normal">aTarget: {round(act_target, 1)} m/s^2')
-          prev_crossed = False
-          for t, cs, v in zip(t_controlsState, controlsState, v_ego, strict=False):
-            if not (start_time <= t <= end_time):
-              continue
-            actual_accel = lat_accel(cs.curvature, v) - baseline_accel
-            crossed = (0 < act_target < actual_accel) or (0 > act_target > actual_accel)
-            if crossed and prev_crossed:
-              cross_time = t - start_time
-              builder.append(f', <strong>crossed in {cross_time:.3f}s</strong>')
-              cross_markers.append((t, act_target + baseline_accel))
-              if maneuver_valid:
-                target_cross_times[description].append(cross_time)
-              break
-            prev_crossed = crossed
-          else:
-            builder.append(', <strong>not crossed</strong>')
-          builder.append('</h3>')
-          if maneuver_valid:
-            target_cross_times.setdefault(description, [])
-
-      plt.rcParams['font.size'] = 40
-      fig = plt.figure(figsize=(30, 40))
-      ax = fig.subplots(5, 1, sharex=True, gridspec_kw={'height_ratios': [5, 5, 3, 3, 3]})
-
-      ax[0].grid(linewidth=4)
-      desired_label = 'lateralManeuverPlan.desiredCurvature * vEgo^2'
-      desired_lat_accel = [lat_accel(m.desiredCurvature, v) for m, v in zip(lateralPlan, v_ego, strict=False)]
-      if description.startswith(('sine', 'jitter')):
-        ax[0].plot(t_lateralPlan[:len(desired_lat_accel)], desired_lat_accel, 'C1', label=desired_label, linewidth=6)
-      else:
-        t_desired = [t_lateralPlan[0]] + t_lateralPlan[:len(desired_lat_accel)]
-        desired_lat_accel = [baseline_accel] + desired_lat_accel
-        ax[0].step(t_desired, desired_lat_accel, 'C1', label=desired_label, linewidth=6, where='post')
-      actual_lat_accel = [lat_accel(cs.curvature, v) for cs, v in zip(controlsState, v_ego, strict=False)]
-      ax[0].plot(t_controlsState[:len(actual_lat_accel)], actual_lat_accel, 'g', label='controlsState.curvature * vEgo^2', linewidth=6)
-      ax[0].set_ylabel('Lateral Accel (m/s^2)')
-      for ct, cv in cross_markers:
-        ax[0].plot(ct, cv, marker='o', markersize=50, markeredgewidth=7, markeredgecolor='black', markerfacecolor='None')
-      ax[0].legend(prop={'size': 30})
-
-      ax[1].grid(linewidth=4)
-      if CP.steerControlType == car.CarParams.SteerControlType.angle:
-        steer_field, steer_ylabel = 'steeringAngleDeg', 'Steer angle (deg)'
-      elif CP.steerControlType == car.CarParams.SteerControlType.curvature:
-        steer_field, steer_ylabel = 'curvature', 'Curvature (1/m)'
-      else:
-        steer_field, steer_ylabel = 'torque', 'Steer torque'
-      ax[1].plot(t_carControl, [getattr(m.actuators, steer_field) for m in carControl], 'C1', label=f'carControl.actuators.{steer_field}', linewidth=6)
-      ax[1].plot(t_carOutput, [getattr(m.actuatorsOutput, steer_field) for m in carOutput], 'g', label=f'carOutput.actuatorsOutput.{steer_field}', linewidth=6)
-      ax[1].set_ylabel(steer_ylabel)
-      ax[1].legend(prop={'size': 30})
-
-      ax[2].grid(linewidth=4)
-      ax[2].plot(t_carState, [v * CV.MS_TO_MPH for v in v_ego], label='carState.vEgo', linewidth=6)
-      ax[2].set_ylabel('Velocity (mph)')
-      ax[2].yaxis.set_major_formatter(plt.FormatStrFormatter('%.1f'))
-      ax[2].legend()
-
-      t_accel = np.array(t_controlsState[:len(actual_lat_accel)])
-      raw_jerk = np.gradient(actual_lat_accel, t_accel)
-      dt_avg = np.mean(np.diff(t_accel))
-      jerk_filter = FirstOrderFilter(0.0, 1 / (2 * np.pi * LP_FILTER_CUTOFF_HZ), dt_avg)
-      filtered_jerk = [jerk_filter.update(j) for j in raw_jerk]
-      ax[3].grid(linewidth=4)
-      ax[3].plot(t_accel, filtered_jerk, label='d/dt(controlsState.curvature * vEgo^2)', linewidth=6)
-      ax[3].set_ylabel('Jerk (m/s^3)')
-      ax[3].legend()
-
-      ax[4].grid(linewidth=4)
-      ax[4].plot(t_carControl, [math.degrees(m.orientationNED[0]) for m in carControl], label='carControl.orientationNED[0]', linewidth=6)
-      ax[4].set_ylabel('Roll (deg)')
-      ax[4].legend()
-
-      ax[-1].set_xlabel("Time (s)")
-      fig.tight_layout()
-
-      buffer = io.BytesIO()
-      fig.savefig(buffer, format='webp')
-      plt.close(fig)
-      buffer.seek(0)
-      builder.append(f"<img src='data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode()}' style='width:100%; max-width:800px;'>\n")
-      builder.append("</details>\n")
+          target_cross_times[description].extend(cross_times)
 
   summary = ["<h2>Summary</h2>\n"]
   cols = ['maneuver', 'crossed', 'mean', 'min', 'max']
@@ -0,0 +1,39 @@
+import openpilot.cereal.messaging as messaging
+from opendbc.car.structs import car
+from openpilot.tools.lateral_maneuvers import generate_report
+
+
+def make_run(n, complete=True, plan=True):
+  msgs = []
+  for i in range(n):
+    t = 10**18 + i * 10**7
+    desired_curvature = 0.002 if i >= 50 else 0.
+    msgs += [
+      messaging.new_message(None, logMonoTime=t + 1, carState={'vEgo': 20.}),
+      messaging.new_message(None, logMonoTime=t + 2, controlsState={'curvature': desired_curvature * min(1., i / 100)}),
+      messaging.new_message(None, logMonoTime=t + 4, carControl={'latActive': True, 'orientationNED': [0., 0., 0.]}),
+      messaging.new_message(None, logMonoTime=t + 5, carOutput={}),
+    ]
+    if plan:
+      msgs.append(messaging.new_message(None, logMonoTime=t + 3, valid=True, lateralManeuverPlan={'desiredCurvature': desired_curvature}))
+  if complete:
+    msgs.append(messaging.new_message(None, logMonoTime=10**18 + n * 10**7, alertDebug={'alertText1': 'Complete', 'alertText2': 'step right'}))
+  return [m.as_reader() for m in msgs]
+
+
+class TestGenerateReport:
+  def test_incomplete_run(self, tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_report, '__file__', str(tmp_path / 'generate_report.py'))
+    monkeypatch.setattr(generate_report.webbrowser, 'open_new_tab', lambda *args: None)
+
+    # aborted before the first plan, and before anything at all
+    aborted = make_run(20, complete=False, plan=False)
+    c = generate_report.run_columns(aborted, 'torque')
+    assert not c.complete and len(c.t_lateralPlan) == 0 and len(c.t_carState) == 20
+    assert len(generate_report.run_columns([], 'torque').t_carOutput) == 0
+
+    CP = car.CarParams.new_message(steerControlType='torque')
+    ID = messaging.new_message('initData').initData
+    generate_report.report('TEST', 'a/b', None, CP, ID, [('step right', [make_run(300), aborted, []])])
+    html = (tmp_path / 'lateral_reports' / 'TEST_a_b.html').read_text()
+    assert html.count('Run #') == 1
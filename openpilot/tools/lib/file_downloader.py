@@ -6,6 +6,7 @@ Called by C++ replay/cabana via subprocess.
 Subcommands:
   route-files <route>    - Get route file URLs as JSON
   download <url>         - Download/decompress URL to local cache, print local path
+  download-files <url>.. - Download/decompress many URLs in parallel, print a JSON line per file
   decompress <path>      - Decompress a local log file, print temporary path
   devices                - List user's devices as JSON
   device-routes <did>    - List routes for a device as JSON
@@ -18,6 +19,9 @@ import os
 import shutil
 import sys
 import tempfile
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import zstandard as zstd
 
@@ -25,6 +29,13 @@ from openpilot.common.hardware.hw import Paths
 from openpilot.tools.lib.api import CommaApi, UnauthorizedError, APIError
 from openpilot.tools.lib.auth_config import get_token
 from openpilot.tools.lib.url_file import URLFile
+from urllib3.util import Timeout
+
+CHUNK_SIZE = 1024 * 1024
+PART_SIZE = 16 * 1024 * 1024  # larger files are downloaded as parallel ranged parts
+MAX_CONNECTIONS = 8
+PART_RETRIES = 3
+TIMEOUT = Timeout(connect=10, read=10)
 
 
 def api_call(func):
@@ -97,6 +108,245 @@ def materialize_cached_file(source, url, compression):
   return local_path
 
 
+def cached_path(url):
+  """Returns the local path of an already downloaded URL, decompressed if it was compressed, or None."""
+  for compression in ('bz2', 'zst'):
+    decompressed_path = cache_file_path(url, compression)
+    if os.path.exists(decompressed_path):
+      return decompressed_path
+
+  local_path = cache_file_path(url)
+  if os.path.exists(local_path):
+    with open(local_path, 'rb') as f:
+      compression = compression_type(f.read(4))
+    if compression:
+      local_path = materialize_cached_file(local_path, url, compression)
+    return local_path
+  return None
+
+
+class FileDownload:
+  """
+  Downloads a URL into <cache path>.part, as ranged parts when the server supports them.
+  Completed parts are listed in <cache path>.parts, so after an interruption only the
+  missing parts are downloaded again. finish() decompresses behind the download, from
+  the contiguous prefix of the file that has been written so far.
+  """
+  def __init__(self, url: str, part_size: int = PART_SIZE, on_progress: Callable[[int], None] | None = None):
+    self.url = url
+    self.part_size = part_size
+    self.on_progress = on_progress
+    self.path = cache_file_path(url) + ".part"
+    self.record_path = cache_file_path(url) + ".parts"
+    self.size: int | None = None
+    self.ranged = False
+    self.written: list[int] = []  # bytes written to each part
+    self.error: Exception | None = None
+    self.cv = threading.Condition()
+
+  def part_range(self, i: int) -> tuple[int, int]:
+    start = i * self.part_size
+    return start, min(start + self.part_size, self.size)
+
+  def available(self) -> int:
+    # end of the prefix that's completely written
+    for i, n in enumerate(self.written):
+      start, end = self.part_range(i)
+      if start + n < end:
+        return start + n
+    return self.size
+
+  def fail(self, e: Exception) -> None:
+    with self.cv:
+      if self.error is None:
+        self.error = e
+      self.cv.notify_all()
+
+  def start(self, pool: ThreadPoolExecutor) -> None:
+    """Finds the size and range support of the URL, then schedules the parts not downloaded yet."""
+    try:
+      r = URLFile.pool_manager().request("GET", self.url, headers={"Range": "bytes=0-0"}, preload_content=False, timeout=TIMEOUT)
+      if r.status == 206:
+        size = int(r.headers.get('content-range', '').rpartition('/')[2] or 0)
+        r.drain_conn()
+        r.release_conn()
+      elif r.status == 200:
+        # no range support, this response is the whole file
+        size = int(r.headers.get('content-length', 0))
+      else:
+        r.release_conn()
+        raise OSError(f"HTTP {r.status}")
+      if size <= 0:
+        r.release_conn()
+        raise OSError("File not found or empty")
+
+      with self.cv:
+        self.size = size
+        self.ranged = r.status == 206
+        if not self.ranged:
+          self.part_size = size
+        n_parts = -(-size // self.part_size)
+
+        done: set[int] = set()
+        header = f"{size} {self.part_size}"
+        if self.ranged and os.path.exists(self.path) and os.path.getsize(self.path) == size and os.path.exists(self.record_path):
+          with open(self.record_path) as f:
+            lines = f.read().splitlines()
+          if lines and lines[0] == header:
+            done = {int(line) for line in lines[1:] if line.isdigit()}
+        if not done:
+          with open(self.path, 'wb') as f:
+            f.truncate(size)
+          with open(self.record_path, 'w') as f:
+            f.write(header + "\n")
+
+        self.written = [self.part_range(i)[1] - self.part_range(i)[0] if i in done else 0 for i in range(n_parts)]
+        self.cv.notify_all()
+      if self.on_progress is not None:
+        self.on_progress(sum(self.written))
+
+      todo = [i for i in range(n_parts) if i not in done]
+      if not self.ranged:
+        pool.submit(self.download_part, 0, r)
+      else:
+        for i in todo:
+          pool.submit(self.download_part, i)
+    except Exception as e:
+      self.fail(e)
+
+  def download_part(self, i: int, r=None) -> None:
+    start, end = self.part_range(i)
+    for attempt in range(PART_RETRIES):
+      if self.error is not None:
+        return
+      try:
+        if r is None:
+          headers = {"Range": f"bytes={start}-{end - 1}"} if self.ranged else {}
+          r = URLFile.pool_manager().request("GET", self.url, headers=headers, preload_content=False, timeout=TIMEOUT)
+
+        try:
+          if r.status != (206 if self.ranged else 200):
+            # the body isn't part of the file, and the retry needs a new request
+            r.drain_conn()
+            raise OSError(f"HTTP {r.status}")
+          self.set_written(i, 0)
+          pos = start
+          with open(self.path, 'r+b', buffering=0) as f:
+            f.seek(start)
+            for data in r.stream(CHUNK_SIZE):
+              data = data[:end - pos]
+              f.write(data)
+              pos += len(data)
+              if pos < end:
+                self.set_written(i, pos - start)
+          if pos < end:
+            raise EOFError(f"Connection closed at byte {pos} of {self.size}")
+        finally:
+          r.release_conn()
+          r = None
+
+        # recorded before it's marked complete, finish() removes the record once all parts are
+        with self.cv, open(self.record_path, 'a') as f:
+          f.write(f"{i}\n")
+        self.set_written(i, end - start)
+        return
+      except Exception as e:
+        if attempt == PART_RETRIES - 1:
+          self.fail(e)
+
+  def set_written(self, i: int, n: int) -> None:
+    with self.cv:
+      delta = n - self.written[i]
+      self.written[i] = n
+      self.cv.notify_all()
+    if self.on_progress is not None and delta:
+      self.on_progress(delta)
+
+  def wait(self, target: int) -> int:
+    with self.cv:
+      while self.error is None and (self.size is None or self.available() < min(target, self.size)):
+        self.cv.wait()
+      if self.error is not None:
+        raise self.error
+      return self.available()
+
+  def finish(self) -> str:
+    """Decompresses the file as it comes in and moves it into the cache, returns its local path."""
+    self.wait(4)
+    size = self.size
+    with open(self.path, 'rb') as src:
+      compression = compression_type(src.read(4))
+      if not compression:
+        self.wait(size)
+        local_path = cache_file_path(self.url)
+        shutil.move(self.path, local_path)
+        os.unlink(self.record_path)
+        return local_path
+
+      decompressor = make_decompressor(compression)
+      tmp_fd, tmp_path = tempfile.mkstemp(dir=Paths.download_cache_root())
+      try:
+        with os.fdopen(tmp_fd, 'wb') as dst:
+          src.seek(0)
+          pos = 0
+          while pos < size:
+            available = self.wait(pos + 1)
+            data = src.read(min(available - pos, CHUNK_SIZE))
+            dst.write(decompressor.decompress(data))
+            pos += len(data)
+        if not decompressor.eof:
+          raise EOFError(f"Compressed {compression} file ended before the end-of-stream marker")
+        local_path = cache_file_path(self.url, compression)
+        shutil.move(tmp_path, local_path)
+      except Exception:
+        try:
+          os.unlink(tmp_path)
+        except OSError:
+          pass
+        raise
+    os.unlink(self.path)
+    os.unlink(self.record_path)
+    return local_path
+
+
+def download_files(urls: Iterable[str], connections: int = MAX_CONNECTIONS, part_size: int = PART_SIZE,
+                   progress: Callable[[int, int], None] | None = None) -> Iterator[tuple[str, str | Exception]]:
+  """
+  Downloads the URLs into the cache over at most `connections` connections, yielding each
+  URL with its local path, or the exception it failed with, as it finishes. Decompression
+  runs on separate threads, so it doesn't hold up the network.
+  """
+  os.makedirs(Paths.download_cache_root(), exist_ok=True)
+  lock = threading.Lock()
+  downloaded = 0
+
+  def on_progress(n):
+    nonlocal downloaded
+    with lock:
+      downloaded += n
+      if progress is not None:
+        progress(downloaded, sum(d.size or 0 for d in downloads))
+
+  downloads = []
+  for url in dict.fromkeys(urls):
+    if (cached := cached_path(url)) is not None:
+      yield url, cached
+    else:
+      downloads.append(FileDownload(url, part_size, on_progress))
+  if not downloads:
+    return
+
+  with ThreadPoolExecutor(connections) as network, ThreadPoolExecutor(min(len(downloads), os.cpu_count() or 1)) as decompress:
+    for download in downloads:
+      network.submit(download.start, network)
+    futures = {decompress.submit(download.finish): download for download in downloads}
+    for future in as_completed(futures):
+      try:
+        yield futures[future].url, future.result()
+      except Exception as e:
+        yield futures[future].url, e
+
+
 def cmd_route_files(args):
   api_call(lambda api: api.get(f"v1/route/{args.route}/files"))
 
@@ -105,23 +355,11 @@ def cmd_download(args):
   url = args.url
   use_cache = not args.no_cache
 
-  if use_cache:
-    for compression in ('bz2', 'zst'):
-      decompressed_path = cache_file_path(url, compression)
-      if os.path.exists(decompressed_path):
-        sys.stdout.write(decompressed_path + "\n")
-        sys.stdout.flush()
-        return
-
-    local_path = cache_file_path(url)
-    if os.path.exists(local_path):
-      with open(local_path, 'rb') as f:
-        compression = compression_type(f.read(4))
-        if compression:
-          local_path = materialize_cached_file(local_path, url, compression)
-      sys.stdout.write(local_path + "\n")
-      sys.stdout.flush()
-      return
+  local_path = cache_file_path(url)
+  if use_cache and (cached := cached_path(url)) is not None:
+    sys.stdout.write(cached + "\n")
+    sys.stdout.flush()
+    return
 
   try:
     # Stream the file in a single HTTP request instead of making
@@ -189,6 +427,37 @@ def cmd_download(args):
   sys.stdout.flush()
 
 
+def cmd_download_files(args):
+  def progress(downloaded, total):
+    sys.stderr.write(f"PROGRESS:{downloaded}:{total}\n")
+    sys.stderr.flush()
+
+  urls = list(args.urls)
+  failed = False
+  try:
+    if args.route:
+      files = CommaApi(get_token()).get(f"v1/route/{args.route}/files")
+      urls += [url for file_type in args.types for url in files.get(file_type, [])]
+
+    for url, result in download_files(urls, args.connections, progress=progress):
+      if isinstance(result, Exception):
+        failed = True
+        sys.stderr.write(f"ERROR:{url}:{result}\n")
+        sys.stderr.flush()
+        json.dump({"url": url, "error": str(result)}, sys.stdout)
+      else:
+        json.dump({"url": url, "path": result}, sys.stdout)
+      sys.stdout.write("\n")
+      sys.stdout.flush()
+  except Exception as e:
+    sys.stderr.write(f"ERROR:{e}\n")
+    sys.stderr.flush()
+    sys.exit(1)
+
+  if failed:
+    sys.exit(1)
+
+
 def cmd_decompress(args):
   os.makedirs(Paths.download_cache_root(), exist_ok=True)
   output_fd, output_path = tempfile.mkstemp(dir=Paths.download_cache_root())
@@ -237,6 +506,13 @@ def main():
   p_dl.add_argument("--no-cache", action="store_true")
   p_dl.set_defaults(func=cmd_download)
 
+  p_dm = subparsers.add_parser("download-files")
+  p_dm.add_argument("urls", nargs="*")
+  p_dm.add_argument("--route", help="also download the files of this route")
+  p_dm.add_argument("--types", nargs="+", default=["logs"], help="route file types, e.g. logs qlogs cameras")
+  p_dm.add_argument("-j", "--connections", type=int, default=MAX_CONNECTIONS)
+  p_dm.set_defaults(func=cmd_download_files)
+
   p_dc = subparsers.add_parser("decompress")
   p_dc.add_argument("path")
   p_dc.set_defaults(func=cmd_decompress)
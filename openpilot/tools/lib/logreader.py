@@ -12,6 +12,7 @@ import urllib.parse
 import warnings
 import zstandard as zstd
 
+from collections import deque
 from collections.abc import Iterable, Iterator
 from urllib.parse import parse_qs, urlparse
 
@@ -272,13 +273,35 @@ class LogReader:
   def _run_on_segment(self, func, i):
     return func(self._get_lr(i))
 
+  def __getstate__(self):
+    # worker processes read their segments again instead of receiving the ones read here
+    state = self.__dict__.copy()
+    state['_LogReader__lrs'] = {}
+    return state
+
+  def imap_segments(self, num_processes, func, disable_tqdm=False, desc=None, window=None):
+    """
+    Yields func's result for each segment in order, as soon as it's ready. At most window segments,
+    num_processes + 1 by default, are queued or held at once, whatever the number of workers.
+    """
+    if window is None:
+      window = num_processes + 1
+    with multiprocessing.Pool(num_processes) as pool, tqdm.tqdm(total=len(self.logreader_identifiers), disable=disable_tqdm, desc=desc) as pbar:
+      run = partial(self._run_on_segment, func)
+      pending: deque[multiprocessing.pool.AsyncResult] = deque()
+      i = 0
+      while i < len(self.logreader_identifiers) or pending:
+        while i < len(self.logreader_identifiers) and len(pending) < window:
+          pending.append(pool.apply_async(run, (i,)))
+          i += 1
+        yield pending.popleft().get()
+        pbar.update()
+
   def run_across_segments(self, num_processes, func, disable_tqdm=False, desc=None):
-    with multiprocessing.Pool(num_processes) as pool:
-      ret = []
-      num_segs = len(self.logreader_identifiers)
-      for p in tqdm.tqdm(pool.imap(partial(self._run_on_segment, func), range(num_segs)), total=num_segs, disable=disable_tqdm, desc=desc):
-        ret.extend(p)
-      return ret
+    ret = []
+    for p in self.imap_segments(num_processes, func, disable_tqdm, desc):
+      ret.extend(p)
+    return ret
 
   def reset(self):
     self.logreader_identifiers = []
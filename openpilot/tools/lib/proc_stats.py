@@ -0,0 +1,125 @@
+"""Per-process CPU and memory series from procLog, and system memory from procLog and deviceState, as NumPy arrays."""
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+MB = 1024 * 1024
+PROC_METRICS = ('cpu', 'rss', 'pss', 'pss_anon', 'pss_shmem')
+MEM_FIELDS = ('total', 'available', 'cached', 'shared', 'buffers')
+
+
+def proc_name(proc) -> str:
+  if len(proc.cmdline) > 0:
+    return proc.cmdline[0]
+  return proc.name
+
+
+@dataclass
+class ProcStats:
+  """
+  One row per procLog sample and one column per process name, processes with the
+  same name are summed. Values are 0 where the process wasn't running, see present.
+  """
+  names: list[str]
+  t: np.ndarray  # procLog logMonoTime in ns
+  present: np.ndarray  # whether the process was running
+  cpu: np.ndarray  # total CPU time in s, children included
+  rss: np.ndarray  # MB
+  pss: np.ndarray  # MB
+  pss_anon: np.ndarray  # MB
+  pss_shmem: np.ndarray  # MB
+  mem: dict[str, np.ndarray]  # system memory in MB, from procLog.mem
+  device_t: np.ndarray  # deviceState logMonoTime in ns
+  memory_usage_percent: np.ndarray
+
+  @classmethod
+  def from_msgs(cls, msgs: Iterable) -> 'ProcStats':
+    """Extracts the stats from the procLog and deviceState messages in one pass"""
+    index: dict[str, int] = {}
+    t, mem = [], []
+    rows, cols, values = [], [], []
+    device_t, memory_usage_percent = [], []
+    for msg in msgs:
+      which = msg.which()
+      if which == 'procLog':
+        m = msg.procLog.mem
+        mem.append((m.total, m.available, m.cached, m.shared, m.buffers))
+        for proc in msg.procLog.procs:
+          rows.append(len(t))
+          cols.append(index.setdefault(proc_name(proc), len(index)))
+          values.append((proc.cpuUser + proc.cpuSystem + proc.cpuChildrenUser + proc.cpuChildrenSystem,
+                         proc.memRss / MB, proc.memPss / MB, proc.memPssAnon / MB, proc.memPssShmem / MB))
+        t.append(msg.logMonoTime)
+      elif which == 'deviceState':
+        device_t.append(msg.logMonoTime)
+        memory_usage_percent.append(msg.deviceState.memoryUsagePercent)
+
+    data = np.zeros((len(t), len(index), len(PROC_METRICS)))
+    np.add.at(data, (rows, cols), np.array(values).reshape(-1, len(PROC_METRICS)))
+    present = np.zeros((len(t), len(index)), dtype=bool)
+    present[rows, cols] = True
+    mem_mb = np.array(mem, dtype=np.float64).reshape(-1, len(MEM_FIELDS)) / MB
+    return cls(list(index), np.array(t, dtype=np.int64), present, *np.moveaxis(data, 2, 0),
+               dict(zip(MEM_FIELDS, mem_mb.T, strict=True)), np.array(device_t, dtype=np.int64),
+               np.array(memory_usage_percent, dtype=np.int64))
+
+  @classmethod
+  def concatenate(cls, parts: Sequence['ProcStats']) -> 'ProcStats':
+    """Joins stats of consecutive logs, e.g. the segments of a route"""
+    names = list(dict.fromkeys(n for p in parts for n in p.names))
+    index = {n: i for i, n in enumerate(names)}
+    samples = sum(len(p) for p in parts)
+
+    def stack(metric, dtype=np.float64):
+      out = np.zeros((samples, len(names)), dtype=dtype)
+      row = 0
+      for p in parts:
+        out[row:row + len(p), [index[n] for n in p.names]] = getattr(p, metric)
+        row += len(p)
+      return out
+
+    return cls(names, np.concatenate([p.t for p in parts]), stack('present', bool), *(stack(m) for m in PROC_METRICS),
+               {k: np.concatenate([p.mem[k] for p in parts]) for k in MEM_FIELDS},
+               np.concatenate([p.device_t for p in parts]), np.concatenate([p.memory_usage_percent for p in parts]))
+
+  @classmethod
+  def from_logreader(cls, lr, num_processes: int = 8) -> 'ProcStats':
+    """Extracts each segment in a worker process, without holding the messages of the route"""
+    return cls.concatenate(list(lr.imap_segments(num_processes, cls.from_msgs, disable_tqdm=True)))
+
+  def __len__(self) -> int:
+    return len(self.t)
+
+  @property
+  def duration(self) -> float:
+    return (self.t[-1] - self.t[0]) / 1e9 if len(self.t) > 1 else 0.
+
+  def column(self, name: str) -> int:
+    return self.names.index(name)
+
+  def samples(self) -> np.ndarray:
+    """Number of samples each process was running in"""
+    return self.present.sum(axis=0)
+
+  def mean(self, metric: str) -> np.ndarray:
+    """Mean of each process over the samples it was running in"""
+    n = self.samples()
+    return np.where(n > 0, getattr(self, metric).sum(axis=0) / np.maximum(n, 1), np.nan)
+
+  def max(self, metric: str) -> np.ndarray:
+    return np.where(self.present, getattr(self, metric), -np.inf).max(axis=0, initial=-np.inf)
+
+  def cpu_usage(self) -> np.ndarray:
+    """
+    CPU usage of each process in % of one core, from its first to its last sample over
+    the duration of the log. NaN for processes in fewer than 3 samples.
+    """
+    if len(self) == 0:
+      return np.full(len(self.names), np.nan)
+    cols = np.arange(len(self.names))
+    first = self.present.argmax(axis=0)
+    last = len(self) - 1 - self.present[::-1].argmax(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      usage = (self.cpu[last, cols] - self.cpu[first, cols]) / self.duration * 100.
+    return np.where(self.samples() > 2, usage, np.nan)
@@ -0,0 +1,196 @@
+import bz2
+import http.server
+import json
+import os
+import random
+import re
+import threading
+
+import pytest
+import zstandard as zstd
+
+from openpilot.tools.lib.file_downloader import cache_file_path, download_files
+from openpilot.tools.lib.url_file import URLFile
+
+PART_SIZE = 64 * 1024
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+  """Serves FILES with Range support, recording the requests and connections in use."""
+  FILES: dict[str, bytes] = {}
+  RANGES = True
+  FAIL_AT: set[int] = set()  # range starts that are cut off halfway, once
+  ERROR_AT: set[int] = set()  # range starts that get an error response with a body, once
+  requests: list[tuple[str, str | None]] = []
+  active = 0
+  max_active = 0
+  lock = threading.Lock()
+
+  def log_message(self, *args):
+    pass
+
+  def do_GET(self):
+    cls = type(self)
+    with cls.lock:
+      cls.active += 1
+      cls.max_active = max(cls.max_active, cls.active)
+      cls.requests.append((self.path, self.headers.get("Range")))
+    try:
+      self.serve()
+    finally:
+      with cls.lock:
+        cls.active -= 1
+
+  def serve(self):
+    dat = self.FILES.get(self.path)
+    if dat is None:
+      self.send_response(404)
+      self.end_headers()
+      return
+
+    m = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+    if not self.RANGES or m is None:
+      self.send_response(200)
+      self.send_header("Content-Length", str(len(dat)))
+      self.end_headers()
+      self.wfile.write(dat)
+      return
+
+    start, end = int(m.group(1)), min(int(m.group(2)), len(dat) - 1)
+    if start in self.ERROR_AT:
+      self.ERROR_AT.discard(start)
+      body = b"internal server error" * 100
+      self.send_response(500)
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+      return
+    self.send_response(206)
+    self.send_header("Content-Range", f"bytes {start}-{end}/{len(dat)}")
+    self.send_header("Content-Length", str(end - start + 1))
+    self.end_headers()
+    if start in self.FAIL_AT:
+      self.FAIL_AT.discard(start)
+      self.wfile.write(dat[start:start + (end - start) // 2])
+      return
+    self.wfile.write(dat[start:end + 1])
+
+
+@pytest.fixture
+def host(tmp_path, monkeypatch):
+  monkeypatch.setenv("COMMA_CACHE", str(tmp_path / "cache"))
+  URLFile.reset()
+  RangeRequestHandler.FILES = {}
+  RangeRequestHandler.RANGES = True
+  RangeRequestHandler.FAIL_AT = set()
+  RangeRequestHandler.ERROR_AT = set()
+  RangeRequestHandler.requests = []
+  RangeRequestHandler.max_active = 0
+
+  server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+  t = threading.Thread(target=server.serve_forever)
+  t.start()
+  try:
+    yield f"http://127.0.0.1:{server.server_port}"
+  finally:
+    server.shutdown()
+    server.server_close()
+    t.join()
+    URLFile.reset()
+
+
+def route_files(n=6, size=300 * 1024):
+  rng = random.Random(0)
+  files = {}
+  for i in range(n):
+    raw = json.dumps([rng.random() for _ in range(size // 20)]).encode()[:size]
+    files[f"/{i}/rlog.zst"] = zstd.ZstdCompressor().compress(raw) if i % 3 == 0 else None
+    files[f"/{i}/rlog.bz2"] = bz2.compress(raw) if i % 3 == 1 else None
+    files[f"/{i}/rlog"] = raw if i % 3 == 2 else None
+  return {k: v for k, v in files.items() if v is not None}
+
+
+def expected(dat):
+  if dat.startswith(b"BZh"):
+    return bz2.decompress(dat)
+  if dat.startswith(b"\x28\xb5\x2f\xfd"):
+    return zstd.ZstdDecompressor().decompressobj().decompress(dat)
+  return dat
+
+
+class TestDownloadFiles:
+  def check(self, host, results):
+    assert set(results) == {host + p for p in RangeRequestHandler.FILES}
+    for path, dat in RangeRequestHandler.FILES.items():
+      with open(results[host + path], "rb") as f:
+        assert f.read() == expected(dat)
+    assert [f for f in os.listdir(os.environ["COMMA_CACHE"]) if f.endswith((".part", ".parts"))] == []
+
+  def test_download(self, host):
+    RangeRequestHandler.FILES = route_files()
+    progress = []
+    results = dict(download_files([host + p for p in RangeRequestHandler.FILES], connections=4, part_size=PART_SIZE,
+                                  progress=lambda *p: progress.append(p)))
+    self.check(host, results)
+
+    # large files go in parts, over no more connections than asked for
+    big = max(RangeRequestHandler.FILES, key=lambda p: len(RangeRequestHandler.FILES[p]))
+    parts = [r for p, r in RangeRequestHandler.requests if p == big and r != "bytes=0-0"]
+    assert len(parts) == -(-len(RangeRequestHandler.FILES[big]) // PART_SIZE)
+    assert RangeRequestHandler.max_active <= 4
+    assert progress[-1] == (sum(map(len, RangeRequestHandler.FILES.values())),) * 2
+
+    # all cached now
+    RangeRequestHandler.requests = []
+    assert dict(download_files(results)) == results
+    assert RangeRequestHandler.requests == []
+
+  def test_no_ranges(self, host):
+    RangeRequestHandler.FILES = route_files(3)
+    RangeRequestHandler.RANGES = False
+    results = dict(download_files([host + p for p in RangeRequestHandler.FILES], part_size=PART_SIZE))
+    self.check(host, results)
+    assert len(RangeRequestHandler.requests) == len(RangeRequestHandler.FILES)
+
+  def test_resume(self, host, monkeypatch):
+    monkeypatch.setattr("openpilot.tools.lib.file_downloader.PART_RETRIES", 1)
+    RangeRequestHandler.FILES = {"/rlog.zst": route_files(1)["/0/rlog.zst"]}
+    url = host + "/rlog.zst"
+    size = len(RangeRequestHandler.FILES["/rlog.zst"])
+    n_parts = -(-size // (PART_SIZE // 4))
+    assert n_parts > 2
+    RangeRequestHandler.FAIL_AT = {PART_SIZE // 4}
+
+    (_, result), = download_files([url], part_size=PART_SIZE // 4)
+    assert isinstance(result, Exception)
+    assert os.path.exists(cache_file_path(url) + ".part")
+    with open(cache_file_path(url) + ".parts") as f:
+      completed = {int(line) for line in f.read().splitlines()[1:]}
+    assert 0 in completed and 1 not in completed
+
+    # only the parts that didn't complete are downloaded again
+    RangeRequestHandler.requests = []
+    results = dict(download_files([url], part_size=PART_SIZE // 4))
+    self.check(host, results)
+    ranges = {r for _, r in RangeRequestHandler.requests}
+    assert ranges == {"bytes=0-0"} | {f"bytes={i * PART_SIZE // 4}-{min((i + 1) * PART_SIZE // 4, size) - 1}"
+                                      for i in range(n_parts) if i not in completed}
+
+  def test_errors(self, host):
+    RangeRequestHandler.FILES = route_files(2)
+    urls = [host + p for p in RangeRequestHandler.FILES] + [host + "/missing"]
+    results = dict(download_files(urls, part_size=PART_SIZE))
+    assert isinstance(results.pop(host + "/missing"), OSError)
+    self.check(host, results)
+
+  def test_error_response(self, host):
+    # uncompressed, so a corrupted part isn't caught by decompression
+    RangeRequestHandler.FILES = {"/rlog": route_files(3)["/2/rlog"][:4 * PART_SIZE + 1000]}
+    size = len(RangeRequestHandler.FILES["/rlog"])
+    last = (size - 1) // PART_SIZE * PART_SIZE
+    assert size - last < len(b"internal server error" * 100)  # the error body would cover the short last part
+    RangeRequestHandler.ERROR_AT = {last}
+
+    results = dict(download_files([host + "/rlog"], part_size=PART_SIZE))
+    self.check(host, results)
+    assert [r for _, r in RangeRequestHandler.requests].count(f"bytes={last}-{size - 1}") == 2
@@ -220,6 +220,12 @@ class TestLogReader(OpenpilotTestCase):
     lr = LogReader([self.qlog_path] * 4)
     assert len(lr.run_across_segments(4, noop)) == len(list(lr))
 
+  def test_imap_segments(self):
+    lr = LogReader([self.qlog_path, self.rlog_path] * 3)
+    assert lr.first("carParams") is not None  # segments read here aren't sent to the workers
+    assert [len(list(p)) for p in lr.imap_segments(2, noop, disable_tqdm=True)] == [10, 100] * 3
+    assert [len(list(p)) for p in lr.imap_segments(4, noop, disable_tqdm=True, window=1)] == [10, 100] * 3
+
   def test_auto_mode(self, subtests, mocker):
     lr = LogReader(self.qlog_path)
     qlog_len = len(list(lr))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from openpilot.cereal import log
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.lib.proc_stats import MB, ProcStats
+
+
+def make_log(start, n, rng):
+  msgs = []
+  for i in range(start, start + n):
+    procs = [('./camerad', 2.0), ('selfdrive.controls.controlsd', 1.5), ('python3', 0.5)]
+    if i % 4 != 3:  # comes and goes
+      procs.append(('./ui', 3.0))
+    if i >= 7:  # started late, two processes with the same name
+      procs += [('./worker', 1.0), ('./worker', 1.0)]
+
+    pl = log.Event.new_message(logMonoTime=i * 10**9)
+    pl.init('procLog')
+    pl.procLog.mem.total = 4096 * MB
+    pl.procLog.mem.available = int((2048 - i) * MB)
+    entries = pl.procLog.init('procs', len(procs) + 1)
+    for p, (name, rate) in zip(entries, procs, strict=False):
+      p.cmdline = [name, '--arg']
+      p.cpuUser = rate * i * 0.75
+      p.cpuSystem = rate * i * 0.25
+      p.memRss = int(rng.integers(10, 100) * MB)
+      p.memPss = p.memRss // 2
+    entries[-1].name = 'kworker/0:1'  # kernel threads have no cmdline
+
+    ds = log.Event.new_message(logMonoTime=i * 10**9 + 1)
+    ds.init('deviceState')
+    ds.deviceState.memoryUsagePercent = 40 + i
+    msgs += [log.Event.from_bytes(pl.to_bytes()).__enter__(), log.Event.from_bytes(ds.to_bytes()).__enter__()]
+  return msgs
+
+
+class TestProcStats:
+  def setup_method(self):
+    self.rng = np.random.default_rng(0)
+    self.segments = [make_log(0, 6, self.rng), make_log(6, 6, self.rng)]
+    self.msgs = [m for s in self.segments for m in s]
+
+  def test_from_msgs(self):
+    stats = ProcStats.from_msgs(self.msgs)
+    assert len(stats) == 12 and stats.duration == 11.
+    assert set(stats.names) == {'./camerad', 'selfdrive.controls.controlsd', 'python3', './ui', './worker', 'kworker/0:1'}
+    np.testing.assert_array_equal(stats.memory_usage_percent, np.arange(40, 52))
+    np.testing.assert_allclose(stats.mem['available'], 2048 - np.arange(12))
+
+    # same as going through the messages process by process
+    for name in stats.names:
+      rss = [sum(p.memRss / MB for p in m.procLog.procs if (p.cmdline[0] if len(p.cmdline) else p.name) == name)
+             for m in self.msgs if m.which() == 'procLog']
+      rss = [r for r, present in zip(rss, stats.present[:, stats.column(name)], strict=True) if present]
+      assert stats.mean('rss')[stats.column(name)] == pytest.approx(np.mean(rss))
+      assert stats.max('rss')[stats.column(name)] == max(rss)
+
+    worker = stats.column('./worker')
+    assert stats.samples()[worker] == 5 and stats.samples()[stats.column('./ui')] == 9
+    np.testing.assert_allclose(stats.pss[:, worker], stats.rss[:, worker] / 2)
+
+    # CPU time in % of a core over the log, from the process' first to last sample
+    usage = dict(zip(stats.names, stats.cpu_usage(), strict=True))
+    assert usage['./camerad'] == pytest.approx(200.)
+    assert usage['./ui'] == pytest.approx(300. * (10 - 0) / 11)
+    assert usage['./worker'] == pytest.approx(200. * (11 - 7) / 11)
+    assert usage['kworker/0:1'] == 0.
+
+  def test_concatenate(self):
+    whole = ProcStats.from_msgs(self.msgs)
+    joined = ProcStats.concatenate([ProcStats.from_msgs(s) for s in self.segments])
+    order = [joined.column(n) for n in whole.names]
+    for metric in ('present', 'cpu', 'rss', 'pss', 'pss_anon', 'pss_shmem'):
+      np.testing.assert_array_equal(getattr(joined, metric)[:, order], getattr(whole, metric))
+    for k, v in whole.mem.items():
+      np.testing.assert_array_equal(joined.mem[k], v)
+    np.testing.assert_array_equal(joined.memory_usage_percent, whole.memory_usage_percent)
+
+  def test_from_logreader(self, tmp_path):
+    fns = []
+    for i, segment in enumerate(self.segments):
+      fns.append(str(tmp_path / f"rlog{i}"))
+      with open(fns[-1], "wb") as f:
+        f.write(b"".join(m.as_builder().to_bytes() for m in segment))
+
+    stats = ProcStats.from_logreader(LogReader(fns), num_processes=2)
+    whole = ProcStats.from_msgs(self.msgs)
+    order = [stats.column(n) for n in whole.names]
+    np.testing.assert_array_equal(stats.cpu_usage()[order], whole.cpu_usage())
+    np.testing.assert_array_equal(stats.mean('rss')[order], whole.mean('rss'))
+
+  def test_empty(self):
+    stats = ProcStats.from_msgs([])
+    assert len(stats) == 0 and stats.names == [] and stats.duration == 0.
+    assert len(stats.cpu_usage()) == 0
@@ -0,0 +1,148 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from openpilot.cereal import log
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.lib.timing_stats import TimingStats, compare, mann_whitney, rate_test, segment_samples
+
+
+def event(t, which):
+  msg = log.Event.new_message(logMonoTime=int(t * 1e9))
+  msg.init(which)
+  return msg
+
+
+def make_log(start, n, rng, exec_ms=20., lag_every=50):
+  """n seconds of a drive starting at start s: carState at 100 Hz, modelV2 at 20 Hz, procLog at 1 Hz"""
+  msgs = []
+  for i in range(int(start * 100), int((start + n) * 100)):
+    t = i / 100
+    msgs.append(event(t, 'carState'))
+    msgs[-1].carState.cumLagMs = float(rng.normal(-5, 1))
+    if i % 5 == 0:
+      msgs.append(event(t + 0.001, 'modelV2'))
+      msgs[-1].modelV2.modelExecutionTime = float(rng.normal(exec_ms, 1)) / 1e3
+    if i % lag_every == 0:
+      records = [json.dumps({"msg": f"./{p} lagging by {rng.uniform(10, 20):.2f} ms", "ctx": {}}) for p in ('camerad', 'encoderd')]
+      msgs.append(log.Event.new_message(logMonoTime=int((t + 0.002) * 1e9), logMessage="\n".join(records)))
+    if i % 100 == 0:
+      msgs.append(event(t + 0.003, 'procLog'))
+      p, = msgs[-1].procLog.init('procs', 1)
+      p.cmdline = ['./camerad']
+      p.cpuUser = t * 0.2
+  return [log.Event.from_bytes(m.to_bytes()).__enter__() for m in msgs]
+
+
+class TestTimingStats:
+  def setup_method(self):
+    self.rng = np.random.default_rng(0)
+
+  def test_segment_samples(self):
+    msgs = make_log(0, 10, self.rng)
+    samples = segment_samples(msgs, services=('carState', 'modelV2'))
+
+    t, v = samples['carState.cumLagMs']
+    np.testing.assert_array_equal(v, [np.float32(m.carState.cumLagMs) for m in msgs if m.which() == 'carState'])
+    assert len(t) == 1000 and t[0] == 0
+
+    _, v = samples['modelV2.modelExecutionTime']
+    assert len(v) == 200 and np.mean(v) == pytest.approx(20., abs=0.5)
+
+    _, v = samples['interval:modelV2']
+    np.testing.assert_allclose(v, 50., atol=1e-3)
+    assert len(samples['interval:carState'][1]) == 999 and 'interval:procLog' not in samples
+
+    # several records in one logMessage
+    for name in ('./camerad', './encoderd'):
+      _, v = samples[f'lag:{name}']
+      assert len(v) == 20 and ((v >= 10) & (v <= 20)).all()
+
+    # 20% of a core between procLog samples
+    t, v = samples['cpu:./camerad']
+    assert len(t) == 9
+    np.testing.assert_allclose(v, 20., rtol=1e-6)
+    assert 'cpu:./camerad' not in segment_samples(msgs, procs=lambda name: name != './camerad')
+
+  def test_from_logreader(self, tmp_path):
+    segments = [make_log(0, 10, self.rng), make_log(10, 10, self.rng)]
+    fns = []
+    for i, segment in enumerate(segments):
+      fns.append(str(tmp_path / f"rlog{i}"))
+      with open(fns[-1], "wb") as f:
+        f.write(b"".join(m.as_builder().to_bytes() for m in segment))
+
+    stats = TimingStats.from_logreader(LogReader(fns), services=('modelV2',), skip=5., route='route', num_processes=2)
+    assert stats.routes == ['route']
+    assert stats.duration == pytest.approx(20 - 5, abs=0.01)
+    whole = segment_samples([m for s in segments for m in s])
+    t, v = whole['carState.cumLagMs']
+    np.testing.assert_array_equal(stats.samples['carState.cumLagMs'], v[t >= 5e9])
+    # the interval across the segments is lost
+    assert stats.counts['interval:modelV2'] == 15 * 20 - 1
+
+  def test_save_load(self, tmp_path):
+    stats = TimingStats.merge([TimingStats.from_segments([segment_samples(make_log(0, 60, self.rng))], route=r)
+                               for r in ('a', 'b')])
+    assert stats.counts['carState.cumLagMs'] == 2 * 6000 and stats.duration == pytest.approx(2 * 60, abs=0.05)
+
+    stats.save(str(tmp_path / "baseline.npz"))
+    loaded = TimingStats.load(str(tmp_path / "baseline.npz"))
+    assert loaded.routes == ['a', 'b'] and loaded.counts == stats.counts and loaded.duration == stats.duration
+    assert len(loaded.samples['carState.cumLagMs']) == 5000
+    np.testing.assert_allclose(loaded.samples['modelV2.modelExecutionTime'], stats.samples['modelV2.modelExecutionTime'], rtol=1e-6)
+
+  def test_compare(self):
+    def stats(**kwargs):
+      return TimingStats.from_segments([segment_samples(make_log(0, 60, self.rng, **kwargs), services=('modelV2',))])
+
+    baseline = stats()
+    results = {r.metric: r for r in compare(baseline, stats())}
+    assert {r.status for r in results.values()} == {'ok'}
+
+    results = {r.metric: r for r in compare(baseline, stats(exec_ms=25.))}
+    assert results['modelV2.modelExecutionTime'].status == 'regressed'
+    assert results['modelV2.modelExecutionTime'].p_value < 1e-10
+    assert results['carState.cumLagMs'].status == 'ok'
+
+    results = {r.metric: r for r in compare(stats(exec_ms=25.), baseline)}
+    assert results['modelV2.modelExecutionTime'].status == 'improved'
+
+    # significant, but too small to matter
+    results = {r.metric: r for r in compare(baseline, stats(exec_ms=20.3))}
+    assert results['modelV2.modelExecutionTime'].status == 'ok'
+
+    # lag warnings are compared by how often they happen
+    results = {r.metric: r for r in compare(baseline, stats(lag_every=10))}
+    assert results['lag:./camerad'].status == 'regressed'
+    assert results['lag:./camerad'].new_rate == pytest.approx(5 * results['lag:./camerad'].baseline_rate)
+
+    no_lag = stats(lag_every=10**6)
+    no_lag.samples = {k: v for k, v in no_lag.samples.items() if not k.startswith('lag:')}
+    no_lag.counts = {k: v for k, v in no_lag.counts.items() if not k.startswith('lag:')}
+    results = {r.metric: r for r in compare(baseline, no_lag)}
+    assert results['lag:./camerad'].status == 'improved'
+
+    del no_lag.samples['cpu:./camerad']
+    assert {r.metric: r for r in compare(baseline, no_lag)}['cpu:./camerad'].status == 'removed'
+
+  def test_mann_whitney(self):
+    x, y = self.rng.normal(0, 1, 200), self.rng.normal(0.5, 1, 300)
+    u = (x[:, None] > y[None, :]).sum() + 0.5 * (x[:, None] == y[None, :]).sum()
+    z = (u - 200 * 300 / 2 - 0.5) / math.sqrt(200 * 300 * 501 / 12)
+    assert mann_whitney(x, y) == pytest.approx(0.5 * math.erfc(z / math.sqrt(2)))
+    assert mann_whitney(x, y) > 0.99 and mann_whitney(y, x) < 0.01
+
+    # ties, as in integer valued samples
+    x, y = self.rng.integers(0, 3, 500), self.rng.integers(0, 3, 500)
+    assert 0.01 < mann_whitney(x, y) < 0.99
+    assert mann_whitney(x + 1, y) < 1e-10
+    assert mann_whitney(np.ones(10), np.ones(10)) == 1.
+
+  def test_rate_test(self):
+    assert rate_test(10, 60., 10, 60.) > 0.5
+    assert rate_test(10, 60., 40, 60.) < 1e-4
+    assert rate_test(10, 60., 40, 240.) > 0.5
+    assert rate_test(0, 60., 0, 60.) == 1.
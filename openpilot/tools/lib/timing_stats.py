@@ -0,0 +1,250 @@
+"""
+Loop timing samples of the onroad processes from logs, stored as a compact baseline
+and compared against it with rank tests.
+"""
+import json
+import math
+import re
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+from functools import partial
+from typing import NamedTuple
+
+import numpy as np
+
+from openpilot.tools.lib.proc_stats import ProcStats
+
+# service: (field, scale to unit, unit) of the timings processes report about their own loop
+FIELDS = {
+  'carState': [('cumLagMs', 1., 'ms')],
+  'modelV2': [('modelExecutionTime', 1e3, 'ms'), ('frameDropPerc', 1., '%')],
+  'driverStateV2': [('modelExecutionTime', 1e3, 'ms'), ('gpuExecutionTime', 1e3, 'ms')],
+  'longitudinalPlan': [('solverExecutionTime', 1e3, 'ms'), ('processingDelay', 1e3, 'ms')],
+  'uiDebug': [('cpuTimeMillis', 1., 'ms'), ('frameTimeMillis', 1., 'ms')],
+}
+
+# Ratekeeper warnings in swaglog records, which logMessage may hold several of, one per line
+LAG_RE = re.compile(r'"msg(?:\$s)?":\s*"(\S+) lagging by (-?[\d.]+) ms"')
+
+MAX_SAMPLES = 5000  # per metric in a baseline
+MIN_DELTA = {'ms': 0.5, '%': 1.}  # changes smaller than this are never regressions
+
+Samples = dict[str, tuple[np.ndarray, np.ndarray]]  # metric: (logMonoTime in ns, values)
+
+
+def metric_unit(metric: str) -> str:
+  if metric.startswith('cpu:'):
+    return '%'
+  service, _, name = metric.partition('.')
+  for f, _, unit in FIELDS.get(service, ()):
+    if f == name:
+      return unit
+  return 'ms'
+
+
+def segment_samples(msgs: Iterable, services: Sequence[str] = (), procs: Callable[[str], bool] | None = None) -> Samples:
+  """
+  Timing samples of one log, in one pass:
+    * <service>.<field>: FIELDS
+    * interval:<service>: time between the messages of each of services
+    * lag:<name>: Ratekeeper lag warnings of the C++ processes
+    * cpu:<process>: CPU usage in % of one core between consecutive procLog samples,
+      of the processes procs returns True for
+  """
+  samples: dict[str, list] = defaultdict(list)
+  times: dict[str, list[int]] = defaultdict(list)
+  proc_msgs = []
+  for msg in msgs:
+    which = msg.which()
+    t = msg.logMonoTime
+    if which in services:
+      times[which].append(t)
+    if which in FIELDS:
+      ev = getattr(msg, which)
+      for f, scale, _ in FIELDS[which]:
+        samples[f'{which}.{f}'].append((t, getattr(ev, f) * scale))
+    elif which == 'logMessage':
+      if 'lagging by' in msg.logMessage:
+        for m in LAG_RE.finditer(msg.logMessage):
+          samples[f'lag:{m.group(1)}'].append((t, float(m.group(2))))
+    elif which == 'procLog':
+      proc_msgs.append(msg)
+
+  out: Samples = {}
+  for metric, s in samples.items():
+    t, v = zip(*s, strict=True)
+    out[metric] = (np.array(t, dtype=np.int64), np.array(v, dtype=np.float64))
+  for service, ts in times.items():
+    t = np.array(ts, dtype=np.int64)
+    out[f'interval:{service}'] = (t[1:], np.diff(t) / 1e6)
+
+  stats = ProcStats.from_msgs(proc_msgs)
+  if len(stats) > 1:
+    with np.errstate(divide='ignore', invalid='ignore'):
+      usage = np.diff(stats.cpu, axis=0) / (np.diff(stats.t) / 1e9)[:, None] * 100.
+    running = stats.present[1:] & stats.present[:-1]
+    for i, name in enumerate(stats.names):
+      if (procs is None or procs(name)) and running[:, i].any():
+        out[f'cpu:{name}'] = (stats.t[1:][running[:, i]], usage[running[:, i], i])
+  return out
+
+
+@dataclass
+class TimingStats:
+  """Timing samples of one or more logs, one array per metric"""
+  samples: dict[str, np.ndarray]
+  counts: dict[str, int]  # samples in the logs, before subsample
+  duration: float  # s of log
+  routes: list[str] = field(default_factory=list)
+
+  @classmethod
+  def from_segments(cls, segments: Iterable[Samples], skip: float = 0., route: str = '') -> 'TimingStats':
+    """Joins the samples of consecutive segments, without the first skip seconds of the route"""
+    parts: dict[str, list[np.ndarray]] = defaultdict(list)
+    cutoff = end = None
+    for seg in segments:
+      seg = {k: v for k, v in seg.items() if len(v[0])}
+      if not seg:
+        continue
+      if cutoff is None:
+        cutoff = min(t[0] for t, _ in seg.values()) + int(skip * 1e9)
+      end = max([t[-1] for t, _ in seg.values()] + ([end] if end is not None else []))
+      for metric, (t, v) in seg.items():
+        parts[metric].append(v[t >= cutoff])
+
+    samples = {k: np.concatenate(v) for k, v in parts.items()}
+    samples = {k: v for k, v in samples.items() if len(v)}
+    duration = max(end - cutoff, 0) / 1e9 if cutoff is not None else 0.
+    return cls(samples, {k: len(v) for k, v in samples.items()}, duration, [route] if route else [])
+
+  @classmethod
+  def from_logreader(cls, lr, services: Sequence[str] = (), procs: Callable[[str], bool] | None = None,
+                     skip: float = 0., route: str = '', num_processes: int = 8) -> 'TimingStats':
+    """Extracts each segment in a worker process, without holding the messages of the route"""
+    extract = partial(segment_samples, services=services, procs=procs)
+    return cls.from_segments(lr.imap_segments(num_processes, extract, disable_tqdm=True), skip, route)
+
+  @classmethod
+  def merge(cls, stats: Sequence['TimingStats']) -> 'TimingStats':
+    metrics = list(dict.fromkeys(k for s in stats for k in s.samples))
+    return cls({k: np.concatenate([s.samples[k] for s in stats if k in s.samples]) for k in metrics},
+               {k: sum(s.counts.get(k, 0) for s in stats) for k in metrics},
+               sum(s.duration for s in stats), [r for s in stats for r in s.routes])
+
+  def subsample(self, n: int = MAX_SAMPLES) -> 'TimingStats':
+    """At most n samples per metric, evenly spread over the logs to keep their variation over time"""
+    samples = {k: v[np.linspace(0, len(v) - 1, n).astype(int)] if len(v) > n else v for k, v in self.samples.items()}
+    return TimingStats(samples, dict(self.counts), self.duration, list(self.routes))
+
+  def rate(self, metric: str) -> float:
+    """Samples per minute"""
+    return self.counts.get(metric, 0) / self.duration * 60. if self.duration > 0 else np.nan
+
+  def save(self, path: str) -> None:
+    stats = self.subsample()
+    metrics = list(stats.samples)
+    meta = {'routes': stats.routes, 'duration': stats.duration, 'metrics': metrics, 'counts': stats.counts}
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)),
+                        **{f'm{i}': stats.samples[k].astype(np.float32) for i, k in enumerate(metrics)})
+
+  @classmethod
+  def load(cls, path: str) -> 'TimingStats':
+    with np.load(path) as f:
+      meta = json.loads(str(f['meta']))
+      samples = {k: f[f'm{i}'].astype(np.float64) for i, k in enumerate(meta['metrics'])}
+    return cls(samples, meta['counts'], meta['duration'], meta['routes'])
+
+
+def mann_whitney(x: np.ndarray, y: np.ndarray) -> float:
+  """
+  One-sided p-value of the Mann-Whitney U test that x tends to be larger than y,
+  with the normal approximation and tie correction.
+  """
+  n1, n2 = len(x), len(y)
+  if n1 == 0 or n2 == 0:
+    return np.nan
+  values = np.concatenate([x, y])
+  order = np.argsort(values, kind='stable')
+  s = values[order]
+  first = np.r_[True, s[1:] != s[:-1]]
+  group = np.cumsum(first) - 1
+  ties = np.bincount(group)
+  ranks = np.empty(len(values))
+  ranks[order] = (np.flatnonzero(first) + (ties + 1) / 2)[group]  # average rank of the ties
+
+  n = n1 + n2
+  u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+  var = n1 * n2 / 12 * ((n + 1) - (ties ** 3 - ties).sum() / (n * (n - 1)))
+  if var <= 0:
+    return 1.
+  z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(var)
+  return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def rate_test(k1: int, t1: float, k2: int, t2: float) -> float:
+  """One-sided p-value that the rate of k2 events in t2 is higher than that of k1 events in t1, conditional binomial test"""
+  n = k1 + k2
+  if n == 0 or t1 <= 0 or t2 <= 0:
+    return 1.
+  p = t2 / (t1 + t2)
+  log_pmf = [math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1) + i * math.log(p) + (n - i) * math.log1p(-p)
+             for i in range(k2, n + 1)]
+  return min(1., math.fsum(math.exp(v) for v in log_pmf))
+
+
+class Comparison(NamedTuple):
+  metric: str
+  unit: str
+  baseline: tuple[float, float]  # median, p95
+  new: tuple[float, float]
+  baseline_rate: float  # samples per minute
+  new_rate: float
+  p_value: float  # one-sided, in the direction of the change
+  status: str  # regressed, improved, ok, added or removed
+
+
+def _quantiles(v: np.ndarray) -> tuple[float, float]:
+  if len(v) == 0:
+    return np.nan, np.nan
+  median, p95 = np.percentile(v, [50, 95])
+  return float(median), float(p95)
+
+
+def compare(baseline: TimingStats, new: TimingStats, alpha: float = 0.01, rel_tol: float = 0.1) -> list[Comparison]:
+  """
+  Compares each metric of new against baseline, higher is worse for all of them. A metric
+  regressed when its change is significant at alpha and its median or p95 got worse by
+  more than rel_tol and MIN_DELTA. Samples of consecutive loops aren't independent, so
+  they're thinned to MAX_SAMPLES first and small p-values alone don't mean much.
+
+  The values of lag:<name> metrics are only there when a process lagged, so for those
+  it's the rate of the warnings that is compared.
+  """
+  new = new.subsample()
+  ret = []
+  for metric in sorted(set(baseline.samples) | set(new.samples)):
+    unit = metric_unit(metric)
+    b, x = baseline.samples.get(metric, np.empty(0)), new.samples.get(metric, np.empty(0))
+    qb, qx = _quantiles(b), _quantiles(x)
+    rb, rx = baseline.rate(metric), new.rate(metric)
+
+    if metric.startswith('lag:'):
+      kb, kx = baseline.counts.get(metric, 0), new.counts.get(metric, 0)
+      higher = rx > rb
+      p = rate_test(kb, baseline.duration, kx, new.duration) if higher else rate_test(kx, new.duration, kb, baseline.duration)
+      changed = abs(rx - rb) > rel_tol * rb
+    elif len(b) == 0 or len(x) == 0:
+      ret.append(Comparison(metric, unit, qb, qx, rb, rx, np.nan, 'added' if len(x) else 'removed'))
+      continue
+    else:
+      higher = qx[0] > qb[0] or (qx[0] == qb[0] and qx[1] > qb[1])
+      p = mann_whitney(x, b) if higher else mann_whitney(b, x)
+      changed = any(abs(vx - vb) > max(rel_tol * abs(vb), MIN_DELTA[unit]) and (vx > vb) == higher
+                    for vb, vx in zip(qb, qx, strict=True))
+
+    status = 'ok'
+    if p < alpha and changed:
+      status = 'regressed' if higher else 'improved'
+    ret.append(Comparison(metric, unit, qb, qx, rb, rx, p, status))
+  return ret
@@ -6,6 +6,7 @@ import shutil
 import subprocess
 import tarfile
 import tempfile
+import threading
 import requests
 import argparse
 from functools import partial
@@ -13,7 +14,7 @@ from opendbc.car.fingerprints import MIGRATION
 from openpilot.common.basedir import BASEDIR
 from openpilot.common.swaglog import cloudlog
 from openpilot.tools.cabana.dbc.generate_dbc_json import generate_dbc_dict
-from openpilot.tools.lib.logreader import LogReader, ReadMode, save_log
+from openpilot.tools.lib.logreader import LogReader, ReadMode
 from openpilot.selfdrive.test.process_replay.migration import migrate_all
 
 juggle_dir = os.path.dirname(os.path.realpath(__file__))
@@ -105,27 +106,61 @@ def process(can, lr):
   return [d for d in lr if can or d.which() not in ['can', 'sendcan'] and not d.which().startswith('customReserved')]
 
 
+def route_context(lr):
+  """The carParams and initData of the route's first segment, which migrations need in every segment"""
+  context = {}
+  # only the first segment, a route without carParams would be read through otherwise
+  for msg in LogReader(lr.logreader_identifiers[0]):
+    if msg.which() in ('carParams', 'initData'):
+      context.setdefault(msg.which(), msg)
+      if len(context) == 2:
+        break
+  return context
+
+
+def export_segment(can, migration_context, lr):
+  msgs = process(can, lr)
+  if migration_context is not None:
+    present = {m.which() for m in msgs}
+    added = [m for m in LogReader.from_bytes(migration_context) if m.which() not in present]
+    msgs = migrate_all(msgs + added)
+    if added:
+      msgs = [m for m in msgs if m.which() not in {a.which() for a in added}]
+  return b"".join(msg.as_builder().to_bytes() for msg in msgs)
+
+
+def export_route(lr, dest, can, migration_context=None):
+  """Writes each segment to dest in order as the workers finish them, without holding the whole route"""
+  try:
+    with open(dest, 'wb') as f:
+      for dat in lr.imap_segments(24, partial(export_segment, can, migration_context)):
+        f.write(dat)
+  except BrokenPipeError:
+    pass  # PlotJuggler was closed before reading everything
+
+
 def juggle_route(route_or_segment_name, can, layout, dbc, should_migrate):
   lr = LogReader(route_or_segment_name, default_mode=ReadMode.AUTO_INTERACTIVE)
-
-  all_data = lr.run_across_segments(24, partial(process, can))
-  if should_migrate:
-    all_data = migrate_all(all_data)
+  context = route_context(lr)
 
   # Infer DBC name from logs
   platform = None
   if dbc is None:
     try:
-      CP = lr.first('carParams')
+      CP = context['carParams'].carParams
       platform = MIGRATION.get(CP.carFingerprint, CP.carFingerprint)
       dbc = generate_dbc_dict()[platform]
     except Exception:
       cloudlog.exception("Failed to get DBC name from logs!")
 
-  with tempfile.NamedTemporaryFile(suffix='.rlog', dir=juggle_dir) as tmp:
-    save_log(tmp.name, all_data, compress=False)
-    del all_data
-    start_juggler(tmp.name, dbc, layout, route_or_segment_name, platform)
+  migration_context = b"".join(msg.as_builder().to_bytes() for msg in context.values()) if should_migrate else None
+
+  # PlotJuggler starts reading from the pipe while the later segments are still being processed
+  with tempfile.TemporaryDirectory(dir=juggle_dir) as tmpdir:
+    fn = os.path.join(tmpdir, "route.rlog")
+    os.mkfifo(fn)
+    threading.Thread(target=export_route, args=(lr, fn, can, migration_context), daemon=True).start()
+    start_juggler(fn, dbc, layout, route_or_segment_name, platform)
 
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@ import glob
 import shutil
 import signal
 import subprocess
+import tempfile
 import time
 
 import unittest
@@ -10,7 +11,9 @@ import unittest
 from openpilot.common.test import OpenpilotTestCase
 from openpilot.common.basedir import BASEDIR
 from openpilot.common.timeout import Timeout
-from openpilot.tools.plotjuggler.juggle import DEMO_ROUTE, install
+from openpilot.cereal import log
+from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.plotjuggler.juggle import DEMO_ROUTE, export_route, install, route_context
 
 PJ_DIR = os.path.join(BASEDIR, "openpilot/tools/plotjuggler")
 
@@ -36,6 +39,36 @@ class TestPlotJuggler(OpenpilotTestCase):
 
       assert "Raw file read failed" not in output
 
+  def test_export_route(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      segments = []
+      for seg in range(3):
+        events = []
+        for i, which in enumerate((['initData', 'carParams'] if seg == 0 else []) + ['carState', 'can'] * 10):
+          event = log.Event.new_message(logMonoTime=seg * 1000 + i)
+          if which == 'can':
+            event.init('can', 1)
+          else:
+            event.init(which)
+          events.append(event.to_bytes())
+        segments.append(os.path.join(tmpdir, f"rlog{seg}"))
+        with open(segments[-1], "wb") as f:
+          f.write(b"".join(events))
+
+      lr = LogReader(segments)
+      context = route_context(lr)
+      assert set(context) == {'initData', 'carParams'}
+
+      # the context messages are only used to migrate the later segments, not written into them
+      out = os.path.join(tmpdir, "route")
+      export_route(lr, out, False, b"".join(m.as_builder().to_bytes() for m in context.values()))
+      msgs = list(LogReader(out))
+      assert [m.which() for m in msgs] == ['initData', 'carParams'] + ['carState'] * 30
+      assert [m.logMonoTime for m in msgs] == sorted(m.logMonoTime for m in msgs)
+
+      export_route(lr, out, True)
+      assert len(list(LogReader(out))) == len(list(lr))
+
   # TODO: also test that layouts successfully load
   def test_layouts(self, subtests):
     bad_strings = (
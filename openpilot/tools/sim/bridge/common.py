@@ -1,6 +1,7 @@
 import signal
 import threading
 import functools
+import time
 import numpy as np
 
 from collections import namedtuple
@@ -8,8 +9,9 @@ from enum import Enum
 from multiprocessing import Process, Queue, Value
 from abc import ABC, abstractmethod
 from opendbc.car.honda.values import CruiseButtons
+from openpilot.cereal import messaging
 from openpilot.common.params import Params
-from openpilot.common.realtime import Ratekeeper
+from openpilot.common.realtime import DT_CTRL, Ratekeeper
 from openpilot.selfdrive.test.helpers import set_params_enabled
 from openpilot.tools.sim.lib.common import SimulatorState, World
 from openpilot.tools.sim.lib.simulated_car import SimulatedCar
@@ -22,6 +24,7 @@ class QueueMessageType(Enum):
   CONTROL_COMMAND = 1
   TERMINATION_INFO = 2
   CLOSE_STATUS = 3
+  METRICS = 4
 
 def control_cmd_gen(cmd: str):
   return QueueMessage(QueueMessageType.CONTROL_COMMAND, cmd)
@@ -33,10 +36,58 @@ def rk_loop(function, hz, exit_event: threading.Event):
     rk.keep_time()
 
 
+LOCKSTEP_TIMEOUT = 1.0
+
+class Lockstep:
+  """
+  Paces the bridge on openpilot instead of the wall clock. After each tick of CAN the bridge waits for the
+  carControl computed from it, and after each camera frame for the modelV2 run on it, so the world only
+  advances once openpilot has consumed the previous frame and runs as fast as openpilot can keep up.
+
+  Until openpilot answers, e.g. while it is starting up, waits give up after startup_timeout, which paces
+  the bridge at about real time. Once in sync a wait that takes longer than timeout drops back to that.
+  """
+  def __init__(self, timeout: float = LOCKSTEP_TIMEOUT, startup_timeout: float = DT_CTRL):
+    self.timeout = timeout
+    self.startup_timeout = startup_timeout
+    self.synced = False
+    self.timeouts = 0
+    self.sm: messaging.SubMaster | None = None
+    self.controls_mono_time = 0
+
+  def start(self):
+    # sockets are created in the bridge process
+    self.sm = messaging.SubMaster(['carControl', 'modelV2'])
+
+  def _wait(self, done) -> bool:
+    assert self.sm is not None
+    deadline = time.monotonic() + (self.timeout if self.synced else self.startup_timeout)
+    while not done():
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        self.timeouts += self.synced
+        self.synced = False
+        return False
+      self.sm.update(int(remaining * 1000))
+    self.synced = True
+    return True
+
+  def wait_for_controls(self) -> bool:
+    assert self.sm is not None
+    if not self._wait(lambda: self.sm.logMonoTime['carControl'] > self.controls_mono_time):
+      return False
+    self.controls_mono_time = self.sm.logMonoTime['carControl']
+    return True
+
+  def wait_for_frame(self, frame_id: int) -> bool:
+    assert self.sm is not None
+    return self._wait(lambda: self.sm.seen['modelV2'] and self.sm['modelV2'].frameId >= frame_id)
+
+
 class SimulatorBridge(ABC):
   TICKS_PER_FRAME = 5
 
-  def __init__(self, dual_camera, high_quality):
+  def __init__(self, dual_camera, high_quality, lockstep: Lockstep | None = None):
     set_params_enabled()
     self.params = Params()
     self.params.put_bool("AlphaLongitudinalEnabled", True, block=True)
@@ -45,6 +96,7 @@ class SimulatorBridge(ABC):
 
     self.dual_camera = dual_camera
     self.high_quality = high_quality
+    self.lockstep = lockstep
 
     self._exit_event: threading.Event | None = None
     self._threads = []
@@ -60,6 +112,11 @@ class SimulatorBridge(ABC):
 
     self.test_run = False
 
+    self.start_time = 0.
+    self.engaged_frames = 0
+    self.distance = 0.
+    self.max_speed = 0.
+
   def _on_shutdown(self, signal, frame):
     self.shutdown()
 
@@ -71,6 +128,7 @@ class SimulatorBridge(ABC):
       self._run(q)
     finally:
       self.close("bridge terminated")
+      q.put(QueueMessage(QueueMessageType.METRICS, self.metrics()))
 
   def close(self, reason):
     self.started.value = False
@@ -93,6 +151,25 @@ State:
 Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_engaged}
     """)
 
+  @property
+  def sim_time(self) -> float:
+    return self.rk.frame * DT_CTRL
+
+  def metrics(self) -> dict:
+    wall_time = time.monotonic() - self.start_time if self.start_time else 0.
+    metrics = {
+      "sim_time": self.sim_time,
+      "wall_time": wall_time,
+      "realtime_factor": self.sim_time / wall_time if wall_time > 0 else 0.,
+      "engaged_time": self.engaged_frames * DT_CTRL,
+      "distance": self.distance,
+      "max_speed": self.max_speed,
+      "lockstep_timeouts": self.lockstep.timeouts if self.lockstep is not None else 0,
+    }
+    if self.world is not None:
+      metrics.update(self.world.metrics())
+    return metrics
+
   @abstractmethod
   def spawn_world(self, q: Queue, /) -> World:
     pass
@@ -105,18 +182,24 @@ Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_enga
 
     self._exit_event = threading.Event()
 
-    self.simulated_car_thread = threading.Thread(target=rk_loop, args=(functools.partial(self.simulated_car.update, self.simulator_state),
-                                                                        100, self._exit_event))
-    self.simulated_car_thread.start()
-
-    self.simulated_camera_thread = threading.Thread(target=rk_loop, args=(functools.partial(self.simulated_sensors.send_camera_images, self.world),
-                                                                        20, self._exit_event))
-    self.simulated_camera_thread.start()
-
-    # Simulation tends to be slow in the initial steps. This prevents lagging later
-    for _ in range(20):
-      self.world.tick()
+    if self.lockstep is None:
+      self.simulated_car_thread = threading.Thread(target=rk_loop, args=(functools.partial(self.simulated_car.update, self.simulator_state),
+                                                                          100, self._exit_event))
+      self.simulated_car_thread.start()
+
+      self.simulated_camera_thread = threading.Thread(target=rk_loop, args=(functools.partial(self.simulated_sensors.send_camera_images, self.world),
+                                                                          20, self._exit_event))
+      self.simulated_camera_thread.start()
+    else:
+      # in lockstep CAN and camera frames are sent from the loop below, in step with the world
+      self.lockstep.start()
+
+    # Simulation tends to be slow in the initial steps. This prevents lagging later, which can't happen in lockstep
+    if self.lockstep is None:
+      for _ in range(20):
+        self.world.tick()
 
+    self.start_time = time.monotonic()
     while self._keep_alive:
       throttle_out = steer_out = brake_out = 0.0
       throttle_op = steer_op = brake_op = 0.0
@@ -166,7 +249,12 @@ Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_enga
       steer_manual = steer_manual * -40
 
       # Update openpilot on current sensor state
-      self.simulated_sensors.update(self.simulator_state, self.world)
+      if self.lockstep is None:
+        self.simulated_sensors.update(self.simulator_state, self.world)
+      else:
+        self.simulated_sensors.update(self.simulator_state, self.world, self.sim_time)
+        self.simulated_car.update(self.simulator_state)
+        self.lockstep.wait_for_controls()
 
       self.simulated_car.sm.update(0)
       self.simulator_state.is_engaged = self.simulated_car.sm['selfdriveState'].active
@@ -185,6 +273,10 @@ Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_enga
       brake_out = brake_op if self.simulator_state.is_engaged else brake_manual
       steer_out = steer_op if self.simulator_state.is_engaged else steer_manual
 
+      self.engaged_frames += self.simulator_state.is_engaged
+      self.distance += self.simulator_state.speed * DT_CTRL
+      self.max_speed = max(self.max_speed, self.simulator_state.speed)
+
       self.world.apply_controls(steer_out, throttle_out, brake_out)
       self.world.read_state()
       self.world.read_sensors(self.simulator_state)
@@ -195,6 +287,9 @@ Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_enga
       if self.rk.frame % self.TICKS_PER_FRAME == 0:
         self.world.tick()
         self.world.read_cameras()
+        if self.lockstep is not None:
+          self.simulated_sensors.send_camera_images(self.world)
+          self.lockstep.wait_for_frame(self.simulated_sensors.camerad.frame_road_id - 1)
 
       # don't print during test, so no print/IO Block between OP and metadrive processes
       if not self.test_run and self.rk.frame % 25 == 0:
@@ -202,4 +297,7 @@ Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_enga
 
       self.started.value = True
 
-      self.rk.keep_time()
+      if self.lockstep is None:
+        self.rk.keep_time()
+      else:
+        self.rk.monitor_time()
@@ -4,7 +4,7 @@ from multiprocessing import Queue
 from metadrive.component.sensors.base_camera import _cuda_enable
 from metadrive.component.map.pg_map import MapGenerateMethod
 
-from openpilot.tools.sim.bridge.common import SimulatorBridge
+from openpilot.tools.sim.bridge.common import Lockstep, SimulatorBridge
 from openpilot.tools.sim.bridge.metadrive.metadrive_common import RGBCameraRoad, RGBCameraWide
 from openpilot.tools.sim.bridge.metadrive.metadrive_world import MetaDriveWorld
 from openpilot.tools.sim.lib.camerad import W, H
@@ -50,8 +50,8 @@ def create_map(track_size=60):
 class MetaDriveBridge(SimulatorBridge):
   TICKS_PER_FRAME = 5
 
-  def __init__(self, dual_camera, high_quality, test_duration=math.inf, test_run=False):
-    super().__init__(dual_camera, high_quality)
+  def __init__(self, dual_camera, high_quality, test_duration=math.inf, test_run=False, lockstep: Lockstep | None = None):
+    super().__init__(dual_camera, high_quality, lockstep)
 
     self.should_render = False
     self.test_run = test_run
@@ -90,4 +90,4 @@ class MetaDriveBridge(SimulatorBridge):
       "anisotropic_filtering": False
     }
 
-    return MetaDriveWorld(queue, config, self.test_duration, self.test_run, self.dual_camera)
+    return MetaDriveWorld(queue, config, self.test_duration, self.test_run, self.dual_camera, self.lockstep is not None)
@@ -50,7 +50,7 @@ def apply_metadrive_patches(arrive_dest_done=True):
 
 def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera_array, image_lock,
                       controls_recv: Connection, simulation_state_send: Connection, vehicle_state_send: Connection,
-                      exit_event, op_engaged, test_duration, test_run):
+                      exit_event, op_engaged, test_duration, test_run, lockstep=False):
   arrive_dest_done = config.pop("arrive_dest_done", True)
   apply_metadrive_patches(arrive_dest_done)
 
@@ -95,10 +95,19 @@ def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera
 
   rk = Ratekeeper(100, None)
 
+  # in lockstep the world only advances when the bridge ticks it, and time is simulation time
+  step_time = config["physics_world_step_size"]
+  steps = 0
+  def now():
+    return steps * step_time if lockstep else time.monotonic()
+
   steer_ratio = 8
   vc = [0,0]
 
   while not exit_event.is_set():
+    if lockstep and not controls_recv.poll(0.1):
+      continue
+
     vehicle_state = metadrive_vehicle_state(
       velocity=vec3(x=float(env.vehicle.velocity[0]), y=float(env.vehicle.velocity[1]), z=0),
       position=env.vehicle.position,
@@ -122,11 +131,12 @@ def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera
 
     is_engaged = op_engaged.is_set()
     if is_engaged and start_time is None:
-      start_time = time.monotonic()
+      start_time = now()
 
-    if rk.frame % 5 == 0:
+    if lockstep or rk.frame % 5 == 0:
       _, _, terminated, _, _ = env.step(vc)
-      timeout = True if start_time is not None and time.monotonic() - start_time >= test_duration else False
+      steps += 1
+      timeout = True if start_time is not None and now() - start_time >= test_duration else False
       lane_idx_curr, on_lane = get_current_lane_info(env.vehicle)
       out_of_lane = lane_idx_curr != lane_idx_prev or not on_lane
       lane_idx_prev = lane_idx_curr
@@ -151,4 +161,5 @@ def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera
       road_image[...] = get_cam_as_rgb("rgb_road")
       image_lock.release()
 
-    rk.keep_time()
+    if not lockstep:
+      rk.keep_time()
@@ -14,7 +14,7 @@ from openpilot.tools.sim.lib.camerad import W, H
 
 
 class MetaDriveWorld(World):
-  def __init__(self, status_q, config, test_duration, test_run, dual_camera=False):
+  def __init__(self, status_q, config, test_duration, test_run, dual_camera=False, lockstep=False):
     super().__init__(dual_camera)
     self.status_q = status_q
     self.camera_array = Array(ctypes.c_uint8, W*H*3)
@@ -32,6 +32,7 @@ class MetaDriveWorld(World):
     self.op_engaged = multiprocessing.Event()
 
     self.test_run = test_run
+    self.lockstep = lockstep
 
     self.first_engage = None
     self.last_check_timestamp = 0
@@ -41,7 +42,7 @@ class MetaDriveWorld(World):
                               functools.partial(metadrive_process, dual_camera, config,
                                                 self.camera_array, self.wide_camera_array, self.image_lock,
                                                 self.controls_recv, self.simulation_state_send,
-                                                self.vehicle_state_send, self.exit_event, self.op_engaged, test_duration, self.test_run))
+                                                self.vehicle_state_send, self.exit_event, self.op_engaged, test_duration, self.test_run, self.lockstep))
 
     self.metadrive_process.start()
     self.status_q.put(QueueMessage(QueueMessageType.START_STATUS, "starting"))
@@ -70,6 +71,11 @@ class MetaDriveWorld(World):
       self.vc[0] = 0
       self.vc[1] = 0
 
+    # in lockstep the controls go out with the next tick, which steps the world
+    if not self.lockstep:
+      self.send_controls()
+
+  def send_controls(self):
     self.controls_send.send([*self.vc, self.should_reset])
     self.should_reset = False
 
@@ -121,7 +127,8 @@ class MetaDriveWorld(World):
     pass
 
   def tick(self):
-    pass
+    if self.lockstep:
+      self.send_controls()
 
   def reset(self):
     self.should_reset = True
@@ -0,0 +1,23 @@
+import math
+from multiprocessing import Queue
+
+from openpilot.common.realtime import DT_CTRL
+from openpilot.tools.sim.bridge.common import Lockstep, SimulatorBridge
+from openpilot.tools.sim.bridge.stub.stub_world import StubWorld
+
+
+class StubBridge(SimulatorBridge):
+  TICKS_PER_FRAME = 5
+
+  def __init__(self, dual_camera=False, high_quality=False, test_duration=math.inf, test_run=False, lockstep: Lockstep | None = None,
+               speed=0., curvature=0.):
+    super().__init__(dual_camera, high_quality, lockstep)
+
+    self.test_run = test_run
+    self.test_duration = test_duration
+    self.speed = speed
+    self.curvature = curvature
+
+  def spawn_world(self, queue: Queue):
+    return StubWorld(queue, self.TICKS_PER_FRAME * DT_CTRL, self.test_duration, self.speed, self.curvature,
+                     self.test_run, self.dual_camera)
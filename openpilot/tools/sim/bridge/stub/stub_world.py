@@ -0,0 +1,114 @@
+import math
+import numpy as np
+
+from openpilot.tools.sim.bridge.common import QueueMessage, QueueMessageType
+from openpilot.tools.sim.lib.common import SimulatorState, World, vec3, W, H
+
+
+def road_image(margin: int) -> np.ndarray:
+  """Flat grey road below the horizon with white lane lines, margin pixels wider than the camera on each side."""
+  img = np.full((H, W + 2 * margin, 3), 110, dtype=np.uint8)
+  img[:H // 2] = (140, 180, 230)
+  for x in (margin + W // 4, margin + 3 * W // 4):
+    img[H // 2:, x - 8:x + 8] = 255
+  return img
+
+
+class StubWorld(World):
+  """
+  World without a simulator, for testing the bridge and running scenarios without MetaDrive.
+
+  The car is a kinematic bicycle model on a road of constant curvature, and the cameras see a synthetic
+  road shifted by the lateral offset from the lane center. Everything runs in the bridge process, so a
+  tick is deterministic and as fast as the bridge calls it.
+  """
+  STEER_RATIO = 15.
+  WHEELBASE = 2.7
+  MAX_ACCEL = 1.6  # the bridge maps accel to throttle and brake with these
+  MAX_DECEL = 4.0
+  LANE_WIDTH = 3.7
+  PIXELS_PER_METER = 200
+  MARGIN = 400
+
+  def __init__(self, status_q, dt: float, duration: float = math.inf, speed: float = 0., curvature: float = 0.,
+               test_run: bool = False, dual_camera: bool = False):
+    super().__init__(dual_camera)
+    self.status_q = status_q
+    self.dt = dt
+    self.duration = duration
+    self.initial_speed = speed
+    self.curvature = curvature
+    self.test_run = test_run
+
+    self.road = road_image(self.MARGIN)
+    self.reset()
+
+  def reset(self):
+    self.time = 0.
+    self.x = self.y = self.heading = 0.
+    self.speed = self.initial_speed
+    self.steering_angle = 0.
+    self.accel = 0.
+    self.done_info: dict | None = None
+    self.max_lateral_offset = 0.
+
+  @property
+  def lateral_offset(self) -> float:
+    # left of the lane center is positive, the road turns left for positive curvature
+    if self.curvature == 0:
+      return self.y
+    radius = 1 / self.curvature
+    return radius - math.copysign(math.hypot(self.x, self.y - radius), radius)
+
+  def apply_controls(self, steer_angle, throttle_out, brake_out):
+    self.steering_angle = steer_angle
+    self.accel = throttle_out * self.MAX_ACCEL - brake_out * self.MAX_DECEL
+
+  def tick(self):
+    self.speed = max(self.speed + self.accel * self.dt, 0.)
+    yaw_rate = self.speed * math.tan(math.radians(self.steering_angle) / self.STEER_RATIO) / self.WHEELBASE
+    # move along the chord of the arc driven during the tick
+    mid_heading = self.heading + yaw_rate * self.dt / 2
+    self.x += self.speed * math.cos(mid_heading) * self.dt
+    self.y += self.speed * math.sin(mid_heading) * self.dt
+    self.heading += yaw_rate * self.dt
+    self.time += self.dt
+
+    offset = self.lateral_offset
+    self.max_lateral_offset = max(self.max_lateral_offset, abs(offset))
+    if self.done_info is None:
+      if self.time >= self.duration:
+        self.done_info = {"timeout": True}
+      elif self.test_run and abs(offset) > self.LANE_WIDTH / 2:
+        self.done_info = {"out_of_lane": True}
+
+    shift = int(np.clip(offset * self.PIXELS_PER_METER, -self.MARGIN, self.MARGIN))
+    self.road_image[...] = self.road[:, self.MARGIN - shift:self.MARGIN - shift + W]
+    if self.dual_camera:
+      self.wide_road_image[...] = self.road_image
+    self.image_lock.release()
+
+  def read_state(self):
+    if self.done_info is not None and not self.exit_event.is_set():
+      self.status_q.put(QueueMessage(QueueMessageType.TERMINATION_INFO, self.done_info))
+      self.exit_event.set()
+
+  def read_sensors(self, state: SimulatorState):
+    state.velocity = vec3(x=self.speed * math.cos(self.heading), y=self.speed * math.sin(self.heading), z=0)
+    state.bearing = math.degrees(self.heading)
+    state.steering_angle = self.steering_angle
+    state.gps.from_xy((self.x, self.y))
+    state.valid = True
+
+  def read_cameras(self):
+    pass
+
+  def close(self, reason: str):
+    self.status_q.put(QueueMessage(QueueMessageType.CLOSE_STATUS, reason))
+    self.exit_event.set()
+
+  def metrics(self) -> dict:
+    return {
+      "lateral_offset": self.lateral_offset,
+      "max_lateral_offset": self.max_lateral_offset,
+    }
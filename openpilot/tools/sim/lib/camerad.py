@@ -7,32 +7,76 @@ from openpilot.cereal import messaging
 from openpilot.tools.sim.lib.common import W, H
 
 
+class NV12Converter:
+  """Converts RGB images to NV12 (YUV420) using BT.601 coefficients, bit exact with the original OpenCL kernel.
+
+  All intermediates fit in uint16, so the frame is converted in bands of rows through preallocated
+  uint16 scratch instead of full frame int32 temporaries. The returned buffer is reused on the next call.
+  """
+  BAND_ROWS = 64
+
+  def __init__(self, w: int, h: int):
+    assert w % 2 == 0 and h % 2 == 0
+    self.w, self.h = w, h
+    self.out = np.empty(w * h * 3 // 2, dtype=np.uint8)
+    self.y = self.out[:w * h].reshape(h, w)
+    self.uv = self.out[w * h:].reshape(h // 2, w // 2, 2)
+
+    rows = self.BAND_ROWS
+    self.planes = np.empty((3, rows, w), dtype=np.uint16)
+    self.acc = np.empty((2, rows, w), dtype=np.uint16)
+    self.row_sums = np.empty((3, rows // 2, w), dtype=np.uint16)
+    self.sub = np.empty((3, rows // 2, w // 2), dtype=np.uint16)
+    self.chroma = np.empty((2, rows // 2, w // 2), dtype=np.uint16)
+
+  def __call__(self, rgb: np.ndarray) -> np.ndarray:
+    assert rgb.shape == (self.h, self.w, 3), f"{rgb.shape}"
+    for top in range(0, self.h, self.BAND_ROWS):
+      n = min(self.BAND_ROWS, self.h - top)
+      planes = self.planes[:, :n]
+      np.copyto(planes, np.moveaxis(rgb[top:top + n], -1, 0))
+      r, g, b = planes
+
+      # Y plane, the sum is at most 111 * 255 + 64 so no clipping is needed
+      y, tmp = self.acc[:, :n]
+      np.multiply(b, 13, out=y)
+      y += np.multiply(g, 65, out=tmp)
+      y += np.multiply(r, 33, out=tmp)
+      y += 64 + (16 << 7)
+      y >>= 7
+      self.y[top:top + n] = y
+
+      # subsample RGB for UV (2x2 box filter)
+      m = n // 2
+      row_sums, sub = self.row_sums[:, :m], self.sub[:, :m]
+      np.add(planes[:, 0::2], planes[:, 1::2], out=row_sums)
+      np.add(row_sums[:, :, 0::2], row_sums[:, :, 1::2], out=sub)
+      sub += 2
+      sub >>= 2
+      r_sub, g_sub, b_sub = sub
+
+      # U and V planes, adding the 0x8080 offset first keeps every step positive
+      c, tmp = self.chroma[:, :m]
+      np.multiply(b_sub, 56, out=c)
+      c += 0x8080
+      c -= np.multiply(g_sub, 37, out=tmp)
+      c -= np.multiply(r_sub, 19, out=tmp)
+      c >>= 8
+      self.uv[top // 2:top // 2 + m, :, 0] = c
+
+      np.multiply(r_sub, 56, out=c)
+      c += 0x8080
+      c -= np.multiply(g_sub, 47, out=tmp)
+      c -= np.multiply(b_sub, 9, out=tmp)
+      c >>= 8
+      self.uv[top // 2:top // 2 + m, :, 1] = c
+    return self.out
+
+
 def rgb_to_nv12(rgb):
   """Convert RGB image to NV12 (YUV420) format using BT.601 coefficients."""
   h, w = rgb.shape[:2]
-  r = rgb[:, :, 0].astype(np.int32)
-  g = rgb[:, :, 1].astype(np.int32)
-  b = rgb[:, :, 2].astype(np.int32)
-
-  # Y plane - BT.601 coefficients (matches original OpenCL kernel)
-  y = (((b * 13 + g * 65 + r * 33) + 64) >> 7) + 16
-  y = np.clip(y, 0, 255).astype(np.uint8)
-
-  # Subsample RGB for UV (2x2 box filter)
-  r_sub = (r[0::2, 0::2] + r[0::2, 1::2] + r[1::2, 0::2] + r[1::2, 1::2] + 2) >> 2
-  g_sub = (g[0::2, 0::2] + g[0::2, 1::2] + g[1::2, 0::2] + g[1::2, 1::2] + 2) >> 2
-  b_sub = (b[0::2, 0::2] + b[0::2, 1::2] + b[1::2, 0::2] + b[1::2, 1::2] + 2) >> 2
-
-  # U and V planes
-  u = np.clip((b_sub * 56 - g_sub * 37 - r_sub * 19 + 0x8080) >> 8, 0, 255).astype(np.uint8)
-  v = np.clip((r_sub * 56 - g_sub * 47 - b_sub * 9 + 0x8080) >> 8, 0, 255).astype(np.uint8)
-
-  # Interleave UV for NV12 format
-  uv = np.empty((h // 2, w), dtype=np.uint8)
-  uv[:, 0::2] = u
-  uv[:, 1::2] = v
-
-  return np.concatenate([y.ravel(), uv.ravel()]).tobytes()
+  return NV12Converter(w, h)(rgb).tobytes()
 
 
 class Camerad:
@@ -43,6 +87,7 @@ class Camerad:
     self.frame_road_id = 0
     self.frame_wide_id = 0
     self.vipc_server = VisionIpcServer("camerad")
+    self.nv12 = NV12Converter(W, H)
 
     self.vipc_server.create_buffers(VisionStreamType.VISION_STREAM_NARROW_ROAD, 5, W, H)
     if dual_camera:
@@ -59,10 +104,10 @@ class Camerad:
     self.frame_wide_id += 1
 
   def rgb_to_yuv(self, rgb):
-    """Convert RGB to NV12 YUV format."""
+    """Convert RGB to NV12 YUV format, the result is only valid until the next call."""
     assert rgb.shape == (H, W, 3), f"{rgb.shape}"
     assert rgb.dtype == np.uint8
-    return rgb_to_nv12(rgb)
+    return self.nv12(rgb)
 
   def _send_yuv(self, yuv, frame_id, pub_type, yuv_type):
     eof = int(frame_id * 0.05 * 1e9)
@@ -98,3 +98,7 @@ class World(ABC):
   @abstractmethod
   def reset(self):
     pass
+
+  def metrics(self) -> dict:
+    """World specific metrics reported at the end of a scenario."""
+    return {}
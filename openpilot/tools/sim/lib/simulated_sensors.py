@@ -104,8 +104,9 @@ class SimulatedSensors:
       yuv = self.camerad.rgb_to_yuv(world.wide_road_image)
       self.camerad.cam_send_yuv_wide_road(yuv)
 
-  def update(self, simulator_state: 'SimulatorState', world: 'World'):
-    now = time.monotonic()
+  def update(self, simulator_state: 'SimulatorState', world: 'World', now: float | None = None):
+    if now is None:
+      now = time.monotonic()
     self.send_imu_message(simulator_state)
     self.send_gps_message(simulator_state)
 
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Runs a batch of closed loop scenarios headless and in lockstep, and reports metrics for each.
+
+Every scenario runs in its own OPENPILOT_PREFIX with its own openpilot, so scenarios in parallel
+workers don't share messaging or params. Scenarios are read from a JSON list, e.g.
+  [{"name": "curve", "world": "stub", "duration": 120, "speed": 20, "curvature": 0.005}]
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import queue
+import subprocess
+import time
+import traceback
+from dataclasses import dataclass, replace
+
+from openpilot.common.prefix import OpenpilotPrefix
+from openpilot.common.realtime import DT_CTRL
+from openpilot.tools.sim.bridge.common import Lockstep, QueueMessageType, SimulatorBridge
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class Scenario:
+  name: str
+  world: str = "stub"  # stub or metadrive
+  duration: float = 60.  # seconds of simulation time, for metadrive counted from the first engagement
+  dual_camera: bool = False
+  speed: float = 0.  # initial speed and road curvature, stub only
+  curvature: float = 0.
+
+  def create_bridge(self, lockstep: Lockstep) -> SimulatorBridge:
+    if self.world == "stub":
+      from openpilot.tools.sim.bridge.stub.stub_bridge import StubBridge
+      return StubBridge(self.dual_camera, False, self.duration, True, lockstep, self.speed, self.curvature)
+    elif self.world == "metadrive":
+      from openpilot.tools.sim.bridge.metadrive.metadrive_bridge import MetaDriveBridge
+      return MetaDriveBridge(self.dual_camera, False, self.duration, True, lockstep)
+    raise ValueError(f"unknown world {self.world}")
+
+
+DEFAULT_SCENARIOS = [
+  Scenario("straight", speed=20.),
+  Scenario("curve_left", speed=20., curvature=0.005),
+  Scenario("curve_right", speed=20., curvature=-0.005),
+]
+
+
+def run_scenario(scenario: Scenario, launch_openpilot: bool = True) -> dict:
+  result = {"name": scenario.name, "termination": None, "error": None}
+  with OpenpilotPrefix():
+    manager = None
+    try:
+      if launch_openpilot:
+        manager = subprocess.Popen(["./launch_openpilot.sh"], cwd=SIM_DIR, env={**os.environ, "BLOCK": "ui"},
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+      # without openpilot there is nothing to wait for, so the bridge runs as fast as the world
+      q: queue.Queue = queue.Queue()
+      bridge = scenario.create_bridge(Lockstep(startup_timeout=DT_CTRL if launch_openpilot else 0.))
+      bridge.bridge_keep_alive(q, 0)
+
+      while not q.empty():
+        msg = q.get()
+        if msg.type == QueueMessageType.TERMINATION_INFO:
+          result["termination"] = ", ".join(k for k, v in msg.info.items() if v)
+        elif msg.type == QueueMessageType.METRICS:
+          result.update(msg.info)
+    except Exception:
+      result["error"] = traceback.format_exc()
+    finally:
+      if manager is not None:
+        manager.terminate()
+        try:
+          manager.wait(10)
+        except subprocess.TimeoutExpired:
+          manager.kill()
+  return result
+
+
+def run_scenarios(scenarios: list[Scenario], workers: int = 1, launch_openpilot: bool = True) -> list[dict]:
+  with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+    return list(pool.map(run_scenario, scenarios, [launch_openpilot] * len(scenarios)))
+
+
+def format_report(results: list[dict], wall_time: float) -> str:
+  lines = [f"{'scenario':<20} {'sim s':>8} {'wall s':>8} {'x rt':>6} {'engaged s':>10} {'dist m':>8} {'timeouts':>9}  termination"]
+  for r in results:
+    if r["error"] is not None:
+      lines.append(f"{r['name']:<20} failed: {r['error'].strip().splitlines()[-1]}")
+    else:
+      lines.append(f"{r['name']:<20} {r['sim_time']:8.1f} {r['wall_time']:8.1f} {r['realtime_factor']:6.1f} {r['engaged_time']:10.1f} " +
+                   f"{r['distance']:8.0f} {r['lockstep_timeouts']:9d}  {r['termination']}")
+  sim_time = sum(r.get("sim_time", 0.) for r in results)
+  lines.append(f"{len(results)} scenarios, {sim_time:.0f} s simulated in {wall_time:.0f} s, {sim_time / max(wall_time, 1e-6):.1f}x real time")
+  return "\n".join(lines)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Run simulator scenarios headless in lockstep with openpilot.",
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument("scenarios", nargs="?", help="JSON file with a list of scenarios, runs the stub scenarios if not given")
+  parser.add_argument("-j", "--workers", type=int, default=1, help="scenarios to run in parallel")
+  parser.add_argument("--no-openpilot", action="store_true", help="only run the bridge and world, e.g. to benchmark the world")
+  parser.add_argument("--duration", type=float, help="override the duration of every scenario")
+  parser.add_argument("--json", help="write the results to this file")
+  args = parser.parse_args()
+
+  if args.scenarios:
+    with open(args.scenarios) as f:
+      scenarios = [Scenario(**s) for s in json.load(f)]
+  else:
+    scenarios = DEFAULT_SCENARIOS
+  if args.duration is not None:
+    scenarios = [replace(s, duration=args.duration) for s in scenarios]
+
+  start = time.monotonic()
+  results = run_scenarios(scenarios, args.workers, not args.no_openpilot)
+  print(format_report(results, time.monotonic() - start))
+
+  if args.json:
+    with open(args.json, "w") as f:
+      json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+  main()
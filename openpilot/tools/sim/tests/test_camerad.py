@@ -0,0 +1,41 @@
+import numpy as np
+
+from openpilot.tools.sim.lib.camerad import NV12Converter, rgb_to_nv12, W, H
+
+
+def rgb_to_nv12_int32(rgb):
+  # the previous implementation, with full frame int32 temporaries
+  h, w = rgb.shape[:2]
+  r = rgb[:, :, 0].astype(np.int32)
+  g = rgb[:, :, 1].astype(np.int32)
+  b = rgb[:, :, 2].astype(np.int32)
+
+  y = (((b * 13 + g * 65 + r * 33) + 64) >> 7) + 16
+  y = np.clip(y, 0, 255).astype(np.uint8)
+
+  r_sub = (r[0::2, 0::2] + r[0::2, 1::2] + r[1::2, 0::2] + r[1::2, 1::2] + 2) >> 2
+  g_sub = (g[0::2, 0::2] + g[0::2, 1::2] + g[1::2, 0::2] + g[1::2, 1::2] + 2) >> 2
+  b_sub = (b[0::2, 0::2] + b[0::2, 1::2] + b[1::2, 0::2] + b[1::2, 1::2] + 2) >> 2
+
+  u = np.clip((b_sub * 56 - g_sub * 37 - r_sub * 19 + 0x8080) >> 8, 0, 255).astype(np.uint8)
+  v = np.clip((r_sub * 56 - g_sub * 47 - b_sub * 9 + 0x8080) >> 8, 0, 255).astype(np.uint8)
+
+  uv = np.empty((h // 2, w), dtype=np.uint8)
+  uv[:, 0::2] = u
+  uv[:, 1::2] = v
+  return np.concatenate([y.ravel(), uv.ravel()]).tobytes()
+
+
+class TestCamerad:
+  def test_nv12_matches_reference(self):
+    rng = np.random.default_rng(0)
+    for h, w in ((H, W), (130, 66), (2, 2)):
+      for rgb in (rng.integers(0, 256, (h, w, 3), dtype=np.uint8), np.zeros((h, w, 3), np.uint8), np.full((h, w, 3), 255, np.uint8)):
+        assert rgb_to_nv12(rgb) == rgb_to_nv12_int32(rgb)
+
+  def test_nv12_converter_reuse(self):
+    rng = np.random.default_rng(1)
+    converter = NV12Converter(W, H)
+    for _ in range(3):
+      rgb = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+      assert converter(rgb).tobytes() == rgb_to_nv12_int32(rgb)
@@ -0,0 +1,86 @@
+import math
+import queue
+
+import numpy as np
+
+from openpilot.tools.sim.bridge.common import QueueMessageType
+from openpilot.tools.sim.bridge.stub.stub_world import StubWorld
+from openpilot.tools.sim.lib.common import SimulatorState
+from openpilot.tools.sim.run_scenarios import Scenario, run_scenario, run_scenarios
+
+DT = 0.05
+
+
+def drive(world, seconds, steer=0., throttle=0., brake=0.):
+  for _ in range(round(seconds / DT)):
+    world.apply_controls(steer, throttle, brake)
+    world.tick()
+    world.image_lock.acquire()
+    world.read_state()
+
+
+class TestStubWorld:
+  def test_follow_curve(self):
+    for curvature in (0., 0.01, -0.01):
+      world = StubWorld(queue.Queue(), DT, speed=10., curvature=curvature)
+      # steering angle that holds the road curvature
+      steer = math.degrees(math.atan(curvature * StubWorld.WHEELBASE) * StubWorld.STEER_RATIO)
+      drive(world, 20., steer)
+      assert abs(world.lateral_offset) < 0.01
+      assert math.isclose(world.time, 20.)
+
+  def test_controls(self):
+    world = StubWorld(queue.Queue(), DT)
+    drive(world, 5., throttle=1.)
+    assert math.isclose(world.speed, 5 * StubWorld.MAX_ACCEL)
+    drive(world, 5., brake=1.)
+    assert world.speed == 0.
+
+    world = StubWorld(queue.Queue(), DT, speed=10.)
+    drive(world, 1., steer=90.)
+    assert world.lateral_offset > 0 and world.heading > 0
+
+    state = SimulatorState()
+    world.read_sensors(state)
+    assert state.valid and math.isclose(state.speed, 10.) and state.steering_angle == 90.
+
+  def test_camera(self):
+    world = StubWorld(queue.Queue(), DT, speed=10., dual_camera=True)
+    drive(world, DT)
+    center = world.road_image.copy()
+    assert (center != world.road[:, :world.road_image.shape[1]]).any()
+
+    # the lane lines move right when the car drifts left
+    drive(world, 1., steer=90.)
+    lines = np.flatnonzero(world.road_image[-1, :, 0] == 255)
+    assert lines.min() > np.flatnonzero(center[-1, :, 0] == 255).min()
+    assert (world.wide_road_image == world.road_image).all()
+
+  def test_termination(self):
+    q = queue.Queue()
+    world = StubWorld(q, DT, duration=math.inf, speed=10., test_run=True)
+    drive(world, 5., steer=90.)
+    assert world.exit_event.is_set()
+    msg = q.get_nowait()
+    assert msg.type == QueueMessageType.TERMINATION_INFO and msg.info == {"out_of_lane": True}
+    assert q.empty()
+
+    q = queue.Queue()
+    world = StubWorld(q, DT, duration=2., speed=10., test_run=True)
+    drive(world, 3.)
+    assert q.get_nowait().info == {"timeout": True} and math.isclose(world.time, 3.)
+
+
+class TestScenarios:
+  def test_run_scenario(self):
+    result = run_scenario(Scenario("straight", duration=5., speed=10.), launch_openpilot=False)
+    assert result["error"] is None, result["error"]
+    assert result["termination"] == "timeout"
+    assert 5. <= result["sim_time"] < 5.2
+    assert result["distance"] > 45. and result["max_lateral_offset"] < 0.01
+
+  def test_workers(self):
+    scenarios = [Scenario(f"straight{i}", duration=5., speed=5. * i) for i in range(4)]
+    results = run_scenarios(scenarios, workers=4, launch_openpilot=False)
+    assert [r["name"] for r in results] == [s.name for s in scenarios]
+    assert all(r["error"] is None and r["termination"] == "timeout" for r in results)
@@ -5,31 +5,29 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from openpilot.selfdrive.test.mem_usage import DEMO_ROUTE, print_report
+from openpilot.selfdrive.test.mem_usage import DEMO_ROUTE, print_comparison, print_report
 from openpilot.tools.lib.logreader import LogReader
+from openpilot.tools.lib.proc_stats import ProcStats
 
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(description="Analyze memory usage from route logs")
-  parser.add_argument("route", nargs="?", default=None, help="route ID or local rlog path")
+  parser.add_argument("routes", nargs="*", help="route IDs or local rlog paths, several are also compared side by side")
   parser.add_argument("--demo", action="store_true", help=f"use demo route ({DEMO_ROUTE})")
   args = parser.parse_args()
 
   if args.demo:
-    route = DEMO_ROUTE
-  elif args.route:
-    route = args.route
+    routes = [DEMO_ROUTE]
+  elif args.routes:
+    routes = args.routes
   else:
     parser.error("provide a route or use --demo")
 
-  print(f"Reading logs from: {route}")
+  stats_by_route = {}
+  for route in routes:
+    print(f"Reading logs from: {route}")
+    stats_by_route[route] = ProcStats.from_logreader(LogReader(route))
+    print_report(stats_by_route[route])
 
-  proc_logs = []
-  device_states = []
-  for msg in LogReader(route):
-    if msg.which() == 'procLog':
-      proc_logs.append(msg)
-    elif msg.which() == 'deviceState':
-      device_states.append(msg)
-
-  print_report(proc_logs, device_states)
+  if len(stats_by_route) > 1:
+    print_comparison(stats_by_route)